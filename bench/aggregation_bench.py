@@ -0,0 +1,178 @@
+"""Server aggregation benchmark: Flower's strategies against flat.py's.
+
+Times `aggregate_fit` of the stock FedAvg, FedAdam, FedYogi and FedAvgM
+against their flat-buffer counterparts (demo/*/flower_demo/flat.py) on the
+demos' real parameter layouts, built by each demo's NumPy-only
+init_params.py: the LLM's 96 LoRA tensors (the case flat buffers are for),
+the CNN's 8 arrays or the MLP's 4. Client updates are the initial weights
+plus noise, new each round and serialized up front, so only aggregation
+is timed.
+
+Both variants get the same updates, and after every round their weights
+and server optimizer state (FedAdam/FedYogi m and v, FedAvgM momentum)
+must agree to np.allclose; the largest weight difference is reported too.
+Exits 1 if they do not.
+
+Usage:
+    python bench/aggregation_bench.py                            # LoRA, 8 and 32 clients
+    python bench/aggregation_bench.py --model cnn --clients 8 32 128 --rounds 5
+    python bench/aggregation_bench.py --model lora --lora-rank 64
+
+Needs flwr and numpy (`pip install -e demo/llm` or any demo). Results are
+written as JSON next to round_bench.py's.
+"""
+
+import argparse
+import importlib.util
+import json
+import statistics
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEMO_DIR = REPO_ROOT / "demo"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Model -> the demo whose init_params.py builds its layout
+MODELS = {"lora": "llm", "cnn": "pytorch", "mlp": "sklearn"}
+STRATEGIES = ("FedAvg", "FedAdam", "FedYogi", "FedAvgM")
+# Server optimizer state per strategy: (stock attribute, flat attribute)
+STATE = {
+    "FedAdam": (("m_t", "_m"), ("v_t", "_v")),
+    "FedYogi": (("m_t", "_m"), ("v_t", "_v")),
+    "FedAvgM": (("momentum_vector", "_momentum"),),
+}
+# np.allclose tolerance, relative to each value and to the array's largest
+# (second moments are ~1e-7, under any fixed absolute tolerance)
+RTOL = 1e-4
+
+
+def _load(demo: str, module: str):
+    """Import demo/<demo>/flower_demo/<module>.py standalone (every demo is `flower_demo`)."""
+    path = DEMO_DIR / demo / "flower_demo" / f"{module}.py"
+    spec = importlib.util.spec_from_file_location(f"bench_{demo}_{module}", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _results(initial, num_clients: int, seed: int) -> list:
+    """Fit results as the strategies receive them: (proxy, FitRes) per client."""
+    import numpy as np
+    from flwr.common import Code, FitRes, Status, ndarrays_to_parameters
+
+    rng = np.random.default_rng(seed)
+    results = []
+    for _ in range(num_clients):
+        update = [(a + rng.normal(0.0, 0.01, a.shape)).astype(a.dtype) for a in initial]
+        results.append((None, FitRes(
+            status=Status(code=Code.OK, message=""),
+            parameters=ndarrays_to_parameters(update),
+            num_examples=int(rng.integers(100, 1000)),
+            metrics={},
+        )))
+    return results
+
+
+def _strategy(cls, name: str, initial_parameters):
+    kwargs = {"initial_parameters": initial_parameters, "fit_metrics_aggregation_fn": lambda metrics: {}}
+    if name in ("FedAdam", "FedYogi"):
+        kwargs.update(eta=0.01, tau=0.1)
+    elif name == "FedAvgM":
+        kwargs.update(server_momentum=0.9)
+    return cls(**kwargs)
+
+
+def _flat(arrays) -> "np.ndarray":
+    import numpy as np
+    return np.concatenate([np.asarray(a, dtype=np.float64).reshape(-1) for a in arrays])
+
+
+def _close(actual, expected) -> bool:
+    import numpy as np
+    return bool(np.allclose(actual, expected, rtol=RTOL, atol=RTOL * float(np.max(np.abs(expected)))))
+
+
+def run_case(name: str, flat, initial, rounds_results: list, rounds: int) -> dict:
+    """Time both variants over `rounds` rounds, comparing them after each."""
+    import numpy as np
+    from flwr.common import ndarrays_to_parameters, parameters_to_ndarrays
+    from flwr.server import strategy as flwr_strategy
+
+    strategies = {
+        "stock": _strategy(getattr(flwr_strategy, name), name, ndarrays_to_parameters(initial)),
+        "flat": _strategy(getattr(flat, f"Flat{name}"), name, ndarrays_to_parameters(initial)),
+    }
+    samples = {variant: [] for variant in strategies}
+    problems, max_diff = [], 0.0
+    for server_round in range(1, rounds + 1):
+        results = rounds_results[server_round - 1]
+        weights = {}
+        for variant, strategy in strategies.items():
+            start = time.perf_counter()
+            parameters, _ = strategy.aggregate_fit(server_round, results, [])
+            samples[variant].append(time.perf_counter() - start)
+            weights[variant] = _flat(parameters_to_ndarrays(parameters))
+        max_diff = max(max_diff, float(np.max(np.abs(weights["stock"] - weights["flat"]))))
+        if not _close(weights["flat"], weights["stock"]):
+            problems.append(f"round {server_round}: weights differ")
+        for stock_attr, flat_attr in STATE.get(name, ()):
+            stock_state = getattr(strategies["stock"], stock_attr, None)
+            flat_state = getattr(strategies["flat"], flat_attr, None)
+            if stock_state is None or flat_state is None:
+                if (stock_state is None) != (flat_state is None):
+                    problems.append(f"round {server_round}: {stock_attr} set in one variant only")
+            elif not _close(flat_state, _flat(stock_state)):
+                problems.append(f"round {server_round}: {stock_attr} differs")
+
+    timings = {variant: statistics.median(s) for variant, s in samples.items()}
+    return {
+        "strategy": name,
+        "stock_s": round(timings["stock"], 5),
+        "flat_s": round(timings["flat"], 5),
+        "speedup": round(timings["stock"] / timings["flat"], 2) if timings["flat"] else None,
+        "max_abs_diff": max_diff,
+        "problems": problems,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=MODELS, default="lora")
+    parser.add_argument("--lora-rank", type=int, default=16)
+    parser.add_argument("--clients", nargs="+", type=int, default=[8, 32])
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per strategy (median time reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    demo = MODELS[args.model]
+    flat = _load(demo, "flat")
+    init_params = _load(demo, "init_params")
+    initial = init_params.initial_arrays(lora_r=args.lora_rank) if args.model == "lora" else init_params.initial_arrays()
+    size_mb = sum(a.nbytes for a in initial) / 1e6
+    print(f"[bench] {args.model}: {len(initial)} arrays, {size_mb:.1f} MB per update", flush=True)
+
+    cases = []
+    for num_clients in args.clients:
+        rounds_results = [_results(initial, num_clients, args.seed + r) for r in range(args.rounds)]
+        for name in args.strategies:
+            case = {"model": args.model, "arrays": len(initial), "update_mb": round(size_mb, 2),
+                    "clients": num_clients, **run_case(name, flat, initial, rounds_results, args.rounds)}
+            cases.append(case)
+            print(f"[bench]   {num_clients:>4} clients {name:<8} stock {case['stock_s']:.4f}s  "
+                  f"flat {case['flat_s']:.4f}s  x{case['speedup']}  max diff {case['max_abs_diff']:.2e}",
+                  flush=True)
+            for p in case["problems"]:
+                print(f"[bench] FAIL {name}: {p}", flush=True)
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    path = args.results_dir / f"aggregation-bench-{args.model}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(cases, indent=2) + "\n")
+    print(f"[bench] results: {path}")
+    raise SystemExit(1 if any(c["problems"] for c in cases) else 0)
+
+
+if __name__ == "__main__":
+    main()
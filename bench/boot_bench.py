@@ -0,0 +1,212 @@
+"""SuperNode boot: the appliance's OneGate phases against a local OneGate.
+
+Starts bench/fake_onegate.py with a SuperLink that publishes its endpoint
+and CA --publish-delay seconds in, then boots --supernodes SuperNodes at
+once, each a bash process that sources appliance-supernode.sh (with `msg`
+stubbed and the /opt/flower paths moved to a temporary directory) and runs
+the configure stage's OneGate phases in its order:
+
+    discover    discover_superlink
+    tls         setup_tls_trust (CA certificate from the SuperLink's VM)
+    partition   compute_partition_id
+
+then publishes the phase times as FL_BOOT_TIMING with publish_to_onegate.
+Firewall, Docker, the framework image and the container are not exercised.
+Each node's result is checked (SuperLink address, a valid CA, distinct
+partition ids, FL_BOOT_TIMING readable by the dashboard) and the phase
+times and OneGate request counts are written as JSON next to
+round_bench.py's. --rev runs the script from an older commit instead of the
+working tree, to compare before and after:
+
+    python bench/boot_bench.py --no-nic --publish-delay 12
+    python bench/boot_bench.py --no-nic --publish-delay 12 --rev HEAD~1
+
+Needs bash, curl, jq and openssl, and no root or OpenNebula.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = REPO_ROOT / "appliances" / "flower_supernode" / "appliance-supernode.sh"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(REPO_ROOT / "dashboard"))
+
+from fake_onegate import FakeOneGate, FLEET_PORT, SUPERLINK_VMID, _ip  # noqa: E402
+from inventory import parse_boot_timing  # noqa: E402
+
+PHASES = ("discover", "tls", "partition")
+
+# Runs in each SuperNode's bash. The appliance functions are called as
+# service_configure calls them; timing is done here rather than with the
+# script's boot_phase, so older revisions without it can be timed too.
+NODE_SCRIPT = r"""
+msg() { local level="$1"; shift; printf '%s [%s] %s\n' "$(date +%T.%N | cut -c1-12)" "${level^^}" "$*" >&2; }
+. "${BENCH_SCRIPT}"
+FLOWER_DIR="${BENCH_NODE_DIR}"
+FLOWER_CONFIG_DIR="${FLOWER_DIR}/config"
+FLOWER_CERTS_DIR="${FLOWER_DIR}/certs"
+FLOWER_DATA_DIR="${FLOWER_DIR}/data"
+FLOWER_BOOT_DIR="${FLOWER_DIR}/run"
+FLOWER_BOOT_TIMING="${FLOWER_CONFIG_DIR}/boot-timing"
+mkdir -p "${FLOWER_CONFIG_DIR}" "${FLOWER_CERTS_DIR}" "${FLOWER_DATA_DIR}" "${FLOWER_BOOT_DIR}"
+ONEAPP_FL_TLS_ENABLED="${BENCH_TLS}"
+ONEAPP_FL_NODE_CONFIG=""
+
+elapsed() { awk -v a="$1" -v b="${EPOCHREALTIME}" 'BEGIN { printf "%.2f", b - a }'; }
+timing=""
+timed() {
+    local _name="$1" _start="${EPOCHREALTIME}" _rc=0
+    shift
+    "$@" || _rc=$?
+    timing+="${timing:+,}${_name}:$(elapsed "${_start}")"
+    return "${_rc}"
+}
+
+start="${EPOCHREALTIME}"
+# discover_superlink prints its result, so it is timed around the substitution
+SUPERLINK_ADDRESS=$(discover_superlink) || exit 10
+timing="discover:$(elapsed "${start}")"
+TLS_MODE="disabled"
+timed tls setup_tls_trust || exit 11
+timed partition compute_partition_id || exit 12
+total=$(elapsed "${start}")
+publish_to_onegate FL_BOOT_TIMING "${timing},onegate:${total}"
+
+printf 'superlink=%s\ntls=%s\nnode_config=%s\ntiming=%s\n' \
+    "${SUPERLINK_ADDRESS}" "${TLS_MODE}" "${ONEAPP_FL_NODE_CONFIG}" "${timing},onegate:${total}"
+"""
+
+
+def _script(rev: str, tmp: Path) -> Path:
+    if not rev:
+        return SCRIPT
+    path = tmp / f"appliance-supernode-{rev.replace('/', '_')}.sh"
+    text = subprocess.run(["git", "-C", str(REPO_ROOT), "show", f"{rev}:{SCRIPT.relative_to(REPO_ROOT)}"],
+                          capture_output=True, text=True, check=True).stdout
+    path.write_text(text)
+    return path
+
+
+def boot(args) -> dict:
+    gate = FakeOneGate(args.supernodes, args.publish_delay, args.latency, nic=not args.no_nic, tls=args.tls)
+    if args.tls and not gate.ca_pem:
+        sys.exit("boot_bench: openssl could not make the test CA (use --no-tls)")
+    endpoint = gate.serve()
+
+    with tempfile.TemporaryDirectory(prefix="boot-bench-") as tmp:
+        tmp = Path(tmp)
+        bin_dir = tmp / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "onegate").symlink_to(Path(__file__).resolve().parent / "fake_onegate.py")
+        script = _script(args.rev, tmp)
+
+        procs = {}
+        for vm_id in gate.supernode_ids:
+            node_dir = tmp / f"vm-{vm_id}"
+            env = {
+                **os.environ,
+                "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+                "ONEGATE_ENDPOINT": endpoint, "TOKENTXT": f"token-{vm_id}", "VMID": str(vm_id),
+                "BENCH_SCRIPT": str(script), "BENCH_NODE_DIR": str(node_dir),
+                "BENCH_TLS": "YES" if args.tls else "NO",
+            }
+            procs[vm_id] = subprocess.Popen(["bash", "-c", NODE_SCRIPT], env=env, text=True,
+                                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        nodes = []
+        for vm_id, proc in procs.items():
+            out, err = proc.communicate(timeout=args.timeout)
+            fields = dict(line.split("=", 1) for line in out.splitlines() if "=" in line)
+            node = {"vm_id": vm_id, "exit": proc.returncode, **fields}
+            published = gate.user_template(vm_id).get("FL_BOOT_TIMING", "")
+            node["boot_timing"] = parse_boot_timing(published)
+            ca = tmp / f"vm-{vm_id}" / "certs" / "ca.crt"
+            node["ca_matches"] = ca.exists() and ca.read_text().strip() == gate.ca_pem.strip()
+            node["onegate_requests"] = gate.stats()["by_vm"].get(str(vm_id), 0)
+            if args.verbose or proc.returncode:
+                print(f"[bench] --- VM {vm_id} (exit {proc.returncode}) ---\n{err.rstrip()}", flush=True)
+            nodes.append(node)
+
+    stats = gate.stats()
+    gate.shutdown()
+    return {"nodes": nodes, "requests": stats["requests"]}
+
+
+def check(result: dict, args) -> list[str]:
+    """What is wrong with a boot result ([] when nothing)."""
+    problems = []
+    expected = f"{_ip(SUPERLINK_VMID)}:{FLEET_PORT}"
+    partitions = []
+    for n in result["nodes"]:
+        vm = f"VM {n['vm_id']}"
+        if n["exit"]:
+            problems.append(f"{vm}: exited {n['exit']}")
+            continue
+        if n.get("superlink") != expected:
+            problems.append(f"{vm}: discovered {n.get('superlink')!r}, expected {expected!r}")
+        if args.tls and (n.get("tls") != "enabled" or not n["ca_matches"]):
+            problems.append(f"{vm}: TLS {n.get('tls')!r}, CA certificate matches: {n['ca_matches']}")
+        if not all(p in n["boot_timing"] for p in PHASES):
+            problems.append(f"{vm}: FL_BOOT_TIMING not published or not readable: {n['boot_timing']}")
+        partitions.append(n.get("node_config", ""))
+    want = {f"partition-id={i} num-partitions={args.supernodes}" for i in range(args.supernodes)}
+    if not problems and set(partitions) != want:
+        problems.append(f"partition ids not distinct: {sorted(partitions)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--supernodes", type=int, default=4)
+    parser.add_argument("--publish-delay", type=float, default=10.0,
+                        help="seconds until the SuperLink publishes FL_ENDPOINT and FL_CA_CERT")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per OneGate request")
+    parser.add_argument("--no-nic", action="store_true",
+                        help="hide the SuperLink's NIC, so discovery must wait for FL_ENDPOINT")
+    parser.add_argument("--no-tls", dest="tls", action="store_false")
+    parser.add_argument("--rev", default="", help="git revision of the appliance script (default: working tree)")
+    parser.add_argument("--timeout", type=int, default=900)
+    parser.add_argument("--verbose", action="store_true", help="print each node's appliance log")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    print(f"[bench] {args.supernodes} SuperNodes, SuperLink publishes after {args.publish_delay:g}s"
+          f"{', no NIC' if args.no_nic else ''}{', TLS' if args.tls else ''}, script {args.rev or 'working tree'}",
+          flush=True)
+    result = boot(args)
+    for n in result["nodes"]:
+        phases = "  ".join(f"{k} {v:.1f}s" for k, v in n["boot_timing"].items())
+        print(f"[bench]   VM {n['vm_id']}: {phases or 'no timing'}  ({n['onegate_requests']} OneGate requests)",
+              flush=True)
+    totals = [n["boot_timing"]["onegate"] for n in result["nodes"] if "onegate" in n["boot_timing"]]
+    if totals:
+        summary = {"onegate_s_median": round(statistics.median(totals), 2), "onegate_s_max": round(max(totals), 2)}
+        waited = [t - args.publish_delay for t in totals]
+        summary["after_publish_s_max"] = round(max(waited), 2)
+        result["summary"] = summary
+        print(f"[bench] OneGate phases: median {summary['onegate_s_median']:.1f}s, max {summary['onegate_s_max']:.1f}s "
+              f"({summary['after_publish_s_max']:.1f}s after the SuperLink published); requests {result['requests']}",
+              flush=True)
+    problems = check(result, args)
+    for p in problems:
+        print(f"[bench] FAIL {p}", flush=True)
+
+    result.update(vars(args) | {"results_dir": str(args.results_dir), "problems": problems})
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    path = args.results_dir / f"boot-bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(result, indent=2) + "\n")
+    print(f"[bench] results: {path}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Eager versus compiled PyTorch client steps, on synthetic CIFAR-shaped tensors.
+
+Times the PyTorch demo's SimpleCNN the way its ClientApp runs it
+(flower_demo/model.py) in four modes, each in a fresh child process so
+dynamo and the inductor caches start from what a new ClientApp process
+would have:
+
+    eager         the default: eager model, plain SGD
+    eager-fused   eager model, fused SGD (the optimizer change on its own)
+    compiled-cold `compile = true` with an empty compile-cache-dir: the first
+                  SuperNode task after a fresh install
+    compiled-warm the same, with the cache the cold run left behind: every
+                  later task and restart
+
+and records, per mode, the first training step (which compiles in the
+compiled modes), training steps/s after --warmup steps, the first eval
+batch and eval batches/s. Inputs are random (batch, 3, 32, 32) tensors and
+labels, built once, so data loading is not timed. Results are written as
+JSON next to round_bench.py's.
+
+Usage:
+    python bench/compile_bench.py
+    python bench/compile_bench.py --batch-size 64 --steps 200 --threads 2
+
+Needs the PyTorch demo's dependencies (`pip install -e demo/pytorch`) and,
+for the compiled modes, a C++ compiler (inductor's CPU backend); without
+one the compiled modes fall back to eager, which the results show as no
+compile time and no speed-up.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEMO_DIR = REPO_ROOT / "demo" / "pytorch"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+MODES = ("eager", "eager-fused", "compiled-cold", "compiled-warm")
+
+
+# ---------------------------------------------------------------------------
+# Worker: one mode, inside a child process
+# ---------------------------------------------------------------------------
+def run_worker(args) -> dict:
+    import torch
+    import torch.nn as nn
+
+    from flower_demo.model import SimpleCNN, compile_model, make_optimizer
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    batches = [(torch.randn(args.batch_size, 3, 32, 32), torch.randint(0, 10, (args.batch_size,)))
+               for _ in range(8)]
+
+    compiled = args.mode.startswith("compiled")
+    net = SimpleCNN()
+    if compiled:
+        net = compile_model(net, args.cache_dir)
+    optimizer = make_optimizer(net, fused=args.mode != "eager")
+    criterion = nn.CrossEntropyLoss()
+
+    def step(i: int) -> None:
+        images, labels = batches[i % len(batches)]
+        optimizer.zero_grad()
+        criterion(net(images), labels).backward()
+        optimizer.step()
+
+    net.train()
+    start = time.perf_counter()
+    step(0)
+    first_step = time.perf_counter() - start
+    for i in range(1, args.warmup):
+        step(i)
+    start = time.perf_counter()
+    for i in range(args.steps):
+        step(i)
+    train_s = time.perf_counter() - start
+
+    net.eval()
+    with torch.no_grad():
+        start = time.perf_counter()
+        net(batches[0][0])
+        first_eval = time.perf_counter() - start
+        times = []
+        for i in range(args.steps):
+            start = time.perf_counter()
+            net(batches[i % len(batches)][0])
+            times.append(time.perf_counter() - start)
+
+    return {
+        "first_step_s": round(first_step, 4),
+        "train_steps_per_s": round(args.steps / train_s, 2),
+        "first_eval_s": round(first_eval, 4),
+        "eval_batches_per_s": round(1 / statistics.median(times), 2),
+        "threads": torch.get_num_threads(),
+        "torch": torch.__version__,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def _child(mode: str, args, cache_dir: str) -> dict:
+    """Run one mode in a fresh interpreter and return its result."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        out_path = tmp.name
+    cmd = [
+        sys.executable, __file__, "--worker", "--mode", mode, "--cache-dir", cache_dir,
+        "--batch-size", str(args.batch_size), "--steps", str(args.steps),
+        "--warmup", str(args.warmup), "--threads", str(args.threads), "--out", out_path,
+    ]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(DEMO_DIR), env.get("PYTHONPATH")]))
+    try:
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=args.timeout)
+        if proc.returncode != 0:
+            tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+            raise RuntimeError("\n".join(tail))
+        return json.loads(Path(out_path).read_text())
+    finally:
+        Path(out_path).unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=32, help="the demo's batch-size default")
+    parser.add_argument("--steps", type=int, default=100, help="timed training steps and eval batches")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed training steps after the first")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0: torch's default)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--timeout", type=int, default=1800)
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        Path(args.out).write_text(json.dumps(run_worker(args)))
+        return
+
+    cases = []
+    # compiled-warm reuses the cache compiled-cold filled
+    with tempfile.TemporaryDirectory(prefix="compile-bench-") as cache_dir:
+        for mode in args.modes:
+            print(f"[bench] {mode} ...", flush=True)
+            case = {"mode": mode, "batch_size": args.batch_size, "steps": args.steps}
+            try:
+                case.update(_child(mode, args, cache_dir))
+                print(f"[bench]   first step {case['first_step_s']:.2f}s  "
+                      f"train {case['train_steps_per_s']:.1f} steps/s  "
+                      f"first eval {case['first_eval_s']:.2f}s  eval {case['eval_batches_per_s']:.1f} batches/s",
+                      flush=True)
+            except Exception as e:
+                case["error"] = str(e)
+                print(f"[bench]   failed: {e}", flush=True)
+            cases.append(case)
+
+    eager = next((c for c in cases if c["mode"] == "eager" and "error" not in c), None)
+    for case in cases:
+        if eager and "error" not in case:
+            case["train_speedup"] = round(case["train_steps_per_s"] / eager["train_steps_per_s"], 2)
+            case["eval_speedup"] = round(case["eval_batches_per_s"] / eager["eval_batches_per_s"], 2)
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    path = args.results_dir / f"compile-bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(cases, indent=2) + "\n")
+    print(f"[bench] results: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Load-test the dashboard API against a simulated cluster.
+
+Starts the dashboard (uvicorn, as in production) with every piece of
+infrastructure it talks to faked on this host:
+    onevm         bench/fake_onevm.py, N SuperNodes and a SuperLink on
+                  127.0.0.0/8 addresses
+    ssh/scp/docker/flwr
+                  bench/fake_cluster.py: `docker inspect`, a SuperLink log
+                  growing at --log-rate lines/s, `flwr run`/`flwr log`
+    node agents   an HTTP server answering every node's /status (or none,
+                  with --no-agent, so the dashboard falls back to SSH)
+    Control API   a listener on 127.0.0.1:9093, so runs can start
+
+Each fake call waits --latency seconds (onevm, ssh, scp) or --agent-latency
+(agents). Then M concurrent viewers each refresh like the web page does,
+GET /api/cluster and /api/training/status back to back (with --interval
+seconds between refreshes), and hold the SSE log of a run started for the
+test open. Reported per endpoint: requests, errors, p50/p95/p99 latency;
+for the log stream: lines received per viewer and p50/p95/p99 line latency
+(from `flwr log` printing a line to the viewer reading it); and the
+dashboard's CPU time, its own and its finished subprocesses'.
+
+Usage:
+    python bench/dashboard_bench.py                             # 8 nodes, 1 and 10 viewers
+    python bench/dashboard_bench.py --nodes 100 --viewers 1 10 50 --duration 30
+    python bench/dashboard_bench.py --no-agent --latency 0.2    # SSH fallback, slow links
+
+Needs the dashboard's dependencies (fastapi, uvicorn); the load generator
+itself is standard library only. Results are written as JSON next to
+round_bench.py's.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+DASHBOARD_DIR = BENCH_DIR.parent / "dashboard"
+RESULTS_DIR = BENCH_DIR / "results"
+FAKE_ONEVM = BENCH_DIR / "fake_onevm.py"
+FAKE_CLUSTER = BENCH_DIR / "fake_cluster.py"
+sys.path.insert(0, str(DASHBOARD_DIR))
+
+from logstream import log_time  # noqa: E402
+
+HOST = "127.0.0.1"
+CONTROL_PORT = 9093
+ENDPOINTS = ("/api/cluster", "/api/training/status")
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+
+# ---------------------------------------------------------------------------
+# Fake infrastructure on this host
+# ---------------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def _agent_server(port: int, latency: float, superlink_ip: str) -> ThreadingHTTPServer:
+    """Every node's metrics agent: one server on 0.0.0.0, told apart by the address dialled."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            superlink = self.connection.getsockname()[0] == superlink_ip
+            body = json.dumps({
+                "container": {
+                    "status": "running",
+                    "started_at": "2026-01-01T00:00:00.000000000Z",
+                    "image": "flwr/superlink:1.31.0" if superlink else "flower-supernode-pytorch:1.31.0",
+                },
+                "resources": {"cpu_percent": 42.0, "mem_used_mb": 1800.0, "mem_limit_mb": 4096.0},
+                "network": {"tx_bytes": 10**8, "rx_bytes": 2 * 10**8},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _control_listener() -> socket.socket | None:
+    """Something listening on the Control API port, so the dashboard's tunnel check passes."""
+    s = socket.socket()
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        s.bind((HOST, CONTROL_PORT))
+    except OSError:
+        s.close()
+        return None  # already taken: the check passes anyway
+    s.listen(64)
+    return s
+
+
+def _fake_bin(tmp: Path) -> Path:
+    bin_dir = tmp / "bin"
+    bin_dir.mkdir()
+    for name in ("ssh", "scp", "docker", "flwr"):
+        (bin_dir / name).symlink_to(FAKE_CLUSTER)
+    return bin_dir
+
+
+def _cpu_seconds(pid: int) -> tuple[float, float]:
+    """(own, reaped children's) CPU seconds of a process, from /proc."""
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    utime, stime, cutime, cstime = (int(v) for v in fields[11:15])
+    return (utime + stime) / CLK_TCK, (cutime + cstime) / CLK_TCK
+
+
+# ---------------------------------------------------------------------------
+# Load generator (asyncio streams, no client library)
+# ---------------------------------------------------------------------------
+async def _request(port: int, method: str, path: str, body: dict | None = None) -> int:
+    """One HTTP/1.1 request on a fresh connection; returns the status code."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    data = json.dumps(body).encode() if body is not None else b""
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n")
+    writer.write(head.encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1]) if response else 0
+
+
+async def _viewer(port: int, deadline: float, interval: float, samples: dict) -> None:
+    """Refresh like the page does until `deadline`."""
+    while time.monotonic() < deadline:
+        for path in ENDPOINTS:
+            start = time.perf_counter()
+            try:
+                status = await _request(port, "GET", path)
+            except OSError:
+                status = 0
+            samples[path].append((time.perf_counter() - start, status == 200))
+        if interval:
+            await asyncio.sleep(interval)
+
+
+async def _log_viewer(port: int, deadline: float, latencies: list, counts: list) -> None:
+    """Hold the followed run's SSE log open until `deadline`, timing every line."""
+    lines = 0
+    connected = time.time()
+    try:
+        reader, writer = await asyncio.open_connection(HOST, port)
+    except OSError:
+        counts.append(0)
+        return
+    writer.write(f"GET /api/training/log HTTP/1.1\r\nHost: {HOST}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    try:
+        while (remaining := deadline - time.monotonic()) > 0:
+            raw = await asyncio.wait_for(reader.readline(), remaining)
+            if not raw:
+                break
+            if not raw.startswith(b"data: "):
+                continue  # headers, chunk sizes, ids, keepalives
+            line = json.loads(raw[6:]).get("line", "")
+            sent = log_time(line)
+            if sent is not None:
+                lines += 1
+                if sent >= connected:  # not the backlog replayed on connect
+                    latencies.append(time.time() - sent)
+    except (asyncio.TimeoutError, OSError, ValueError):
+        pass
+    writer.close()
+    counts.append(lines)
+
+
+def _percentiles(values: list[float]) -> dict:
+    if len(values) < 2:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    q = statistics.quantiles(values, n=100)
+    return {"p50_ms": round(q[49] * 1000, 1), "p95_ms": round(q[94] * 1000, 1), "p99_ms": round(q[98] * 1000, 1)}
+
+
+async def run_load(port: int, pid: int, viewers: int, args) -> dict:
+    samples = {path: [] for path in ENDPOINTS}
+    latencies, counts = [], []
+    cpu_before = _cpu_seconds(pid)
+    start = time.monotonic()
+    deadline = start + args.duration
+    tasks = [_viewer(port, deadline, args.interval, samples) for _ in range(viewers)]
+    if not args.no_log:
+        tasks += [_log_viewer(port, deadline, latencies, counts) for _ in range(viewers)]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - start
+    cpu_after = _cpu_seconds(pid)
+
+    case = {"viewers": viewers, "duration_s": round(elapsed, 1)}
+    for path, results in samples.items():
+        case[path] = {
+            "requests": len(results),
+            "errors": sum(1 for _, ok in results if not ok),
+            "rps": round(len(results) / elapsed, 1),
+            **_percentiles([t for t, _ in results]),
+        }
+    if not args.no_log:
+        case["log"] = {"lines_per_viewer": round(statistics.mean(counts), 1) if counts else 0,
+                       **_percentiles(latencies)}
+    case["cpu_s"] = round(cpu_after[0] - cpu_before[0], 2)
+    case["children_cpu_s"] = round(cpu_after[1] - cpu_before[1], 2)
+    requests = sum(case[path]["requests"] for path in ENDPOINTS)
+    case["cpu_ms_per_request"] = round(1000 * case["cpu_s"] / requests, 2) if requests else None
+    return case
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+async def _wait_ready(port: int, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"dashboard exited with code {proc.returncode}")
+        try:
+            if await _request(port, "GET", "/api/training/status") == 200:
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"dashboard not ready after {timeout}s")
+
+
+async def bench(args) -> list[dict]:
+    with tempfile.TemporaryDirectory(prefix="dashboard-bench-") as tmp:
+        bin_dir = _fake_bin(Path(tmp))
+        agent_port = _free_port()
+        ip_prefix = "127"
+        superlink_ip = f"{ip_prefix}.0.0.1"  # fake_onevm: VM 0 is the SuperLink
+        agent = None if args.no_agent else _agent_server(agent_port, args.agent_latency, superlink_ip)
+        control = _control_listener()
+        port = _free_port()
+        env = {
+            **os.environ,
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            "FL_ONEVM_BIN": str(FAKE_ONEVM),
+            "FL_FLWR_BIN": str(bin_dir / "flwr"),
+            "FL_AGENT_PORT": str(agent_port),
+            "FAKE_ONEVM_VMS": str(args.nodes + 1),
+            "FAKE_ONEVM_FLOWER_EVERY": "1",
+            "FAKE_ONEVM_IP_PREFIX": ip_prefix,
+            "FAKE_ONEVM_LATENCY": str(args.latency),
+            "FAKE_SSH_LATENCY": str(args.latency),
+            "FAKE_CLUSTER_NODES": str(args.nodes),
+            # Runs long enough that the followed run outlasts every case
+            "FAKE_CLUSTER_ROUNDS": str(max(10, int(
+                (args.duration * len(args.viewers) + 60) * args.log_rate / (6 + min(args.nodes, 50))))),
+            "FAKE_CLUSTER_EPOCH": str(time.time() - args.backlog / args.log_rate),
+            "FAKE_LOG_RATE": str(args.log_rate),
+        }
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", HOST, "--port", str(port),
+             "--log-level", "warning"],
+            cwd=DASHBOARD_DIR, env=env,
+        )
+        try:
+            await _wait_ready(port, proc)
+            # Warm up: inventory, SuperLink log follower, a run whose log viewers can follow
+            await _request(port, "GET", "/api/cluster")
+            if not args.no_log:
+                await _request(port, "POST", "/api/training/start", {"framework": "pytorch"})
+            cases = []
+            for viewers in args.viewers:
+                print(f"[bench] {args.nodes} nodes, {viewers} viewers, {args.duration}s ...", flush=True)
+                case = {"nodes": args.nodes, "agent": not args.no_agent, "latency_s": args.latency,
+                        **await run_load(port, proc.pid, viewers, args)}
+                cases.append(case)
+                for path in ENDPOINTS:
+                    c = case[path]
+                    print(f"[bench]   {path:<22} {c['requests']:>6} req {c['errors']:>4} err  "
+                          f"p50 {c['p50_ms']} ms  p95 {c['p95_ms']} ms  p99 {c['p99_ms']} ms", flush=True)
+                if "log" in case:
+                    c = case["log"]
+                    print(f"[bench]   {'SSE log':<22} {c['lines_per_viewer']:>6} lines/viewer  "
+                          f"p50 {c['p50_ms']} ms  p95 {c['p95_ms']} ms  p99 {c['p99_ms']} ms", flush=True)
+                print(f"[bench]   dashboard CPU {case['cpu_s']}s ({case['cpu_ms_per_request']} ms/request), "
+                      f"subprocesses {case['children_cpu_s']}s", flush=True)
+            return cases
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            if agent is not None:
+                agent.shutdown()
+            if control is not None:
+                control.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=8, help="SuperNodes in the fake cluster")
+    parser.add_argument("--viewers", nargs="+", type=int, default=[1, 10], help="concurrent viewers, one case each")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per case")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between a viewer's refreshes")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake onevm/ssh/scp call")
+    parser.add_argument("--agent-latency", type=float, default=0.01, help="seconds per fake agent request")
+    parser.add_argument("--no-agent", action="store_true", help="no node agents: node status over SSH")
+    parser.add_argument("--no-log", action="store_true", help="no SSE log viewers")
+    parser.add_argument("--log-rate", type=float, default=20.0, help="SuperLink log lines per second")
+    parser.add_argument("--backlog", type=int, default=5000, help="SuperLink log lines written before the test")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    cases = asyncio.run(bench(args))
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    path = args.results_dir / f"dashboard-bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(cases, indent=2) + "\n")
+    print(f"[bench] results: {path}")
+
+
+if __name__ == "__main__":
+    main()
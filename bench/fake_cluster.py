@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Stand-ins for `ssh`, `scp`, `docker` and `flwr` on a simulated cluster.
+
+One script, several names: bench/dashboard_bench.py symlinks it as `ssh`,
+`scp`, `docker` and `flwr` into a directory it puts first on the
+dashboard's PATH, and points FL_FLWR_BIN at the `flwr` link. Together with
+bench/fake_onevm.py (the VM inventory) the dashboard then runs unchanged
+against a cluster that does not exist:
+
+    ssh [opts] user@host CMD    runs CMD under bash with the fake `docker`
+                                 first on PATH, after FAKE_SSH_LATENCY s;
+                                 tunnels (-N) and control commands (-O) succeed
+    scp ...                      succeeds without copying anything
+    docker inspect/logs/...      container state, and a SuperLink log that
+                                 grows at FAKE_LOG_RATE lines/s (`-f` follows)
+    flwr run/log/stop            submits a run, then streams its log
+
+The SuperLink log is a function of time: line k was written at
+FAKE_CLUSTER_EPOCH + k / FAKE_LOG_RATE, so every `docker logs` call and
+follower sees the same, growing log. It cycles through runs of
+FAKE_CLUSTER_ROUNDS rounds with FAKE_CLUSTER_NODES SuperNodes, in the line
+formats the dashboard parses. `flwr log --stream` prints the same lines,
+from the moment it starts, for one run.
+
+Standard library only.
+"""
+
+import os
+import shlex
+import signal
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Default: the top of the hour, so separately started fakes still agree
+EPOCH = float(os.environ.get("FAKE_CLUSTER_EPOCH") or time.time() // 3600 * 3600)
+RATE = float(os.environ.get("FAKE_LOG_RATE", "20"))
+NODES = int(os.environ.get("FAKE_CLUSTER_NODES", "8"))
+ROUNDS = int(os.environ.get("FAKE_CLUSTER_ROUNDS", "10"))
+FRAMEWORK = os.environ.get("FAKE_CLUSTER_FRAMEWORK", "pytorch")
+SSH_LATENCY = float(os.environ.get("FAKE_SSH_LATENCY", "0.05"))
+
+IMAGE_TAG = "1.31.0"
+# Fleet API lines per round; enough for the dashboard's connected-node count
+PULLS_PER_ROUND = min(NODES, 50)
+
+
+# ---------------------------------------------------------------------------
+# The synthetic SuperLink log
+# ---------------------------------------------------------------------------
+def _round_lines(rnd: int) -> list[str]:
+    acc = round(min(0.95, 0.1 + 0.08 * rnd), 4)
+    fit = {"local_steps": 10.0, "prof_train_s_mean": 4.2, "prof_train_s_max": 5.1,
+           "prof_set_weights_s_mean": 0.02, "prof_set_weights_s_max": 0.03,
+           "idle_s_mean": 0.6, "idle_s_max": 0.9, "idle_frac": 0.12}
+    lines = [f"INFO :      [ROUND {rnd}]",
+             f"INFO :      configure_fit: strategy sampled {NODES} clients (out of {NODES})"]
+    lines += [f"INFO :      [Fleet.PullMessages] node_id={1000 + i}" for i in range(PULLS_PER_ROUND)]
+    lines += [f"INFO :      aggregate_fit: received {NODES} results and 0 failures",
+              "INFO :      [METRICS] fit " + _json(fit),
+              f"INFO :      configure_evaluate: strategy sampled {NODES} clients (out of {NODES})",
+              f"INFO :      aggregate_evaluate: received {NODES} results and 0 failures",
+              "INFO :      [METRICS] evaluate " + _json({"accuracy": acc, "prof_eval_s_mean": 0.8,
+                                                         "prof_eval_s_max": 1.0})]
+    return lines
+
+
+def _json(d: dict) -> str:
+    return "{" + ", ".join(f'"{k}": {v}' for k, v in sorted(d.items())) + "}"
+
+
+ROUND_LEN = len(_round_lines(1))
+RUN_LEN = 2 + ROUNDS * ROUND_LEN + 1
+
+
+def line_text(k: int) -> str:
+    """Text of SuperLink log line `k` (without its timestamp)."""
+    run, pos = divmod(k, RUN_LEN)
+    if pos == 0:
+        return f"INFO :      Starting run {1000 + run}"
+    if pos == 1:
+        return f"INFO :      Starting Flower ServerApp, config: num_rounds={ROUNDS}, no round_timeout"
+    if pos == RUN_LEN - 1:
+        return f"INFO :      Run finished {ROUNDS} round(s) in {ROUNDS * ROUND_LEN / RATE:.2f}s"
+    rnd, i = divmod(pos - 2, ROUND_LEN)
+    return _round_lines(rnd + 1)[i]
+
+
+def _stamp(t: float) -> str:
+    # Docker's --timestamps format: RFC 3339 with nanoseconds
+    return datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f") + "000Z"
+
+
+def _line_time(k: int) -> float:
+    return EPOCH + k / RATE
+
+
+def _lines_written(now: float) -> int:
+    return max(0, int((now - EPOCH) * RATE) + 1)
+
+
+def _emit(line: str) -> None:
+    try:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        os._exit(0)
+
+
+def _follow_from(k: int) -> None:
+    """Print lines k.. as they come due, forever."""
+    while True:
+        delay = _line_time(k) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        _emit(f"{_stamp(_line_time(k))} {line_text(k)}")
+        k += 1
+
+
+# ---------------------------------------------------------------------------
+# docker
+# ---------------------------------------------------------------------------
+def docker(args: list[str]) -> int:
+    if not args:
+        return 1
+    cmd, rest = args[0], args[1:]
+    if cmd == "logs":
+        follow = "-f" in rest or "--follow" in rest
+        now = time.time()
+        end = _lines_written(now)
+        start = 0
+        if "--tail" in rest:
+            start = max(0, end - int(rest[rest.index("--tail") + 1]))
+        if "--since" in rest:
+            since = float(rest[rest.index("--since") + 1])
+            start = max(start, int((since - EPOCH) * RATE))
+        for k in range(start, end):
+            _emit(f"{_stamp(_line_time(k))} {line_text(k)}")
+        if follow:
+            _follow_from(end)
+        return 0
+    if cmd == "inspect":
+        name = rest[0] if rest else ""
+        image = "flwr/superlink:" + IMAGE_TAG if "superlink" in name \
+            else f"flower-supernode-{FRAMEWORK}:{IMAGE_TAG}"
+        print(f"running {_stamp(EPOCH or time.time() - 3600)} {image}")
+        return 0
+    if cmd == "load":
+        sys.stdin.buffer.read()
+        print(f"Loaded image: flower-supernode-{FRAMEWORK}:{IMAGE_TAG}")
+        return 0
+    # image/container inspect, run, rm, stop, save, ...: succeed quietly
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# ssh / scp
+# ---------------------------------------------------------------------------
+_SSH_VALUE_OPTS = set("bcDEeFIiJLlmOopQRSWw")
+
+
+def ssh(args: list[str]) -> int:
+    flags, i = set(), 0
+    while i < len(args) and args[i].startswith("-"):
+        opt = args[i][1:]
+        i += 1
+        for j, c in enumerate(opt):
+            flags.add(c)
+            if c in _SSH_VALUE_OPTS:
+                if j == len(opt) - 1:
+                    i += 1  # the value is the next argument
+                break
+    command = " ".join(args[i + 1:])
+    time.sleep(SSH_LATENCY)
+    if "N" in flags or "O" in flags or not command:
+        return 0  # tunnels and control-master commands
+    bin_dir = str(Path(sys.argv[0]).absolute().parent)
+    env = {**os.environ, "PATH": bin_dir + os.pathsep + os.environ.get("PATH", "")}
+    os.execvpe("bash", ["bash", "-c", command], env)
+
+
+# ---------------------------------------------------------------------------
+# flwr
+# ---------------------------------------------------------------------------
+def flwr(args: list[str]) -> int:
+    cmd = args[0] if args else ""
+    if cmd == "run":
+        time.sleep(SSH_LATENCY)
+        print(f"Successfully started run {int(time.time() * 1000) % 10**9}", flush=True)
+        return 0
+    if cmd == "log":
+        # One run's worth of SuperLink lines, from now, at the log rate; the
+        # stamp lets the load test measure end-to-end line latency
+        start = _lines_written(time.time())
+        k = start
+        while k < start + RUN_LEN:
+            delay = _line_time(k) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            _emit(f"{_stamp(time.time())} {line_text(k - start)}")
+            k += 1
+        return 0
+    if cmd == "stop":
+        return 0
+    sys.exit(f"fake flwr: unsupported command {shlex.join(args)}")
+
+
+def main() -> int:
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    name = Path(sys.argv[0]).name
+    args = sys.argv[1:]
+    if name == "ssh":
+        return ssh(args)
+    if name == "scp":
+        time.sleep(SSH_LATENCY)
+        return 0
+    if name == "docker":
+        return docker(args)
+    if name == "flwr":
+        return flwr(args)
+    sys.exit(f"fake_cluster: invoke as ssh, scp, docker or flwr (symlink), not {name}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
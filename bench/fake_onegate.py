@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""A local OneGate for a SuperLink and SuperNode role, and the `onegate` CLI.
+
+One script, two names, like fake_cluster.py. As `fake_onegate.py` it serves
+the part of the OneGate API the SuperNode appliance uses:
+
+    GET /vm            the calling VM (X-ONEGATE-VMID), USER_TEMPLATE included
+    PUT /vm            KEY=VALUE lines merged into the caller's USER_TEMPLATE
+    GET /service       a OneFlow service: one `superlink` VM, --supernodes
+                       `supernode` VMs, each with its vm_info
+    GET /vms/<id>      any VM of the service (what `onegate vm show` reads)
+    GET /stats         requests served, by method and path, and per VM
+
+Requests without a token or from a VM outside the service get 401. The
+SuperLink VM publishes FL_ENDPOINT, FL_TLS and FL_CA_CERT (a throwaway
+self-signed CA, made with openssl) --publish-delay seconds after start, the
+way a SuperLink still booting does; --no-nic hides its NIC, so a SuperNode
+cannot fall back to the NIC address and has to wait for FL_ENDPOINT. Every
+request takes --latency seconds.
+
+Symlinked as `onegate` it is the CLI subset the appliance calls, against the
+server at ONEGATE_ENDPOINT, as VMID with token TOKENTXT:
+
+    onegate vm show ID --json
+    onegate vm update --data KEY=VALUE
+
+Used by bench/boot_bench.py; runs on its own too:
+
+    python bench/fake_onegate.py --port 5030 --supernodes 4 --publish-delay 20
+
+Standard library only (plus the openssl binary for the CA).
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SUPERLINK_VMID = 100
+FLEET_PORT = 9092
+
+
+def _ip(vm_id: int) -> str:
+    return f"10.10.{vm_id // 256}.{vm_id % 256}"
+
+
+def make_ca_cert() -> str:
+    """PEM of a throwaway self-signed CA ('' without openssl)."""
+    try:
+        proc = subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:P-256",
+             "-nodes", "-keyout", os.devnull, "-subj", "/CN=fake-onegate CA", "-days", "1"],
+            capture_output=True, text=True, timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return proc.stdout if proc.returncode == 0 else ""
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+class FakeOneGate:
+    """The service's VMs and their USER_TEMPLATEs, and the HTTP server over them."""
+
+    def __init__(self, supernodes: int = 2, publish_delay: float = 0.0, latency: float = 0.0,
+                 nic: bool = True, tls: bool = True):
+        self.supernode_ids = [SUPERLINK_VMID + 1 + i for i in range(supernodes)]
+        self.latency = latency
+        self.nic = nic
+        self.ca_pem = make_ca_cert() if tls else ""
+        self.templates = {vm_id: {} for vm_id in [SUPERLINK_VMID, *self.supernode_ids]}
+        self.requests = Counter()
+        self.requests_by_vm = Counter()
+        self._lock = threading.Lock()
+        self._publish_at = time.monotonic() + publish_delay
+        self._server = None
+
+    # -- state ----------------------------------------------------------------
+    def _superlink_published(self) -> dict:
+        if time.monotonic() < self._publish_at:
+            return {}
+        values = {"FL_READY": "YES", "FL_ENDPOINT": f"{_ip(SUPERLINK_VMID)}:{FLEET_PORT}"}
+        if self.ca_pem:
+            values["FL_TLS"] = "YES"
+            values["FL_CA_CERT"] = base64.b64encode(self.ca_pem.encode()).decode()
+        return values
+
+    def vm(self, vm_id: int) -> dict:
+        role = "superlink" if vm_id == SUPERLINK_VMID else "supernode"
+        with self._lock:
+            user = dict(self.templates[vm_id])
+        if vm_id == SUPERLINK_VMID:
+            user.update(self._superlink_published())
+        template = {"NIC": [{"IP": _ip(vm_id), "NIC_ID": "0"}]} if self.nic else {}
+        return {"VM": {"ID": str(vm_id), "NAME": f"{role}_0_(service_1)", "STATE": "3", "LCM_STATE": "3",
+                       "TEMPLATE": template, "USER_TEMPLATE": user}}
+
+    def service(self) -> dict:
+        def role(name, ids):
+            return {"name": name, "cardinality": len(ids), "state": "2",
+                    "nodes": [{"deploy_id": i, "running": True, "vm_info": self.vm(i)} for i in ids]}
+        return {"SERVICE": {"id": "1", "name": "flower", "state": "2",
+                            "roles": [role("superlink", [SUPERLINK_VMID]), role("supernode", self.supernode_ids)]}}
+
+    def update(self, vm_id: int, body: str) -> None:
+        with self._lock:
+            for line in body.splitlines():
+                key, sep, value = line.partition("=")
+                if sep and key.strip():
+                    self.templates[vm_id][key.strip()] = value
+
+    def user_template(self, vm_id: int) -> dict:
+        with self._lock:
+            return dict(self.templates[vm_id])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": dict(self.requests), "by_vm": {str(k): v for k, v in self.requests_by_vm.items()}}
+
+    # -- HTTP -------------------------------------------------------------------
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a daemon thread; returns the endpoint URL."""
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def shutdown(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _handler(gate: FakeOneGate):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, doc=None) -> None:
+            body = json.dumps(doc).encode() if doc is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _caller(self):
+            vm_id = self.headers.get("X-ONEGATE-VMID", "")
+            if not self.headers.get("X-ONEGATE-TOKEN") or not vm_id.isdigit() or int(vm_id) not in gate.templates:
+                return None
+            return int(vm_id)
+
+        def _route(self, method: str) -> None:
+            time.sleep(gate.latency)
+            path = self.path.split("?")[0].rstrip("/")
+            if path != "/stats":
+                with gate._lock:
+                    gate.requests[f"{method} {re.sub(r'/[0-9]+$', '/<id>', path)}"] += 1
+            if path == "/stats":
+                return self._reply(200, gate.stats())
+            caller = self._caller()
+            if caller is None:
+                return self._reply(401, {"message": "invalid OneGate token or VM id"})
+            with gate._lock:
+                gate.requests_by_vm[caller] += 1
+            if method == "GET" and path == "/vm":
+                return self._reply(200, gate.vm(caller))
+            if method == "PUT" and path == "/vm":
+                length = int(self.headers.get("Content-Length") or 0)
+                gate.update(caller, self.rfile.read(length).decode(errors="replace"))
+                return self._reply(200)
+            if method == "GET" and path == "/service":
+                return self._reply(200, gate.service())
+            match = re.fullmatch(r"/vms/([0-9]+)", path)
+            if method == "GET" and match and int(match[1]) in gate.templates:
+                return self._reply(200, gate.vm(int(match[1])))
+            return self._reply(404, {"message": f"no such resource: {method} {path}"})
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_PUT(self):
+            self._route("PUT")
+
+    return Handler
+
+
+# ---------------------------------------------------------------------------
+# `onegate` CLI
+# ---------------------------------------------------------------------------
+def onegate(args: list[str]) -> int:
+    endpoint = os.environ.get("ONEGATE_ENDPOINT", "").rstrip("/")
+    headers = {"X-ONEGATE-TOKEN": os.environ.get("TOKENTXT", ""), "X-ONEGATE-VMID": os.environ.get("VMID", "")}
+    if not endpoint:
+        print("ONEGATE_ENDPOINT not set", file=sys.stderr)
+        return 1
+    if args[:2] == ["vm", "show"]:
+        rest = [a for a in args[2:] if a != "--json"]
+        request = urllib.request.Request(f"{endpoint}/vms/{rest[0]}" if rest else f"{endpoint}/vm", headers=headers)
+    elif args[:2] == ["vm", "update"] and "--data" in args:
+        data = args[args.index("--data") + 1].encode()
+        request = urllib.request.Request(f"{endpoint}/vm", data=data, headers=headers, method="PUT")
+    else:
+        print("usage: onegate vm show [ID] --json | onegate vm update --data KEY=VALUE", file=sys.stderr)
+        return 1
+    try:
+        with urllib.request.urlopen(request, timeout=30) as resp:
+            body = resp.read().decode()
+    except (urllib.error.URLError, OSError) as e:
+        print(f"onegate: {e}", file=sys.stderr)
+        return 1
+    if body:
+        print(body)
+    return 0
+
+
+def main() -> int:
+    if Path(sys.argv[0]).name == "onegate":
+        return onegate(sys.argv[1:])
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5030)
+    parser.add_argument("--supernodes", type=int, default=2)
+    parser.add_argument("--publish-delay", type=float, default=0.0,
+                        help="seconds until the SuperLink publishes its endpoint and CA")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--no-nic", action="store_true", help="hide the SuperLink's NIC")
+    parser.add_argument("--no-tls", action="store_true", help="publish no CA certificate")
+    args = parser.parse_args()
+
+    gate = FakeOneGate(args.supernodes, args.publish_delay, args.latency, nic=not args.no_nic, tls=not args.no_tls)
+    endpoint = gate.serve(args.host, args.port)
+    print(f"fake OneGate at {endpoint}: SuperLink VM {SUPERLINK_VMID}, "
+          f"SuperNode VMs {', '.join(map(str, gate.supernode_ids))}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        gate.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
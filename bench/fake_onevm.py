@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Stand-in for the OpenNebula `onevm` CLI with a large synthetic VM pool.
+
+Supports what the dashboard calls:
+    fake_onevm.py list -j [--search EXPR]
+    fake_onevm.py show <id> -j
+
+The pool has FAKE_ONEVM_VMS VMs (default 10000), of which one in
+FAKE_ONEVM_FLOWER_EVERY (default 100) is a Flower VM: the first a SuperLink,
+the rest SuperNodes. Every VM carries a realistically sized template and
+history, so the JSON is about as large as a real pool's. `--search` returns
+only the Flower VMs, standing in for the server-side filter.
+FAKE_ONEVM_LATENCY adds a startup delay in seconds (the real CLI is Ruby).
+FAKE_ONEVM_IP_PREFIX (default 10) is the first octet of the VMs' IPs; the
+dashboard load test (bench/dashboard_bench.py) uses 127 so that the node
+agents it fakes are reachable on loopback.
+
+Point the dashboard at it with FL_ONEVM_BIN=/path/to/fake_onevm.py.
+"""
+
+import json
+import os
+import sys
+import time
+
+NUM_VMS = int(os.environ.get("FAKE_ONEVM_VMS", "10000"))
+FLOWER_EVERY = int(os.environ.get("FAKE_ONEVM_FLOWER_EVERY", "100"))
+LATENCY = float(os.environ.get("FAKE_ONEVM_LATENCY", "0"))
+IP_PREFIX = os.environ.get("FAKE_ONEVM_IP_PREFIX", "10")
+
+
+def _name(vm_id: int) -> str:
+    if vm_id % FLOWER_EVERY:
+        return f"tenant-{vm_id % 37}-vm-{vm_id}"
+    return "flower-superlink-0" if vm_id == 0 else f"flower-supernode-{vm_id // FLOWER_EVERY}"
+
+
+def make_vm(vm_id: int) -> dict:
+    host = vm_id + 1  # never .0.0.0
+    ip = f"{IP_PREFIX}.{host >> 16 & 255}.{host >> 8 & 255}.{host & 255}"
+    return {
+        "ID": str(vm_id),
+        "UID": "0", "GID": "0", "UNAME": "oneadmin", "GNAME": "oneadmin",
+        "NAME": _name(vm_id),
+        "STATE": "3", "LCM_STATE": "3", "PREV_STATE": "3", "PREV_LCM_STATE": "3",
+        "STIME": "1760000000", "ETIME": "0", "DEPLOY_ID": f"one-{vm_id}",
+        "TEMPLATE": {
+            "CPU": "1", "VCPU": "2", "MEMORY": "4096",
+            "NIC": [{
+                "IP": ip, "MAC": f"02:00:{ip.replace('.', ':')[3:]}:00",
+                "NETWORK": "private", "NETWORK_ID": "0", "NIC_ID": "0",
+                "BRIDGE": "br0", "SECURITY_GROUPS": "0", "VN_MAD": "bridge",
+            }],
+            "DISK": [{
+                "DISK_ID": str(i), "IMAGE": f"image-{i}", "IMAGE_ID": str(i),
+                "DATASTORE": "default", "DATASTORE_ID": "1", "SIZE": "20480",
+                "SOURCE": f"/var/lib/one/datastores/1/{vm_id:08x}{i}", "TYPE": "FILE",
+            } for i in range(2)],
+            "CONTEXT": {
+                "NETWORK": "YES", "SSH_PUBLIC_KEY": "ssh-ed25519 " + "A" * 68,
+                "ONEAPP_FL_SUPERLINK_ADDRESS": "",
+                "TOKEN": "YES", "REPORT_READY": "YES",
+            },
+            "GRAPHICS": {"LISTEN": "0.0.0.0", "PORT": str(5900 + vm_id), "TYPE": "VNC"},
+            "OS": {"ARCH": "x86_64", "BOOT": "disk0"},
+        },
+        "USER_TEMPLATE": {
+            "DESCRIPTION": "synthetic VM " * 8,
+            "LABELS": "flower" if not vm_id % FLOWER_EVERY else "tenant",
+        },
+        "HISTORY_RECORDS": {"HISTORY": [{
+            "SEQ": str(seq), "HOSTNAME": f"host-{(vm_id + seq) % 64}", "HID": str((vm_id + seq) % 64),
+            "STIME": "1760000000", "ETIME": "0", "ACTION": "0", "REASON": "0",
+            "VM_MAD": "kvm", "TM_MAD": "ssh", "DS_ID": "0",
+        } for seq in range(3)]},
+    }
+
+
+def main():
+    time.sleep(LATENCY)
+    args = sys.argv[1:]
+    out = sys.stdout
+    if args[:1] == ["show"] and len(args) >= 2:
+        json.dump({"VM": make_vm(int(args[1]))}, out)
+        return
+    if args[:1] != ["list"]:
+        sys.exit(f"fake_onevm: unsupported command {' '.join(args)}")
+
+    ids = range(NUM_VMS)
+    if "--search" in args:
+        ids = range(0, NUM_VMS, FLOWER_EVERY)
+    # Stream the document like the real CLI; never hold the pool in memory
+    out.write('{"VM_POOL":{"VM":[')
+    for i, vm_id in enumerate(ids):
+        if i:
+            out.write(",")
+        out.write(json.dumps(make_vm(vm_id)))
+    out.write("]}}\n")
+
+
+if __name__ == "__main__":
+    main()
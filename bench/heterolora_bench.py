@@ -0,0 +1,187 @@
+"""Heterogeneous LoRA aggregation check (demo/llm/flower_demo/heterolora.py).
+
+Mixed-rank, mixed-depth updates that all carry the same change to the
+global adapter must aggregate back to exactly that change: on every slot
+some node trained, whichever nodes trained it, and the global value on the
+slots none did. The check runs HeteroLoRAStrategy's padding around each
+server composition the LLM demo can build:
+
+    plain         FedAvg / FlatFedAvg
+    hierarchical  HierarchicalStrategy (nodes split into --groups groups)
+    adaptive      AdaptiveWorkStrategy with equal step counts
+    both          hierarchical inside adaptive, as server_app.py nests them
+
+and with unequal step counts (`fednova`), where each slot must get the
+FedNova-normalised mean over the nodes that trained it. Node budgets cycle
+through --budgets (rank/layers), and example counts are random. Update
+sizes against the full adapter and the time of one aggregate_fit are
+reported; exits 1 if an aggregate is off by more than np.allclose allows.
+
+Usage:
+    python bench/heterolora_bench.py
+    python bench/heterolora_bench.py --clients 16 --budgets 16/24 8/12 4/6
+
+Needs flwr and numpy (`pip install -e demo/llm`). Results are written as
+JSON next to round_bench.py's.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+# heterolora.py imports its siblings as `flower_demo.*`
+sys.path.insert(0, str(REPO_ROOT / "demo" / "llm"))
+
+COMPOSITIONS = ("plain", "hierarchical", "adaptive", "both", "fednova")
+
+
+def _budget(text: str) -> tuple[int, int]:
+    """"rank/layers" -> (rank, first trained layer)."""
+    from flower_demo.init_params import NUM_LAYERS
+
+    rank, layers = (int(v) for v in text.split("/"))
+    return rank, NUM_LAYERS - layers
+
+
+def _strategy(strategy_cls, composition: str, global_parameters):
+    from flower_demo.adaptive import AdaptiveWorkStrategy
+    from flower_demo.heterolora import HeteroLoRAStrategy
+    from flower_demo.hierarchy import HierarchicalStrategy
+
+    strategy = strategy_cls(initial_parameters=global_parameters, fit_metrics_aggregation_fn=lambda m: {})
+    if composition in ("hierarchical", "both"):
+        strategy = HierarchicalStrategy(strategy, fit_metrics_aggregation_fn=lambda m: {})
+    if composition in ("adaptive", "both", "fednova"):
+        strategy = AdaptiveWorkStrategy(strategy)
+        strategy._global = global_parameters  # set by configure_fit in a real round
+    return HeteroLoRAStrategy(strategy)
+
+
+def _results(initial, delta, budgets, composition: str, groups: int, rng) -> list:
+    """(proxy, FitRes) per node: its slice of global + delta, with its budget metrics."""
+    from flwr.common import Code, FitRes, Status, ndarrays_to_parameters
+    from flower_demo.adaptive import STEPS_METRIC
+    from flower_demo.heterolora import FIRST_LAYER_METRIC, RANK_METRIC, project
+    from flower_demo.hierarchy import GROUP_KEY
+
+    trained = [g + d for g, d in zip(initial, delta)]
+    results = []
+    for i, (rank, first_layer) in enumerate(budgets):
+        metrics = {RANK_METRIC: rank, FIRST_LAYER_METRIC: first_layer, "prof_train_s": 1.0,
+                   STEPS_METRIC: int(rng.integers(10, 100)) if composition == "fednova" else 50}
+        if composition in ("hierarchical", "both"):
+            metrics[GROUP_KEY] = f"g{i % groups}"
+        results.append((SimpleNamespace(cid=str(i)), FitRes(
+            status=Status(code=Code.OK, message=""),
+            parameters=ndarrays_to_parameters(project(trained, rank, first_layer)),
+            num_examples=int(rng.integers(100, 1000)),
+            metrics=metrics,
+        )))
+    return results
+
+
+def expected(initial, delta, results) -> list:
+    """Global + each slot's mean change over the nodes that trained it.
+
+    With equal step counts that is the change itself. With unequal ones
+    each node's change counts times mean steps / its steps (FedNova), the
+    mean taken over all nodes as adaptive.py does.
+    """
+    import numpy as np
+    from flower_demo.adaptive import STEPS_METRIC
+    from flower_demo.heterolora import ARRAYS_PER_LAYER, FIRST_LAYER_METRIC, RANK_METRIC
+
+    full_rank = initial[0].shape[0]
+    layers = len(initial) // ARRAYS_PER_LAYER
+    weights = np.array([res.num_examples for _, res in results], dtype=np.float64)
+    steps = np.array([res.metrics[STEPS_METRIC] for _, res in results], dtype=np.float64)
+    factor = np.ones_like(steps) if len(set(steps)) == 1 else (weights @ steps / weights.sum()) / steps
+    cover = np.zeros((layers, full_rank))
+    scaled = np.zeros((layers, full_rank))
+    for (_, res), w, f in zip(results, weights, factor):
+        first_layer, rank = res.metrics[FIRST_LAYER_METRIC], res.metrics[RANK_METRIC]
+        cover[first_layer:, :rank] += w
+        scaled[first_layer:, :rank] += w * f
+    share = np.divide(scaled, cover, out=np.zeros_like(cover), where=cover > 0)
+    out = []
+    for i, (g, d) in enumerate(zip(initial, delta)):
+        s = share[i // ARRAYS_PER_LAYER]
+        out.append(g + (s[:, None] * d if i % 2 == 0 else s[None, :] * d))
+    return out
+
+
+def run_case(strategy_cls, composition: str, initial, delta, budgets, groups: int, seed: int) -> dict:
+    import numpy as np
+    from flwr.common import ndarrays_to_parameters, parameters_to_ndarrays
+
+    rng = np.random.default_rng(seed)
+    global_parameters = ndarrays_to_parameters(initial)
+    strategy = _strategy(strategy_cls, composition, global_parameters)
+    strategy._global = initial  # set by configure_fit in a real round
+    results = _results(initial, delta, budgets, composition, groups, rng)
+
+    start = time.perf_counter()
+    parameters, _ = strategy.aggregate_fit(1, results, [])
+    elapsed = time.perf_counter() - start
+
+    got = parameters_to_ndarrays(parameters)
+    want = expected(initial, delta, results)
+    max_diff = max(float(np.max(np.abs(a.astype(np.float64) - b))) for a, b in zip(got, want))
+    ok = all(np.allclose(a, b, rtol=1e-5, atol=1e-6) for a, b in zip(got, want))
+    sent = sum(sum(len(t) for t in res.parameters.tensors) for _, res in results)
+    full = sum(a.nbytes for a in initial) * len(results)
+    return {
+        "strategy": strategy_cls.__name__,
+        "composition": composition,
+        "aggregate_s": round(elapsed, 4),
+        "update_share": round(sent / full, 3),
+        "max_abs_diff": max_diff,
+        "ok": ok,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--budgets", nargs="+", default=["16/24", "8/12", "4/6", "8/24"],
+                        help="rank/layers per node, cycled over the clients")
+    parser.add_argument("--groups", type=int, default=3, help="groups for the hierarchical compositions")
+    parser.add_argument("--lora-rank", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    import numpy as np
+    from flwr.server.strategy import FedAvg
+    from flower_demo.flat import FlatFedAvg
+    from flower_demo.init_params import initial_arrays
+
+    initial = initial_arrays(lora_r=args.lora_rank)
+    rng = np.random.default_rng(args.seed)
+    delta = [rng.normal(0.0, 0.01, a.shape).astype(a.dtype) for a in initial]
+    budgets = [_budget(args.budgets[i % len(args.budgets)]) for i in range(args.clients)]
+    print(f"[bench] {args.clients} nodes, budgets {args.budgets}", flush=True)
+
+    cases = []
+    for strategy_cls in (FedAvg, FlatFedAvg):
+        for composition in COMPOSITIONS:
+            case = run_case(strategy_cls, composition, initial, delta, budgets, args.groups, args.seed)
+            cases.append(case)
+            print(f"[bench]   {case['strategy']:<10} {composition:<12} {case['aggregate_s']:.4f}s  "
+                  f"updates {case['update_share']:.0%} of full  max diff {case['max_abs_diff']:.2e}"
+                  f"{'' if case['ok'] else '  FAIL'}", flush=True)
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    path = args.results_dir / f"heterolora-bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(cases, indent=2) + "\n")
+    print(f"[bench] results: {path}")
+    raise SystemExit(0 if all(c["ok"] for c in cases) else 1)
+
+
+if __name__ == "__main__":
+    main()
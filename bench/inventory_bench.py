@@ -0,0 +1,93 @@
+"""Benchmark the dashboard's VM inventory against a large fake OpenNebula pool.
+
+Compares, on the same synthetic pool (bench/fake_onevm.py):
+    full-parse   the old collect_nodes(): capture all output, json.loads, filter
+    streaming    inventory.py over the full pool, parsed one VM at a time
+    search       inventory.py with a server-side `--search` scope
+    cached       Inventory.get() within its TTL (no CLI call at all)
+
+Usage:
+    python bench/inventory_bench.py                  # 10k VMs, 5 repeats
+    python bench/inventory_bench.py --vms 50000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+FAKE_ONEVM = BENCH_DIR / "fake_onevm.py"
+sys.path.insert(0, str(BENCH_DIR.parent / "dashboard"))
+
+import inventory  # noqa: E402
+
+
+def full_parse() -> list[dict]:
+    """The pre-inventory collect_nodes(): whole pool in memory, then filter."""
+    out = subprocess.run([str(FAKE_ONEVM), "list", "-j"], capture_output=True, text=True).stdout
+    vms = json.loads(out).get("VM_POOL", {}).get("VM", [])
+    if isinstance(vms, dict):
+        vms = [vms]
+    return [inventory.node_fields(vm) for vm in vms if inventory._is_flower_vm(vm)]
+
+
+def streaming() -> list[dict]:
+    return inventory._stream_pool([], timeout=120)
+
+
+def search() -> list[dict]:
+    return inventory._stream_pool(["--search", "VM.USER_TEMPLATE.LABELS=flower"], timeout=120, by_name=False)
+
+
+_cache = inventory.Inventory(ttl=3600, query_fn=streaming)
+
+
+def cached() -> list[dict]:
+    return _cache.get()
+
+
+def measure(fn, repeat: int) -> dict:
+    """Best-of-`repeat` wall time and the parser's peak Python allocation."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        nodes = fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "nodes": len(nodes),
+        "best_s": round(min(times), 4),
+        "mean_s": round(sum(times) / len(times), 4),
+        "peak_alloc_mb": round(peak / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vms", type=int, default=10_000)
+    parser.add_argument("--flower-every", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["FAKE_ONEVM_VMS"] = str(args.vms)
+    os.environ["FAKE_ONEVM_FLOWER_EVERY"] = str(args.flower_every)
+    inventory.ONEVM_BIN = str(FAKE_ONEVM)
+
+    print(f"pool: {args.vms} VMs, {len(range(0, args.vms, args.flower_every))} Flower VMs")
+    print(f"{'mode':<12} {'nodes':>6} {'best s':>9} {'mean s':>9} {'peak MiB':>9}")
+    _cache.get()  # warm: "cached" measures hits only
+    for name, fn in (("full-parse", full_parse), ("streaming", streaming), ("search", search), ("cached", cached)):
+        r = measure(fn, args.repeat)
+        print(f"{name:<12} {r['nodes']:>6} {r['best_s']:>9} {r['mean_s']:>9} {r['peak_alloc_mb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
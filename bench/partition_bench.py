@@ -0,0 +1,126 @@
+"""Shard movement when SuperNodes join or leave (flower_demo/partitioning.py).
+
+For each --nodes N, assigns --shards shards over N members (VM ids, as the
+appliance's manifest lists them) with assign_shards, then over N+1 (a join)
+and N-1 (a leave), and counts the shards that change owner against:
+
+    ideal       shards / max(N, N±1), what an even share costs to move
+    rendezvous  plain rendezvous hashing, no load cap (the lower bound
+                for a hash-only assignment)
+
+Each assignment is also checked: every shard owned exactly once, no member
+over ceil(shards / members), and a member that did not join or leave and
+is not over the cap keeps every shard it wins by hashing in both member
+lists. Exits 1 if a check fails.
+
+Usage:
+    python bench/partition_bench.py
+    python bench/partition_bench.py --nodes 2 4 8 16 32 --shards 128
+
+Needs flwr (for the demos' logger). Results are written as JSON next to
+round_bench.py's.
+"""
+
+import argparse
+import importlib.util
+import json
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+FIRST_VMID = 101
+
+
+def _load():
+    path = REPO_ROOT / "demo" / "pytorch" / "flower_demo" / "partitioning.py"
+    spec = importlib.util.spec_from_file_location("bench_partitioning", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _rendezvous(part, members, num_shards: int) -> dict[int, str]:
+    return {s: max(members, key=lambda m: part._weight(m, s)) for s in range(num_shards)}
+
+
+def _owners(owned: dict[str, list[int]]) -> dict[int, str]:
+    return {s: m for m, shards in owned.items() for s in shards}
+
+
+def check(part, before: list[str], after: list[str], num_shards: int) -> list[str]:
+    """What is wrong with the assignments over `before` and `after` ([] when nothing)."""
+    problems = []
+    maps = {}
+    for members in (before, after):
+        owned = part.assign_shards(members, num_shards)
+        capacity = -(-num_shards // len(members))
+        label = f"{len(members)} members"
+        if sorted(s for shards in owned.values() for s in shards) != list(range(num_shards)):
+            problems.append(f"{label}: shards not owned exactly once")
+        over = [m for m, shards in owned.items() if len(shards) > capacity]
+        if over:
+            problems.append(f"{label}: {over} over the cap of {capacity}")
+        winners = _rendezvous(part, members, num_shards)
+        counts = {m: sum(1 for w in winners.values() if w == m) for m in members}
+        maps[len(members)] = (owned, winners, {m for m, c in counts.items() if c > capacity})
+
+    (owned_b, win_b, over_b), (owned_a, win_a, over_a) = maps[len(before)], maps[len(after)]
+    for member in sorted(set(before) & set(after)):
+        if member in over_b or member in over_a:
+            continue
+        kept = {s for s in range(num_shards) if win_b[s] == member and win_a[s] == member}
+        lost = (kept - set(owned_b[member])) | (kept - set(owned_a[member]))
+        if lost:
+            problems.append(f"{len(before)}->{len(after)}: member {member} under the cap lost shards {sorted(lost)}")
+    return problems
+
+
+def run_case(part, before: list[str], after: list[str], num_shards: int) -> dict:
+    old, new = _owners(part.assign_shards(before, num_shards)), _owners(part.assign_shards(after, num_shards))
+    moved = sum(1 for s in range(num_shards) if old[s] != new[s])
+    plain_b, plain_a = _rendezvous(part, before, num_shards), _rendezvous(part, after, num_shards)
+    loads = sorted(len(v) for v in part.assign_shards(after, num_shards).values())
+    return {
+        "before": len(before),
+        "after": len(after),
+        "moved": moved,
+        "ideal": round(num_shards / max(len(before), len(after)), 1),
+        "rendezvous": sum(1 for s in range(num_shards) if plain_b[s] != plain_a[s]),
+        "loads": [loads[0], loads[-1]],
+        "problems": check(part, before, after, num_shards),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", nargs="+", type=int, default=[2, 4, 8, 16])
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    part = _load()
+    cases = []
+    for n in args.nodes:
+        members = [str(FIRST_VMID + i) for i in range(n + 1)]
+        transitions = [(members[:n], members)]
+        if n > 1:
+            transitions.append((members[:n], members[:n - 1]))
+        for before, after in transitions:
+            case = run_case(part, before, after, args.shards)
+            cases.append(case)
+            print(f"[bench]   {case['before']:>3} -> {case['after']:<3} moved {case['moved']:>3}  "
+                  f"ideal {case['ideal']:>5.1f}  rendezvous {case['rendezvous']:>3}  "
+                  f"loads {case['loads'][0]}-{case['loads'][1]}", flush=True)
+            for p in case["problems"]:
+                print(f"[bench] FAIL {p}", flush=True)
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    path = args.results_dir / f"partition-bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(cases, indent=2) + "\n")
+    print(f"[bench] results: {path}")
+    raise SystemExit(1 if any(c["problems"] for c in cases) else 0)
+
+
+if __name__ == "__main__":
+    main()
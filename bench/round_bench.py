@@ -0,0 +1,293 @@
+"""Offline end-to-end round benchmark for the demo apps (Flower simulation).
+
+Runs each demo's real ServerApp and ClientApp through the Flower simulation
+engine on synthetic data (`synthetic-data = true`, no dataset download) at
+several SuperNode counts, and records per round: wall time, time spent in
+client fit/evaluate, server aggregation time, bytes sent to and received
+from clients, and peak memory of the server and client roles. Results are
+written as JSON and CSV so runs can be diffed for regressions.
+
+`--groups` also runs each case with the demos' simulated two-tier
+aggregation (the nodes split into N groups by partition-id, see
+flower_demo/hierarchy.py); 0 is flat. Every update still reaches the
+server, so bytes are the same as flat; what changes is what the strategy
+aggregates.
+
+Every (demo, node count, groups) case runs in a fresh child process with that
+demo's directory on PYTHONPATH: the demos all ship a `flower_demo` package,
+and a clean process keeps the server's peak RSS honest.
+
+Usage:
+    python bench/round_bench.py                                  # all demos, 2/8/32 nodes
+    python bench/round_bench.py --demos pytorch sklearn --nodes 2 8
+    python bench/round_bench.py --rounds 2 --samples-per-client 256
+    python bench/round_bench.py --demos sklearn --nodes 64 128 --groups 0 8
+
+Each demo's dependencies must be importable (`pip install -e demo/<name>`);
+a demo that fails to import or run is recorded with its error and the
+benchmark moves on. The LLM demo still needs the base model in the local
+Hugging Face cache; only its dataset is synthetic.
+"""
+
+import argparse
+import copy
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEMO_DIR = REPO_ROOT / "demo"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+DEMOS = ("pytorch", "tensorflow", "sklearn", "llm")
+CSV_FIELDS = (
+    "demo", "num_supernodes", "groups", "round", "round_wall_s", "fit_s", "aggregate_fit_s",
+    "evaluate_s", "aggregate_evaluate_s", "bytes_down", "bytes_up",
+    "client_peak_rss_mb", "server_peak_rss_mb",
+)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _tensor_bytes(parameters) -> int:
+    return sum(len(t) for t in parameters.tensors)
+
+
+# ---------------------------------------------------------------------------
+# Worker: one simulation run inside a child process
+# ---------------------------------------------------------------------------
+
+
+def _recording_strategy(strategy, rounds: dict):
+    """Wrap `strategy` so every call is timed and every payload measured.
+
+    Subclassing Strategy (rather than the concrete class) keeps the wrapper
+    independent of which strategy the demo's server_fn picked.
+    """
+    from flwr.server.strategy import Strategy
+
+    def stats(server_round: int) -> dict:
+        return rounds.setdefault(server_round, {
+            "round": server_round, "bytes_down": 0, "bytes_up": 0, "client_peak_rss_mb": 0.0,
+        })
+
+    def client_peak(results) -> float:
+        peaks = [float(res.metrics.get("prof_process_peak_rss_mb", 0.0)) for _, res in results]
+        return max(peaks, default=0.0)
+
+    class RecordingStrategy(Strategy):
+        def __init__(self, inner):
+            self.inner = inner
+
+        def __repr__(self):
+            return f"RecordingStrategy({self.inner!r})"
+
+        def initialize_parameters(self, client_manager):
+            return self.inner.initialize_parameters(client_manager)
+
+        def configure_fit(self, server_round, parameters, client_manager):
+            s = stats(server_round)
+            s["_start"] = time.perf_counter()
+            instructions = self.inner.configure_fit(server_round, parameters, client_manager)
+            s["bytes_down"] += sum(_tensor_bytes(ins.parameters) for _, ins in instructions)
+            s["_fit_sent"] = time.perf_counter()
+            return instructions
+
+        def aggregate_fit(self, server_round, results, failures):
+            s = stats(server_round)
+            start = time.perf_counter()
+            s["fit_s"] = round(start - s["_fit_sent"], 4)
+            s["bytes_up"] += sum(_tensor_bytes(res.parameters) for _, res in results)
+            s["client_peak_rss_mb"] = max(s["client_peak_rss_mb"], client_peak(results))
+            s["fit_failures"] = len(failures)
+            aggregated = self.inner.aggregate_fit(server_round, results, failures)
+            s["_end"] = time.perf_counter()
+            s["aggregate_fit_s"] = round(s["_end"] - start, 4)
+            return aggregated
+
+        def configure_evaluate(self, server_round, parameters, client_manager):
+            s = stats(server_round)
+            instructions = self.inner.configure_evaluate(server_round, parameters, client_manager)
+            s["bytes_down"] += sum(_tensor_bytes(ins.parameters) for _, ins in instructions)
+            s["_eval_sent"] = time.perf_counter()
+            return instructions
+
+        def aggregate_evaluate(self, server_round, results, failures):
+            s = stats(server_round)
+            start = time.perf_counter()
+            s["evaluate_s"] = round(start - s["_eval_sent"], 4)
+            s["client_peak_rss_mb"] = max(s["client_peak_rss_mb"], client_peak(results))
+            aggregated = self.inner.aggregate_evaluate(server_round, results, failures)
+            s["_end"] = time.perf_counter()
+            s["aggregate_evaluate_s"] = round(s["_end"] - start, 4)
+            return aggregated
+
+        def evaluate(self, server_round, parameters):
+            return self.inner.evaluate(server_round, parameters)
+
+    return RecordingStrategy(strategy)
+
+
+def run_worker(args) -> dict:
+    """Run one simulation and return its per-round measurements."""
+    from flwr.client import ClientApp
+    from flwr.server import ServerApp
+    from flwr.simulation import run_simulation
+
+    from flower_demo import client_app, server_app
+
+    # Override the demo's pyproject defaults: synthetic data, everyone trains
+    overrides = {
+        "num-server-rounds": args.rounds,
+        "synthetic-data": True,
+        "synthetic-samples": args.samples_per_client,
+        "min-fit-clients": args.num_supernodes,
+        "min-available-clients": args.num_supernodes,
+        "checkpoint-every": 0,
+        # Every simulated node needs at least one shard of the training split
+        "partition-shards": max(64, args.num_supernodes),
+        "hierarchical-aggregation": args.num_groups > 0,
+        "aggregation-groups": args.num_groups,
+    }
+    rounds: dict[int, dict] = {}
+
+    def server_fn(context):
+        context.run_config.update(overrides)
+        components = server_app.server_fn(context)
+        components.strategy = _recording_strategy(components.strategy, rounds)
+        return components
+
+    def client_fn(context):
+        # Flower fails a ClientApp that modifies its context's run_config
+        context = copy.copy(context)
+        context.run_config = {**context.run_config, **overrides}
+        return client_app.client_fn(context)
+
+    start = time.perf_counter()
+    run_simulation(
+        server_app=ServerApp(server_fn=server_fn),
+        client_app=ClientApp(client_fn=client_fn),
+        num_supernodes=args.num_supernodes,
+        backend_config={"client_resources": {"num_cpus": args.client_cpus, "num_gpus": 0.0}},
+    )
+    wall = time.perf_counter() - start
+
+    server_peak = _peak_rss_mb()
+    for s in rounds.values():
+        s["round_wall_s"] = round(s.pop("_end", s["_start"]) - s.pop("_start"), 4)
+        s.pop("_fit_sent", None)
+        s.pop("_eval_sent", None)
+        s["server_peak_rss_mb"] = server_peak
+    return {
+        "status": "ok",
+        "wall_s": round(wall, 3),
+        "server_peak_rss_mb": server_peak,
+        "rounds": [rounds[r] for r in sorted(rounds)],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driver: one child process per (demo, node count)
+# ---------------------------------------------------------------------------
+
+
+def run_case(demo: str, num_supernodes: int, groups: int, args) -> dict:
+    """Benchmark one demo at one scale in a fresh Python process."""
+    case = {"demo": demo, "num_supernodes": num_supernodes, "groups": groups}
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        out_path = tmp.name
+    cmd = [
+        sys.executable, __file__, "--worker",
+        "--demo", demo,
+        "--num-supernodes", str(num_supernodes),
+        "--num-groups", str(groups),
+        "--rounds", str(args.rounds),
+        "--samples-per-client", str(args.samples_per_client),
+        "--client-cpus", str(args.client_cpus),
+        "--out", out_path,
+    ]
+    env = dict(os.environ)
+    # Ray workers inherit the environment, so they can import flower_demo too
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(DEMO_DIR / demo), env.get("PYTHONPATH")]))
+    tiers = f" in {groups} groups" if groups else ""
+    print(f"[bench] {demo} with {num_supernodes} SuperNodes{tiers} ...", flush=True)
+    try:
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=args.timeout)
+        if proc.returncode == 0:
+            case.update(json.loads(Path(out_path).read_text()))
+        else:
+            tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+            case.update(status="error", error="\n".join(tail))
+    except subprocess.TimeoutExpired:
+        case.update(status="timeout", error=f"no result after {args.timeout}s")
+    finally:
+        Path(out_path).unlink(missing_ok=True)
+
+    if case["status"] == "ok":
+        slowest = max((r["round_wall_s"] for r in case["rounds"]), default=0.0)
+        print(f"[bench]   {case['wall_s']}s total, slowest round {slowest}s", flush=True)
+    else:
+        print(f"[bench]   {case['status']}: {case['error']}", flush=True)
+    return case
+
+
+def write_results(cases: list[dict], results_dir: Path) -> tuple[Path, Path]:
+    """Write the full results as JSON and one CSV row per round."""
+    results_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    json_path = results_dir / f"round-bench-{stamp}.json"
+    csv_path = results_dir / f"round-bench-{stamp}.csv"
+    json_path.write_text(json.dumps(cases, indent=2) + "\n")
+    with csv_path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for case in cases:
+            for row in case.get("rounds", []):
+                writer.writerow({
+                    "demo": case["demo"], "num_supernodes": case["num_supernodes"],
+                    "groups": case["groups"], **row,
+                })
+    return json_path, csv_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--demos", nargs="+", choices=DEMOS, default=list(DEMOS))
+    parser.add_argument("--nodes", nargs="+", type=int, default=[2, 8, 32])
+    parser.add_argument("--groups", nargs="+", type=int, default=[0],
+                        help="aggregation groups for two-tier aggregation (0 = flat)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--samples-per-client", type=int, default=0,
+                        help="synthetic training samples per client (0 = the real dataset's share)")
+    parser.add_argument("--client-cpus", type=float, default=1.0,
+                        help="CPUs reserved per simulated client (bounds concurrency)")
+    parser.add_argument("--timeout", type=int, default=3600, help="seconds per (demo, nodes) case")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    # Internal: run a single case in this process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--demo", help=argparse.SUPPRESS)
+    parser.add_argument("--num-supernodes", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--num-groups", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        Path(args.out).write_text(json.dumps(run_worker(args)))
+        return
+
+    cases = [run_case(demo, n, g, args) for demo in args.demos for n in args.nodes for g in args.groups]
+    json_path, csv_path = write_results(cases, args.results_dir)
+    print(f"[bench] results: {json_path} and {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
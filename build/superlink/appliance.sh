@@ -37,6 +37,7 @@ ONE_SERVICE_PARAMS=(
     'ONEAPP_FL_ISOLATION'             'configure' 'App execution isolation mode (subprocess|process)'      'subprocess'
     'ONEAPP_FL_DATABASE'              'configure' 'Database path for state persistence'                    'state/state.db'
     'ONEAPP_FL_LOG_LEVEL'             'configure' 'Log verbosity (DEBUG|INFO|WARNING|ERROR)'               'INFO'
+    'ONEAPP_FL_METRICS_AGENT'         'configure' 'Serve node metrics on port 9101 to the FL subnet (YES|NO)' 'YES'
 
     # --- TLS configuration (secure by default) ---
     'ONEAPP_FL_TLS_ENABLED'           'configure' 'Enable TLS encryption (YES|NO)'                         'YES'
@@ -49,6 +50,7 @@ ONEAPP_FLOWER_VERSION="${ONEAPP_FLOWER_VERSION:-1.31.0}"
 ONEAPP_FL_ISOLATION="${ONEAPP_FL_ISOLATION:-subprocess}"
 ONEAPP_FL_DATABASE="${ONEAPP_FL_DATABASE:-state/state.db}"
 ONEAPP_FL_LOG_LEVEL="${ONEAPP_FL_LOG_LEVEL:-INFO}"
+ONEAPP_FL_METRICS_AGENT="${ONEAPP_FL_METRICS_AGENT:-YES}"
 ONEAPP_FL_TLS_ENABLED="${ONEAPP_FL_TLS_ENABLED:-YES}"
 
 # --------------------------------------------------------------------------
@@ -61,6 +63,8 @@ readonly FLOWER_STATE_DIR="${FLOWER_BASE_DIR}/state"
 readonly FLOWER_SCRIPTS_DIR="${FLOWER_BASE_DIR}/scripts"
 readonly FLOWER_SYSTEMD_UNIT="/etc/systemd/system/flower-superlink.service"
 readonly FLOWER_ENV_FILE="${FLOWER_CONFIG_DIR}/superlink.env"
+readonly FLOWER_AGENT_UNIT="/etc/systemd/system/flower-metrics-agent.service"
+readonly FLOWER_AGENT_PORT=9101
 readonly FLOWER_UID=49999
 readonly FLOWER_GID=49999
 
@@ -142,7 +146,12 @@ service_configure() {
     #    control that blocks unsolicited outbound mail from the appliance.
     harden_firewall
 
-    # 7. Write service report
+    # 7. Node metrics agent: container state, cgroup CPU/memory and Fleet API
+    #    byte counters for the dashboard, one HTTP GET instead of an SSH session
+    setup_fl_accounting
+    install_metrics_agent
+
+    # 8. Write service report
     local _vm_ip
     _vm_ip=$(get_primary_ip)
     local _report=""
@@ -152,6 +161,9 @@ service_configure() {
     _report+="TLS: ${ONEAPP_FL_TLS_ENABLED}\n"
     _report+="Firewall: default-deny inbound, FL ports restricted to ${FL_PRIVATE_CIDR:-private subnet}, outbound SMTP blocked\n"
     _report+="Submit training: push a Flower App Bundle with 'flwr run' against the Control API\n"
+    if [ "${ONEAPP_FL_METRICS_AGENT}" = "YES" ]; then
+        _report+="Metrics agent: http://${_vm_ip}:${FLOWER_AGENT_PORT}/status (FL subnet only)\n"
+    fi
     if [ -n "${ONE_SERVICE_REPORT:-}" ]; then
         echo -e "${_report}" > "${ONE_SERVICE_REPORT}"
         chmod 600 "${ONE_SERVICE_REPORT}" 2>/dev/null || true
@@ -194,6 +206,12 @@ service_bootstrap() {
     # 4. Health check -- wait for Fleet API to accept connections
     wait_for_superlink
 
+    # 4b. Start the metrics agent (best-effort; monitoring must not block boot)
+    if [ "${ONEAPP_FL_METRICS_AGENT}" = "YES" ]; then
+        systemctl enable flower-metrics-agent.service >/dev/null 2>&1 || true
+        systemctl restart flower-metrics-agent.service || msg warning "Metrics agent failed to start"
+    fi
+
     # 5. Publish readiness to OneGate
     publish_to_onegate
 
@@ -215,6 +233,7 @@ Key configuration variables (set via OpenNebula context):
   ONEAPP_FLOWER_VERSION           Flower image tag (default: 1.31.0)
   ONEAPP_FL_TLS_ENABLED           Enable TLS (default: YES)
   ONEAPP_FL_ISOLATION             App isolation: subprocess|process (default: subprocess)
+  ONEAPP_FL_METRICS_AGENT         Node metrics on port 9101, FL subnet only (default: YES)
 
 The aggregation strategy, number of rounds and client minimums are NOT set
 here: they are properties of the Flower App Bundle you submit at run time with
@@ -224,6 +243,7 @@ Ports (none are published on 0.0.0.0):
   9091  ServerAppIo  (container-internal only, not published)
   9092  Fleet API    (bound to the private NIC; SuperNode connections)
   9093  Control API  (bound to 127.0.0.1; reach via SSH tunnel, executes code)
+  9101  Metrics agent (bound to the private NIC; read-only JSON, FL subnet only)
 
 Service management:
   systemctl status  flower-superlink
@@ -318,6 +338,12 @@ validate_config() {
            _errors=$((_errors + 1)) ;;
     esac
 
+    case "${ONEAPP_FL_METRICS_AGENT}" in
+        YES|NO) ;;
+        *) msg error "ONEAPP_FL_METRICS_AGENT='${ONEAPP_FL_METRICS_AGENT}' -- must be YES or NO"
+           _errors=$((_errors + 1)) ;;
+    esac
+
     # Version: strict semver (parity with the SuperNode). Blocks any value with a
     # newline/space/metacharacter from reaching the image tag and docker pull args
     # that are interpolated into the root-owned systemd unit.
@@ -696,6 +722,11 @@ harden_firewall() {
         ufw default deny incoming  >/dev/null 2>&1 || true
         ufw default allow outgoing >/dev/null 2>&1 || true
         ufw allow 22/tcp comment 'SSH' >/dev/null 2>&1 || true
+        # The metrics agent is a host process, so UFW (not DOCKER-USER) guards it
+        if [ "${ONEAPP_FL_METRICS_AGENT}" = "YES" ]; then
+            ufw allow from "${FL_PRIVATE_CIDR}" to any port "${FLOWER_AGENT_PORT}" proto tcp \
+                comment 'Flower metrics agent' >/dev/null 2>&1 || true
+        fi
         ufw logging low        >/dev/null 2>&1 || true
         ufw --force enable     >/dev/null 2>&1 || true
     fi
@@ -742,3 +773,246 @@ harden_firewall() {
 
     msg info "Firewall hardened (FL ports limited to ${FL_PRIVATE_CIDR}, SMTP egress blocked)"
 }
+
+# ==========================================================================
+#  HELPER: setup_fl_accounting  (byte counters for Fleet API traffic)
+#  Container traffic is forwarded, so it traverses DOCKER-USER. The
+#  FLOWER-ACCT rules have no target: they only count, then fall through.
+#  Rebuilt on every boot like the rest of the firewall.
+# ==========================================================================
+setup_fl_accounting() {
+    command -v iptables >/dev/null 2>&1 || return 0
+    iptables -L DOCKER-USER >/dev/null 2>&1 || iptables -N DOCKER-USER 2>/dev/null || true
+    iptables -N FLOWER-ACCT 2>/dev/null || true
+    iptables -C FLOWER-ACCT -p tcp --dport 9092 2>/dev/null \
+        || iptables -A FLOWER-ACCT -p tcp --dport 9092 2>/dev/null || true
+    iptables -C FLOWER-ACCT -p tcp --sport 9092 2>/dev/null \
+        || iptables -A FLOWER-ACCT -p tcp --sport 9092 2>/dev/null || true
+    iptables -C DOCKER-USER -j FLOWER-ACCT 2>/dev/null \
+        || iptables -I DOCKER-USER 1 -j FLOWER-ACCT 2>/dev/null || true
+}
+
+# ==========================================================================
+#  HELPER: install_metrics_agent  (write the agent and its systemd unit)
+#  Stdlib-only Python HTTP server bound to the private NIC. Disabling it via
+#  ONEAPP_FL_METRICS_AGENT=NO stops and removes it on the next boot.
+# ==========================================================================
+install_metrics_agent() {
+    if [ "${ONEAPP_FL_METRICS_AGENT}" != "YES" ]; then
+        systemctl disable --now flower-metrics-agent.service >/dev/null 2>&1 || true
+        rm -f "${FLOWER_AGENT_UNIT}"
+        return 0
+    fi
+
+    local _vm_ip
+    _vm_ip=$(get_primary_ip)
+    [ -z "${_vm_ip}" ] && _vm_ip="127.0.0.1"
+
+    mkdir -p "${FLOWER_SCRIPTS_DIR}"
+    cat > "${FLOWER_SCRIPTS_DIR}/metrics-agent.py" <<'AGENT'
+#!/usr/bin/env python3
+"""Flower node metrics agent: container state and resource usage as JSON.
+
+GET /status on <bind>:<port>. Standard library only. Runs as root under
+systemd (flower-metrics-agent.service): it reads the Docker socket, the
+container's cgroup and the FLOWER-ACCT iptables byte counters.
+
+Usage: metrics-agent.py <role> <container> <bind-address> <port>
+"""
+
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROLE, CONTAINER, BIND, PORT = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+FL_PORT = "9092"
+ACCT_CHAIN = "FLOWER-ACCT"
+SAMPLE_INTERVAL = 5.0
+
+# CPU percent of the container over the last sampling interval, kept by the
+# sampler thread so concurrent scrapers all see the same, stable figure
+_cpu = {"id": "", "usage_us": 0, "at": 0.0, "percent": None}
+
+
+class _DockerConnection(http.client.HTTPConnection):
+    """HTTP over the Docker Engine unix socket."""
+
+    def __init__(self):
+        super().__init__("localhost", timeout=2)
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(2)
+        self.sock.connect("/var/run/docker.sock")
+
+
+def _inspect():
+    conn = _DockerConnection()
+    try:
+        conn.request("GET", f"/containers/{CONTAINER}/json")
+        resp = conn.getresponse()
+        body = resp.read()
+        return json.loads(body) if resp.status == 200 else None
+    except (OSError, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _mb(value):
+    return round(int(value) / 2**20, 1) if value.isdigit() else None
+
+
+def _cgroup_dir(container_id):
+    # cgroup v2 with the systemd driver (Ubuntu 24.04), then the cgroupfs layout
+    for path in (f"/sys/fs/cgroup/system.slice/docker-{container_id}.scope",
+                 f"/sys/fs/cgroup/docker/{container_id}"):
+        if os.path.isdir(path):
+            return path
+    return ""
+
+
+def _cpu_usage_us(cgroup):
+    for line in _read(f"{cgroup}/cpu.stat").splitlines():
+        key, _, value = line.partition(" ")
+        if key == "usage_usec":
+            return int(value)
+    return 0
+
+
+def _sampler():
+    while True:
+        info = _inspect()
+        cid = info["Id"] if info and info["State"].get("Running") else ""
+        cgroup = _cgroup_dir(cid) if cid else ""
+        now = time.monotonic()
+        if cgroup:
+            usage = _cpu_usage_us(cgroup)
+            if cid == _cpu["id"] and now > _cpu["at"]:
+                _cpu["percent"] = round((usage - _cpu["usage_us"]) / 1e4 / (now - _cpu["at"]), 1)
+            else:
+                _cpu["percent"] = None
+            _cpu.update(id=cid, usage_us=usage, at=now)
+        else:
+            _cpu.update(id="", percent=None)
+        time.sleep(SAMPLE_INTERVAL)
+
+
+def _fl_bytes():
+    """Bytes to and from the Fleet API port, from the FLOWER-ACCT counters."""
+    try:
+        out = subprocess.run(
+            ["iptables", "-w", "-L", ACCT_CHAIN, "-n", "-v", "-x"],
+            capture_output=True, text=True, timeout=2,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None, None
+    to_port = from_port = None
+    for line in out.splitlines()[2:]:
+        fields = line.split()
+        if f"dpt:{FL_PORT}" in line:
+            to_port = int(fields[1])
+        elif f"spt:{FL_PORT}" in line:
+            from_port = int(fields[1])
+    # A SuperNode connects out to 9092; the SuperLink serves it
+    return (to_port, from_port) if ROLE == "supernode" else (from_port, to_port)
+
+
+def _host():
+    meminfo = {}
+    for line in _read("/proc/meminfo").splitlines():
+        key, _, value = line.partition(":")
+        meminfo[key] = int(value.split()[0]) if value.split() else 0
+    load = _read("/proc/loadavg").split()
+    return {
+        "cpus": os.cpu_count(),
+        "load1": float(load[0]) if load else None,
+        "mem_total_mb": round(meminfo.get("MemTotal", 0) / 1024, 1),
+        "mem_available_mb": round(meminfo.get("MemAvailable", 0) / 1024, 1),
+    }
+
+
+def status():
+    info = _inspect()
+    container = {"name": CONTAINER, "status": "not found"}
+    resources = {}
+    if info:
+        state = info.get("State", {})
+        container.update(
+            status=state.get("Status", "unknown"),
+            started_at=state.get("StartedAt", ""),
+            image=info.get("Config", {}).get("Image", ""),
+        )
+        cgroup = _cgroup_dir(info["Id"]) if state.get("Running") else ""
+        if cgroup:
+            resources = {
+                "cpu_usage_s": round(_cpu_usage_us(cgroup) / 1e6, 3),
+                "cpu_percent": _cpu["percent"] if _cpu["id"] == info["Id"] else None,
+                "mem_used_mb": _mb(_read(f"{cgroup}/memory.current")),
+                "mem_limit_mb": _mb(_read(f"{cgroup}/memory.max")),
+                "mem_peak_mb": _mb(_read(f"{cgroup}/memory.peak")),
+            }
+    tx, rx = _fl_bytes()
+    return {
+        "role": ROLE,
+        "timestamp": time.time(),
+        "container": container,
+        "resources": resources,
+        "network": {"fl_port": int(FL_PORT), "tx_bytes": tx, "rx_bytes": rx},
+        "host": _host(),
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        body = json.dumps(status()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    threading.Thread(target=_sampler, daemon=True).start()
+    ThreadingHTTPServer((BIND, PORT), Handler).serve_forever()
+AGENT
+    chmod 0755 "${FLOWER_SCRIPTS_DIR}/metrics-agent.py"
+
+    cat > "${FLOWER_AGENT_UNIT}" <<EOF
+[Unit]
+Description=Flower node metrics agent
+After=docker.service
+
+[Service]
+Type=simple
+Restart=always
+RestartSec=5
+ExecStart=/usr/bin/python3 ${FLOWER_SCRIPTS_DIR}/metrics-agent.py superlink flower-superlink ${_vm_ip} ${FLOWER_AGENT_PORT}
+
+[Install]
+WantedBy=multi-user.target
+EOF
+    systemctl daemon-reload
+    msg info "Metrics agent installed (${_vm_ip}:${FLOWER_AGENT_PORT})"
+}
@@ -16,8 +16,27 @@ FLOWER_SCRIPTS_DIR="${FLOWER_DIR}/scripts"
 FLOWER_CONFIG_DIR="${FLOWER_DIR}/config"
 FLOWER_CERTS_DIR="${FLOWER_DIR}/certs"
 FLOWER_DATA_DIR="${FLOWER_DIR}/data"
+# Writable scratch for ClientApps, kept across restarts (/app/cache in the
+# containers): the PyTorch demo's compiled kernels (compile = true)
+FLOWER_CACHE_DIR="${FLOWER_DIR}/cache"
 FLOWER_CONTAINER="flower-supernode"
+FLOWER_AGENT_UNIT="/etc/systemd/system/flower-metrics-agent.service"
+FLOWER_AGENT_PORT=9101
+# Warm ClientApp worker (ONEAPP_FL_ISOLATION=process), see install_warm_worker
+FLOWER_CLIENTAPP_CONTAINER="flower-clientapp"
+FLOWER_CLIENTAPP_UNIT="/etc/systemd/system/flower-clientapp.service"
+FLOWER_CLIENTAPPIO_PORT=9094
 PREBAKED_VERSION="1.31.0"
+# Local wheels for the framework images that are not baked (built offline at
+# first boot). pytorch is baked as an image, so its wheels are not kept.
+FLOWER_WHEELHOUSE="${FLOWER_DIR}/wheelhouse"
+FLOWER_WHEELHOUSE_FRAMEWORKS="tensorflow sklearn"
+# Per-boot scratch (tmpfs): the OneGate answers configure shares between its
+# phases, so /service and the SuperLink VM are fetched once, not per phase
+FLOWER_BOOT_DIR="/run/flower-boot"
+# Seconds per boot phase, appended by configure and bootstrap (two processes)
+# and published to OneGate as FL_BOOT_TIMING once the container runs
+FLOWER_BOOT_TIMING="${FLOWER_CONFIG_DIR}/boot-timing"
 ONE_SERVICE_SETUP_DIR="/opt/one-appliance"
 
 ### Appliance Metadata ########################################################
@@ -57,8 +76,10 @@ ONE_SERVICE_PARAMS=(
     'ONEAPP_FL_NODE_CONFIG'            'configure' 'Space-separated key=value node config'                      ''
     'ONEAPP_FL_MAX_RETRIES'            'configure' 'Max reconnection attempts (0=unlimited)'                    '0'
     'ONEAPP_FL_MAX_WAIT_TIME'          'configure' 'Max wait time for connection in seconds (0=unlimited)'      '0'
-    'ONEAPP_FL_ISOLATION'              'configure' 'App execution isolation mode (subprocess|process)'          'subprocess'
+    'ONEAPP_FL_ISOLATION'              'configure' 'ClientApp isolation (subprocess|process=warm worker)'       'subprocess'
+    'ONEAPP_FL_AGGREGATION_GROUP'      'configure' 'Two-tier aggregation group (name|subnet)'                   ''
     'ONEAPP_FL_LOG_LEVEL'              'configure' 'Log verbosity (DEBUG|INFO|WARNING|ERROR)'                   'INFO'
+    'ONEAPP_FL_METRICS_AGENT'          'configure' 'Serve node metrics on port 9101 to the FL subnet (YES|NO)'  'YES'
     # Phase 2: TLS (secure by default)
     'ONEAPP_FL_TLS_ENABLED'            'configure' 'Enable TLS encryption (YES|NO)'                             'YES'
 )
@@ -77,7 +98,9 @@ apply_config_defaults() {
     ONEAPP_FL_MAX_RETRIES="${ONEAPP_FL_MAX_RETRIES:-0}"
     ONEAPP_FL_MAX_WAIT_TIME="${ONEAPP_FL_MAX_WAIT_TIME:-0}"
     ONEAPP_FL_ISOLATION="${ONEAPP_FL_ISOLATION:-subprocess}"
+    ONEAPP_FL_AGGREGATION_GROUP="${ONEAPP_FL_AGGREGATION_GROUP:-}"
     ONEAPP_FL_LOG_LEVEL="${ONEAPP_FL_LOG_LEVEL:-INFO}"
+    ONEAPP_FL_METRICS_AGENT="${ONEAPP_FL_METRICS_AGENT:-YES}"
     ONEAPP_FL_TLS_ENABLED="${ONEAPP_FL_TLS_ENABLED:-YES}"
 }
 apply_config_defaults
@@ -108,9 +131,15 @@ service_install()
     # Bake ONLY the default (pytorch) framework image to keep the qcow2 small
     # enough for the marketplace CLONING timeout. tensorflow/sklearn are built
     # lazily on first boot when ONEAPP_FL_FRAMEWORK selects them (see
-    # ensure_framework_image). The stock flwr/supernode image is NOT pulled --
-    # the appliance runs its own glibc-based framework images instead.
-    msg info "Building default framework image (pytorch)"
+    # ensure_framework_image), on top of the shared base image and from the
+    # local wheelhouse, so that build needs no network and takes seconds.
+    # The stock flwr/supernode image is NOT pulled -- the appliance runs its
+    # own glibc-based framework images instead.
+    msg info "Downloading the wheelhouse (${FLOWER_WHEELHOUSE_FRAMEWORKS})"
+    build_wheelhouse || msg warning "Wheelhouse incomplete -- first-boot builds will need network access"
+
+    msg info "Building the shared base image and the default framework image (pytorch)"
+    build_base_image || { msg error "Failed to build the base image"; exit 1; }
     build_framework_image "pytorch"
 
     # Reclaim the BuildKit cache (downloaded wheels) so it does not inflate the
@@ -118,8 +147,9 @@ service_install()
     docker builder prune -af >/dev/null 2>&1 || true
 
     msg info "Creating /opt/flower directory structure"
-    mkdir -p "${FLOWER_SCRIPTS_DIR}" "${FLOWER_CONFIG_DIR}" "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}"
-    chown -R 49999:49999 "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}"
+    mkdir -p "${FLOWER_SCRIPTS_DIR}" "${FLOWER_CONFIG_DIR}" "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}" \
+        "${FLOWER_CACHE_DIR}"
+    chown -R 49999:49999 "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}" "${FLOWER_CACHE_DIR}"
 
     msg info "Writing prebaked version marker"
     echo "${PREBAKED_VERSION}" > "${FLOWER_DIR}/PREBAKED_VERSION"
@@ -153,13 +183,25 @@ service_configure()
     validate_config || exit 1
 
     # Step 4: create mount dirs with correct ownership
-    mkdir -p "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}" "${FLOWER_CONFIG_DIR}"
-    chown -R 49999:49999 "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}"
+    mkdir -p "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}" "${FLOWER_CONFIG_DIR}" "${FLOWER_CACHE_DIR}"
+    chown -R 49999:49999 "${FLOWER_DATA_DIR}" "${FLOWER_CERTS_DIR}" "${FLOWER_CACHE_DIR}"
+    boot_timing_reset
 
     # Harden the host firewall: default-deny inbound, block outbound SMTP. The
     # SuperNode publishes no inbound FL ports (it connects out to the SuperLink),
     # so this mainly blocks unsolicited outbound mail from a compromised workload.
-    harden_firewall
+    boot_phase firewall harden_firewall
+
+    # Node metrics agent, dataset staging helper, warm ClientApp worker
+    boot_phase services install_node_services
+
+    # The framework image does not depend on anything below, and building it
+    # (tensorflow/sklearn on first boot) is the longest phase, so it runs in
+    # the background while the OneGate phases wait on the SuperLink. Its
+    # result is collected before configure.state is written. It starts only
+    # now so that Docker coming up does not race the iptables changes above.
+    prepare_framework_image "${ONEAPP_FL_FRAMEWORK}" &
+    local image_job=$!
 
     # Step 7: SuperLink discovery
     SUPERLINK_ADDRESS=""
@@ -168,7 +210,7 @@ service_configure()
         SUPERLINK_ADDRESS="${ONEAPP_FL_SUPERLINK_ADDRESS}"
     else
         msg info "No static address set; attempting OneGate discovery"
-        SUPERLINK_ADDRESS=$(discover_superlink)
+        SUPERLINK_ADDRESS=$(boot_phase discover discover_superlink)
         if [ -z "${SUPERLINK_ADDRESS}" ]; then
             msg error "SuperLink discovery failed"
             exit 1
@@ -186,13 +228,18 @@ service_configure()
 
     # TLS setup: determine mode and retrieve CA cert if needed
     TLS_MODE="disabled"
-    setup_tls_trust
+    boot_phase tls setup_tls_trust
     msg info "TLS mode: ${TLS_MODE}"
 
-    # Auto-compute partition ID if FL_NODE_CONFIG is empty
+    # Auto-compute partition ID if FL_NODE_CONFIG is empty, and keep the
+    # partition manifest (stable shard assignment for the demos) up to date
     if [ -z "${ONEAPP_FL_NODE_CONFIG}" ]; then
-        compute_partition_id
+        boot_phase partition compute_partition_id
+        install_partition_manifest
+    else
+        remove_partition_manifest
     fi
+    apply_aggregation_group
 
     # Determine container image version and framework-specific image
     VERSION="${ONEAPP_FLOWER_VERSION}"
@@ -205,11 +252,12 @@ service_configure()
     esac
     msg info "Using ML framework image: ${IMAGE_TAG}"
 
-    # Lazy build: only pytorch is baked into the image; build the selected
-    # framework image now if it is missing.
+    # Lazy build (started above): only pytorch is baked into the image; the
+    # selected framework image is built if it is missing. 'image_wait' is the
+    # time configure still had to wait for it after the OneGate phases.
     # Fail closed: a tampered or failed framework build must abort the boot
     # rather than silently start a container against a half-built image.
-    ensure_framework_image "${ONEAPP_FL_FRAMEWORK}" || {
+    boot_phase image_wait wait "${image_job}" || {
         msg error "Could not build ${ONEAPP_FL_FRAMEWORK} image -- aborting"
         exit 1
     }
@@ -254,6 +302,7 @@ image      = ${IMAGE_TAG}
 isolation  = ${ONEAPP_FL_ISOLATION}
 tls        = ${TLS_MODE}
 firewall   = default-deny inbound, outbound SMTP blocked
+metrics    = ${ONEAPP_FL_METRICS_AGENT} (port ${FLOWER_AGENT_PORT}, FL subnet only)
 EOF
         chmod 600 "${ONE_SERVICE_REPORT}" 2>/dev/null
     fi
@@ -295,7 +344,9 @@ service_bootstrap()
         esac
     fi
 
-    # Create the container (Step 11 prep -- container creation separate from systemd start)
+    # Create the container (Step 11 prep -- container creation separate from systemd start).
+    # The warm worker joins the SuperNode's network namespace, so it goes first.
+    docker rm -f "${FLOWER_CLIENTAPP_CONTAINER}" 2>/dev/null || true
     docker rm -f "${FLOWER_CONTAINER}" 2>/dev/null || true
 
     # Build the docker command as an ARRAY (never eval a string): operator-
@@ -309,6 +360,7 @@ service_bootstrap()
     # scan the FL subnet, or escalate to root.
     create_cmd+=(--cap-drop ALL --security-opt no-new-privileges)
     create_cmd+=(-v "${FLOWER_DATA_DIR}:/app/data:ro")
+    create_cmd+=(-v "${FLOWER_CACHE_DIR}:/app/cache")
     # shellcheck disable=SC2206
     [ -n "${TLS_VOLUME_FLAGS}" ]   && create_cmd+=(${TLS_VOLUME_FLAGS})
     create_cmd+=(--env-file "${FLOWER_CONFIG_DIR}/supernode.env")
@@ -317,6 +369,10 @@ service_bootstrap()
     create_cmd+=(${TLS_FLAGS})
     create_cmd+=(--superlink "${SUPERLINK_ADDRESS}")
     create_cmd+=(--isolation "${ONEAPP_FL_ISOLATION}")
+    if [ "${ONEAPP_FL_ISOLATION}" = "process" ]; then
+        # Only the warm worker, inside this container's network namespace, connects
+        create_cmd+=(--clientappio-api-address "127.0.0.1:${FLOWER_CLIENTAPPIO_PORT}")
+    fi
     create_cmd+=(--node-config "${ONEAPP_FL_NODE_CONFIG}")
     create_cmd+=(--max-retries "${ONEAPP_FL_MAX_RETRIES}")
     create_cmd+=(--max-wait-time "${ONEAPP_FL_MAX_WAIT_TIME}")
@@ -324,19 +380,66 @@ service_bootstrap()
     msg info "Creating container: ${create_cmd[*]}"
     "${create_cmd[@]}" || { msg error "Failed to create container"; exit 1; }
 
-    # Step 11: start via systemd
+    # Warm worker: same image and hardening, running every task in one process
+    if [ "${ONEAPP_FL_ISOLATION}" = "process" ]; then
+        local -a worker_cmd=(docker create --name "${FLOWER_CLIENTAPP_CONTAINER}")
+        worker_cmd+=(--cap-drop ALL --security-opt no-new-privileges)
+        worker_cmd+=(--network "container:${FLOWER_CONTAINER}")
+        worker_cmd+=(-v "${FLOWER_DATA_DIR}:/app/data:ro")
+        worker_cmd+=(-v "${FLOWER_CACHE_DIR}:/app/cache")
+        worker_cmd+=(-v "${FLOWER_SCRIPTS_DIR}/warm-clientapp.py:/app/warm-clientapp.py:ro")
+        worker_cmd+=(--env-file "${FLOWER_CONFIG_DIR}/supernode.env")
+        worker_cmd+=(--entrypoint python "${IMAGE_TAG}" /app/warm-clientapp.py)
+        worker_cmd+=(--insecure --clientappio-api-address "127.0.0.1:${FLOWER_CLIENTAPPIO_PORT}")
+        msg info "Creating warm ClientApp worker: ${worker_cmd[*]}"
+        "${worker_cmd[@]}" || { msg error "Failed to create warm ClientApp worker"; exit 1; }
+    fi
+
+    # Record both docker create commands for recreate-containers.sh (the
+    # dashboard's framework switch), so a recreated container gets exactly
+    # these flags and only the image changes
+    {
+        printf 'image_tag=%q\n' "${IMAGE_TAG}"
+        declare -p create_cmd
+        if [ "${ONEAPP_FL_ISOLATION}" = "process" ]; then
+            declare -p worker_cmd
+        else
+            echo 'declare -a worker_cmd=()'
+        fi
+    } > "${FLOWER_CONFIG_DIR}/containers.state"
+    chmod 600 "${FLOWER_CONFIG_DIR}/containers.state"
+
+    # Step 11: start via systemd. The start event is looked for from just
+    # before the start, so wait_for_container cannot miss it.
+    local start_time
+    start_time=$(date +%s)
     systemctl daemon-reload
     systemctl enable flower-supernode.service
     systemctl start flower-supernode.service
 
+    # Start the metrics agent (best-effort; monitoring must not block boot).
+    # It does not need the container, so it comes up while that starts.
+    if [ "${ONEAPP_FL_METRICS_AGENT}" = "YES" ]; then
+        systemctl enable flower-metrics-agent.service >/dev/null 2>&1 || true
+        systemctl restart flower-metrics-agent.service || msg warning "Metrics agent failed to start"
+    fi
+
     # Step 12: wait for container running state
-    wait_for_container || { msg error "Container failed to reach running state"; exit 1; }
+    boot_phase container wait_for_container "${start_time}" \
+        || { msg error "Container failed to reach running state"; exit 1; }
 
-    # Step 13: publish to OneGate (best-effort)
-    publish_to_onegate "FL_NODE_READY" "YES"
-    publish_to_onegate "FL_NODE_ID" "${VMID:-unknown}"
-    publish_to_onegate "FL_VERSION" "${VERSION}"
-    publish_to_onegate "FL_FRAMEWORK" "${ONEAPP_FL_FRAMEWORK:-pytorch}"
+    if [ "${ONEAPP_FL_ISOLATION}" = "process" ]; then
+        systemctl enable flower-clientapp.service
+        systemctl restart flower-clientapp.service
+    fi
+
+    # Step 13: publish to OneGate (best-effort), in one request
+    publish_to_onegate \
+        "FL_NODE_READY" "YES" \
+        "FL_NODE_ID" "${VMID:-unknown}" \
+        "FL_VERSION" "${VERSION}" \
+        "FL_FRAMEWORK" "${ONEAPP_FL_FRAMEWORK:-pytorch}" \
+        "FL_BOOT_TIMING" "$(boot_timing_summary)"
 
     msg info "BOOTSTRAP FINISHED"
     return 0
@@ -352,6 +455,9 @@ service_help()
     msg info "  ONEAPP_FL_SUPERLINK_ADDRESS      Static SuperLink address (host:port)"
     msg info "  ONEAPP_FL_NODE_CONFIG            key=value pairs for ClientApp"
     msg info "  ONEAPP_FL_TLS_ENABLED            Enable TLS encryption (default: YES)"
+    msg info "  ONEAPP_FL_METRICS_AGENT          Node metrics on port 9101, FL subnet only (default: YES)"
+    msg info "  ONEAPP_FL_ISOLATION              subprocess, or process for a warm ClientApp worker (default: subprocess)"
+    msg info "  ONEAPP_FL_AGGREGATION_GROUP      Group for two-tier aggregation: a name, or subnet (default: none)"
     msg info ""
     msg info "Logs: /var/log/one-appliance/"
     msg info "Container logs: docker logs flower-supernode"
@@ -403,62 +509,110 @@ https://download.docker.com/linux/ubuntu $(. /etc/os-release && echo "$VERSION_C
     msg info "Docker CE installed"
 }
 
-# build_framework_image: build ONE framework image on demand.
-# The official flwr/supernode image is Alpine (musl) which lacks the glibc that
-# PyTorch/TensorFlow manylinux wheels need, so we build from python:3.12-slim.
+# Pinned requirements. The base set is shared by every framework image and
+# installed once, in flower-supernode-base; each framework adds a thin layer.
 # NumPy 2.x requires SSE4.1 (x86_v2) which some KVM VMs lack, so pin 1.26.4.
-# Only the default (pytorch) image is baked at build time; the others are built
-# lazily on first boot to keep the exported qcow2 within the marketplace
-# CLONING timeout.
+BASE_REQUIREMENTS="numpy==1.26.4 flwr[simulation]==1.31.0 flwr-datasets[vision]>=0.4.0"
+
+framework_requirements()
+{
+    case "$1" in
+        pytorch)    echo "torch==2.5.1+cpu torchvision==0.20.1+cpu" ;;
+        tensorflow) echo "tensorflow-cpu==2.18.1" ;;
+        sklearn)    echo "scikit-learn==1.5.2" ;;
+        *)          return 1 ;;
+    esac
+}
+
+# framework_packages: Debian packages a framework image needs beyond Python:
+# PyTorch's inductor compiles its CPU kernels with g++ (demo compile = true)
+framework_packages()
+{
+    case "$1" in
+        pytorch) echo "g++" ;;
+        *)       echo "" ;;
+    esac
+}
+
+# build_wheelhouse: download the wheels of the base set plus every framework
+# in FLOWER_WHEELHOUSE_FRAMEWORKS into FLOWER_WHEELHOUSE, resolved together
+# (so the base image and each framework layer agree on shared dependencies)
+# and inside python:3.12-slim (so the wheels match the images' platform).
+build_wheelhouse()
+{
+    local _reqs="${BASE_REQUIREMENTS}" _fw
+    for _fw in ${FLOWER_WHEELHOUSE_FRAMEWORKS}; do
+        _reqs="${_reqs} $(framework_requirements "${_fw}")"
+    done
+
+    mkdir -p "${FLOWER_WHEELHOUSE}"
+    # shellcheck disable=SC2086  # word splitting of _reqs is intended
+    docker run --rm -v "${FLOWER_WHEELHOUSE}:/wheels" python:3.12-slim \
+        pip download --no-cache-dir --only-binary=:all: -d /wheels ${_reqs}
+}
+
+# pip_install_step: the Dockerfile RUN line installing $* from the wheelhouse
+# (bind-mounted, so the wheels never end up in an image layer). Falls back to
+# PyPI for anything the wheelhouse lacks; pytorch always comes from the
+# PyTorch CPU index since its wheels are not kept locally.
+pip_install_step()
+{
+    local _pkgs="" _p
+    for _p in "$@"; do _pkgs="${_pkgs} '${_p}'"; done
+    echo "RUN --mount=type=bind,source=.,target=/wheels \\
+    pip install --no-cache-dir --no-index --find-links /wheels${_pkgs} \\
+    || pip install --no-cache-dir --find-links /wheels${_pkgs} \\
+       --extra-index-url https://download.pytorch.org/whl/cpu"
+}
+
+# build_base_image: the shared layer (python:3.12-slim + numpy, flwr,
+# flwr-datasets) that every framework image starts FROM. The official
+# flwr/supernode image is Alpine (musl) which lacks the glibc that
+# PyTorch/TensorFlow manylinux wheels need, hence python:3.12-slim.
+build_base_image()
+{
+    local _tag="flower-supernode-base:${PREBAKED_VERSION}"
+
+    mkdir -p "${FLOWER_WHEELHOUSE}"
+    msg info "Building ${_tag}"
+    # shellcheck disable=SC2086
+    docker build -t "${_tag}" -f - "${FLOWER_WHEELHOUSE}" <<DOCKERFILE
+FROM python:3.12-slim
+$(pip_install_step ${BASE_REQUIREMENTS})
+ENTRYPOINT ["flower-supernode"]
+DOCKERFILE
+}
+
+# build_framework_image: build ONE framework image on demand, as a thin layer
+# over flower-supernode-base. Only the default (pytorch) image is baked at
+# build time; the others are built lazily on first boot to keep the exported
+# qcow2 within the marketplace CLONING timeout.
 build_framework_image()
 {
     local _framework="$1"
     local VER="${PREBAKED_VERSION}"
     local _tag="flower-supernode-${_framework}:${VER}"
+    local _reqs
 
-    case "${_framework}" in
-        pytorch)
-            msg info "Building ${_tag}"
-            docker build -t "${_tag}" - <<'DOCKERFILE'
-FROM python:3.12-slim
-RUN pip install --no-cache-dir \
-    'numpy==1.26.4' \
-    'flwr[simulation]==1.31.0' \
-    'torch==2.5.1+cpu' 'torchvision==0.20.1+cpu' \
-    --extra-index-url https://download.pytorch.org/whl/cpu
-RUN pip install --no-cache-dir 'flwr-datasets[vision]>=0.4.0'
-ENTRYPOINT ["flower-supernode"]
-DOCKERFILE
-            ;;
-        tensorflow)
-            msg info "Building ${_tag}"
-            docker build -t "${_tag}" - <<'DOCKERFILE'
-FROM python:3.12-slim
-RUN pip install --no-cache-dir \
-    'numpy==1.26.4' \
-    'flwr[simulation]==1.31.0' \
-    'tensorflow-cpu==2.18.1' \
-    'flwr-datasets[vision]>=0.4.0'
-ENTRYPOINT ["flower-supernode"]
-DOCKERFILE
-            ;;
-        sklearn)
-            msg info "Building ${_tag}"
-            docker build -t "${_tag}" - <<'DOCKERFILE'
-FROM python:3.12-slim
-RUN pip install --no-cache-dir \
-    'numpy==1.26.4' \
-    'flwr[simulation]==1.31.0' \
-    'scikit-learn==1.5.2' \
-    'flwr-datasets[vision]>=0.4.0'
+    if ! _reqs=$(framework_requirements "${_framework}"); then
+        msg error "Unknown framework '${_framework}' -- cannot build image"
+        return 1
+    fi
+    if ! docker image inspect "flower-supernode-base:${VER}" >/dev/null 2>&1; then
+        build_base_image || return 1
+    fi
+
+    msg info "Building ${_tag}"
+    mkdir -p "${FLOWER_WHEELHOUSE}"
+    # shellcheck disable=SC2086
+    local _apt
+    _apt=$(framework_packages "${_framework}")
+    docker build -t "${_tag}" -f - "${FLOWER_WHEELHOUSE}" <<DOCKERFILE
+FROM flower-supernode-base:${VER}
+${_apt:+RUN apt-get update && apt-get install -y --no-install-recommends ${_apt} && rm -rf /var/lib/apt/lists/*}
+$(pip_install_step ${_reqs})
 ENTRYPOINT ["flower-supernode"]
 DOCKERFILE
-            ;;
-        *)
-            msg error "Unknown framework '${_framework}' -- cannot build image"
-            return 1
-            ;;
-    esac
 }
 
 # ensure_framework_image: build the selected framework image at boot if it is
@@ -480,6 +634,15 @@ ensure_framework_image()
     docker builder prune -af >/dev/null 2>&1 || true
 }
 
+# prepare_framework_image: the configure stage's background job -- wait for
+# the Docker daemon, then ensure_framework_image. Its exit status is the
+# job's, collected with 'wait' before configure.state is written.
+prepare_framework_image()
+{
+    boot_phase docker wait_for_docker || return 1
+    boot_phase image ensure_framework_image "$1"
+}
+
 # validate_config: Fail-fast validation of all context variables.
 # Collects all errors before aborting so operators can fix them in one pass.
 validate_config()
@@ -536,6 +699,12 @@ validate_config()
            errors=$((errors + 1)) ;;
     esac
 
+    # FL_AGGREGATION_GROUP: a plain name (it becomes a quoted node config value)
+    if ! [[ "${ONEAPP_FL_AGGREGATION_GROUP}" =~ ^[A-Za-z0-9._-]*$ ]]; then
+        msg error "Invalid ONEAPP_FL_AGGREGATION_GROUP: '${ONEAPP_FL_AGGREGATION_GROUP}'. Use letters, digits, '.', '_' or '-'"
+        errors=$((errors + 1))
+    fi
+
     # FL_LOG_LEVEL: enum
     case "${ONEAPP_FL_LOG_LEVEL}" in
         DEBUG|INFO|WARNING|ERROR) ;;
@@ -550,6 +719,13 @@ validate_config()
            errors=$((errors + 1)) ;;
     esac
 
+    # FL_METRICS_AGENT: boolean
+    case "${ONEAPP_FL_METRICS_AGENT}" in
+        YES|NO) ;;
+        *) msg error "Invalid ONEAPP_FL_METRICS_AGENT: '${ONEAPP_FL_METRICS_AGENT}'. Must be YES or NO"
+           errors=$((errors + 1)) ;;
+    esac
+
     if [ "${errors}" -gt 0 ]; then
         msg error "${errors} configuration error(s). Aborting boot."
         return 1
@@ -559,8 +735,95 @@ validate_config()
     return 0
 }
 
+# install_node_services: the host-side helpers, none of which needs the
+# SuperLink or the framework image.
+install_node_services()
+{
+    # Node metrics agent: container state, cgroup CPU/memory and Fleet API
+    # byte counters for the dashboard, one HTTP GET instead of an SSH session
+    setup_fl_accounting
+    install_metrics_agent
+
+    # Dataset staging helper: fills the demos' local mirror in the data volume
+    install_stage_dataset_script
+
+    # Warm ClientApp worker, for ONEAPP_FL_ISOLATION=process
+    install_warm_worker
+
+    # Container re-creation on another image, for the dashboard's framework switch
+    install_recreate_script
+}
+
+# onegate_service_json: this service's GET /service document, fetched once
+# per configure and kept under FLOWER_BOOT_DIR for the later phases
+# (discovery runs in a command substitution, so a variable would not do).
+onegate_service_json()
+{
+    local cache="${FLOWER_BOOT_DIR}/service.json"
+
+    if [ ! -s "${cache}" ]; then
+        mkdir -p -m 0700 "${FLOWER_BOOT_DIR}"
+        curl -sf "${ONEGATE_ENDPOINT}/service" \
+            -H "X-ONEGATE-TOKEN: ${TOKENTXT:-}" \
+            -H "X-ONEGATE-VMID: ${VMID:-}" > "${cache}.tmp" 2>/dev/null \
+            && mv -f "${cache}.tmp" "${cache}"
+        rm -f "${cache}.tmp"
+    fi
+    cat "${cache}" 2>/dev/null
+}
+
+# superlink_vmid: the SuperLink role's first VM id, from onegate_service_json.
+superlink_vmid()
+{
+    onegate_service_json | jq -r '
+        .SERVICE.roles[]
+        | select(.name == "superlink")
+        | .nodes[0].vm_info.VM.ID // empty
+    ' 2>/dev/null
+}
+
+# superlink_field VMID KEY: KEY from the SuperLink VM's USER_TEMPLATE. The
+# VM document one phase fetched is reused by the next (discovery's copy
+# usually has FL_CA_CERT too, since the SuperLink publishes both at once);
+# it is only fetched again while KEY is missing. Fails while KEY is unset.
+superlink_field()
+{
+    local cache="${FLOWER_BOOT_DIR}/superlink-vm.json"
+    local _filter='.VM.USER_TEMPLATE[$k] // empty'
+    local value=""
+
+    [ -s "${cache}" ] && value=$(jq -r --arg k "$2" "${_filter}" "${cache}" 2>/dev/null)
+    if [ -z "${value}" ]; then
+        mkdir -p -m 0700 "${FLOWER_BOOT_DIR}"
+        # Use onegate CLI for cross-VM query (curl /vm/<id> not supported)
+        onegate vm show "$1" --json > "${cache}.tmp" 2>/dev/null \
+            && [ -s "${cache}.tmp" ] && mv -f "${cache}.tmp" "${cache}"
+        rm -f "${cache}.tmp"
+        value=$(jq -r --arg k "$2" "${_filter}" "${cache}" 2>/dev/null)
+    fi
+    [ -n "${value}" ] && printf '%s\n' "${value}"
+}
+
+# superlink_endpoint VMID: the SuperLink's published FL_ENDPOINT, else its
+# NIC IP with the default Fleet API port. Fails while the VM has neither.
+superlink_endpoint()
+{
+    local fl_endpoint sl_ip
+
+    fl_endpoint=$(superlink_field "$1" FL_ENDPOINT) && { echo "${fl_endpoint}"; return 0; }
+
+    # Fallback: derive from NIC IP (assume port 9092)
+    sl_ip=$(jq -r '.VM.TEMPLATE.NIC[0].IP // empty' "${FLOWER_BOOT_DIR}/superlink-vm.json" 2>/dev/null)
+    if [ -n "${sl_ip}" ]; then
+        msg info "Derived SuperLink endpoint from NIC IP: ${sl_ip}:9092" >&2
+        echo "${sl_ip}:9092"
+        return 0
+    fi
+    return 1
+}
+
 # discover_superlink: Resolve the SuperLink Fleet API address via OneGate.
-# Implements the retry loop from spec/02 Section 6d.
+# Implements the retry loop from spec/02 Section 6d (with backoff).
 # Outputs the discovered address on stdout; returns non-zero on failure.
 discover_superlink()
 {
@@ -592,64 +855,25 @@ discover_superlink()
     msg info "OneGate connectivity verified" >&2
 
     # Step 1: Get SuperLink VM ID from service endpoint
-    local service_json superlink_vmid
-    service_json=$(curl -s "${onegate_endpoint}/service" \
-        -H "X-ONEGATE-TOKEN: ${onegate_token}" \
-        -H "X-ONEGATE-VMID: ${vmid}" 2>/dev/null)
+    local sl_vmid
+    sl_vmid=$(superlink_vmid)
 
-    superlink_vmid=$(echo "${service_json}" | jq -r '
-        .SERVICE.roles[]
-        | select(.name == "superlink")
-        | .nodes[0].vm_info.VM.ID // empty
-    ' 2>/dev/null)
-
-    if [ -z "${superlink_vmid}" ]; then
+    if [ -z "${sl_vmid}" ]; then
         msg error "Could not find SuperLink VM ID from service endpoint"
         return 1
     fi
-    msg info "Found SuperLink VM ID: ${superlink_vmid}" >&2
+    msg info "Found SuperLink VM ID: ${sl_vmid}" >&2
 
-    # Step 2: Retry loop — query SuperLink VM directly for FL_ENDPOINT.
-    # Bounded: up to 30 attempts with a fixed 10s wait between them.
-    local max_retries=30
-    local interval=10
-    local attempt=1
+    # Step 2: query the SuperLink VM directly for FL_ENDPOINT, backing off
+    # from 1 s to 5 s between tries. Bounded at 300 s, the old 30 x 10 s.
     local fl_endpoint=""
+    if fl_endpoint=$(backoff_until 300 superlink_endpoint "${sl_vmid}"); then
+        msg info "Discovered SuperLink at ${fl_endpoint}" >&2
+        echo "${fl_endpoint}"
+        return 0
+    fi
 
-    while [ "${attempt}" -le "${max_retries}" ]; do
-        # Use onegate CLI for cross-VM query (curl /vm/<id> not supported)
-        local vm_json
-        vm_json=$(onegate vm show "${superlink_vmid}" --json 2>/dev/null)
-
-        # Try FL_ENDPOINT from USER_TEMPLATE first
-        fl_endpoint=$(echo "${vm_json}" | jq -r '
-            .VM.USER_TEMPLATE.FL_ENDPOINT // empty
-        ' 2>/dev/null)
-
-        # Fallback: derive from NIC IP (assume port 9092)
-        if [ -z "${fl_endpoint}" ] && [ -n "${vm_json}" ]; then
-            local sl_ip
-            sl_ip=$(echo "${vm_json}" | jq -r '
-                .VM.TEMPLATE.NIC[0].IP // empty
-            ' 2>/dev/null)
-            if [ -n "${sl_ip}" ]; then
-                fl_endpoint="${sl_ip}:9092"
-                msg info "Derived SuperLink endpoint from NIC IP: ${fl_endpoint}" >&2
-            fi
-        fi
-
-        if [ -n "${fl_endpoint}" ]; then
-            msg info "Discovered SuperLink at ${fl_endpoint} (attempt ${attempt})" >&2
-            echo "${fl_endpoint}"
-            return 0
-        fi
-
-        msg info "SuperLink not ready, waiting ${interval}s... (attempt ${attempt})" >&2
-        sleep "${interval}"
-        attempt=$((attempt + 1))
-    done
-
-    msg error "SuperLink discovery timed out after ${max_retries} attempts"
+    msg error "SuperLink discovery timed out after 300s"
     return 1
 }
 
@@ -673,13 +897,8 @@ setup_tls_trust()
             local onegate_token="${TOKENTXT:-}"
 
             if [ -n "${onegate_token}" ]; then
-                local service_json
-                service_json=$(curl -s "${ONEGATE_ENDPOINT}/service" \
-                    -H "X-ONEGATE-TOKEN: ${onegate_token}" \
-                    -H "X-ONEGATE-VMID: ${VMID:-}" 2>/dev/null)
-
                 local tls_flag
-                tls_flag=$(echo "${service_json}" | jq -r '
+                tls_flag=$(onegate_service_json | jq -r '
                     .SERVICE.roles[]
                     | select(.name == "superlink")
                     | .nodes[0].vm_info.VM.USER_TEMPLATE.FL_TLS // empty
@@ -705,35 +924,23 @@ retrieve_ca_cert()
     # The plain GET /service response does not reliably include the SuperLink's
     # full USER_TEMPLATE, so resolve the SuperLink VM id from /service and then
     # query that VM directly with `onegate vm show <id> --json` (the same robust
-    # path discover_superlink uses). Retry briefly to absorb publish timing.
+    # path discover_superlink uses, and usually the document it already
+    # fetched). Back off for up to 60 s to absorb publish timing.
     if [ -n "${ONEGATE_ENDPOINT:-}" ]; then
         local onegate_token="${TOKENTXT:-}"
 
         if [ -n "${onegate_token}" ]; then
-            local service_json superlink_vmid
-            service_json=$(curl -s "${ONEGATE_ENDPOINT}/service" \
-                -H "X-ONEGATE-TOKEN: ${onegate_token}" \
-                -H "X-ONEGATE-VMID: ${VMID:-}" 2>/dev/null)
-            superlink_vmid=$(echo "${service_json}" | jq -r '
-                .SERVICE.roles[]
-                | select(.name == "superlink")
-                | .nodes[0].vm_info.VM.ID // empty
-            ' 2>/dev/null)
-
-            if [ -n "${superlink_vmid}" ]; then
-                local _attempt ca_b64 vm_json
-                for _attempt in $(seq 1 12); do
-                    vm_json=$(onegate vm show "${superlink_vmid}" --json 2>/dev/null)
-                    ca_b64=$(echo "${vm_json}" | jq -r '.VM.USER_TEMPLATE.FL_CA_CERT // empty' 2>/dev/null)
-                    if [ -n "${ca_b64}" ]; then
-                        msg info "CA certificate retrieved from OneGate (SuperLink VM ${superlink_vmid})"
-                        echo "${ca_b64}" | base64 -d > "${cert_path}" 2>/dev/null
-                        finalize_ca_cert "${cert_path}"
-                        return $?
-                    fi
-                    msg info "Waiting for SuperLink to publish FL_CA_CERT (attempt ${_attempt})"
-                    sleep 5
-                done
+            local sl_vmid ca_b64
+            sl_vmid=$(superlink_vmid)
+
+            if [ -n "${sl_vmid}" ]; then
+                msg info "Waiting for SuperLink VM ${sl_vmid} to publish FL_CA_CERT"
+                if ca_b64=$(backoff_until 60 superlink_field "${sl_vmid}" FL_CA_CERT); then
+                    msg info "CA certificate retrieved from OneGate (SuperLink VM ${sl_vmid})"
+                    echo "${ca_b64}" | base64 -d > "${cert_path}" 2>/dev/null
+                    finalize_ca_cert "${cert_path}"
+                    return $?
+                fi
             fi
         fi
     fi
@@ -769,13 +976,8 @@ compute_partition_id()
     local onegate_token="${TOKENTXT:-}"
     [ -z "${onegate_token}" ] && return 0
 
-    local service_json
-    service_json=$(curl -s "${ONEGATE_ENDPOINT}/service" \
-        -H "X-ONEGATE-TOKEN: ${onegate_token}" \
-        -H "X-ONEGATE-VMID: ${VMID:-}" 2>/dev/null)
-
     local nodes num_partitions my_index
-    nodes=$(echo "${service_json}" | jq '.SERVICE.roles[] | select(.name == "supernode") | .nodes' 2>/dev/null)
+    nodes=$(onegate_service_json | jq '.SERVICE.roles[] | select(.name == "supernode") | .nodes' 2>/dev/null)
 
     if [ -z "${nodes}" ] || [ "${nodes}" = "null" ]; then
         msg warning "Could not read supernode role nodes from OneGate; partition-id not set"
@@ -794,6 +996,358 @@ compute_partition_id()
     fi
 }
 
+# install_partition_manifest: keep ${FLOWER_DATA_DIR}/partition.json (seen by
+# the container as /app/data/partition.json) listing this VM's id and the VM
+# ids of the whole supernode role. The demo ClientApps hash their data shards
+# over that member list, so scaling the role moves shards to the nodes that
+# joined and off the ones that left, plus the few a per-node load cap
+# redistributes; the rest stay put. Unlike partition-id (fixed at boot, and
+# shifted for everyone by a scale event), a timer refreshes the manifest every
+# minute; the file is only rewritten when the membership actually changes.
+install_partition_manifest()
+{
+    cat > "${FLOWER_SCRIPTS_DIR}/partition-manifest.sh" <<'SCRIPT'
+#!/usr/bin/env bash
+# Refresh the Flower partition manifest from OneGate (see appliance script).
+out=/opt/flower/data/partition.json
+# shellcheck disable=SC1091
+[ -f /run/one-context/one_env ] && . /run/one-context/one_env
+[ -n "${ONEGATE_ENDPOINT:-}" ] && [ -n "${TOKENTXT:-}" ] && [ -n "${VMID:-}" ] || exit 0
+
+members=$(curl -sf --max-time 10 "${ONEGATE_ENDPOINT}/service" \
+    -H "X-ONEGATE-TOKEN: ${TOKENTXT}" -H "X-ONEGATE-VMID: ${VMID}" \
+    | jq -c '[.SERVICE.roles[] | select(.name == "supernode") | .nodes[].deploy_id | tostring] | sort') \
+    || exit 0
+case "${members}" in ''|'[]'|null) exit 0 ;; esac
+
+manifest=$(jq -cn --arg key "${VMID}" --argjson members "${members}" \
+    '{version: 1, node_key: $key, members: $members}') || exit 0
+[ -f "${out}" ] && [ "$(cat "${out}")" = "${manifest}" ] && exit 0
+printf '%s\n' "${manifest}" > "${out}.tmp" && chmod 0644 "${out}.tmp" && mv -f "${out}.tmp" "${out}"
+SCRIPT
+    chmod 0755 "${FLOWER_SCRIPTS_DIR}/partition-manifest.sh"
+
+    cat > /etc/systemd/system/flower-partition-manifest.service <<EOF
+[Unit]
+Description=Refresh the Flower partition manifest from OneGate
+
+[Service]
+Type=oneshot
+ExecStart=${FLOWER_SCRIPTS_DIR}/partition-manifest.sh
+EOF
+    cat > /etc/systemd/system/flower-partition-manifest.timer <<'EOF'
+[Unit]
+Description=Refresh the Flower partition manifest every minute
+
+[Timer]
+OnBootSec=30
+OnUnitActiveSec=60
+
+[Install]
+WantedBy=timers.target
+EOF
+    systemctl daemon-reload
+    "${FLOWER_SCRIPTS_DIR}/partition-manifest.sh"
+    systemctl enable --now flower-partition-manifest.timer >/dev/null 2>&1 || true
+    if [ -f "${FLOWER_DATA_DIR}/partition.json" ]; then
+        msg info "Partition manifest: $(cat "${FLOWER_DATA_DIR}/partition.json")"
+    fi
+}
+
+# remove_partition_manifest: an explicit ONEAPP_FL_NODE_CONFIG wins, so drop
+# the manifest (and its timer) the ClientApps would otherwise prefer.
+remove_partition_manifest()
+{
+    systemctl disable --now flower-partition-manifest.timer >/dev/null 2>&1 || true
+    rm -f "${FLOWER_DATA_DIR}/partition.json"
+}
+
+# apply_aggregation_group: add this node's group to the node config, for the
+# demos' simulated two-tier aggregation (run config hierarchical-aggregation =
+# true): the ServerApp averages each group's updates before its strategy runs.
+# Every update still travels to the SuperLink; nothing is aggregated here.
+# ONEAPP_FL_AGGREGATION_GROUP is a name shared by the nodes of a group (one
+# per OpenNebula host or rack, say), or "subnet" to group by the VM's
+# connected subnet. An aggregation-group already in the node config wins.
+apply_aggregation_group()
+{
+    local group="${ONEAPP_FL_AGGREGATION_GROUP}"
+    [ -z "${group}" ] && return 0
+    if [[ "${ONEAPP_FL_NODE_CONFIG}" == *aggregation-group=* ]]; then
+        msg info "Node config already sets aggregation-group; ignoring ONEAPP_FL_AGGREGATION_GROUP"
+        return 0
+    fi
+    if [ "${group}" = "subnet" ]; then
+        group=$(get_primary_cidr)
+        [ -z "${group}" ] && group="$(get_primary_ip)/24"
+    fi
+    ONEAPP_FL_NODE_CONFIG="${ONEAPP_FL_NODE_CONFIG:+${ONEAPP_FL_NODE_CONFIG} }aggregation-group=\"${group}\""
+    msg info "Aggregation group: ${group}"
+}
+
+# install_stage_dataset_script: write ${FLOWER_SCRIPTS_DIR}/stage-dataset.sh,
+# which downloads a Hugging Face dataset ONCE into ${FLOWER_DATA_DIR}/mirror,
+# the layout the demos' datasource.py reads (memory-mapped, no network).
+# The data volume outlives the container, so a framework switch no longer
+# means a fresh download. It runs the node's own framework image, which
+# already has the datasets library, writing as the data volume's owner.
+#   stage-dataset.sh uoft-cs/cifar10             (train + test)
+#   stage-dataset.sh vicgalle/alpaca-gpt4 train
+install_stage_dataset_script()
+{
+    cat > "${FLOWER_SCRIPTS_DIR}/stage-dataset.sh" <<'SCRIPT'
+#!/usr/bin/env bash
+# Mirror a Hugging Face dataset into /opt/flower/data/mirror for the demos.
+set -euo pipefail
+dataset="${1:?usage: stage-dataset.sh <hf-dataset> [split ...]}"
+shift
+splits="${*:-train test}"
+image=$(docker inspect -f '{{.Config.Image}}' flower-supernode)
+
+mkdir -p /opt/flower/data/mirror
+chown 49999:49999 /opt/flower/data/mirror
+docker run --rm --user 49999:49999 -e HOME=/tmp \
+    -e DATASET="${dataset}" -e SPLITS="${splits}" \
+    -v /opt/flower/data:/app/data --entrypoint python "${image}" -c '
+import os
+from datasets import load_dataset
+name = os.environ["DATASET"]
+root = "/app/data/mirror/" + name.replace("/", "__")
+for split in os.environ["SPLITS"].split():
+    load_dataset(name, split=split).save_to_disk(f"{root}/{split}")
+    print(f"staged {name} {split}")
+'
+SCRIPT
+    chmod 0755 "${FLOWER_SCRIPTS_DIR}/stage-dataset.sh"
+}
+
+# install_recreate_script: write recreate-containers.sh, which the dashboard
+# runs over SSH to switch a SuperNode to another framework image. It replays
+# the docker create commands service_bootstrap recorded in containers.state
+# with only the image swapped, so the hardening, mounts, env file and
+# connection flags stay the appliance's, and it starts the containers through
+# their systemd units, the containers' only lifecycle owner.
+install_recreate_script()
+{
+    mkdir -p "${FLOWER_SCRIPTS_DIR}"
+    cat > "${FLOWER_SCRIPTS_DIR}/recreate-containers.sh" <<'SCRIPT'
+#!/usr/bin/env bash
+# Recreate the Flower containers on another image (see appliance script).
+# Usage: recreate-containers.sh IMAGE
+state=/opt/flower/config/containers.state
+image="${1:?usage: recreate-containers.sh IMAGE}"
+# shellcheck disable=SC1090
+. "${state}" || exit 1
+
+for i in "${!create_cmd[@]}"; do
+    [ "${create_cmd[$i]}" = "${image_tag}" ] && create_cmd[$i]="${image}"
+done
+for i in "${!worker_cmd[@]}"; do
+    [ "${worker_cmd[$i]}" = "${image_tag}" ] && worker_cmd[$i]="${image}"
+done
+
+systemctl stop flower-clientapp.service flower-supernode.service 2>/dev/null
+docker rm -f flower-clientapp flower-supernode >/dev/null 2>&1
+"${create_cmd[@]}" >/dev/null || exit 1
+systemctl start flower-supernode.service || exit 1
+if [ "${#worker_cmd[@]}" -gt 0 ]; then
+    "${worker_cmd[@]}" >/dev/null || exit 1
+    systemctl restart flower-clientapp.service || exit 1
+fi
+
+# The next switch starts from this image
+{ printf 'image_tag=%q\n' "${image}"; declare -p create_cmd worker_cmd; } > "${state}.tmp" \
+    && chmod 600 "${state}.tmp" && mv -f "${state}.tmp" "${state}"
+SCRIPT
+    chmod 0755 "${FLOWER_SCRIPTS_DIR}/recreate-containers.sh"
+}
+
+# install_warm_worker: write the warm ClientApp worker and its systemd unit.
+# With ONEAPP_FL_ISOLATION=process the SuperNode starts no process per task;
+# warm-clientapp.py in the flower-clientapp container (same image, in the
+# SuperNode's network namespace) takes every task from the ClientAppIo API
+# on 127.0.0.1:9094 and runs it in its own interpreter, one at a time. It
+# imports the ML framework once at start and loads each app once, so rounds
+# stop paying interpreter start-up, the framework import and the app load.
+# Otherwise the worker's unit and container are removed.
+install_warm_worker()
+{
+    if [ "${ONEAPP_FL_ISOLATION}" != "process" ]; then
+        systemctl disable --now flower-clientapp.service >/dev/null 2>&1 || true
+        rm -f "${FLOWER_CLIENTAPP_UNIT}"
+        docker rm -f "${FLOWER_CLIENTAPP_CONTAINER}" >/dev/null 2>&1 || true
+        return 0
+    fi
+
+    mkdir -p "${FLOWER_SCRIPTS_DIR}"
+    cat > "${FLOWER_SCRIPTS_DIR}/warm-clientapp.py" <<'WORKER'
+#!/usr/bin/env python3
+"""Warm Flower ClientApp worker for SuperNodes with --isolation process.
+
+`flwr-clientapp` without a --token does not stay warm: it becomes a
+launcher that starts a fresh `flwr-clientapp --token ...` process for
+every task. This worker does the launcher's job and runs each task in its
+own interpreter instead. It polls the SuperNode's ClientAppIo API for runs
+with tasks waiting, takes a token, then pulls the task, runs the ClientApp
+and pushes the reply, the same steps `flwr-clientapp --token` takes once
+(flwr.supernode.runtime.run_clientapp). Then it polls again.
+
+The ML framework is imported once at start, and a run's ClientApp is
+loaded once (its FAB installed on first sight) and reused for every
+later task of that FAB. Module state such as a cached compiled model
+survives from task to task; `client_fn` still runs per task. Tasks run
+one at a time. The ClientAppIo helpers used here are flwr internals,
+matching the flwr version pinned in the image (1.25).
+
+Runs in the flower-clientapp container (systemd flower-clientapp.service),
+from the SuperNode's image and in its network namespace.
+
+Usage: warm-clientapp.py --insecure [--clientappio-api-address ADDR] [--flwr-dir DIR]
+"""
+
+import argparse
+import importlib
+import importlib.util
+import time
+from logging import ERROR, INFO
+
+import grpc
+from flwr.app.error import Error
+from flwr.cli.install import install_from_fab
+from flwr.clientapp.client_app import LoadClientAppError
+from flwr.clientapp.utils import get_load_client_app_fn
+from flwr.common import Message
+from flwr.common.config import get_flwr_dir
+from flwr.common.constant import ErrorCode
+from flwr.common.grpc import create_channel
+from flwr.common.logger import log
+from flwr.common.retry_invoker import _make_simple_grpc_retry_invoker, _wrap_stub
+from flwr.proto.appio_pb2 import ListAppsToLaunchRequest, RequestTokenRequest
+from flwr.proto.clientappio_pb2_grpc import ClientAppIoStub
+from flwr.supercore.heartbeat import HeartbeatSender, make_app_heartbeat_fn_grpc
+from flwr.supernode.runtime.run_clientapp import pull_clientappinputs, push_clientappoutputs
+
+# Heavy imports of the demo ClientApps; those installed in this image are loaded
+PRELOAD = ("torch", "torchvision", "tensorflow", "keras", "sklearn",
+           "transformers", "peft", "datasets", "flwr_datasets")
+# Seconds between polls while no task is waiting
+POLL_S = 0.2
+
+
+class Worker:
+    """Runs ClientAppIo tasks in this process, keeping the last loaded ClientApp."""
+
+    def __init__(self, stub: ClientAppIoStub, flwr_dir: str | None):
+        self.stub = stub
+        self.flwr_dir = get_flwr_dir(flwr_dir)
+        self.load = get_load_client_app_fn(
+            default_app_ref="", app_path=None, multi_app=True, flwr_dir=str(self.flwr_dir),
+        )
+        # (fab_id, fab_version, fab_hash) and its ClientApp. One at a time:
+        # every demo is the `flower_demo` package, so loading another FAB
+        # reloads the modules the previous app's functions live in.
+        self.app_key = None
+        self.app = None
+        self.tasks = 0
+
+    def _client_app(self, run, fab):
+        key = (run.fab_id, run.fab_version, fab.hash_str if fab else "")
+        if key != self.app_key:
+            if fab:
+                install_from_fab(fab.content, flwr_dir=self.flwr_dir, skip_prompt=True)
+            self.app, self.app_key = self.load(*key), key
+            log(INFO, "[warm-clientapp] loaded ClientApp %s %s", run.fab_id, run.fab_version)
+        return self.app
+
+    def run_task(self, token: str) -> None:
+        """Pull one task, run it here and push the reply (run_clientapp's steps)."""
+        start = time.monotonic()
+        heartbeat = HeartbeatSender(make_app_heartbeat_fn_grpc(self.stub, token))
+        heartbeat.start()
+        try:
+            message, context, run, fab = pull_clientappinputs(stub=self.stub, token=token)
+            try:
+                reply = self._client_app(run, fab)(message=message, context=context)
+            except Exception as ex:  # reported to the ServerApp, as flwr-clientapp does
+                code = ErrorCode.CLIENT_APP_RAISED_EXCEPTION
+                reason = str(type(ex)) + ":<'" + str(ex) + "'>"
+                if isinstance(ex, LoadClientAppError):
+                    code = ErrorCode.LOAD_CLIENT_APP_EXCEPTION
+                    reason = "An exception was raised when attempting to load `ClientApp`"
+                    self.app_key = self.app = None
+                log(ERROR, "ClientApp raised an exception", exc_info=ex)
+                reply = Message(Error(code=code, reason=reason), reply_to=message)
+            push_clientappoutputs(stub=self.stub, token=token, message=reply, context=context)
+        except grpc.RpcError as e:
+            log(ERROR, "[warm-clientapp] task dropped, gRPC error: %s", e)
+            return
+        finally:
+            heartbeat.stop()
+        self.tasks += 1
+        log(INFO, "[warm-clientapp] task %d (run %d, %s) in %.2fs",
+            self.tasks, run.run_id, message.metadata.message_type, time.monotonic() - start)
+
+    def serve(self) -> None:
+        """Poll for runs with waiting tasks and run them, one at a time, forever."""
+        while True:
+            run_ids = self.stub.ListAppsToLaunch(ListAppsToLaunchRequest()).run_ids
+            token = self.stub.RequestToken(RequestTokenRequest(run_id=run_ids[0])).token if run_ids else ""
+            if token:
+                self.run_task(token)
+            else:
+                time.sleep(POLL_S)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm Flower ClientApp worker")
+    parser.add_argument("--insecure", action="store_true", required=True,
+                        help="plaintext ClientAppIo (the only mode flwr-clientapp supports)")
+    parser.add_argument("--clientappio-api-address", default="127.0.0.1:9094")
+    parser.add_argument("--flwr-dir", default=None)
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    loaded = [name for name in PRELOAD if importlib.util.find_spec(name) is not None]
+    for name in loaded:
+        importlib.import_module(name)
+    log(INFO, "[warm-clientapp] preloaded %s in %.1fs", ", ".join(loaded) or "nothing",
+        time.monotonic() - start)
+
+    channel = create_channel(server_address=args.clientappio_api_address, insecure=True)
+    stub = ClientAppIoStub(channel)
+    _wrap_stub(stub, _make_simple_grpc_retry_invoker())
+    try:
+        Worker(stub, args.flwr_dir).serve()
+    finally:
+        channel.close()
+
+
+if __name__ == "__main__":
+    main()
+WORKER
+    chmod 0644 "${FLOWER_SCRIPTS_DIR}/warm-clientapp.py"
+
+    # PartOf/WantedBy: restarted with the SuperNode, whose network namespace it shares
+    cat > "${FLOWER_CLIENTAPP_UNIT}" <<EOF
+[Unit]
+Description=Flower warm ClientApp worker (ONEAPP_FL_ISOLATION=process)
+After=flower-supernode.service
+PartOf=flower-supernode.service
+
+[Service]
+Type=simple
+Restart=always
+RestartSec=5
+ExecStart=/usr/bin/docker start -a ${FLOWER_CLIENTAPP_CONTAINER}
+ExecStop=/usr/bin/docker stop -t 30 ${FLOWER_CLIENTAPP_CONTAINER}
+
+[Install]
+WantedBy=flower-supernode.service
+EOF
+    systemctl daemon-reload
+    msg info "Generated ${FLOWER_CLIENTAPP_UNIT}"
+}
+
 # generate_env_file: Write the Docker environment file for the container.
 generate_env_file()
 {
@@ -830,68 +1384,129 @@ EOF
     msg info "Generated /etc/systemd/system/flower-supernode.service"
 }
 
-# wait_for_docker: Poll docker info until the daemon is ready (60s timeout).
+# wait_for_docker: Start the daemon and wait for it (60s timeout).
+# docker.service is Type=notify, so 'systemctl start' returns once dockerd
+# has told systemd it is ready; the docker info poll is only the fallback
+# for a daemon systemd does not manage.
 wait_for_docker()
 {
-    local timeout=60
-    local elapsed=0
+    local _start="${SECONDS}"
 
-    while ! docker info >/dev/null 2>&1; do
-        sleep 1
-        elapsed=$((elapsed + 1))
-        if [ "${elapsed}" -ge "${timeout}" ]; then
-            msg error "Docker daemon not ready after ${timeout}s"
-            return 1
-        fi
-    done
+    timeout 60 systemctl start docker.service >/dev/null 2>&1 || true
+    if ! backoff_until 60 docker info >/dev/null 2>&1; then
+        msg error "Docker daemon not ready after 60s"
+        return 1
+    fi
 
-    msg info "Docker daemon ready (${elapsed}s)"
+    msg info "Docker daemon ready ($((SECONDS - _start))s)"
     return 0
 }
 
-# wait_for_container: Poll container running state (60s timeout).
+# wait_for_container: Wait for the container's start event (60s timeout).
+# Follows 'docker events' from START_TIME (epoch seconds, taken before the
+# unit was started) instead of polling docker inspect once a second.
 wait_for_container()
 {
+    local since="${1:-$(date +%s)}"
     local timeout=60
-    local elapsed=0
-
-    while true; do
-        local running
+    local _start="${SECONDS}" _event="" _events_pid running
+
+    running=$(docker inspect --format='{{.State.Running}}' "${FLOWER_CONTAINER}" 2>/dev/null)
+    if [ "${running}" != "true" ]; then
+        read -r -t "${timeout}" _event < <(docker events --since "${since}" \
+            --filter "container=${FLOWER_CONTAINER}" --filter event=start \
+            --format '{{.Status}}' 2>/dev/null)
+        _events_pid=$!
+        kill "${_events_pid}" 2>/dev/null || true
         running=$(docker inspect --format='{{.State.Running}}' "${FLOWER_CONTAINER}" 2>/dev/null)
+    fi
 
-        if [ "${running}" = "true" ]; then
-            msg info "Container ${FLOWER_CONTAINER} is running (${elapsed}s)"
-            return 0
-        fi
+    if [ "${running}" = "true" ]; then
+        msg info "Container ${FLOWER_CONTAINER} is running ($((SECONDS - _start))s)"
+        return 0
+    fi
+
+    msg error "Container ${FLOWER_CONTAINER} not running after ${timeout}s"
+    docker logs "${FLOWER_CONTAINER}" 2>&1 | tail -20 || true
+    return 1
+}
+
+# backoff_until DEADLINE CMD...: run CMD until it succeeds, sleeping 1, 2, 4,
+# then 5 s between tries; gives up (returns 1) once DEADLINE seconds have
+# passed. Replaces the fixed-interval retry loops: a peer that is already up
+# is seen within a second instead of after a full interval.
+backoff_until()
+{
+    local _deadline=$((SECONDS + $1)) _delay=1
+    shift
 
-        sleep 1
-        elapsed=$((elapsed + 1))
-        if [ "${elapsed}" -ge "${timeout}" ]; then
-            msg error "Container ${FLOWER_CONTAINER} not running after ${timeout}s"
-            docker logs "${FLOWER_CONTAINER}" 2>&1 | tail -20 || true
+    until "$@"; do
+        if [ $((SECONDS + _delay)) -gt "${_deadline}" ]; then
             return 1
         fi
+        sleep "${_delay}"
+        _delay=$((_delay * 2 > 5 ? 5 : _delay * 2))
     done
 }
 
-# publish_to_onegate: PUT a key-value pair to the VM's USER_TEMPLATE via OneGate.
-# Non-fatal on failure -- SuperNode operates without OneGate publication.
-publish_to_onegate()
+# boot_timing_reset: start a fresh boot-timing record (configure stage).
+boot_timing_reset()
+{
+    mkdir -p "${FLOWER_CONFIG_DIR}"
+    rm -rf "${FLOWER_BOOT_DIR}"
+    mkdir -p -m 0700 "${FLOWER_BOOT_DIR}"
+    : > "${FLOWER_BOOT_TIMING}"
+}
+
+# boot_phase NAME CMD...: run CMD in this shell (it may set globals or exit)
+# and append "NAME:seconds" to the boot-timing record. Prints nothing of its
+# own, so it can wrap a function whose stdout is its result. Phases run in
+# the background append to the same file; one short line per write keeps
+# the appends whole.
+boot_phase()
+{
+    local _name="$1" _start="${EPOCHREALTIME}" _rc=0
+    shift
+
+    "$@" || _rc=$?
+    awk -v n="${_name}" -v a="${_start}" -v b="${EPOCHREALTIME}" \
+        'BEGIN { printf "%s:%.1f\n", n, b - a }' >> "${FLOWER_BOOT_TIMING}"
+    return "${_rc}"
+}
+
+# boot_timing_summary: the boot-timing record as one OneGate value,
+# "phase:s,phase:s,...,ready:s", where ready is the time since the kernel
+# booted (contextualization and everything before configure included).
+boot_timing_summary()
 {
-    local key="$1"
-    local value="$2"
+    local _phases
+    _phases=$(paste -sd, "${FLOWER_BOOT_TIMING}" 2>/dev/null)
+    printf '%s%sready:%.0f\n' "${_phases}" "${_phases:+,}" "$(cut -d' ' -f1 /proc/uptime)"
+}
 
+# publish_to_onegate KEY VALUE [KEY VALUE ...]: PUT key-value pairs to the
+# VM's USER_TEMPLATE via OneGate, all in one request (OneGate takes one
+# KEY=VALUE per line). Non-fatal on failure -- SuperNode operates without
+# OneGate publication.
+publish_to_onegate()
+{
     local onegate_token="${TOKENTXT:-}"
+    local data=""
 
     if [ -z "${ONEGATE_ENDPOINT:-}" ] || [ -z "${onegate_token}" ]; then
         return 0
     fi
 
-    if ! curl -s -X PUT "${ONEGATE_ENDPOINT}/vm" \
+    while [ "$#" -ge 2 ]; do
+        data+="${data:+$'\n'}$1=$2"
+        shift 2
+    done
+
+    if ! curl -sf -X PUT "${ONEGATE_ENDPOINT}/vm" \
         -H "X-ONEGATE-TOKEN: ${onegate_token}" \
         -H "X-ONEGATE-VMID: ${VMID:-}" \
-        -d "${key}=${value}" 2>/dev/null; then
-        msg warning "Failed to publish ${key}=${value} to OneGate"
+        --data-binary "${data}" >/dev/null 2>&1; then
+        msg warning "Failed to publish ${data//$'\n'/, } to OneGate"
     fi
 }
 
@@ -938,6 +1553,11 @@ harden_firewall()
         ufw default deny incoming  >/dev/null 2>&1 || true
         ufw default allow outgoing >/dev/null 2>&1 || true
         ufw allow 22/tcp comment 'SSH' >/dev/null 2>&1 || true
+        # The metrics agent is a host process, so UFW (not DOCKER-USER) guards it
+        if [ "${ONEAPP_FL_METRICS_AGENT}" = "YES" ]; then
+            ufw allow from "${FL_PRIVATE_CIDR}" to any port "${FLOWER_AGENT_PORT}" proto tcp \
+                comment 'Flower metrics agent' >/dev/null 2>&1 || true
+        fi
         ufw logging low        >/dev/null 2>&1 || true
         ufw --force enable     >/dev/null 2>&1 || true
     fi
@@ -973,3 +1593,244 @@ harden_firewall()
 
     msg info "Firewall hardened (FL ports limited to ${FL_PRIVATE_CIDR}, SMTP egress blocked)"
 }
+
+# setup_fl_accounting: byte counters for Fleet API traffic. The container's
+# connection to the SuperLink is forwarded traffic, so it traverses
+# DOCKER-USER; the FLOWER-ACCT rules have no target and only count before
+# falling through. Rebuilt on every boot like the rest of the firewall.
+setup_fl_accounting()
+{
+    command -v iptables >/dev/null 2>&1 || return 0
+    iptables -L DOCKER-USER >/dev/null 2>&1 || iptables -N DOCKER-USER 2>/dev/null || true
+    iptables -N FLOWER-ACCT 2>/dev/null || true
+    iptables -C FLOWER-ACCT -p tcp --dport 9092 2>/dev/null \
+        || iptables -A FLOWER-ACCT -p tcp --dport 9092 2>/dev/null || true
+    iptables -C FLOWER-ACCT -p tcp --sport 9092 2>/dev/null \
+        || iptables -A FLOWER-ACCT -p tcp --sport 9092 2>/dev/null || true
+    iptables -C DOCKER-USER -j FLOWER-ACCT 2>/dev/null \
+        || iptables -I DOCKER-USER 1 -j FLOWER-ACCT 2>/dev/null || true
+}
+
+# install_metrics_agent: write the metrics agent and its systemd unit. A
+# stdlib-only Python HTTP server bound to the private NIC; setting
+# ONEAPP_FL_METRICS_AGENT=NO stops and removes it on the next boot.
+install_metrics_agent()
+{
+    if [ "${ONEAPP_FL_METRICS_AGENT}" != "YES" ]; then
+        systemctl disable --now flower-metrics-agent.service >/dev/null 2>&1 || true
+        rm -f "${FLOWER_AGENT_UNIT}"
+        return 0
+    fi
+
+    local _vm_ip
+    _vm_ip=$(get_primary_ip)
+    [ -z "${_vm_ip}" ] && _vm_ip="127.0.0.1"
+
+    mkdir -p "${FLOWER_SCRIPTS_DIR}"
+    cat > "${FLOWER_SCRIPTS_DIR}/metrics-agent.py" <<'AGENT'
+#!/usr/bin/env python3
+"""Flower node metrics agent: container state and resource usage as JSON.
+
+GET /status on <bind>:<port>. Standard library only. Runs as root under
+systemd (flower-metrics-agent.service): it reads the Docker socket, the
+container's cgroup and the FLOWER-ACCT iptables byte counters.
+
+Usage: metrics-agent.py <role> <container> <bind-address> <port>
+"""
+
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROLE, CONTAINER, BIND, PORT = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+FL_PORT = "9092"
+ACCT_CHAIN = "FLOWER-ACCT"
+SAMPLE_INTERVAL = 5.0
+
+# CPU percent of the container over the last sampling interval, kept by the
+# sampler thread so concurrent scrapers all see the same, stable figure
+_cpu = {"id": "", "usage_us": 0, "at": 0.0, "percent": None}
+
+
+class _DockerConnection(http.client.HTTPConnection):
+    """HTTP over the Docker Engine unix socket."""
+
+    def __init__(self):
+        super().__init__("localhost", timeout=2)
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(2)
+        self.sock.connect("/var/run/docker.sock")
+
+
+def _inspect():
+    conn = _DockerConnection()
+    try:
+        conn.request("GET", f"/containers/{CONTAINER}/json")
+        resp = conn.getresponse()
+        body = resp.read()
+        return json.loads(body) if resp.status == 200 else None
+    except (OSError, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _mb(value):
+    return round(int(value) / 2**20, 1) if value.isdigit() else None
+
+
+def _cgroup_dir(container_id):
+    # cgroup v2 with the systemd driver (Ubuntu 24.04), then the cgroupfs layout
+    for path in (f"/sys/fs/cgroup/system.slice/docker-{container_id}.scope",
+                 f"/sys/fs/cgroup/docker/{container_id}"):
+        if os.path.isdir(path):
+            return path
+    return ""
+
+
+def _cpu_usage_us(cgroup):
+    for line in _read(f"{cgroup}/cpu.stat").splitlines():
+        key, _, value = line.partition(" ")
+        if key == "usage_usec":
+            return int(value)
+    return 0
+
+
+def _sampler():
+    while True:
+        info = _inspect()
+        cid = info["Id"] if info and info["State"].get("Running") else ""
+        cgroup = _cgroup_dir(cid) if cid else ""
+        now = time.monotonic()
+        if cgroup:
+            usage = _cpu_usage_us(cgroup)
+            if cid == _cpu["id"] and now > _cpu["at"]:
+                _cpu["percent"] = round((usage - _cpu["usage_us"]) / 1e4 / (now - _cpu["at"]), 1)
+            else:
+                _cpu["percent"] = None
+            _cpu.update(id=cid, usage_us=usage, at=now)
+        else:
+            _cpu.update(id="", percent=None)
+        time.sleep(SAMPLE_INTERVAL)
+
+
+def _fl_bytes():
+    """Bytes to and from the Fleet API port, from the FLOWER-ACCT counters."""
+    try:
+        out = subprocess.run(
+            ["iptables", "-w", "-L", ACCT_CHAIN, "-n", "-v", "-x"],
+            capture_output=True, text=True, timeout=2,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None, None
+    to_port = from_port = None
+    for line in out.splitlines()[2:]:
+        fields = line.split()
+        if f"dpt:{FL_PORT}" in line:
+            to_port = int(fields[1])
+        elif f"spt:{FL_PORT}" in line:
+            from_port = int(fields[1])
+    # A SuperNode connects out to 9092; the SuperLink serves it
+    return (to_port, from_port) if ROLE == "supernode" else (from_port, to_port)
+
+
+def _host():
+    meminfo = {}
+    for line in _read("/proc/meminfo").splitlines():
+        key, _, value = line.partition(":")
+        meminfo[key] = int(value.split()[0]) if value.split() else 0
+    load = _read("/proc/loadavg").split()
+    return {
+        "cpus": os.cpu_count(),
+        "load1": float(load[0]) if load else None,
+        "mem_total_mb": round(meminfo.get("MemTotal", 0) / 1024, 1),
+        "mem_available_mb": round(meminfo.get("MemAvailable", 0) / 1024, 1),
+    }
+
+
+def status():
+    info = _inspect()
+    container = {"name": CONTAINER, "status": "not found"}
+    resources = {}
+    if info:
+        state = info.get("State", {})
+        container.update(
+            status=state.get("Status", "unknown"),
+            started_at=state.get("StartedAt", ""),
+            image=info.get("Config", {}).get("Image", ""),
+        )
+        cgroup = _cgroup_dir(info["Id"]) if state.get("Running") else ""
+        if cgroup:
+            resources = {
+                "cpu_usage_s": round(_cpu_usage_us(cgroup) / 1e6, 3),
+                "cpu_percent": _cpu["percent"] if _cpu["id"] == info["Id"] else None,
+                "mem_used_mb": _mb(_read(f"{cgroup}/memory.current")),
+                "mem_limit_mb": _mb(_read(f"{cgroup}/memory.max")),
+                "mem_peak_mb": _mb(_read(f"{cgroup}/memory.peak")),
+            }
+    tx, rx = _fl_bytes()
+    return {
+        "role": ROLE,
+        "timestamp": time.time(),
+        "container": container,
+        "resources": resources,
+        "network": {"fl_port": int(FL_PORT), "tx_bytes": tx, "rx_bytes": rx},
+        "host": _host(),
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        body = json.dumps(status()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    threading.Thread(target=_sampler, daemon=True).start()
+    ThreadingHTTPServer((BIND, PORT), Handler).serve_forever()
+AGENT
+    chmod 0755 "${FLOWER_SCRIPTS_DIR}/metrics-agent.py"
+
+    cat > "${FLOWER_AGENT_UNIT}" <<EOF
+[Unit]
+Description=Flower node metrics agent
+After=docker.service
+
+[Service]
+Type=simple
+Restart=always
+RestartSec=5
+ExecStart=/usr/bin/python3 ${FLOWER_SCRIPTS_DIR}/metrics-agent.py supernode ${FLOWER_CONTAINER} ${_vm_ip} ${FLOWER_AGENT_PORT}
+
+[Install]
+WantedBy=multi-user.target
+EOF
+    systemctl daemon-reload
+    msg info "Metrics agent installed (${_vm_ip}:${FLOWER_AGENT_PORT})"
+}
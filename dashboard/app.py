@@ -16,17 +16,24 @@ import tempfile
 import threading
 import time
 import tomllib
-from collections import deque
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field as PydField
 
+import planner
+from inventory import Inventory
+from logstream import SuperLinkLog, log_time
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, FederationMetrics
+from runs import Run, RunScheduler, format_run_config, run_config
+
 app = FastAPI(title="Flower FL Dashboard")
 app.mount("/static", StaticFiles(directory=Path(__file__).parent / "static"), name="static")
 
@@ -37,29 +44,41 @@ SSH_USER = os.environ.get("FL_SSH_USER", "root")
 SSH_OPTS = "-o StrictHostKeyChecking=no -o ConnectTimeout=5 -o BatchMode=yes"
 SUPERLINK_CONTAINER = "flower-superlink"
 SUPERNODE_CONTAINER = "flower-supernode"
+# Warm ClientApp worker next to the SuperNode (appliance ONEAPP_FL_ISOLATION=process)
+CLIENTAPP_CONTAINER = "flower-clientapp"
+# Appliance script that recreates both containers on another image with the
+# docker create flags the appliance itself used (appliance-supernode.sh)
+RECREATE_SCRIPT = "/opt/flower/scripts/recreate-containers.sh"
+# Node metrics agent on every appliance VM (ONEAPP_FL_METRICS_AGENT); nodes
+# without it fall back to SSH + docker inspect
+AGENT_PORT = int(os.environ.get("FL_AGENT_PORT", "9101"))
+AGENT_TIMEOUT = float(os.environ.get("FL_AGENT_TIMEOUT", "2"))
+# Copying a framework image between SuperNodes (docker save | docker load)
+IMAGE_COPY_TIMEOUT = int(os.environ.get("FL_IMAGE_COPY_TIMEOUT", "900"))
 
 DEMO_BASE = Path(__file__).parent.parent / "demo"
-FLWR_BIN = DEMO_BASE / ".venv" / "bin" / "flwr"
+FLWR_BIN = Path(os.environ.get("FL_FLWR_BIN", DEMO_BASE / ".venv" / "bin" / "flwr"))
 SUPERNODE_IMAGE_TAG = "1.31.0"
 
+# Flower VMs from OpenNebula, shared by every endpoint (FL_INVENTORY_TTL etc.)
+_inventory = Inventory()
+
+# Prometheus metrics, folded in as cluster snapshots are taken. A scrape
+# takes a fresh snapshot only when the last one is older than this.
+METRICS_MAX_AGE = float(os.environ.get("FL_METRICS_MAX_AGE", "15"))
+_metrics = FederationMetrics()
+_last_snapshot: float = 0.0
+
 
 # ---------------------------------------------------------------------------
 # Training control state
 # ---------------------------------------------------------------------------
-@dataclass
-class ActiveTraining:
-    process: subprocess.Popen
-    framework: str
-    config: dict
-    started_at: float
-    output_lines: deque  # maxlen=500
-
-
-_active_training: Optional[ActiveTraining] = None
-_last_completed: Optional[dict] = None
+# Runs themselves live in the RunScheduler (_scheduler, below _launch_run)
+# Seconds a run's log stream may sit silent before it sends a keepalive comment
+SSE_KEEPALIVE_S = 15.0
 _training_reset: bool = False
-_monitoring_run: bool = False  # True after flwr run submits job; training runs on SuperLink
-_superlink_ip_cache: str = ""
+# framework -> background image pre-load job, see prewarm_framework()
+_prewarm_jobs: dict[str, dict] = {}
 
 
 class TrainingRequest(BaseModel):
@@ -73,13 +92,8 @@ class TrainingRequest(BaseModel):
     min_fit_clients: int = PydField(2, ge=1)
     min_available_clients: int = PydField(2, ge=1)
     extra_config: dict = PydField(default_factory=dict)
-
-
-def _reader_thread(proc, lines_deque):
-    """Read subprocess stdout line by line into a deque."""
-    for line in iter(proc.stdout.readline, ''):
-        lines_deque.append(line.rstrip('\n'))
-    proc.stdout.close()
+    # Queue order: higher first, then submission order
+    priority: int = PydField(0, ge=0, le=10)
 
 
 # ---------------------------------------------------------------------------
@@ -99,6 +113,16 @@ class NodeInfo:
     flower_version: str = ""
     superlink_address: str = ""
     framework: str = ""
+    # Live container usage, only when the node's metrics agent answered
+    cpu_percent: Optional[float] = None
+    mem_used_mb: Optional[float] = None
+    mem_limit_mb: Optional[float] = None
+    net_tx_bytes: Optional[int] = None
+    net_rx_bytes: Optional[int] = None
+    metrics_source: str = ""  # "agent", "ssh" or "" (not collected)
+    # Seconds per boot phase, as the SuperNode published them (FL_BOOT_TIMING);
+    # "ready" is the time from VM boot to a running container
+    boot_timing: dict[str, float] = field(default_factory=dict)
 
 
 @dataclass
@@ -110,6 +134,12 @@ class RoundMetrics:
     fit_failures: int = 0
     eval_clients: int = 0
     eval_failures: int = 0
+    # Mean client seconds per phase, e.g. {"fit": {"train": 8.1, ...}, "evaluate": {...}}
+    phase_timings: dict = field(default_factory=dict)
+    # From "[ROUND N]" to the round's last aggregation, once the round is over
+    duration_s: Optional[float] = None
+    # Share of client time spent waiting for the slowest client in fit
+    idle_frac: Optional[float] = None
 
 
 @dataclass
@@ -150,13 +180,18 @@ def _run(cmd: str, timeout: int = 10) -> tuple[int, str]:
 
 def _ssh(ip: str, cmd: str, timeout: int = 8) -> tuple[int, str]:
     """SSH to a VM and run a command."""
-    return _run(f"ssh {SSH_OPTS} {SSH_USER}@{ip} {repr(cmd)}", timeout=timeout)
+    start = time.monotonic()
+    rc, out = _run(f"ssh {SSH_OPTS} {SSH_USER}@{ip} {repr(cmd)}", timeout=timeout)
+    _metrics.observe_probe("ssh", rc == 0, time.monotonic() - start)
+    return rc, out
 
 
 # The SuperLink binds its Control API (9093) to localhost for safety, so the
 # dashboard reaches it through an SSH port-forward on this host.
 _CONTROL_PORT = 9093
 _control_tunnel_sock = ""
+# Concurrent runs each ensure the tunnel; only one may (re)create it
+_control_tunnel_lock = threading.Lock()
 
 
 def _port_open(host: str, port: int, timeout: float = 2.0) -> bool:
@@ -187,195 +222,336 @@ def _ensure_control_tunnel(superlink_ip: str) -> bool:
     global _control_tunnel_sock
     if not superlink_ip:
         return False
-    if _port_open("127.0.0.1", _CONTROL_PORT):
-        return True
-    sock = f"/tmp/flwr-dashboard-tunnel-{superlink_ip}.sock"
-    # Port is closed, so any socket file here is stale (the master died). Clear it
-    # so `ssh -M` can recreate the tunnel.
-    _run(f"rm -f {sock}", timeout=5)
-    _run(
-        f"ssh {SSH_OPTS} -f -N -M -S {sock} "
-        f"-L 127.0.0.1:{_CONTROL_PORT}:127.0.0.1:{_CONTROL_PORT} "
-        f"{SSH_USER}@{superlink_ip}",
-        timeout=15,
-    )
-    _control_tunnel_sock = sock
-    for _ in range(5):
+    with _control_tunnel_lock:
         if _port_open("127.0.0.1", _CONTROL_PORT):
             return True
-        time.sleep(1)
-    return False
+        sock = f"/tmp/flwr-dashboard-tunnel-{superlink_ip}.sock"
+        # Port is closed, so any socket file here is stale (the master died). Clear it
+        # so `ssh -M` can recreate the tunnel.
+        _run(f"rm -f {sock}", timeout=5)
+        _run(
+            f"ssh {SSH_OPTS} -f -N -M -S {sock} "
+            f"-L 127.0.0.1:{_CONTROL_PORT}:127.0.0.1:{_CONTROL_PORT} "
+            f"{SSH_USER}@{superlink_ip}",
+            timeout=15,
+        )
+        _control_tunnel_sock = sock
+        for _ in range(5):
+            if _port_open("127.0.0.1", _CONTROL_PORT):
+                return True
+            time.sleep(1)
+        return False
+
+
+# One log follower per SuperLink (see logstream.py), started on first use
+_superlink_logs: dict[str, SuperLinkLog] = {}
+_superlink_logs_lock = threading.Lock()
+
+
+def _superlink_log(superlink_ip: str, wait: float = 10.0) -> SuperLinkLog:
+    """The SuperLink's log follower; waits up to `wait` s for its backlog on first use."""
+    with _superlink_logs_lock:
+        follower = _superlink_logs.get(superlink_ip)
+        if follower is None:
+            # The SuperLink moved (redeployed): drop the old follower
+            for old in _superlink_logs.values():
+                old.stop()
+            _superlink_logs.clear()
+            # Keepalives so a silently dropped connection ends the stream and reconnects
+            remote = ["ssh", *SSH_OPTS.split(), "-o", "ServerAliveInterval=15",
+                      f"{SSH_USER}@{superlink_ip}"]
+            follower = _superlink_logs[superlink_ip] = SuperLinkLog(remote, SUPERLINK_CONTAINER)
+    follower.ready.wait(wait)
+    return follower
 
 
 # ---------------------------------------------------------------------------
 # SuperNode framework switching
 # ---------------------------------------------------------------------------
+def _probe_supernode(node: NodeInfo, image: str) -> dict:
+    """One SSH round trip: is `image` present, does the node trust the SuperLink CA,
+    and does it run a warm ClientApp worker?"""
+    rc, out = _ssh(
+        node.ip,
+        f"docker image inspect {image} >/dev/null 2>&1 && echo image=1 || echo image=0; "
+        f"test -f /opt/flower/certs/ca.crt && echo ca=1 || echo ca=0; "
+        f"docker container inspect {CLIENTAPP_CONTAINER} >/dev/null 2>&1 && echo warm=1 || echo warm=0",
+        timeout=15,
+    )
+    return {"reachable": rc == 0, "has_image": "image=1" in out, "has_ca": "ca=1" in out,
+            "warm": "warm=1" in out}
+
+
+def _copy_image(src_ip: str, dst_ip: str, image: str) -> tuple[bool, str, float]:
+    """Stream `image` from one node to another with docker save | docker load.
+
+    The stream passes through this host (the VMs need no SSH trust between
+    them); gzip -1 keeps the CPU cost low while roughly halving the bytes.
+    """
+    start = time.monotonic()
+    rc, out = _run(
+        f"ssh {SSH_OPTS} {SSH_USER}@{src_ip} 'docker save {image} | gzip -1' | "
+        f"ssh {SSH_OPTS} {SSH_USER}@{dst_ip} 'gunzip | docker load'",
+        timeout=IMAGE_COPY_TIMEOUT,
+    )
+    ok = rc == 0 and "Loaded image" in out
+    return ok, "ok" if ok else out[-300:], round(time.monotonic() - start, 1)
+
+
+def _distribute_image(image: str, sources: list[str], targets: list[str]) -> dict[str, dict]:
+    """Load `image` onto every target IP, copying from nodes that have it.
+
+    Copies run in waves, one per source at a time, and every node that
+    receives the image becomes a source for the next wave, so N targets take
+    about log2(N) copy times rather than N. Returns {ip: {success, message,
+    seconds}}.
+    """
+    results: dict[str, dict] = {}
+    sources = list(sources)
+    pending = list(targets)
+    with ThreadPoolExecutor(max_workers=max(1, len(targets))) as pool:
+        while pending and sources:
+            wave = list(zip(sources, pending))
+            pending = pending[len(wave):]
+            futures = {dst: pool.submit(_copy_image, src, dst, image) for src, dst in wave}
+            for dst, future in futures.items():
+                ok, message, seconds = future.result()
+                results[dst] = {"success": ok, "message": message, "seconds": seconds}
+                if ok:
+                    sources.append(dst)
+    for dst in pending:
+        results[dst] = {
+            "success": False, "seconds": 0.0,
+            "message": f"image {image} is on no node; redeploy a SuperNode with this framework to seed it",
+        }
+    return results
+
+
+def prewarm_framework_image(nodes: list[NodeInfo], framework: str) -> dict:
+    """Make sure every running SuperNode has `framework`'s image, without switching.
+
+    Returns {"results": {ip: ...}, "seconds": wall time}.
+    """
+    image = f"flower-supernode-{framework}:{SUPERNODE_IMAGE_TAG}"
+    start = time.monotonic()
+    targets = [n for n in nodes if n.role == "supernode" and n.status == "running" and n.ip]
+    with ThreadPoolExecutor(max_workers=min(16, len(targets) or 1)) as pool:
+        probes = dict(zip((n.ip for n in targets), pool.map(lambda n: _probe_supernode(n, image), targets)))
+    have = [ip for ip, p in probes.items() if p["has_image"]]
+    missing = [ip for ip, p in probes.items() if p["reachable"] and not p["has_image"]]
+    results = _distribute_image(image, have, missing)
+    return {"results": results, "seconds": round(time.monotonic() - start, 1)}
+
+
 def _switch_supernode_framework(
     nodes: list[NodeInfo], framework: str, superlink_ip: str,
-) -> list[dict]:
+) -> tuple[list[dict], dict]:
     """Stop/rm/run SuperNode containers with the requested framework image.
 
-    Only switches nodes whose current image doesn't already match.
-    Returns a per-node list of {node, ip, switched, success, message}.
+    Only switches nodes whose current image doesn't already match. All nodes
+    are probed at once, nodes missing the image get it streamed from a node
+    that has it (see _distribute_image), then every swap runs in parallel.
+
+    Returns a per-node list of {node, ip, switched, success, message,
+    seconds} and the phase timings, whose total is the critical path: the
+    slowest node through probe, image copy and swap.
     """
     image = f"flower-supernode-{framework}:{SUPERNODE_IMAGE_TAG}"
     results = []
+    timing = {"probe_s": 0.0, "image_s": 0.0, "swap_s": 0.0, "total_s": 0.0}
+    start = time.monotonic()
 
-    for node in nodes:
-        if node.role != "supernode" or node.status != "running" or not node.ip:
-            continue
-
-        # Check current image
+    workers = [n for n in nodes if n.role == "supernode" and n.status == "running" and n.ip]
+    to_switch = []
+    for node in workers:
         if node.framework == framework:
             results.append({
                 "node": node.name, "ip": node.ip,
-                "switched": False, "success": True, "message": "already correct",
+                "switched": False, "success": True, "message": "already correct", "seconds": 0.0,
             })
-            continue
+        else:
+            to_switch.append(node)
+    if not to_switch:
+        return results, timing
 
-        # The appliance only builds the framework image selected at deploy time.
-        # If the target image is absent, switching cannot work here — surface a
-        # clear message instead of a cryptic 'docker run' failure.
-        rc_img, _ = _ssh(node.ip, f"docker image inspect {image} >/dev/null 2>&1", timeout=15)
-        if rc_img != 0:
-            results.append({
-                "node": node.name, "ip": node.ip,
-                "switched": False, "success": False,
-                "message": f"image {image} not present; redeploy the cluster with framework '{framework}'",
-            })
-            continue
+    pool = ThreadPoolExecutor(max_workers=min(16, len(workers)))
+    try:
+        # 1. Probe every SuperNode (also the ones already switched: any node
+        #    with the image can seed the others)
+        probes = dict(zip((n.ip for n in workers), pool.map(lambda n: _probe_supernode(n, image), workers)))
+        timing["probe_s"] = round(time.monotonic() - start, 1)
+
+        # 2. The appliance only builds the framework image selected at deploy
+        #    time; copy it to the nodes that lack it
+        copies = {}
+        missing = [n.ip for n in to_switch if probes[n.ip]["reachable"] and not probes[n.ip]["has_image"]]
+        if missing:
+            have = [ip for ip, p in probes.items() if p["has_image"]]
+            copies = _distribute_image(image, have, missing)
+        timing["image_s"] = round(time.monotonic() - start - timing["probe_s"], 1)
+
+        # 3. Swap the containers, all at once
+        def swap(node: NodeInfo) -> dict:
+            probe = probes[node.ip]
+            copy = copies.get(node.ip)
+            result = {"node": node.name, "ip": node.ip, "switched": False, "success": False}
+            if not probe["reachable"]:
+                return {**result, "message": "unreachable over SSH", "seconds": 0.0}
+            if copy is not None and not copy["success"]:
+                return {**result, "message": f"image {image} not present: {copy['message']}", "seconds": copy["seconds"]}
+
+            # Match the appliance's TLS posture: connect securely when the SuperNode
+            # has the SuperLink CA, otherwise fall back to insecure.
+            if probe["has_ca"]:
+                tls_mount = "-v /opt/flower/certs/ca.crt:/app/ca.crt:ro "
+                conn_args = "--root-certificates /app/ca.crt"
+            else:
+                tls_mount = ""
+                conn_args = "--insecure"
 
-        # Match the appliance's TLS posture: connect securely when the SuperNode
-        # has the SuperLink CA, otherwise fall back to insecure.
-        rc_tls, _ = _ssh(node.ip, "test -f /opt/flower/certs/ca.crt", timeout=8)
-        if rc_tls == 0:
-            tls_mount = "-v /opt/flower/certs/ca.crt:/app/ca.crt:ro "
-            conn_args = "--root-certificates /app/ca.crt"
-        else:
-            tls_mount = ""
-            conn_args = "--insecure"
-
-        sl_addr = superlink_ip or node.superlink_address
-        docker_run = (
-            f"docker stop {SUPERNODE_CONTAINER} 2>/dev/null; "
-            f"docker rm {SUPERNODE_CONTAINER} 2>/dev/null; "
-            f"docker run -d --name {SUPERNODE_CONTAINER} --restart unless-stopped "
-            f"-v /opt/flower/data:/app/data:ro {tls_mount}"
-            f"{image} "
-            f"{conn_args} --superlink {sl_addr}:9092 "
-            f"--isolation subprocess "
-            f"--max-retries 0 --max-wait-time 0"
-        )
-        rc, out = _ssh(node.ip, docker_run, timeout=30)
-        results.append({
-            "node": node.name, "ip": node.ip,
-            "switched": True, "success": rc == 0,
-            "message": "ok" if rc == 0 else out,
-        })
+            # Keep a warm ClientApp worker: it runs the same image, in the
+            # SuperNode's network namespace, so it is recreated with it
+            if probe["warm"]:
+                isolation = "--isolation process --clientappio-api-address 127.0.0.1:9094"
+            else:
+                isolation = "--isolation subprocess"
+
+            # Nodes with the appliance's recreate script replay its own docker
+            # create commands. Older nodes get the same flags from here:
+            # hardened, no Docker restart policy (systemd's units own the
+            # containers and restart them), the writable /app/cache mount
+            # (compiled artifacts), started through those units.
+            sl_addr = superlink_ip or node.superlink_address
+            hardening = "--cap-drop ALL --security-opt no-new-privileges"
+            fallback = (
+                f"systemctl stop flower-clientapp.service flower-supernode.service 2>/dev/null; "
+                f"docker rm -f {CLIENTAPP_CONTAINER} {SUPERNODE_CONTAINER} 2>/dev/null; "
+                f"mkdir -p /opt/flower/cache && chown 49999:49999 /opt/flower/cache && "
+                f"docker create --name {SUPERNODE_CONTAINER} {hardening} "
+                f"-v /opt/flower/data:/app/data:ro -v /opt/flower/cache:/app/cache {tls_mount}"
+                f"--env-file /opt/flower/config/supernode.env "
+                f"{image} "
+                f"{conn_args} --superlink {sl_addr}:9092 "
+                f"{isolation} "
+                f"--max-retries 0 --max-wait-time 0 >/dev/null "
+                f"&& systemctl start flower-supernode.service"
+            )
+            if probe["warm"]:
+                fallback += (
+                    f" && docker create --name {CLIENTAPP_CONTAINER} {hardening} "
+                    f"--network container:{SUPERNODE_CONTAINER} "
+                    f"-v /opt/flower/data:/app/data:ro -v /opt/flower/cache:/app/cache "
+                    f"-v /opt/flower/scripts/warm-clientapp.py:/app/warm-clientapp.py:ro "
+                    f"--env-file /opt/flower/config/supernode.env "
+                    f"--entrypoint python {image} /app/warm-clientapp.py "
+                    f"--insecure --clientappio-api-address 127.0.0.1:9094 >/dev/null "
+                    f"&& systemctl restart flower-clientapp.service"
+                )
+            docker_run = (
+                f"if [ -x {RECREATE_SCRIPT} ] && [ -f /opt/flower/config/containers.state ]; "
+                f"then {RECREATE_SCRIPT} {image}; else {fallback}; fi"
+            )
+            swap_start = time.monotonic()
+            rc, out = _ssh(node.ip, docker_run, timeout=30)
+            seconds = time.monotonic() - swap_start + (copy["seconds"] if copy else 0.0)
+            return {**result, "switched": True, "success": rc == 0,
+                    "message": "ok" if rc == 0 else out, "seconds": round(seconds, 1)}
+
+        swap_start = time.monotonic()
+        results.extend(pool.map(swap, to_switch))
+        timing["swap_s"] = round(time.monotonic() - swap_start, 1)
+    finally:
+        pool.shutdown()
 
-    return results
+    timing["total_s"] = round(time.monotonic() - start, 1)
+    return results, timing
 
 
 # ---------------------------------------------------------------------------
 # Data collection
 # ---------------------------------------------------------------------------
 def collect_nodes() -> list[NodeInfo]:
-    """Get all Flower VMs from OpenNebula."""
-    nodes = []
-    rc, out = _run("onevm list -j 2>/dev/null")
-    if rc != 0:
-        return nodes
+    """Get all Flower VMs from OpenNebula (scoped and cached, see inventory.py)."""
+    return [NodeInfo(**fields) for fields in _inventory.get()]
+
 
+def _apply_container(node: NodeInfo, status: str, started_at: str, image: str) -> None:
+    """Fill the container fields of `node` from Docker's state and image."""
+    node.container_status = status
+    # Calculate uptime
     try:
-        data = json.loads(out)
-    except json.JSONDecodeError:
-        return nodes
-
-    vm_pool = data.get("VM_POOL", {})
-    if not vm_pool:
-        return nodes
-
-    vms = vm_pool.get("VM", [])
-    if isinstance(vms, dict):
-        vms = [vms]
-
-    for vm in vms:
-        name = vm.get("NAME", "")
-        name_lower = name.lower()
-        if not any(kw in name_lower for kw in ("flower", "superlink", "supernode")):
-            continue
+        started = datetime.fromisoformat(started_at.replace("Z", "+00:00"))
+        delta = datetime.now(timezone.utc) - started
+        hours, remainder = divmod(int(delta.total_seconds()), 3600)
+        minutes, _ = divmod(remainder, 60)
+        node.container_uptime = f"{hours}h {minutes}m"
+    except (ValueError, TypeError):
+        node.container_uptime = "unknown"
+    node.flower_version = image.split(":")[-1] if ":" in image else image
+    # Detect framework from Docker image name
+    image_name = image.lower()
+    for fw in ("pytorch", "tensorflow", "sklearn"):
+        if fw in image_name:
+            node.framework = fw
+            break
 
-        # Determine role
-        role = "superlink" if "superlink" in name.lower() else "supernode"
-
-        # Get IP
-        template = vm.get("TEMPLATE", {})
-        nic = template.get("NIC", {})
-        if isinstance(nic, list):
-            nic = nic[0] if nic else {}
-        ip = nic.get("IP", "")
-
-        # Get context for SuperLink address
-        context = template.get("CONTEXT", {})
-        superlink_addr = context.get("ONEAPP_FL_SUPERLINK_ADDRESS", "")
-
-        # State mapping
-        lcm_state = int(vm.get("LCM_STATE", 0))
-        state_map = {3: "running", 5: "stopped", 36: "unknown"}
-        status = state_map.get(lcm_state, "other")
-
-        cpu = int(template.get("VCPU", template.get("CPU", 0)))
-        memory = int(template.get("MEMORY", 0))
-
-        node = NodeInfo(
-            vm_id=int(vm.get("ID", 0)),
-            name=name,
-            role=role,
-            ip=ip,
-            status=status,
-            cpu=cpu,
-            memory_mb=memory,
-            superlink_address=superlink_addr,
-        )
-        nodes.append(node)
 
-    return nodes
+def _agent_status(ip: str) -> Optional[dict]:
+    """GET /status from the node's metrics agent, or None if it is not there."""
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(f"http://{ip}:{AGENT_PORT}/status", timeout=AGENT_TIMEOUT) as resp:
+            status = json.loads(resp.read())
+    except (OSError, ValueError):
+        _metrics.observe_probe("agent", False, time.monotonic() - start)
+        return None
+    _metrics.observe_probe("agent", True, time.monotonic() - start)
+    return status
 
 
 def collect_container_info(node: NodeInfo) -> NodeInfo:
-    """Enrich a node with Docker container info via SSH."""
+    """Enrich a node with Docker container info from its metrics agent, else via SSH."""
     if not node.ip or node.status != "running":
         return node
 
+    status = _agent_status(node.ip)
+    if status is not None:
+        container = status.get("container", {})
+        if container.get("status", "not found") == "not found":
+            node.container_status = "not found"
+        else:
+            _apply_container(node, container.get("status", "unknown"),
+                             container.get("started_at", ""), container.get("image", ""))
+        resources = status.get("resources", {})
+        network = status.get("network", {})
+        node.cpu_percent = resources.get("cpu_percent")
+        node.mem_used_mb = resources.get("mem_used_mb")
+        node.mem_limit_mb = resources.get("mem_limit_mb")
+        node.net_tx_bytes = network.get("tx_bytes")
+        node.net_rx_bytes = network.get("rx_bytes")
+        node.metrics_source = "agent"
+        return node
+
     container = SUPERLINK_CONTAINER if node.role == "superlink" else SUPERNODE_CONTAINER
 
     rc, out = _ssh(node.ip, f"docker inspect {container} --format '{{{{.State.Status}}}} {{{{.State.StartedAt}}}} {{{{.Config.Image}}}}'")
     if rc == 0 and out:
         parts = out.split()
         if len(parts) >= 3:
-            node.container_status = parts[0]
-            # Calculate uptime
-            try:
-                started = datetime.fromisoformat(parts[1].replace("Z", "+00:00"))
-                delta = datetime.now(timezone.utc) - started
-                hours, remainder = divmod(int(delta.total_seconds()), 3600)
-                minutes, _ = divmod(remainder, 60)
-                node.container_uptime = f"{hours}h {minutes}m"
-            except (ValueError, TypeError):
-                node.container_uptime = "unknown"
-            node.flower_version = parts[2].split(":")[-1] if ":" in parts[2] else parts[2]
-            # Detect framework from Docker image name
-            image_name = parts[2].lower()
-            for fw in ("pytorch", "tensorflow", "sklearn"):
-                if fw in image_name:
-                    node.framework = fw
-                    break
+            _apply_container(node, parts[0], parts[1], parts[2])
     else:
         node.container_status = "not found"
+    node.metrics_source = "ssh"
 
     return node
 
 
+def enrich_nodes(nodes: list[NodeInfo]) -> list[NodeInfo]:
+    """collect_container_info() for all nodes at once, one thread per node."""
+    with ThreadPoolExecutor(max_workers=min(16, len(nodes) or 1)) as pool:
+        return list(pool.map(collect_container_info, nodes))
+
+
 MODEL_INFO = {
     "pytorch": {
         "architecture": "Conv2d(3\u219232,5\u00d75) \u2192 MaxPool \u2192 Conv2d(32\u219264,5\u00d75) \u2192 MaxPool \u2192 FC(2304\u2192512) \u2192 FC(512\u219210)",
@@ -401,6 +577,16 @@ MODEL_INFO = {
 }
 
 
+def _phase_breakdown(metrics: dict) -> dict:
+    """Extract {phase: mean seconds} from an aggregated `[METRICS]` payload."""
+    phases = {}
+    for key, value in metrics.items():
+        m = re.fullmatch(r"prof_(\w+)_s_mean", key)
+        if m:
+            phases[m.group(1)] = value
+    return phases
+
+
 def collect_training_logs(superlink_ip: str, framework: str = "") -> RunInfo:
     """Parse SuperLink logs for training metrics.
 
@@ -412,24 +598,12 @@ def collect_training_logs(superlink_ip: str, framework: str = "") -> RunInfo:
     if not superlink_ip:
         return run_info
 
-    rc, out = _ssh(superlink_ip, f"docker logs {SUPERLINK_CONTAINER} 2>&1", timeout=10)
-    if rc != 0:
+    # Lines carry their `docker logs --timestamps` time, for round durations
+    superlink_log = _superlink_log(superlink_ip)
+    run_info.run_id = superlink_log.latest_run()
+    if not run_info.run_id:
         return run_info
-
-    all_lines = out.split("\n")
-
-    # Scope to the latest run only
-    last_start_idx = 0
-    for i, line in enumerate(all_lines):
-        if re.search(r"Starting run \d+", line):
-            last_start_idx = i
-    lines = all_lines[last_start_idx:]
-
-    # Extract run ID
-    for line in lines:
-        m = re.search(r"Starting run (\d+)", line)
-        if m:
-            run_info.run_id = m.group(1)
+    lines = superlink_log.run(run_info.run_id).lines()
 
     # Extract num_rounds from config
     for line in lines:
@@ -440,6 +614,8 @@ def collect_training_logs(superlink_ip: str, framework: str = "") -> RunInfo:
     # Parse rounds
     current_round = 0
     rounds = {}
+    round_start = {}  # round -> log time of "[ROUND N]"
+    round_end = {}  # round -> log time of its last aggregation
     for line in lines:
         # Round start
         m = re.search(r"\[ROUND (\d+)\]", line)
@@ -447,18 +623,34 @@ def collect_training_logs(superlink_ip: str, framework: str = "") -> RunInfo:
             current_round = int(m.group(1))
             if current_round not in rounds:
                 rounds[current_round] = RoundMetrics(round_num=current_round)
+                round_start[current_round] = log_time(line)
 
         # Fit aggregation
         m = re.search(r"aggregate_fit: received (\d+) results? and (\d+) failures?", line)
         if m and current_round in rounds:
             rounds[current_round].fit_clients = int(m.group(1))
             rounds[current_round].fit_failures = int(m.group(2))
+            round_end[current_round] = log_time(line)
 
         # Evaluate aggregation
         m = re.search(r"aggregate_evaluate: received (\d+) results? and (\d+) failures?", line)
         if m and current_round in rounds:
             rounds[current_round].eval_clients = int(m.group(1))
             rounds[current_round].eval_failures = int(m.group(2))
+            round_end[current_round] = log_time(line)
+
+        # Aggregated client metrics logged by the demo strategies
+        m = re.search(r"\[METRICS\] (fit|evaluate) (\{.*\})", line)
+        if m and current_round in rounds:
+            try:
+                metrics = json.loads(m.group(2))
+            except json.JSONDecodeError:
+                metrics = {}
+            rounds[current_round].phase_timings[m.group(1)] = _phase_breakdown(metrics)
+            if m.group(1) == "fit" and "idle_frac" in metrics:
+                rounds[current_round].idle_frac = metrics["idle_frac"]
+            if m.group(1) == "evaluate" and "accuracy" in metrics:
+                rounds[current_round].accuracy = metrics["accuracy"]
 
     # Parse history (loss per round)
     loss_section = False
@@ -484,9 +676,6 @@ def collect_training_logs(superlink_ip: str, framework: str = "") -> RunInfo:
                 elif accuracy_section:
                     rounds[rnum].accuracy = val
 
-    run_info.rounds = [asdict(r) for r in sorted(rounds.values(), key=lambda x: x.round_num)]
-    run_info.num_rounds_completed = len(rounds)
-
     # Determine run status
     for line in lines:
         if "Run finished" in line:
@@ -499,9 +688,19 @@ def collect_training_logs(superlink_ip: str, framework: str = "") -> RunInfo:
         if run_info.run_id:
             run_info.status = "running"
 
+    # A round is over once the next one started (or the run finished)
+    for rnum, start in round_start.items():
+        end = round_end.get(rnum)
+        over = rnum + 1 in round_start or run_info.status == "completed"
+        if over and start is not None and end is not None:
+            rounds[rnum].duration_s = round(end - start, 3)
+
+    run_info.rounds = [asdict(r) for r in sorted(rounds.values(), key=lambda x: x.round_num)]
+    run_info.num_rounds_completed = len(rounds)
+
     # Count connected SuperNodes from Fleet API messages
     node_ids = set()
-    for line in all_lines[-200:]:  # Last 200 lines from full log
+    for line in superlink_log.recent.tail(200):  # Last 200 lines from full log
         m = re.search(r"node_id=(\d+)", line)
         if m:
             node_ids.add(m.group(1))
@@ -516,11 +715,8 @@ def collect_connected_nodes(superlink_ip: str) -> int:
     """Count unique SuperNode IDs from recent Fleet API messages."""
     if not superlink_ip:
         return 0
-    rc, out = _ssh(superlink_ip, f"docker logs {SUPERLINK_CONTAINER} 2>&1 | tail -100")
-    if rc != 0:
-        return 0
     node_ids = set()
-    for line in out.split("\n"):
+    for line in _superlink_log(superlink_ip).recent.tail(100):
         m = re.search(r"\[Fleet\.PullMessages\] node_id=(\d+)", line)
         if m:
             node_ids.add(m.group(1))
@@ -533,11 +729,10 @@ def collect_connected_nodes(superlink_ip: str) -> int:
 @app.get("/api/cluster")
 async def get_cluster_state():
     """Return full cluster state as JSON."""
-    nodes = collect_nodes()
+    nodes = await asyncio.to_thread(collect_nodes)
 
-    # Enrich with container info in parallel
-    for node in nodes:
-        collect_container_info(node)
+    # Enrich with container info in parallel, off the event loop
+    await asyncio.to_thread(enrich_nodes, nodes)
 
     superlink_ip = ""
     framework = ""
@@ -547,13 +742,13 @@ async def get_cluster_state():
         if node.role == "supernode" and node.framework:
             framework = node.framework
 
-    process_running = _active_training and _active_training.process.poll() is None
-    training_active = process_running or _monitoring_run
+    training_active = bool(_scheduler.active())
 
     if _training_reset and not training_active:
         run_info = RunInfo()
     else:
-        run_info = collect_training_logs(superlink_ip, framework)
+        # Off the event loop: a cold SuperLink log waits for `docker logs`
+        run_info = await asyncio.to_thread(collect_training_logs, superlink_ip, framework)
         if training_active:
             if run_info.status in ("completed", "idle", ""):
                 # SuperLink hasn't registered the new run yet — show running
@@ -561,7 +756,7 @@ async def get_cluster_state():
             else:
                 # Preserve partial round data, force running status
                 run_info.status = "running"
-    connected = collect_connected_nodes(superlink_ip)
+    connected = await asyncio.to_thread(collect_connected_nodes, superlink_ip)
 
     state = ClusterState(
         timestamp=datetime.now(timezone.utc).isoformat(),
@@ -570,9 +765,60 @@ async def get_cluster_state():
         connected_supernodes=connected,
         superlink_ip=superlink_ip,
     )
+
+    global _last_snapshot
+    _last_snapshot = time.monotonic()
+    _metrics.observe_run(state.current_run)
+    _metrics.observe_nodes(state.nodes, connected, time.time())
     return asdict(state)
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus exposition of round, client and node metrics.
+
+    Renders the values already folded in by /api/cluster; only when nobody
+    has refreshed the cluster for METRICS_MAX_AGE seconds does a scrape take
+    a snapshot itself.
+    """
+    if time.monotonic() - _last_snapshot > METRICS_MAX_AGE:
+        await get_cluster_state()
+    return Response(content=_metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/api/planner")
+async def get_plan(framework: str = "", max_nodes: int = 32, epochs: int = 0,
+                   bandwidth_mbps: float = 1000.0, superlink_mbps: float = 1000.0,
+                   node_cost_per_hour: float = 0.0, calibrate: bool = True):
+    """Predicted round time for 1..max_nodes SuperNodes, and the best count.
+
+    Node size is the smallest running SuperNode's (a synchronous round waits
+    for it); the framework and epochs default to the last dashboard run's,
+    whose SuperLink log calibrates the rates (see planner.py).
+    """
+    runs = _scheduler.active() or _scheduler.finished()[:1]
+    last = runs[0] if runs else None
+    framework = framework or (last.framework if last else "pytorch")
+    if framework not in planner.PARAMS:
+        raise HTTPException(status_code=400, detail=f"Unknown framework '{framework}'")
+
+    nodes = await asyncio.to_thread(collect_nodes)
+    supernodes = [n for n in nodes if n.role == "supernode" and n.status == "running"]
+    vcpus = [n.cpu or 1 for n in supernodes]
+    memory = [n.memory_mb or 4096 for n in supernodes]
+    work, rates = planner.defaults(framework)
+    work.epochs = epochs or int((last.config if last else {}).get("local-epochs", 1))
+    rates.node_mbps, rates.superlink_mbps = bandwidth_mbps, superlink_mbps
+
+    superlink_ip = next((n.ip for n in nodes if n.role == "superlink" and n.status == "running"), "")
+    if calibrate and superlink_ip:
+        run_info = await asyncio.to_thread(collect_training_logs, superlink_ip, framework)
+        rates = planner.calibrate(work, rates, planner.rounds_from_run(run_info.rounds), min(vcpus or [1]))
+
+    return planner.plan(work, rates, min(vcpus or [2]), min(memory or [4096]), max(1, max_nodes),
+                        node_cost_per_hour, current=(vcpus, memory))
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index():
     """Serve the dashboard."""
@@ -580,6 +826,137 @@ async def index():
     return HTMLResponse(html_path.read_text())
 
 
+# ---------------------------------------------------------------------------
+# Run execution (one asyncio task per scheduled run)
+# ---------------------------------------------------------------------------
+# Held while a run checks the cluster's framework and switches it, so two runs
+# starting together do not both switch (the second then finds it done)
+_switch_lock = asyncio.Lock()
+
+
+async def _follow(run: Run, cmd: list[str], cwd: Path) -> int:
+    """Run `cmd` as the run's current process, logging its output line by line.
+
+    Each line is appended to the run's log as soon as it is read, which
+    wakes every stream subscribed to it.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, cwd=str(cwd),
+        limit=2**20,  # flwr log lines carry whole metrics dicts
+    )
+    run.process = proc
+    async for raw in proc.stdout:
+        line = raw.decode(errors="replace").rstrip('\n')
+        run.log(line)
+        m = re.search(r"Successfully started run (\d+)", line)
+        if m:
+            run.flwr_run_id = m.group(1)
+    return await proc.wait()
+
+
+async def _launch_run(run: Run) -> None:
+    """Take a scheduled run from framework switch to the end of training.
+
+    Phase 1 submits it with `flwr run`; phase 2 follows the SuperLink's log
+    of that run alone (`flwr log --stream`, so concurrent runs do not mix)
+    until it ends. Run by the scheduler as a task on the event loop; the
+    blocking cluster calls go to worker threads.
+    """
+    app_dir = DEMO_BASE / run.framework
+
+    # --- Auto-switch SuperNode framework if needed ---
+    async with _switch_lock:
+        nodes = await asyncio.to_thread(collect_nodes)
+        await asyncio.to_thread(enrich_nodes, nodes)
+        superlink_ip = ""
+        cluster_framework = ""
+        for node in nodes:
+            if node.role == "superlink" and node.status == "running":
+                superlink_ip = node.ip
+            if node.role == "supernode" and node.framework:
+                cluster_framework = node.framework
+
+        if cluster_framework and cluster_framework != run.framework:
+            run.state = "switching"
+            run.log(f"--- Switching SuperNodes from {cluster_framework} to {run.framework} ---")
+            switch_results, run.switch_timing = await asyncio.to_thread(
+                _switch_supernode_framework, nodes, run.framework, superlink_ip,
+            )
+            _inventory.invalidate()
+            failures = [r for r in switch_results if not r["success"]]
+            if failures:
+                detail = "; ".join(f"{r['node']}: {r['message']}" for r in failures)
+                run.state, run.message = "failed", f"Framework switch failed: {detail}"
+                run.log(f"--- {run.message} ---")
+                return
+            run.log(f"--- Switched in {run.switch_timing['total_s']}s ---")
+            # Give containers time to register with SuperLink
+            await asyncio.sleep(5)
+
+    if run.stop_requested:
+        run.state = "stopped"
+        return
+
+    # `flwr run` connects to the Control API at 127.0.0.1:9093 over TLS. Trust the
+    # SuperLink CA and forward the localhost-bound Control API to this host first.
+    await asyncio.to_thread(_ensure_ca, superlink_ip, app_dir)
+    if not await asyncio.to_thread(_ensure_control_tunnel, superlink_ip):
+        run.state = "failed"
+        run.message = "Cannot reach the SuperLink Control API (9093). Check SSH access to the SuperLink."
+        run.log(f"--- {run.message} ---")
+        return
+
+    # --- Phase 1: submit with flwr run ---
+    run.state = "submitting"
+    run.exit_code = await _follow(
+        run, [str(FLWR_BIN), "run", ".", "opennebula", "--run-config", format_run_config(run_config(run.config))], app_dir,
+    )
+    if run.stop_requested:
+        run.state = "stopped"
+        return
+    if not run.flwr_run_id:
+        # flwr run failed or wasn't a submission
+        run.state, run.message = "failed", f"flwr run exited with code {run.exit_code}"
+        return
+
+    # --- Phase 2: follow the submitted run on the SuperLink ---
+    run.state = "running"
+    run.log("")
+    run.log(f"--- Monitoring run {run.flwr_run_id} on SuperLink ---")
+    await _follow(run, [str(FLWR_BIN), "log", run.flwr_run_id, ".", "opennebula", "--stream"], app_dir)
+    if run.stop_requested:
+        run.state = "stopped"
+    elif any("Run finished" in line for line in run.tail(50)):
+        run.state = "completed"
+    else:
+        run.state, run.message = "failed", "log stream ended before the run finished"
+
+
+async def _interrupt_run(run: Run) -> None:
+    """Stop an active run's `flwr` process, and the run on the SuperLink if submitted."""
+    proc = run.process
+    if proc is not None and proc.returncode is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await asyncio.wait_for(proc.wait(), timeout=2)
+    if run.flwr_run_id:
+        stop = await asyncio.create_subprocess_exec(
+            str(FLWR_BIN), "stop", run.flwr_run_id, ".", "opennebula",
+            cwd=str(DEMO_BASE / run.framework),
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            stop.kill()
+
+
+_scheduler = RunScheduler(_launch_run)
+
+
 # ---------------------------------------------------------------------------
 # Training control endpoints
 # ---------------------------------------------------------------------------
@@ -599,310 +976,204 @@ async def get_frameworks():
                 data = tomllib.load(f)
             defaults = data.get("tool", {}).get("flwr", {}).get("app", {}).get("config", {})
 
-    # Detect cluster framework from running nodes
-    cluster_framework = ""
-    nodes = collect_nodes()
-    for node in nodes:
-        if node.role == "supernode" and node.status == "running":
-            collect_container_info(node)
-            if node.framework:
-                cluster_framework = node.framework
-                break
+    # Detect cluster framework from running nodes, probed in parallel off the event loop
+    nodes = await asyncio.to_thread(collect_nodes)
+    supernodes = [n for n in nodes if n.role == "supernode" and n.status == "running"]
+    await asyncio.to_thread(enrich_nodes, supernodes)
+    cluster_framework = next((n.framework for n in supernodes if n.framework), "")
 
     return {
         "frameworks": frameworks,
         "cluster_framework": cluster_framework,
-        "strategies": ["FedAvg", "FedProx", "FedAdam"],
+        "strategies": ["FedAvg", "FedProx", "FedAdam", "FedYogi", "FedAvgM"],
         "defaults": defaults,
+        "prewarm": _prewarm_jobs,
     }
 
 
-@app.post("/api/training/start")
-async def start_training(req: TrainingRequest):
-    """Launch a Flower training run as a subprocess.
+@app.post("/api/frameworks/{framework}/prewarm")
+async def prewarm_framework(framework: str):
+    """Copy a framework's SuperNode image to every node in the background.
 
-    If the requested framework differs from what the cluster is running,
-    the SuperNode containers are automatically restarted with the correct image.
+    The dashboard calls this as soon as another framework is selected, so a
+    later switch only has to swap containers.
     """
-    global _active_training, _last_completed, _training_reset, _monitoring_run, _superlink_ip_cache
-
-    if _active_training and _active_training.process.poll() is None:
-        raise HTTPException(status_code=409, detail="Training already in progress")
-    if _monitoring_run:
-        raise HTTPException(status_code=409, detail="Training already in progress on the cluster")
+    if framework not in ("pytorch", "tensorflow", "sklearn"):
+        raise HTTPException(status_code=404, detail=f"Unknown framework '{framework}'")
+    job = _prewarm_jobs.get(framework)
+    if job and job["status"] == "running":
+        return job
 
-    # Clear stale results from previous run
-    _last_completed = None
-    _training_reset = False
-    _monitoring_run = False
+    nodes = await asyncio.to_thread(collect_nodes)
+    _prewarm_jobs[framework] = {"status": "running"}
 
-    # --- Auto-switch SuperNode framework if needed ---
-    switch_results = []
-    nodes = collect_nodes()
-    for node in nodes:
-        collect_container_info(node)
+    def work():
+        try:
+            _prewarm_jobs[framework] = {"status": "done", **prewarm_framework_image(nodes, framework)}
+        except Exception as e:
+            _prewarm_jobs[framework] = {"status": "failed", "message": str(e)}
 
-    superlink_ip = ""
-    cluster_framework = ""
-    for node in nodes:
-        if node.role == "superlink" and node.status == "running":
-            superlink_ip = node.ip
-        if node.role == "supernode" and node.framework:
-            cluster_framework = node.framework
-
-    _superlink_ip_cache = superlink_ip
-
-    needs_switch = cluster_framework and cluster_framework != req.framework
-    if needs_switch:
-        switch_results = _switch_supernode_framework(nodes, req.framework, superlink_ip)
-        failures = [r for r in switch_results if not r["success"]]
-        if failures:
-            detail = "; ".join(f"{r['node']}: {r['message']}" for r in failures)
-            raise HTTPException(status_code=500, detail=f"Framework switch failed: {detail}")
-        # Give containers time to register with SuperLink
-        time.sleep(5)
-
-    # Build --run-config string (string values must be double-quoted for flwr)
-    def _cfg(k, v):
-        if isinstance(v, str):
-            return f'{k}="{v}"'
-        return f"{k}={v}"
-
-    config_parts = [
-        _cfg("num-server-rounds", req.num_rounds),
-        _cfg("local-epochs", req.local_epochs),
-        _cfg("batch-size", req.batch_size),
-        _cfg("strategy", req.strategy),
-        _cfg("min-fit-clients", req.min_fit_clients),
-        _cfg("min-available-clients", req.min_available_clients),
-    ]
-    for k, v in req.extra_config.items():
-        config_parts.append(_cfg(k, v))
-    run_config_str = " ".join(config_parts)
+    threading.Thread(target=work, daemon=True).start()
+    return _prewarm_jobs[framework]
 
-    # `flwr run` connects to the Control API at 127.0.0.1:9093 over TLS. Trust the
-    # SuperLink CA and forward the localhost-bound Control API to this host first.
-    _ensure_ca(superlink_ip, DEMO_BASE / req.framework)
-    if not _ensure_control_tunnel(superlink_ip):
-        raise HTTPException(
-            status_code=502,
-            detail="Cannot reach the SuperLink Control API (9093). Check SSH access to the SuperLink.",
-        )
 
-    cmd = [str(FLWR_BIN), "run", ".", "opennebula", "--run-config", run_config_str]
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        cwd=str(DEMO_BASE / req.framework),
-    )
+@app.post("/api/training/start")
+async def start_training(req: TrainingRequest):
+    """Queue a Flower training run; it starts as soon as the scheduler has room.
 
-    output_lines = deque(maxlen=500)
-    t = threading.Thread(target=_reader_thread, args=(proc, output_lines), daemon=True)
-    t.start()
+    If the requested framework differs from what the cluster is running,
+    the SuperNode containers are automatically restarted with the correct
+    image once the runs using the current one have finished.
+    """
+    global _training_reset
 
-    _active_training = ActiveTraining(
-        process=proc,
+    run = _scheduler.submit(Run(
         framework=req.framework,
-        config=req.model_dump(),
-        started_at=time.time(),
-        output_lines=output_lines,
-    )
-
+        config=req.model_dump(exclude={"priority"}),
+        priority=req.priority,
+    ))
+    _training_reset = False
     return {
-        "status": "started",
-        "pid": proc.pid,
+        "status": "queued" if run.state == "queued" else "started",
+        "run_id": run.run_id,
         "framework": req.framework,
-        "switched": needs_switch,
-        "switch_results": switch_results,
+        "position": _scheduler.position(run.run_id),
     }
 
 
+def _followed_run() -> Optional[Run]:
+    """The run the single-run endpoints report on: the newest active one, else the next queued."""
+    active = _scheduler.active()
+    if active:
+        return active[-1]
+    queued = _scheduler.queued()
+    return queued[0] if queued else None
+
+
+def _run_or_404(run_id: str) -> Run:
+    run = _scheduler.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run '{run_id}'")
+    return run
+
+
 @app.get("/api/training/status")
 async def get_training_status():
-    """Return current training status."""
-    global _active_training, _last_completed
-
-    # flwr run process still running
-    if _active_training and _active_training.process.poll() is None:
+    """Return current training status (the followed run, plus queue counts)."""
+    run = _followed_run()
+    counts = {"running": len(_scheduler.active()), "queued": len(_scheduler.queued())}
+    if run is not None:
         return {
             "active": True,
-            "phase": "submitting",
-            "framework": _active_training.framework,
-            "config": _active_training.config,
-            "elapsed_s": round(time.time() - _active_training.started_at, 1),
-            "lines": list(_active_training.output_lines)[-20:],
+            "phase": "training" if run.state == "running" else run.state,
+            **counts,
+            **run.summary(lines=20),
         }
 
-    # flwr run process finished — clean up reference but don't set _last_completed
-    # if monitoring continues (the SSE handler sets _monitoring_run)
-    if _active_training and _active_training.process.poll() is not None:
-        if not _monitoring_run:
-            _last_completed = {
-                "framework": _active_training.framework,
-                "config": _active_training.config,
-                "duration_s": round(time.time() - _active_training.started_at, 1),
-                "exit_code": _active_training.process.returncode,
-                "last_lines": list(_active_training.output_lines)[-20:],
-            }
-        _active_training = None
-
-    # Training running on SuperLink (flwr run already exited)
-    if _monitoring_run:
-        return {
-            "active": True,
-            "phase": "training",
+    finished = _scheduler.finished()
+    last_completed = None
+    if finished and not _training_reset:
+        last = finished[0]
+        last_completed = {
+            **last.summary(),
+            "duration_s": last.summary()["elapsed_s"],
+            "last_lines": last.tail(20),
         }
+    return {"active": False, **counts, "last_completed": last_completed}
+
 
+@app.get("/api/runs")
+async def list_runs():
+    """Every queued, active and recently finished run."""
     return {
-        "active": False,
-        "last_completed": _last_completed,
+        "max_concurrent": _scheduler.max_concurrent,
+        "active": [r.summary() for r in _scheduler.active()],
+        "queued": [{**r.summary(), "position": i} for i, r in enumerate(_scheduler.queued(), 1)],
+        "finished": [r.summary() for r in _scheduler.finished()],
     }
 
 
-@app.get("/api/training/log")
-async def stream_training_log():
-    """SSE endpoint to tail training output.
+@app.get("/api/runs/{run_id}")
+async def get_run(run_id: str):
+    run = _run_or_404(run_id)
+    return {**run.summary(lines=20), "position": _scheduler.position(run_id)}
+
+
+def _log_stream(run: Optional[Run], last_event_id: Optional[str] = None) -> StreamingResponse:
+    """SSE of one run's log until it finishes.
 
-    Phase 1: streams flwr run process stdout.
-    Phase 2: after flwr run exits successfully (job submitted), switches
-    to tailing SuperLink docker logs until "Run finished" is detected.
+    Every line's event id is its offset in the run's log, so a reconnecting
+    EventSource (which sends Last-Event-ID) resumes after the last line it got.
     """
     async def event_generator():
-        global _monitoring_run
-
-        # --- Phase 1: stream flwr run process output ---
-        seen = 0
-        submitted_run_id = ""
-        while _active_training:
-            lines = list(_active_training.output_lines)
-            if len(lines) > seen:
-                for line in lines[seen:]:
-                    yield f"data: {json.dumps({'line': line})}\n\n"
-                    m = re.search(r"Successfully started run (\d+)", line)
-                    if m:
-                        submitted_run_id = m.group(1)
-                seen = len(lines)
-
-            if _active_training.process.poll() is not None:
-                # Flush remaining
-                lines = list(_active_training.output_lines)
-                for line in lines[seen:]:
-                    yield f"data: {json.dumps({'line': line})}\n\n"
-                    m = re.search(r"Successfully started run (\d+)", line)
-                    if m:
-                        submitted_run_id = m.group(1)
+        offset = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+        while run is not None:
+            # Read the state first so lines logged just before it finished are sent
+            done = run.finished
+            lines, end = run.output.since(offset)
+            if end - offset > len(lines):
+                # Fell further behind than the run's log holds (FL_RUN_OUTPUT_LINES)
+                dropped = {'line': f"--- {end - offset - len(lines)} lines dropped ---"}
+                yield f"data: {json.dumps(dropped)}\n\n"
+            for i, line in enumerate(lines, end - len(lines) + 1):
+                yield f"id: {i}\ndata: {json.dumps({'line': line})}\n\n"
+            offset = end
+            if done:
                 break
+            # Woken by the next line or the run's end; a comment keeps idle proxies open
+            if not await run.output.wait(offset, timeout=SSE_KEEPALIVE_S):
+                yield ": keepalive\n\n"
 
-            await asyncio.sleep(0.5)
-
-        if not submitted_run_id:
-            # flwr run failed or wasn't a submission — done
-            yield "event: complete\ndata: {}\n\n"
-            return
-
-        # --- Phase 2: tail SuperLink logs for the submitted run ---
-        _monitoring_run = True
-        yield f"data: {json.dumps({'line': ''})}\n\n"
-        yield f"data: {json.dumps({'line': f'--- Monitoring run {submitted_run_id} on SuperLink ---'})}\n\n"
-
-        sl_ip = _superlink_ip_cache
-        seen_sl = 0
-        found_run = False
-        while _monitoring_run:
-            if not sl_ip:
-                await asyncio.sleep(3)
-                continue
-
-            rc, out = _ssh(sl_ip, f"docker logs {SUPERLINK_CONTAINER} 2>&1", timeout=10)
-            if rc != 0:
-                await asyncio.sleep(3)
-                continue
-
-            sl_lines = out.split("\n")
-
-            # Find where our specific run starts in the logs
-            if not found_run:
-                run_start = -1
-                for i, line in enumerate(sl_lines):
-                    if f"Starting run {submitted_run_id}" in line:
-                        run_start = i
-                        found_run = True
-                        break
-                if not found_run:
-                    await asyncio.sleep(2)
-                    continue
-                scoped = sl_lines[run_start:]
-            else:
-                # Re-scope from same run on each poll
-                run_start = 0
-                for i, line in enumerate(sl_lines):
-                    if f"Starting run {submitted_run_id}" in line:
-                        run_start = i
-                        break
-                scoped = sl_lines[run_start:]
-
-            if len(scoped) > seen_sl:
-                for line in scoped[seen_sl:]:
-                    yield f"data: {json.dumps({'line': line})}\n\n"
-                seen_sl = len(scoped)
-
-                # Check for completion
-                for line in scoped:
-                    if "Run finished" in line:
-                        _monitoring_run = False
-                        yield "event: complete\ndata: {}\n\n"
-                        return
-
-            await asyncio.sleep(2)
-
-        yield "event: complete\ndata: {}\n\n"
+        end = {"state": run.state, "message": run.message} if run is not None else {}
+        yield f"event: complete\ndata: {json.dumps(end)}\n\n"
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
-@app.post("/api/training/stop")
-async def stop_training():
-    """Stop the active training run."""
-    global _active_training, _last_completed, _monitoring_run
+@app.get("/api/runs/{run_id}/log")
+async def stream_run_log(run_id: str, last_event_id: Optional[str] = Header(None)):
+    """SSE endpoint to tail one run: queue, switch, `flwr run`, then its SuperLink log."""
+    return _log_stream(_run_or_404(run_id), last_event_id)
 
-    if _active_training and _active_training.process.poll() is None:
-        proc = _active_training.process
-        proc.send_signal(signal.SIGTERM)
-        try:
-            proc.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            proc.kill()
-            proc.wait(timeout=2)
-
-        _last_completed = {
-            "framework": _active_training.framework,
-            "config": _active_training.config,
-            "duration_s": round(time.time() - _active_training.started_at, 1),
-            "exit_code": proc.returncode,
-            "last_lines": list(_active_training.output_lines)[-20:],
-        }
-        _active_training = None
-        _monitoring_run = False
-        return {"status": "stopped"}
 
-    if _monitoring_run:
-        _monitoring_run = False
-        _active_training = None
-        return {"status": "stopped"}
+@app.get("/api/training/log")
+async def stream_training_log(last_event_id: Optional[str] = Header(None)):
+    """SSE endpoint to tail the followed run (see /api/runs/{run_id}/log)."""
+    return _log_stream(_followed_run(), last_event_id)
+
+
+async def _stop(run: Run) -> dict:
+    _scheduler.stop(run.run_id)
+    if run.active:
+        await _interrupt_run(run)
+    return {"status": "stopped", "run_id": run.run_id}
+
 
-    raise HTTPException(status_code=404, detail="No active training to stop")
+@app.post("/api/runs/{run_id}/stop")
+async def stop_run(run_id: str):
+    """Stop an active run, or take a queued one off the queue."""
+    run = _run_or_404(run_id)
+    if run.finished:
+        raise HTTPException(status_code=409, detail=f"Run '{run_id}' already {run.state}")
+    return await _stop(run)
+
+
+@app.post("/api/training/stop")
+async def stop_training():
+    """Stop the followed run."""
+    run = _followed_run()
+    if run is None:
+        raise HTTPException(status_code=404, detail="No active training to stop")
+    return await _stop(run)
 
 
 @app.post("/api/training/reset")
 async def reset_training():
     """Clear stale training results so the dashboard shows a clean slate."""
-    global _last_completed, _training_reset, _monitoring_run
+    global _training_reset
 
-    _last_completed = None
+    _scheduler.clear_history()
     _training_reset = True
-    _monitoring_run = False
     return {"status": "reset"}
 
 
@@ -923,22 +1194,25 @@ async def upload_dataset(file: UploadFile = File(...)):
             tmp.write(chunk)
         tmp.close()
 
-        # SCP to each supernode
-        nodes = collect_nodes()
-        results = []
-        for node in nodes:
-            if node.role != "supernode" or node.status != "running":
-                continue
-            rc, out = _run(
-                f"scp {SSH_OPTS} {tmp.name} {SSH_USER}@{node.ip}:/opt/flower/data/{file.filename}",
-                timeout=60,
-            )
-            results.append({
-                "node": node.name,
-                "ip": node.ip,
-                "success": rc == 0,
-                "message": out if rc != 0 else "ok",
-            })
+        # SCP to each supernode, off the event loop
+        def copy_all() -> list[dict]:
+            results = []
+            for node in collect_nodes():
+                if node.role != "supernode" or node.status != "running":
+                    continue
+                rc, out = _run(
+                    f"scp {SSH_OPTS} {tmp.name} {SSH_USER}@{node.ip}:/opt/flower/data/{file.filename}",
+                    timeout=60,
+                )
+                results.append({
+                    "node": node.name,
+                    "ip": node.ip,
+                    "success": rc == 0,
+                    "message": out if rc != 0 else "ok",
+                })
+            return results
+
+        results = await asyncio.to_thread(copy_all)
 
         return {"filename": file.filename, "size_bytes": size, "nodes": results}
     finally:
@@ -0,0 +1,262 @@
+"""
+Flower VM inventory from OpenNebula: scoped queries, streaming parse, TTL cache.
+
+`onevm list -j` returns the whole VM pool, which on a shared OpenNebula is
+thousands of VMs and megabytes of JSON, and the dashboard asks for the
+inventory several times per request. This module narrows the query, parses
+the pool one VM at a time as the CLI writes it, and caches the result.
+
+Scope, first match wins:
+    FL_ONEFLOW_SERVICE  OneFlow service id or name: only that service's VMs,
+                        with roles taken from the service's role names
+    FL_VM_SEARCH        server-side `onevm list --search` expression, e.g.
+                        "VM.USER_TEMPLATE.LABELS=flower"
+    (neither)           full pool, filtered by name like before
+
+Other settings: FL_INVENTORY_TTL (seconds, default 5), FL_ONEVM_BIN and
+FL_ONEFLOW_BIN (CLI paths, e.g. a fake for benchmarking).
+"""
+
+import json
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ONEVM_BIN = os.environ.get("FL_ONEVM_BIN", "onevm")
+ONEFLOW_BIN = os.environ.get("FL_ONEFLOW_BIN", "oneflow")
+ONEFLOW_SERVICE = os.environ.get("FL_ONEFLOW_SERVICE", "")
+VM_SEARCH = os.environ.get("FL_VM_SEARCH", "")
+INVENTORY_TTL = float(os.environ.get("FL_INVENTORY_TTL", "5"))
+
+NAME_KEYWORDS = ("flower", "superlink", "supernode")
+# LCM_STATE: 3 RUNNING, 5 SUSPENDED/stopped, 36 UNKNOWN; anything else is a
+# transition (boot, migrate, shutdown...) about to change again
+STATE_MAP = {3: "running", 5: "stopped", 36: "unknown"}
+# While any VM is in transition, serve the cache for at most this long
+TRANSITION_TTL = 1.0
+
+_READ_CHUNK = 1 << 16
+_POOL_HEAD = re.compile(r'\s*\{\s*"VM_POOL"\s*:\s*\{\s*(?=\S)')
+_VM_KEY = re.compile(r'"VM"\s*:\s*(?=\S)')
+_PHASE_NAME = re.compile(r"[A-Za-z0-9_-]{1,32}")
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+def iter_pool_vms(stream):
+    """Yield each VM dict of `onevm list -j` output read from `stream`.
+
+    Elements of the VM array are decoded one at a time as chunks arrive, so
+    parsing overlaps with the CLI writing and only one VM's tree is alive at
+    once. Copes with OpenNebula's single-VM (object, not array) and empty
+    pool shapes. Raises ValueError on malformed input.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, eof
+        if eof:
+            return False
+        chunk = stream.read(_READ_CHUNK)
+        if not chunk:
+            eof = True
+            return False
+        buf += chunk
+        return True
+
+    # Header: {"VM_POOL": {"VM": <value>, or "}" for an empty pool
+    while not (match := _POOL_HEAD.match(buf)):
+        if not fill():
+            raise ValueError("not a VM_POOL document")
+    pos = match.end()
+    if buf[pos] == "}":
+        return
+    while not (match := _VM_KEY.match(buf, pos)):
+        if not fill():
+            raise ValueError("not a VM_POOL document")
+    pos = match.end()
+
+    single = buf[pos] == "{"
+    if not single:
+        if buf[pos] != "[":
+            raise ValueError("unexpected VM value")
+        pos += 1
+
+    while True:
+        # Skip separators between elements
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or not fill():
+                break
+        if pos >= len(buf):
+            raise ValueError("truncated VM_POOL document")
+        if buf[pos] == "]":
+            return
+        try:
+            vm, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if fill():
+                continue
+            raise ValueError("truncated VM_POOL document") from None
+        yield vm
+        if single:
+            return
+        pos = end
+        # Drop consumed text now and then, so the buffer stays around a chunk
+        if pos > _READ_CHUNK:
+            buf, pos = buf[pos:], 0
+
+
+def _is_flower_vm(vm: dict) -> bool:
+    name = vm.get("NAME", "").lower()
+    return any(kw in name for kw in NAME_KEYWORDS)
+
+
+def parse_boot_timing(value: str) -> dict[str, float]:
+    """A SuperNode's FL_BOOT_TIMING ("phase:seconds,...,ready:seconds") as a dict.
+
+    The VM writes this value itself, so entries that are not a plain phase
+    name and a number are skipped; an unset value gives {}.
+    """
+    timing = {}
+    for entry in value.split(","):
+        phase, _, seconds = entry.strip().partition(":")
+        if not _PHASE_NAME.fullmatch(phase):
+            continue
+        try:
+            seconds = float(seconds)
+        except ValueError:
+            continue
+        if math.isfinite(seconds):
+            timing[phase] = seconds
+    return timing
+
+
+def node_fields(vm: dict, role: str = "") -> dict:
+    """The dashboard's NodeInfo fields for one VM (role from the name if unset)."""
+    name = vm.get("NAME", "")
+    if not role:
+        role = "superlink" if "superlink" in name.lower() else "supernode"
+
+    template = vm.get("TEMPLATE", {})
+    nic = template.get("NIC", {})
+    if isinstance(nic, list):
+        nic = nic[0] if nic else {}
+    context = template.get("CONTEXT", {})
+    user_template = vm.get("USER_TEMPLATE") or {}
+
+    return {
+        "vm_id": int(vm.get("ID", 0)),
+        "name": name,
+        "role": role,
+        "ip": nic.get("IP", ""),
+        "status": STATE_MAP.get(int(vm.get("LCM_STATE", 0)), "other"),
+        "cpu": int(float(template.get("VCPU", template.get("CPU", 0)))),
+        "memory_mb": int(template.get("MEMORY", 0)),
+        "superlink_address": context.get("ONEAPP_FL_SUPERLINK_ADDRESS", ""),
+        "boot_timing": parse_boot_timing(user_template.get("FL_BOOT_TIMING", "")),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+def _stream_pool(args: list[str], timeout: float, by_name: bool = True) -> list[dict]:
+    """Run `onevm list -j` with `args`; `by_name` keeps only Flower-named VMs."""
+    proc = subprocess.Popen(
+        [ONEVM_BIN, "list", "-j", *args],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    # A hung CLI must not hang the dashboard
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    try:
+        return [node_fields(vm) for vm in iter_pool_vms(proc.stdout) if not by_name or _is_flower_vm(vm)]
+    finally:
+        timer.cancel()
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise OSError(f"{ONEVM_BIN} list exited with {proc.returncode}")
+
+
+def _service_vms(service: str, timeout: float) -> list[dict]:
+    """VMs of one OneFlow service, with each role's name as the node role."""
+    out = subprocess.run(
+        [ONEFLOW_BIN, "show", service, "-j"],
+        capture_output=True, text=True, timeout=timeout, check=True,
+    ).stdout
+    body = json.loads(out)["DOCUMENT"]["TEMPLATE"]["BODY"]
+    members = [
+        (str(node["deploy_id"]), role.get("name", ""))
+        for role in body.get("roles", [])
+        for node in role.get("nodes", [])
+    ]
+
+    def show(member):
+        vm_id, role = member
+        r = subprocess.run(
+            [ONEVM_BIN, "show", vm_id, "-j"],
+            capture_output=True, text=True, timeout=timeout, check=True,
+        )
+        return node_fields(json.loads(r.stdout)["VM"], role if role in ("superlink", "supernode") else "")
+
+    with ThreadPoolExecutor(max_workers=min(8, len(members) or 1)) as pool:
+        return list(pool.map(show, members))
+
+
+def query(timeout: float = 10) -> list[dict]:
+    """One uncached inventory query in the configured scope."""
+    if ONEFLOW_SERVICE:
+        return _service_vms(ONEFLOW_SERVICE, timeout)
+    if VM_SEARCH:
+        return _stream_pool(["--search", VM_SEARCH], timeout, by_name=False)
+    return _stream_pool([], timeout)
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+class Inventory:
+    """Thread-safe TTL cache in front of `query()`.
+
+    Concurrent callers share one in-flight query. The TTL drops to
+    TRANSITION_TTL while any VM is mid-transition, and `invalidate()` lets
+    the dashboard drop the cache after it changes the cluster itself.
+    """
+
+    def __init__(self, ttl: float = INVENTORY_TTL, query_fn=query):
+        self.ttl = ttl
+        self._query = query_fn
+        self._lock = threading.Lock()
+        self._nodes: list[dict] = []
+        self._expires = 0.0
+        self.queries = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._expires = 0.0
+
+    def get(self) -> list[dict]:
+        """Flower VMs as NodeInfo field dicts (copies; safe to mutate)."""
+        with self._lock:
+            if time.monotonic() >= self._expires:
+                try:
+                    nodes = self._query()
+                except (OSError, ValueError, KeyError, subprocess.SubprocessError):
+                    # Keep serving the last good inventory; retry next call
+                    self._expires = 0.0
+                else:
+                    self.queries += 1
+                    self._nodes = nodes
+                    settled = all(n["status"] != "other" for n in nodes)
+                    ttl = self.ttl if settled else min(self.ttl, TRANSITION_TTL)
+                    self._expires = time.monotonic() + ttl
+            return [dict(n) for n in self._nodes]
@@ -0,0 +1,247 @@
+"""
+SuperLink log following: one `docker logs -f` per SuperLink, split by run.
+
+The cluster view used to fetch the SuperLink's whole `docker logs` output
+over SSH on every refresh (twice: once for the run, once for connected
+nodes) and search it from the top for the latest run. Here one follower
+process per SuperLink reads the log once and keeps reading as it grows;
+lines are filed by run into bounded ring buffers that any number of
+readers consume by offset.
+Readers on an event loop `await buffer.wait(offset)` and are woken as soon
+as a line arrives, from whichever thread or task appended it.
+
+Offsets are absolute line numbers, so a reader that stores the last one it
+saw (an SSE client's Last-Event-ID) resumes exactly where it left off, and
+one that fell further behind than a buffer holds skips what was dropped.
+
+Runs can overlap (FL_MAX_CONCURRENT_RUNS), and their ServerApps all write
+to the one SuperLink log. The demo ServerApps prefix their lines with
+`[RUN <id>]` (flower_demo/profiling.py tag_run_log), and a tagged line is
+filed under that run. An untagged line goes with the line before it: the
+SuperLink's "Starting run N" opens run N, and the rest of a multi-line
+record (the History summary) follows its first line. Lines a ServerApp
+writes before its tag is set may land under another run that is active.
+
+Settings: FL_SUPERLINK_LOG_BACKLOG (lines read when a follower starts,
+default 20000; a run whose "Starting run" line is older than that is
+not shown), FL_RUN_LOG_LINES (lines kept per run, default 20000).
+Standard library only, like inventory.py.
+"""
+
+import asyncio
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+BACKLOG_LINES = int(os.environ.get("FL_SUPERLINK_LOG_BACKLOG", "20000"))
+RUN_LOG_LINES = int(os.environ.get("FL_RUN_LOG_LINES", "20000"))
+RECENT_LINES = 1000
+RUNS_KEPT = 5
+RETRY_DELAY = 3.0
+
+_RUN_START = re.compile(r"Starting run (\d+)")
+_RUN_TAG = re.compile(r"\[RUN (\d+)\]")
+_TIMESTAMP = re.compile(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?Z ")
+
+
+def log_time(line: str) -> Optional[float]:
+    """Unix time of a `docker logs --timestamps` line, or None."""
+    m = _TIMESTAMP.match(line)
+    if not m:
+        return None
+    # Docker writes nanoseconds; datetime takes at most microseconds
+    frac = (m.group(2) or ".0")[:7]
+    return datetime.fromisoformat(m.group(1) + frac + "+00:00").timestamp()
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class LineBuffer:
+    """Thread-safe ring buffer of lines, addressed by absolute offset.
+
+    Any number of subscribers read it by offset and `wait()` for the next
+    line; appending wakes every waiting subscriber on its own event loop.
+    `close()` marks the end of the stream and wakes them too.
+    """
+
+    def __init__(self, maxlen: int):
+        self._lines: deque = deque(maxlen=maxlen)
+        self._end = 0  # offset just past the newest line
+        self._closed = False
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._lock = threading.Lock()
+
+    def _notify(self) -> None:
+        # Caller holds self._lock
+        waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            self._lines.append(line)
+            self._end += 1
+            self._notify()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._notify()
+
+    @property
+    def end(self) -> int:
+        return self._end
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def since(self, offset: int) -> tuple[list[str], int]:
+        """Lines from `offset` on (or the oldest still held), and the new end offset."""
+        with self._lock:
+            new = min(self._end - offset, len(self._lines))
+            if new <= 0:
+                return [], self._end
+            # Walk back from the newest line: O(new lines), not O(buffer)
+            return list(islice(reversed(self._lines), new))[::-1], self._end
+
+    async def wait(self, offset: int, timeout: Optional[float] = None) -> bool:
+        """Wait for a line past `offset` (or the close); False on timeout."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._end > offset or self._closed:
+                return True
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+
+    def tail(self, n: int) -> list[str]:
+        with self._lock:
+            return list(self._lines)[-n:] if n > 0 else []
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            return list(self._lines)
+
+
+class SuperLinkLog:
+    """Follows one SuperLink container's log on a background thread.
+
+    `remote` is the command prefix that runs a command on the SuperLink
+    host (e.g. `ssh ... root@ip`). The follower reads the last
+    BACKLOG_LINES first, then `docker logs -f --since <last line's time>`,
+    reconnecting the same way whenever the stream ends (SSH drop,
+    container restart). Lines keep their Docker timestamp prefix.
+    """
+
+    def __init__(self, remote: list[str], container: str):
+        self._remote = remote
+        self._container = container
+        self._lock = threading.Lock()
+        self._runs: OrderedDict[str, LineBuffer] = OrderedDict()
+        self._current = ""  # run the last line was filed under
+        self._last_time: Optional[float] = None
+        self._last_text = ""
+        self._proc: Optional[subprocess.Popen] = None
+        self._stopped = False
+        self.recent = LineBuffer(RECENT_LINES)
+        self.ready = threading.Event()
+        threading.Thread(target=self._follow, daemon=True).start()
+
+    # -- readers ------------------------------------------------------------
+    def latest_run(self) -> str:
+        with self._lock:
+            return next(reversed(self._runs), "")
+
+    def run(self, run_id: str) -> Optional[LineBuffer]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def stop(self) -> None:
+        self._stopped = True
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+
+    # -- follower -----------------------------------------------------------
+    def _ingest(self, line: str) -> None:
+        t = log_time(line)
+        if t is None:
+            return  # not container output (ssh or docker errors)
+        text = line.split(" ", 1)[-1]
+        if self._last_time is not None:
+            # --since resends the line(s) at the boundary time
+            if t < self._last_time or (t == self._last_time and text == self._last_text):
+                return
+        self._last_time, self._last_text = t, text
+        self.recent.append(line)
+        start = _RUN_START.search(line)
+        tag = None if start else _RUN_TAG.search(line)
+        with self._lock:
+            if start:
+                self._current = start.group(1)
+                self._runs.pop(self._current, None)
+                self._runs[self._current] = LineBuffer(RUN_LOG_LINES)
+                while len(self._runs) > RUNS_KEPT:
+                    self._runs.popitem(last=False)
+            elif tag:
+                # A run that started before the backlog gets no buffer
+                self._current = tag.group(1)
+            buf = self._runs.get(self._current)
+        if buf is not None:
+            buf.append(line)
+
+    def _since(self) -> str:
+        if self._last_time is None:
+            return f"--tail {BACKLOG_LINES}"
+        return f"--since {self._last_time:.6f}"
+
+    def _follow(self) -> None:
+        while not self._stopped:
+            if not self.ready.is_set():
+                # Backlog without -f, so readers know when it is all in
+                cmd = f"docker logs --timestamps {self._since()} {self._container} 2>&1"
+                try:
+                    out = subprocess.run(
+                        self._remote + [cmd], capture_output=True, text=True, timeout=60,
+                    )
+                except (OSError, subprocess.SubprocessError):
+                    time.sleep(RETRY_DELAY)
+                    continue
+                if out.returncode == 0:
+                    for line in out.stdout.splitlines():
+                        self._ingest(line)
+                    self.ready.set()
+                else:
+                    time.sleep(RETRY_DELAY)
+                continue
+
+            cmd = f"docker logs --timestamps -f {self._since()} {self._container} 2>&1"
+            try:
+                self._proc = subprocess.Popen(
+                    self._remote + [cmd], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                )
+                for line in iter(self._proc.stdout.readline, ''):
+                    self._ingest(line.rstrip('\n'))
+                self._proc.stdout.close()
+                self._proc.wait()
+            except OSError:
+                pass
+            time.sleep(RETRY_DELAY)
@@ -0,0 +1,214 @@
+"""
+Prometheus metrics for the dashboard, in the text exposition format.
+
+Values are folded in as the dashboard collects them (one `observe_*` call
+per cluster snapshot or probe) and a scrape only renders what is already
+there. Counters are per round, so each round is counted once no matter how
+often the SuperLink logs are re-read.
+
+Standard library only, like inventory.py: the dashboard's only dependencies
+are FastAPI and uvicorn.
+"""
+
+import math
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; rounds range from a few seconds (sklearn) to many minutes (LLM)
+ROUND_BUCKETS = (1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+PROBE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+PHASES = ("idle", "running", "completed", "failed")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self._values: dict[tuple, object] = {}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key in sorted(self._values):
+            lines.extend(self._render_one(key, self._values[key]))
+        return lines
+
+    def _render_one(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_num(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labels) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        self._values[labels] = value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = ROUND_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value: float, *labels) -> None:
+        counts, total = self._values.get(labels, ([0] * len(self.buckets), 0.0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self._values[labels] = (counts, total + value)
+
+    def _render_one(self, key: tuple, value) -> list[str]:
+        counts, total = value
+        lines = []
+        for bound, count in zip(self.buckets, counts):
+            le = 'le="%s"' % _num(bound)
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}")
+        return lines
+
+
+class FederationMetrics:
+    """The dashboard's metric registry, updated from parsed runs and snapshots."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (round, "fit"|"evaluate"|"duration") already counted for _run_id
+        self._run_id = ""
+        self._counted: set[tuple] = set()
+        self.round_duration = Histogram(
+            "flower_round_duration_seconds", "Wall time of a completed federated round")
+        self.clients = Counter(
+            "flower_round_clients_total", "Client results received by aggregation", ("phase",))
+        self.failures = Counter(
+            "flower_round_failures_total", "Client failures reported by aggregation", ("phase",))
+        self.rounds = Counter(
+            "flower_rounds_total", "Federated rounds with an aggregated fit")
+        self.round_current = Gauge(
+            "flower_round_current", "Latest round of the current run")
+        self.round_idle = Gauge(
+            "flower_round_idle_fraction", "Share of client fit time spent waiting for the slowest client, latest round")
+        self.rounds_configured = Gauge(
+            "flower_rounds_configured", "Rounds configured for the current run")
+        self.phase = Gauge(
+            "flower_training_phase", "1 for the current training phase", ("phase",))
+        self.connected = Gauge(
+            "flower_connected_supernodes", "SuperNodes connected to the SuperLink")
+        self.node_up = Gauge(
+            "flower_node_container_running", "1 if the node's Flower container is running",
+            ("node", "role", "ip"))
+        self.node_cpu = Gauge(
+            "flower_node_container_cpu_percent", "Container CPU use reported by the node agent",
+            ("node", "role"))
+        self.node_mem = Gauge(
+            "flower_node_container_memory_bytes", "Container memory reported by the node agent",
+            ("node", "role"))
+        self.node_boot = Gauge(
+            "flower_node_boot_seconds", "Seconds per SuperNode boot phase (ready: VM boot to running container)",
+            ("node", "phase"))
+        self.probe = Histogram(
+            "flower_dashboard_probe_seconds", "Latency of node probes made by the dashboard",
+            ("method", "result"), buckets=PROBE_BUCKETS)
+        self.snapshot_time = Gauge(
+            "flower_dashboard_snapshot_timestamp_seconds", "Unix time of the last cluster snapshot")
+
+    # -- updates ------------------------------------------------------------
+    def observe_run(self, run: dict) -> None:
+        """Fold in a parsed RunInfo (as a dict); each round is counted once."""
+        with self._lock:
+            status = run.get("status") or "idle"
+            for p in PHASES:
+                self.phase.set(1 if p == status else 0, p)
+            self.rounds_configured.set(run.get("num_rounds_configured", 0))
+            rounds = run.get("rounds", [])
+            self.round_current.set(max((r["round_num"] for r in rounds), default=0))
+            idle = [r for r in rounds if r.get("idle_frac") is not None]
+            if idle:
+                self.round_idle.set(max(idle, key=lambda r: r["round_num"])["idle_frac"])
+
+            run_id = run.get("run_id", "")
+            if not run_id:
+                return
+            if run_id != self._run_id:
+                self._run_id, self._counted = run_id, set()
+            for r in rounds:
+                key = (r["round_num"],)
+                for phase, clients, failures in (
+                    ("fit", r.get("fit_clients", 0), r.get("fit_failures", 0)),
+                    ("evaluate", r.get("eval_clients", 0), r.get("eval_failures", 0)),
+                ):
+                    if (clients or failures) and key + (phase,) not in self._counted:
+                        self._counted.add(key + (phase,))
+                        self.clients.inc(clients, phase)
+                        self.failures.inc(failures, phase)
+                        if phase == "fit":
+                            self.rounds.inc()
+                if r.get("duration_s") is not None and key + ("duration",) not in self._counted:
+                    self._counted.add(key + ("duration",))
+                    self.round_duration.observe(r["duration_s"])
+
+    def observe_nodes(self, nodes: list[dict], connected: int, timestamp: float) -> None:
+        """Replace the per-node gauges with the latest cluster snapshot."""
+        with self._lock:
+            self.node_up.clear()
+            self.node_cpu.clear()
+            self.node_mem.clear()
+            self.node_boot.clear()
+            for n in nodes:
+                self.node_up.set(1 if n.get("container_status") == "running" else 0,
+                                 n["name"], n["role"], n["ip"])
+                if n.get("cpu_percent") is not None:
+                    self.node_cpu.set(n["cpu_percent"], n["name"], n["role"])
+                if n.get("mem_used_mb") is not None:
+                    self.node_mem.set(n["mem_used_mb"] * 2**20, n["name"], n["role"])
+                for phase, seconds in (n.get("boot_timing") or {}).items():
+                    self.node_boot.set(seconds, n["name"], phase)
+            self.connected.set(connected)
+            self.snapshot_time.set(timestamp)
+
+    def observe_probe(self, method: str, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self.probe.observe(seconds, method, "ok" if ok else "error")
+
+    # -- exposition ---------------------------------------------------------
+    def render(self) -> str:
+        metrics = (
+            self.round_duration, self.rounds, self.clients, self.failures,
+            self.round_current, self.round_idle, self.rounds_configured, self.phase, self.connected,
+            self.node_up, self.node_cpu, self.node_mem, self.node_boot, self.probe, self.snapshot_time,
+        )
+        with self._lock:
+            lines = [line for m in metrics for line in m.render()]
+        return "\n".join(lines) + "\n"
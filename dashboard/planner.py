@@ -0,0 +1,368 @@
+"""
+Round-time capacity planner: predict a federated round before scaling.
+
+A synchronous round of the demo strategies (FedAvg family, every SuperNode
+fits then evaluates) is modelled as
+    compute        the slowest SuperNode's training and evaluation:
+                   samples / (per-vCPU throughput x vCPUs). The training
+                   split is divided evenly over the nodes; every node
+                   evaluates the whole test split, so evaluation does
+                   not shrink as N grows
+    communication  every node downloads the global model for fit and for
+                   evaluate and uploads one update, 3B bytes (B = 4 bytes
+                   per parameter), over its own link; the SuperLink's link
+                   carries all N of them: max(3B / node_bw, 3NB / superlink_bw)
+    aggregation    N updates of P parameters at agg_ns_per_param
+    overhead       fixed per-round cost: scheduling, ClientApp start-up
+Sweeping N from 1 to max_nodes gives the round-time curve. `best` is the
+fastest N; `efficient` the smallest N within 10% of it, which is what to
+scale the supernode role to when VMs cost money. With node_cost_per_hour
+each N also gets a cost per round.
+
+Calibration: given a recorded run's rounds (the `[METRICS]` lines'
+prof_train_s and prof_eval_s means, client counts and round wall times),
+the per-vCPU throughputs are measured, and the part of the round time
+that compute, communication and aggregation do not explain becomes the
+per-round overhead. The throughput defaults below are rough CPU figures.
+
+Standard library only, like inventory.py (a model's parameter count comes
+from its demo's NumPy-only init_params.py when NumPy is there). The
+dashboard serves it as GET /api/planner; from the command line:
+    python dashboard/planner.py --framework pytorch --vcpu 4 --max-nodes 64
+    python dashboard/planner.py --framework sklearn --log run.log --bandwidth-mbps 100
+    python dashboard/planner.py --check     # the model's own scaling checks
+"""
+
+import argparse
+import importlib.util
+import json
+import re
+import statistics
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Optional
+
+DEMO_BASE = Path(__file__).parent.parent / "demo"
+
+# Parameter counts of the demo models (init_params.initial_arrays)
+PARAMS = {"pytorch": 1_238_986, "tensorflow": 2_156_490, "sklearn": 1_578_506}
+# Rough CPU defaults: train and eval samples/s per vCPU, framework resident MB
+DEFAULT_RATES = {
+    "pytorch": (250.0, 1000.0, 1500),
+    "tensorflow": (200.0, 800.0, 2000),
+    "sklearn": (1500.0, 6000.0, 500),
+}
+BYTES_PER_PARAM = 4  # float32 on the wire
+SAMPLE_BYTES = 3072 * 4  # a CIFAR-10 image as float32
+EFFICIENT_SLACK = 0.10
+
+
+@dataclass
+class Workload:
+    framework: str = "pytorch"
+    params: int = PARAMS["pytorch"]
+    train_samples: int = 50_000  # CIFAR-10
+    test_samples: int = 10_000
+    epochs: int = 1
+
+
+@dataclass
+class Rates:
+    train_per_vcpu: float = DEFAULT_RATES["pytorch"][0]  # samples/s
+    eval_per_vcpu: float = DEFAULT_RATES["pytorch"][1]
+    node_mbps: float = 1000.0
+    superlink_mbps: float = 1000.0
+    agg_ns_per_param: float = 2.0  # flat-buffer FedAvg, see bench/aggregation_bench.py
+    overhead_s: float = 2.0
+    base_mb: int = DEFAULT_RATES["pytorch"][2]
+    calibrated_from: int = 0  # rounds used by calibrate()
+
+
+@dataclass
+class Prediction:
+    nodes: int
+    compute_s: float
+    communication_s: float
+    aggregation_s: float
+    overhead_s: float
+    round_s: float
+    memory_mb: int  # per node
+    fits: bool
+    cost_per_round: Optional[float] = None
+    notes: list = field(default_factory=list)
+
+
+def model_params(framework: str) -> int:
+    """Parameter count of a demo's model, from its init_params.py if NumPy is there."""
+    path = DEMO_BASE / framework / "flower_demo" / "init_params.py"
+    try:
+        spec = importlib.util.spec_from_file_location(f"planner_{framework}_init_params", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return int(sum(a.size for a in module.initial_arrays()))
+    except Exception:  # no NumPy on the dashboard host, or no such demo
+        return PARAMS.get(framework, PARAMS["pytorch"])
+
+
+def parse_count(text: str) -> int:
+    """'~1.24M' (MODEL_INFO style) -> 1240000."""
+    m = re.search(r"([\d.]+)\s*([KMB]?)", text.upper())
+    if not m:
+        raise ValueError(f"not a parameter count: {text!r}")
+    return int(float(m.group(1)) * {"": 1, "K": 1e3, "M": 1e6, "B": 1e9}[m.group(2)])
+
+
+def defaults(framework: str) -> tuple[Workload, Rates]:
+    train, evaluate, base_mb = DEFAULT_RATES.get(framework, DEFAULT_RATES["pytorch"])
+    return (Workload(framework=framework, params=model_params(framework)),
+            Rates(train_per_vcpu=train, eval_per_vcpu=evaluate, base_mb=base_mb))
+
+
+# ---------------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------------
+def _communication_s(work: Workload, rates: Rates, n: int) -> float:
+    per_node = 3 * work.params * BYTES_PER_PARAM
+    return max(per_node / (rates.node_mbps * 1e6 / 8), n * per_node / (rates.superlink_mbps * 1e6 / 8))
+
+
+def _memory_mb(work: Workload, rates: Rates, n: int) -> int:
+    # Framework, the node's share of the training data and the whole test
+    # split as float32, and the model four times over (weights, gradients,
+    # optimizer state, the update sent back)
+    data = (work.train_samples / n + work.test_samples) * SAMPLE_BYTES
+    model = 4 * work.params * BYTES_PER_PARAM
+    return int(rates.base_mb + (data + model) / 2**20)
+
+
+def predict(work: Workload, rates: Rates, vcpus: list[int], memory_mb: list[int],
+            node_cost_per_hour: float = 0.0) -> Prediction:
+    """One round on the given SuperNodes (one vCPU and memory figure per node)."""
+    n = len(vcpus)
+    slowest = max(1, min(vcpus))
+    # Each node trains on its 1/n of the training split but evaluates the
+    # full test split (the demos' ClientApps load the whole test set)
+    compute = (work.epochs * work.train_samples / n / (rates.train_per_vcpu * slowest)
+               + work.test_samples / (rates.eval_per_vcpu * slowest))
+    communication = _communication_s(work, rates, n)
+    aggregation = n * work.params * rates.agg_ns_per_param * 1e-9
+    total = compute + communication + aggregation + rates.overhead_s
+    memory = _memory_mb(work, rates, n)
+    p = Prediction(
+        nodes=n,
+        compute_s=round(compute, 3),
+        communication_s=round(communication, 3),
+        aggregation_s=round(aggregation, 3),
+        overhead_s=round(rates.overhead_s, 3),
+        round_s=round(total, 3),
+        memory_mb=memory,
+        fits=memory <= min(memory_mb),
+    )
+    if node_cost_per_hour:
+        p.cost_per_round = round(n * node_cost_per_hour * total / 3600, 4)
+    if len(set(vcpus)) > 1:
+        p.notes.append(f"nodes wait for the {slowest}-vCPU ones")
+    if communication > compute:
+        p.notes.append("communication-bound: the SuperLink link is the bottleneck"
+                       if n * rates.node_mbps > rates.superlink_mbps else "communication-bound")
+    return p
+
+
+def plan(work: Workload, rates: Rates, vcpu: int, memory_mb: int, max_nodes: int,
+         node_cost_per_hour: float = 0.0, current: Optional[tuple[list[int], list[int]]] = None) -> dict:
+    """Round time for 1..max_nodes SuperNodes of `vcpu`/`memory_mb`, and the best N."""
+    curve = [predict(work, rates, [vcpu] * n, [memory_mb] * n, node_cost_per_hour)
+             for n in range(1, max_nodes + 1)]
+    fitting = [p for p in curve if p.fits] or curve
+    best = min(fitting, key=lambda p: p.round_s)
+    efficient = next(p for p in fitting if p.round_s <= best.round_s * (1 + EFFICIENT_SLACK))
+    out = {
+        "workload": asdict(work),
+        "rates": asdict(rates),
+        "node": {"vcpu": vcpu, "memory_mb": memory_mb},
+        "best": asdict(best),
+        "efficient": asdict(efficient),
+        "curve": [asdict(p) for p in curve],
+    }
+    if current and current[0]:
+        out["current"] = asdict(predict(work, rates, *current, node_cost_per_hour))
+    return out
+
+
+def check(work: Workload, rates: Rates, vcpu: int, memory_mb: int, max_nodes: int) -> list[str]:
+    """What is wrong with the model's scaling ([] when nothing).
+
+    Evaluation must not speed up with more nodes (each evaluates the whole
+    test split), training must shrink as 1/N, and calibrating from the
+    model's own predictions must give back the rates it started from.
+    """
+    problems = []
+    eval_only = replace(work, train_samples=0)
+    evals = {predict(eval_only, rates, [vcpu] * n, [memory_mb] * n).compute_s for n in range(1, max_nodes + 1)}
+    if len(evals) > 1:
+        problems.append(f"predicted eval time changes with N: {sorted(evals)}")
+    train_only = replace(work, test_samples=0)
+    one = predict(train_only, rates, [vcpu], [memory_mb]).compute_s
+    last = predict(train_only, rates, [vcpu] * max_nodes, [memory_mb] * max_nodes).compute_s
+    if abs(last * max_nodes - one) > 0.01 * one + 0.01:
+        problems.append(f"predicted train time at N={max_nodes} is {last}s, not 1/N of {one}s")
+    recorded = [{"clients": n,
+                 "train_s": work.epochs * work.train_samples / n / (rates.train_per_vcpu * vcpu),
+                 "eval_s": work.test_samples / (rates.eval_per_vcpu * vcpu),
+                 "duration_s": None} for n in (1, max(1, max_nodes // 2), max_nodes)]
+    calibrated = calibrate(work, rates, recorded, vcpu)
+    for name in ("train_per_vcpu", "eval_per_vcpu"):
+        if abs(getattr(calibrated, name) - getattr(rates, name)) > 1e-6 * getattr(rates, name):
+            problems.append(f"calibrate() turns {name} {getattr(rates, name)} into {getattr(calibrated, name)}")
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# Calibration
+# ---------------------------------------------------------------------------
+def calibrate(work: Workload, rates: Rates, rounds: list[dict], vcpu: int) -> Rates:
+    """Rates measured from recorded rounds.
+
+    Each round is {"clients", "train_s", "eval_s", "duration_s"}: fit
+    clients, mean client train and eval seconds, wall time (any may be
+    None). Throughputs come from rounds with client timings, the overhead
+    from rounds that also have a wall time.
+    """
+    train, evaluate, overhead = [], [], []
+    for r in rounds:
+        n = r.get("clients") or 0
+        if not n:
+            continue
+        if r.get("train_s"):
+            train.append(work.epochs * work.train_samples / n / r["train_s"] / vcpu)
+        if r.get("eval_s"):
+            evaluate.append(work.test_samples / r["eval_s"] / vcpu)
+    out = replace(
+        rates,
+        train_per_vcpu=statistics.median(train) if train else rates.train_per_vcpu,
+        eval_per_vcpu=statistics.median(evaluate) if evaluate else rates.eval_per_vcpu,
+    )
+    for r in rounds:
+        n = r.get("clients") or 0
+        if n and r.get("duration_s") and r.get("train_s"):
+            explained = (r["train_s"] + (r.get("eval_s") or 0) + _communication_s(work, out, n)
+                         + n * work.params * out.agg_ns_per_param * 1e-9)
+            overhead.append(max(0.0, r["duration_s"] - explained))
+    if overhead:
+        out.overhead_s = statistics.median(overhead)
+    out.calibrated_from = len(train)
+    return out
+
+
+def rounds_from_run(rounds: list[dict]) -> list[dict]:
+    """Calibration rounds from the dashboard's RunInfo.rounds."""
+    return [{
+        "clients": r.get("fit_clients") or 0,
+        "train_s": r.get("phase_timings", {}).get("fit", {}).get("train"),
+        "eval_s": r.get("phase_timings", {}).get("evaluate", {}).get("eval"),
+        "duration_s": r.get("duration_s"),
+    } for r in rounds]
+
+
+def rounds_from_log(lines: list[str]) -> list[dict]:
+    """Calibration rounds from a SuperLink log (`docker logs --timestamps` or `flwr log`).
+
+    Wall times need the Docker timestamps; without them only throughputs
+    are calibrated.
+    """
+    from logstream import log_time
+
+    rounds: dict[int, dict] = {}
+    current = 0
+    for line in lines:
+        m = re.search(r"\[ROUND (\d+)\]", line)
+        if m:
+            current = int(m.group(1))
+            rounds[current] = {"clients": 0, "train_s": None, "eval_s": None,
+                               "duration_s": None, "_start": log_time(line), "_end": None}
+            continue
+        r = rounds.get(current)
+        if r is None:
+            continue
+        m = re.search(r"aggregate_(fit|evaluate): received (\d+) results?", line)
+        if m:
+            if m.group(1) == "fit":
+                r["clients"] = int(m.group(2))
+            r["_end"] = log_time(line)
+        m = re.search(r"\[METRICS\] (fit|evaluate) (\{.*\})", line)
+        if m:
+            try:
+                metrics = json.loads(m.group(2))
+            except json.JSONDecodeError:
+                continue
+            key, phase = ("train_s", "prof_train_s_mean") if m.group(1) == "fit" else ("eval_s", "prof_eval_s_mean")
+            r[key] = metrics.get(phase)
+    out = []
+    for r in rounds.values():
+        start, end = r.pop("_start"), r.pop("_end")
+        if start is not None and end is not None:
+            r["duration_s"] = end - start
+        out.append(r)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--framework", choices=sorted(PARAMS), default="pytorch")
+    parser.add_argument("--params", help="parameter count instead of the demo model's, e.g. 7.5M")
+    parser.add_argument("--train-samples", type=int, default=Workload.train_samples)
+    parser.add_argument("--test-samples", type=int, default=Workload.test_samples)
+    parser.add_argument("--epochs", type=int, default=Workload.epochs)
+    parser.add_argument("--vcpu", type=int, default=2, help="vCPUs per SuperNode")
+    parser.add_argument("--memory-mb", type=int, default=4096, help="memory per SuperNode")
+    parser.add_argument("--max-nodes", type=int, default=32)
+    parser.add_argument("--bandwidth-mbps", type=float, default=Rates.node_mbps, help="per SuperNode")
+    parser.add_argument("--superlink-mbps", type=float, default=Rates.superlink_mbps)
+    parser.add_argument("--train-rate", type=float, help="train samples/s per vCPU (default: calibrated or rough)")
+    parser.add_argument("--node-cost", type=float, default=0.0, help="cost per SuperNode-hour")
+    parser.add_argument("--log", type=Path, help="SuperLink log of a recorded run, to calibrate from")
+    parser.add_argument("--json", action="store_true", help="print the whole plan as JSON")
+    parser.add_argument("--check", action="store_true",
+                        help="check the model's scaling and calibration instead of planning")
+    args = parser.parse_args()
+
+    work, rates = defaults(args.framework)
+    work = replace(work, train_samples=args.train_samples, test_samples=args.test_samples, epochs=args.epochs)
+    if args.params:
+        work.params = parse_count(args.params)
+    rates = replace(rates, node_mbps=args.bandwidth_mbps, superlink_mbps=args.superlink_mbps)
+    if args.log:
+        rates = calibrate(work, rates, rounds_from_log(args.log.read_text().splitlines()), args.vcpu)
+    if args.train_rate:
+        rates.train_per_vcpu = args.train_rate
+
+    if args.check:
+        problems = check(work, rates, args.vcpu, args.memory_mb, args.max_nodes)
+        for p in problems:
+            print(f"FAIL {p}")
+        print("ok" if not problems else f"{len(problems)} problem(s)")
+        raise SystemExit(1 if problems else 0)
+
+    result = plan(work, rates, args.vcpu, args.memory_mb, args.max_nodes, args.node_cost)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{work.framework}: {work.params / 1e6:.2f}M parameters, {work.train_samples} train samples, "
+          f"{args.vcpu} vCPU / {args.memory_mb} MB per node"
+          + (f", calibrated from {rates.calibrated_from} rounds" if rates.calibrated_from else ""))
+    print(f"{'nodes':>5} {'round s':>8} {'compute':>8} {'comm':>7} {'agg':>6} {'mem MB':>7}"
+          + (f" {'cost':>8}" if args.node_cost else ""))
+    for p in result["curve"]:
+        mark = " <- best" if p["nodes"] == result["best"]["nodes"] else \
+            " <- efficient" if p["nodes"] == result["efficient"]["nodes"] else ""
+        print(f"{p['nodes']:>5} {p['round_s']:>8.2f} {p['compute_s']:>8.2f} {p['communication_s']:>7.2f} "
+              f"{p['aggregation_s']:>6.2f} {p['memory_mb']:>7}{'' if p['fits'] else '!'}"
+              + (f" {p['cost_per_round']:>8.4f}" if args.node_cost else "") + mark)
+
+
+if __name__ == "__main__":
+    main()
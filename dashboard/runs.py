@@ -0,0 +1,249 @@
+"""
+Training run queue for the dashboard: priority FIFO, concurrency limit,
+one state object per run.
+
+The SuperLink holds several runs at once, but every SuperNode runs a single
+framework image, and switching it restarts the SuperNode containers under
+whatever is training. So the scheduler only starts runs side by side when
+they use the same framework; a run for another framework waits at the head
+of the queue until the running ones finish (runs behind it wait too, so it
+is never starved), then switches the cluster and starts.
+
+Order: higher `priority` first, then submission order. Settings:
+FL_MAX_CONCURRENT_RUNS (default 2), FL_RUN_HISTORY (finished runs kept,
+default 20), FL_RUN_OUTPUT_LINES (log lines kept per run, default 5000).
+
+Standard library only, like inventory.py. How a run is executed (framework
+switch, `flwr run`, log tailing) is the dashboard's `launch(run)` coroutine,
+run as a task on the dashboard's event loop.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from logstream import LineBuffer
+
+MAX_CONCURRENT_RUNS = int(os.environ.get("FL_MAX_CONCURRENT_RUNS", "2"))
+RUN_HISTORY = int(os.environ.get("FL_RUN_HISTORY", "20"))
+
+# queued -> starting [-> switching] -> submitting -> running -> completed | failed | stopped
+ACTIVE_STATES = ("starting", "switching", "submitting", "running")
+FINISHED_STATES = ("completed", "failed", "stopped")
+
+RUN_OUTPUT_LINES = int(os.environ.get("FL_RUN_OUTPUT_LINES", "5000"))
+
+# TrainingRequest fields -> the demo apps' run-config keys
+RUN_CONFIG_KEYS = {
+    "num_rounds": "num-server-rounds",
+    "local_epochs": "local-epochs",
+    "batch_size": "batch-size",
+    "strategy": "strategy",
+    "min_fit_clients": "min-fit-clients",
+    "min_available_clients": "min-available-clients",
+}
+
+
+def run_config(request: dict) -> dict:
+    """A training request (TrainingRequest fields) as run-config keys and values."""
+    config = {key: request[name] for name, key in RUN_CONFIG_KEYS.items() if name in request}
+    config.update(request.get("extra_config", {}))
+    return config
+
+
+def format_run_config(config: dict) -> str:
+    """The `flwr run --run-config` string: strings double-quoted, TOML booleans."""
+    def _cfg(k, v):
+        if isinstance(v, bool):
+            return f"{k}={str(v).lower()}"
+        if isinstance(v, str):
+            return f'{k}="{v}"'
+        return f"{k}={v}"
+
+    return " ".join(_cfg(k, v) for k, v in config.items())
+
+
+@dataclass
+class Run:
+    """One submission: its request, where it is in its life, and its log."""
+
+    framework: str
+    config: dict
+    priority: int = 0
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    state: str = "queued"
+    flwr_run_id: str = ""  # the SuperLink's id, once `flwr run` submitted it
+    message: str = ""
+    exit_code: Optional[int] = None
+    switch_timing: dict = field(default_factory=dict)
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # asyncio subprocess currently working for this run (`flwr run`, then `flwr log`)
+    process: object = field(default=None, repr=False)
+    stop_requested: bool = False
+    # Everything shown in the run's log stream, read by offset (logstream.py)
+    output: LineBuffer = field(default_factory=lambda: LineBuffer(RUN_OUTPUT_LINES), repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def log(self, line: str) -> None:
+        self.output.append(line)
+
+    def tail(self, n: int = 20) -> list[str]:
+        return self.output.tail(n)
+
+    def summary(self, lines: int = 0) -> dict:
+        now = time.time()
+        end = self.finished_at or now
+        out = {
+            "run_id": self.run_id,
+            "flwr_run_id": self.flwr_run_id,
+            "state": self.state,
+            "framework": self.framework,
+            "priority": self.priority,
+            "config": self.config,
+            "message": self.message,
+            "exit_code": self.exit_code,
+            "switch_timing": self.switch_timing,
+            "submitted_at": self.submitted_at,
+            "waited_s": round((self.started_at or now) - self.submitted_at, 1),
+            "elapsed_s": round(end - self.started_at, 1) if self.started_at else 0.0,
+        }
+        if lines:
+            out["lines"] = self.tail(lines)
+        return out
+
+
+class RunScheduler:
+    """Thread-safe run queue in front of `launch(run)`.
+
+    `launch` is a coroutine that runs to the end of the run and sets its
+    final state; the scheduler then fills the freed slot. `submit` must be
+    called on the event loop the launches run on.
+    """
+
+    def __init__(self, launch, max_concurrent: int = MAX_CONCURRENT_RUNS, history: int = RUN_HISTORY):
+        self.max_concurrent = max(1, max_concurrent)
+        self._launch = launch
+        self._lock = threading.Lock()
+        self._queue: list[tuple[int, int, Run]] = []  # (-priority, seq, run)
+        self._seq = itertools.count()
+        self._active: dict[str, Run] = {}
+        self._finished: deque = deque(maxlen=history)
+        self._framework = ""  # framework of the active runs
+        self._tasks: set[asyncio.Task] = set()  # launches in flight (the loop keeps weak refs)
+
+    # -- submission ---------------------------------------------------------
+    def submit(self, run: Run) -> Run:
+        with self._lock:
+            heapq.heappush(self._queue, (-run.priority, next(self._seq), run))
+        self._dispatch()
+        if run.state == "queued":
+            run.log(f"--- Queued at position {self.position(run.run_id)} ---")
+        return run
+
+    def stop(self, run_id: str) -> Optional[Run]:
+        """Drop a queued run, or flag an active one (the caller interrupts it)."""
+        with self._lock:
+            for i, (_, _, run) in enumerate(self._queue):
+                if run.run_id == run_id:
+                    self._queue.pop(i)
+                    heapq.heapify(self._queue)
+                    self._finish(run, "stopped", "removed from the queue")
+                    return run
+            run = self._active.get(run_id)
+            if run is not None:
+                run.stop_requested = True
+            return run
+
+    def clear_history(self) -> None:
+        with self._lock:
+            self._finished.clear()
+
+    # -- queries ------------------------------------------------------------
+    def get(self, run_id: str) -> Optional[Run]:
+        with self._lock:
+            if run_id in self._active:
+                return self._active[run_id]
+            for run in itertools.chain((r for _, _, r in self._queue), self._finished):
+                if run.run_id == run_id:
+                    return run
+        return None
+
+    def queued(self) -> list[Run]:
+        with self._lock:
+            return [run for _, _, run in sorted(self._queue, key=lambda e: e[:2])]
+
+    def active(self) -> list[Run]:
+        with self._lock:
+            return sorted(self._active.values(), key=lambda r: r.started_at or 0)
+
+    def finished(self) -> list[Run]:
+        with self._lock:
+            return list(self._finished)
+
+    def position(self, run_id: str) -> int:
+        """1-based place in the queue, 0 if not queued."""
+        for i, run in enumerate(self.queued(), 1):
+            if run.run_id == run_id:
+                return i
+        return 0
+
+    def busy(self) -> bool:
+        with self._lock:
+            return bool(self._active or self._queue)
+
+    # -- dispatch -----------------------------------------------------------
+    def _dispatch(self) -> None:
+        started = []
+        with self._lock:
+            while self._queue and len(self._active) < self.max_concurrent:
+                run = self._queue[0][2]
+                if self._active and run.framework != self._framework:
+                    break
+                heapq.heappop(self._queue)
+                self._framework = run.framework
+                run.state = "starting"
+                run.started_at = time.time()
+                self._active[run.run_id] = run
+                started.append(run)
+        loop = asyncio.get_running_loop() if started else None
+        for run in started:
+            task = loop.create_task(self._work(run))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _work(self, run: Run) -> None:
+        try:
+            await self._launch(run)
+        except Exception as e:
+            run.log(f"--- Run failed: {e} ---")
+            run.state, run.message = "failed", str(e)
+        with self._lock:
+            self._active.pop(run.run_id, None)
+            if not run.finished:
+                run.state = "stopped" if run.stop_requested else "failed"
+            self._finish(run, run.state, run.message)
+        self._dispatch()
+
+    def _finish(self, run: Run, state: str, message: str) -> None:
+        # Caller holds self._lock
+        run.state, run.message = state, message
+        run.finished_at = time.time()
+        run.process = None
+        run.output.close()
+        self._finished.appendleft(run)
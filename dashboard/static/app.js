@@ -6,6 +6,7 @@ let prevData = null;
 let clusterFramework = '';
 const FW_LABELS = { pytorch: 'PyTorch', tensorflow: 'TensorFlow', sklearn: 'scikit-learn' };
 let sseSource = null;
+let currentRunId = '';  // run this page follows (log, stop button)
 let trainingActive = false;
 let logAutoScroll = true;
 let statusPollTimer = null;
@@ -30,6 +31,24 @@ function showToast(message, type = 'success') {
 // =========================================================================
 // Topology Renderer (animated SVG)
 // =========================================================================
+// "VM 12 · 4 vCPU · 8 GB", plus live container CPU/memory when the node's
+// metrics agent reported them, and the boot time a SuperNode published
+function formatVmInfo(n) {
+  let info = `VM ${n.vm_id} \u00b7 ${n.cpu} vCPU \u00b7 ${(n.memory_mb / 1024).toFixed(0)} GB`;
+  if (n.cpu_percent != null) info += ` \u00b7 ${n.cpu_percent.toFixed(0)}% CPU`;
+  if (n.mem_used_mb != null) info += ` \u00b7 ${(n.mem_used_mb / 1024).toFixed(1)} GB used`;
+  const boot = n.boot_timing || {};
+  if (boot.ready != null) info += ` \u00b7 ready in ${boot.ready.toFixed(0)}s`;
+  return info;
+}
+
+// Tooltip with the boot phases, "discover 3.2s, tls 0.4s, ..." ('' if none)
+function formatBootTiming(n) {
+  const phases = Object.entries(n.boot_timing || {}).filter(([p]) => p !== 'ready');
+  if (!phases.length) return '';
+  return 'Boot: ' + phases.map(([p, s]) => `${p} ${s.toFixed(1)}s`).join(', ');
+}
+
 function renderTopology(nodes, connectedCount, runStatus) {
   const svg = document.getElementById('topology-canvas');
   const isDark = document.documentElement.getAttribute('data-theme') === 'dark';
@@ -115,7 +134,7 @@ function renderTopology(nodes, connectedCount, runStatus) {
         <text x="-30" y="-6" font-size="13" font-weight="600" fill="${textPrimary}" font-family="Inter,sans-serif">Coordinator</text>
         <text x="-30" y="10" font-size="10" fill="${textSecondary}" font-family="JetBrains Mono,monospace">${coordinator.ip || '\u2014'}</text>
       </g>`;
-    html += `<text x="${cx}" y="${cy + 46}" text-anchor="middle" font-size="10" fill="${textTertiary}" font-family="Inter,sans-serif">VM ${coordinator.vm_id} \u00b7 ${coordinator.cpu} vCPU \u00b7 ${(coordinator.memory_mb / 1024).toFixed(0)} GB</text>`;
+    html += `<text x="${cx}" y="${cy + 46}" text-anchor="middle" font-size="10" fill="${textTertiary}" font-family="Inter,sans-serif">${formatVmInfo(coordinator)}</text>`;
   }
 
   // Worker nodes
@@ -137,8 +156,9 @@ function renderTopology(nodes, connectedCount, runStatus) {
     const fw = w.framework || '';
     const fwColor = fwColors[fw] || textTertiary;
     const fwLabel = fwLabels[fw] || '';
-    const vmInfo = `VM ${w.vm_id} \u00b7 ${w.cpu} vCPU \u00b7 ${(w.memory_mb / 1024).toFixed(0)} GB`;
-    html += `<text x="${wx}" y="${workerY + 42}" text-anchor="middle" font-size="10" fill="${textTertiary}" font-family="Inter,sans-serif">${vmInfo}</text>`;
+    const vmInfo = formatVmInfo(w);
+    const bootInfo = formatBootTiming(w);
+    html += `<text x="${wx}" y="${workerY + 42}" text-anchor="middle" font-size="10" fill="${textTertiary}" font-family="Inter,sans-serif">${bootInfo ? `<title>${bootInfo}</title>` : ''}${vmInfo}</text>`;
     if (fwLabel) {
       html += `<text x="${wx}" y="${workerY + 56}" text-anchor="middle" font-size="10" font-weight="600" fill="${fwColor}" font-family="Inter,sans-serif">${fwLabel}</text>`;
     }
@@ -237,6 +257,16 @@ function renderLossChart(rounds) {
 // =========================================================================
 // Rounds Table
 // =========================================================================
+function formatPhaseTimings(phases, idleFrac) {
+  // Mean client seconds per fit phase, slowest first, then the round's idle share
+  const fit = (phases && phases.fit) || {};
+  const entries = Object.entries(fit).sort((a, b) => b[1] - a[1]);
+  if (entries.length === 0) return '--';
+  const parts = entries.map(([name, secs]) => `${name.replace(/_/g, ' ')} ${secs.toFixed(1)}s`);
+  if (idleFrac !== null && idleFrac !== undefined) parts.push(`idle ${Math.round(idleFrac * 100)}%`);
+  return parts.join(' \u00b7 ');
+}
+
 function renderRoundsTable(rounds) {
   const el = document.getElementById('rounds-table');
   if (!rounds || rounds.length === 0) {
@@ -250,6 +280,7 @@ function renderRoundsTable(rounds) {
         <th class="text-right px-5 py-3 text-[11px] font-medium text-[var(--text-tertiary)] uppercase tracking-wider">Loss</th>
         <th class="text-right px-5 py-3 text-[11px] font-medium text-[var(--text-tertiary)] uppercase tracking-wider">Clients</th>
         <th class="text-right px-5 py-3 text-[11px] font-medium text-[var(--text-tertiary)] uppercase tracking-wider">Eval</th>
+        <th class="text-right px-5 py-3 text-[11px] font-medium text-[var(--text-tertiary)] uppercase tracking-wider">Fit time</th>
       </tr></thead>
       <tbody>
         ${rounds.map(r => `
@@ -262,6 +293,7 @@ function renderRoundsTable(rounds) {
             <td class="px-5 py-3 text-right">
               <span class="text-[var(--green)]">${r.eval_clients}</span>${r.eval_failures > 0 ? `<span class="text-[var(--red)]"> / ${r.eval_failures}</span>` : ''}
             </td>
+            <td class="px-5 py-3 text-right mono text-xs text-[var(--text-secondary)]">${formatPhaseTimings(r.phase_timings, r.idle_frac)}</td>
           </tr>`).join('')}
       </tbody>
     </table>`;
@@ -459,12 +491,19 @@ async function loadFrameworks() {
 function handleFrameworkChange() {
   // pytorch / tensorflow / sklearn all use the standard epoch-based config
   document.getElementById('cp-epochs-group').classList.remove('hidden');
+  // Start copying the other framework's image to the SuperNodes now, so the
+  // switch on "Start" only has to swap containers
+  const framework = document.getElementById('cp-framework').value;
+  if (clusterFramework && framework && framework !== clusterFramework) {
+    fetch(`/api/frameworks/${framework}/prewarm`, { method: 'POST' }).catch(() => {});
+  }
 }
 
 function handleStrategyChange() {
   const strategy = document.getElementById('cp-strategy').value;
   document.getElementById('cp-fedprox-params').classList.toggle('hidden', strategy !== 'FedProx');
-  document.getElementById('cp-fedadam-params').classList.toggle('hidden', strategy !== 'FedAdam');
+  document.getElementById('cp-fedadam-params').classList.toggle('hidden', strategy !== 'FedAdam' && strategy !== 'FedYogi');
+  document.getElementById('cp-fedavgm-params').classList.toggle('hidden', strategy !== 'FedAvgM');
 }
 
 // =========================================================================
@@ -481,9 +520,12 @@ async function startTraining() {
   const extra_config = {};
   if (strategy === 'FedProx') {
     extra_config['proximal-mu'] = parseFloat(document.getElementById('cp-proximal-mu').value) || 1.0;
-  } else if (strategy === 'FedAdam') {
+  } else if (strategy === 'FedAdam' || strategy === 'FedYogi') {
     extra_config['server-lr'] = parseFloat(document.getElementById('cp-server-lr').value) || 0.01;
     extra_config['tau'] = parseFloat(document.getElementById('cp-tau').value) || 0.1;
+  } else if (strategy === 'FedAvgM') {
+    const momentum = parseFloat(document.getElementById('cp-server-momentum').value);
+    extra_config['server-momentum'] = Number.isNaN(momentum) ? 0.9 : momentum;
   }
 
   const body = {
@@ -520,14 +562,6 @@ async function startTraining() {
       body: JSON.stringify(body),
     });
 
-    if (res.status === 409) {
-      showToast('Training is already running', 'error');
-      startBtn.textContent = origText;
-      startBtn.disabled = false;
-      startBtn.style.opacity = '1';
-      startBtn.style.cursor = 'pointer';
-      return;
-    }
     if (!res.ok) {
       const err = await res.json().catch(() => ({}));
       showToast(err.detail || 'Failed to start training', 'error');
@@ -539,11 +573,10 @@ async function startTraining() {
     }
 
     const result = await res.json();
-    if (result.switched) {
-      clusterFramework = framework;
-    }
-
-    showToast('Training started');
+    currentRunId = result.run_id;
+    showToast(result.status === 'queued'
+      ? `Training queued (position ${result.position})`
+      : 'Training started');
     startBtn.textContent = origText;
     sseCurrentRound = 0;
     sseConfiguredRounds = body.num_rounds;
@@ -560,8 +593,9 @@ async function startTraining() {
 }
 
 async function stopTraining() {
+  const url = currentRunId ? `/api/runs/${currentRunId}/stop` : '/api/training/stop';
   try {
-    const res = await fetch('/api/training/stop', { method: 'POST' });
+    const res = await fetch(url, { method: 'POST' });
     if (res.ok) {
       showToast('Training stopped');
       setTrainingActive(false);
@@ -602,6 +636,7 @@ async function newTraining() {
   }
 
   // Reset SSE round tracking
+  currentRunId = '';
   sseCurrentRound = 0;
   sseConfiguredRounds = 0;
 
@@ -616,18 +651,16 @@ async function newTraining() {
 }
 
 function setTrainingActive(active) {
+  // Start stays enabled: further runs are queued by the dashboard
   trainingActive = active;
   const startBtn = document.getElementById('cp-start-btn');
   const stopBtn = document.getElementById('cp-stop-btn');
+  startBtn.disabled = false;
+  startBtn.style.opacity = '1';
+  startBtn.style.cursor = 'pointer';
   if (active) {
-    startBtn.disabled = true;
-    startBtn.style.opacity = '0.5';
-    startBtn.style.cursor = 'not-allowed';
     stopBtn.classList.remove('hidden');
   } else {
-    startBtn.disabled = false;
-    startBtn.style.opacity = '1';
-    startBtn.style.cursor = 'pointer';
     stopBtn.classList.add('hidden');
   }
 }
@@ -640,7 +673,7 @@ function connectSSE() {
   const log = document.getElementById('cp-log');
   log.textContent = '';
 
-  sseSource = new EventSource('/api/training/log');
+  sseSource = new EventSource(currentRunId ? `/api/runs/${currentRunId}/log` : '/api/training/log');
 
   sseSource.onmessage = (event) => {
     try {
@@ -668,8 +701,13 @@ function connectSSE() {
     }
   };
 
-  sseSource.addEventListener('complete', () => {
-    appendLogLine('\n--- Training complete ---', 'success');
+  sseSource.addEventListener('complete', (event) => {
+    const end = JSON.parse(event.data || '{}');
+    if (end.state && end.state !== 'completed') {
+      appendLogLine(`\n--- Training ${end.state}${end.message ? ': ' + end.message : ''} ---`, 'error');
+    } else {
+      appendLogLine('\n--- Training complete ---', 'success');
+    }
     disconnectSSE();
     setTrainingActive(false);
     stopStatusPolling();
@@ -736,10 +774,10 @@ function stopStatusPolling() {
 
 async function pollTrainingStatus() {
   try {
-    const res = await fetch('/api/training/status');
+    const res = await fetch(currentRunId ? `/api/runs/${currentRunId}` : '/api/training/status');
     const data = await res.json();
 
-    if (!data.active) {
+    if (currentRunId ? ['completed', 'failed', 'stopped'].includes(data.state) : !data.active) {
       setTrainingActive(false);
       stopStatusPolling();
       disconnectSSE();
@@ -868,6 +906,7 @@ async function checkTrainingState() {
     const res = await fetch('/api/training/status');
     const data = await res.json();
     if (data.active) {
+      currentRunId = data.run_id;
       setTrainingActive(true);
       connectSSE();
       startStatusPolling();
@@ -0,0 +1,355 @@
+"""
+Hyperparameter sweeps over the demo apps' training parameters, run with `flwr run`.
+
+Each trial is one `flwr run` of a demo with its own run config, built the
+same way the dashboard's /api/training/start builds one (runs.py), so any
+TrainingRequest field (num_rounds, strategy, local_epochs, batch_size) or
+run-config key (proximal-mu, server-lr, tau, ...) can be swept. Per-round
+scores come from the `[METRICS] evaluate {...}` line the demo strategies log
+once per round, read from the run's streamed SuperLink output.
+
+Search methods:
+    grid      every combination of the listed values, each to --rounds
+    random    --trials samples; `lo:hi` (uniform) and `lo:hi:log` ranges allowed
+    halving   successive halving: --trials samples run --min-rounds, the best
+              1/--eta go on to eta times as many rounds, and so on to --rounds.
+              Survivors resume from their own checkpoint (resume = true), so a
+              promoted trial only trains the rounds it has not done yet.
+
+Grid and random trials are stopped early by the median rule: after
+--grace-rounds, a trial whose score at round r is worse than the median of
+the other trials' scores at r is stopped (`--no-early-stop` turns it off).
+Fewer trials should run concurrently (--parallel) than there are in total,
+so there are peers to compare against.
+
+Usage (from the repository root; the demo installed, `flwr` on PATH or in
+demo/.venv):
+    python dashboard/sweep.py --demo pytorch --federation local-sim \\
+        --set synthetic-data=true --param local_epochs=1,2 --param batch_size=32,64
+    python dashboard/sweep.py --demo pytorch --method halving --trials 9 --rounds 9 \\
+        --param strategy=FedProx --param proximal-mu=0.001:1:log --parallel 3
+
+Against the appliance cluster (`--federation opennebula`, the default) the
+Control API tunnel and CA must be in place as for `flwr run` by hand, and
+checkpoints go to the SuperLink's state volume.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import product
+from pathlib import Path
+from typing import Optional
+
+from runs import RUN_CONFIG_KEYS, format_run_config
+
+DEMO_BASE = Path(__file__).resolve().parent.parent / "demo"
+VENV_FLWR = DEMO_BASE / ".venv" / "bin" / "flwr"
+REMOTE_CHECKPOINT_ROOT = "/app/state/checkpoints/sweeps"
+
+_ROUND = re.compile(r"\[ROUND (\d+)\]")
+_EVALUATE = re.compile(r"\[METRICS\] evaluate (\{.*\})")
+_STARTED = re.compile(r"Successfully started run (\d+)")
+
+
+# ---------------------------------------------------------------------------
+# Search space
+# ---------------------------------------------------------------------------
+def _value(text: str):
+    """A run-config value from the command line: bool, int, float or string."""
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+@dataclass
+class Param:
+    """One swept run-config key: a list of choices, or a numeric range."""
+
+    key: str
+    choices: list = field(default_factory=list)
+    low: float = 0.0
+    high: float = 0.0
+    log: bool = False
+
+    @classmethod
+    def parse(cls, spec: str) -> "Param":
+        """`name=a,b,c`, `name=lo:hi` or `name=lo:hi:log`; name as in TrainingRequest or run config."""
+        name, sep, values = spec.partition("=")
+        if not sep or not values:
+            raise ValueError(f"expected name=values, got '{spec}'")
+        key = RUN_CONFIG_KEYS.get(name, name)
+        parts = values.split(":")
+        if len(parts) in (2, 3) and all(isinstance(_value(p), (int, float)) for p in parts[:2]):
+            if len(parts) == 3 and parts[2] != "log":
+                raise ValueError(f"range '{values}': the third field can only be 'log'")
+            low, high = float(parts[0]), float(parts[1])
+            if len(parts) == 3 and low <= 0:
+                raise ValueError(f"range '{values}': a log range must be positive")
+            return cls(key, low=low, high=high, log=len(parts) == 3)
+        return cls(key, choices=[_value(v) for v in values.split(",")])
+
+    def sample(self, rng: random.Random):
+        if self.choices:
+            return rng.choice(self.choices)
+        if self.log:
+            return round(math.exp(rng.uniform(math.log(self.low), math.log(self.high))), 6)
+        return round(rng.uniform(self.low, self.high), 6)
+
+
+def grid(params: list[Param]) -> list[dict]:
+    for p in params:
+        if not p.choices:
+            raise ValueError(f"grid search needs a list of values for '{p.key}', not a range")
+    return [dict(zip((p.key for p in params), combo)) for combo in product(*(p.choices for p in params))]
+
+
+def sample(params: list[Param], n: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [{p.key: p.sample(rng) for p in params} for _ in range(n)]
+
+
+# ---------------------------------------------------------------------------
+# Trials
+# ---------------------------------------------------------------------------
+@dataclass
+class Trial:
+    trial_id: int
+    config: dict
+    # pending -> running -> done | stopped (early) | pruned (halving) | failed
+    state: str = "pending"
+    rounds_done: int = 0
+    scores: dict = field(default_factory=dict)  # round -> evaluate metric
+    round_wall_s: dict = field(default_factory=dict)  # round -> seconds
+    wall_s: float = 0.0
+    flwr_run_ids: list = field(default_factory=list)
+    message: str = ""
+
+    @property
+    def name(self) -> str:
+        return f"trial-{self.trial_id:03d}"
+
+    def score(self) -> Optional[float]:
+        return self.scores[max(self.scores)] if self.scores else None
+
+
+class Sweep:
+    """Runs trials with `flwr run`, at most `parallel` at a time."""
+
+    def __init__(self, args, trials: list[Trial]):
+        self.args = args
+        self.trials = trials
+        self.demo_dir = DEMO_BASE / args.demo
+        self.flwr = args.flwr or (str(VENV_FLWR) if VENV_FLWR.exists() else "flwr")
+        self.out_dir = Path(args.out_dir).resolve()
+        self.checkpoint_root = args.checkpoint_root or (
+            str(self.out_dir / "checkpoints") if args.federation == "local-sim" else REMOTE_CHECKPOINT_ROOT
+        )
+        self.sign = 1 if args.mode == "max" else -1
+        self._lock = threading.Lock()
+
+    def better(self, a: float, b: float) -> bool:
+        return self.sign * a > self.sign * b
+
+    # -- one flwr run -------------------------------------------------------
+    def run_trial(self, trial: Trial, rounds: int, early_stop: bool) -> Trial:
+        """Train `trial` up to `rounds` rounds in total, resuming from its checkpoint."""
+        offset = trial.rounds_done
+        config = {
+            **self.args.fixed,
+            **trial.config,
+            "num-server-rounds": rounds,
+            "checkpoint-every": 1,
+            "checkpoint-dir": f"{self.checkpoint_root}/{self.args.sweep_id}/{trial.name}",
+            "resume": offset > 0,
+        }
+        cmd = [self.flwr, "run", ".", self.args.federation,
+               "--run-config", format_run_config(config), "--stream"]
+        trial.state = "running"
+        started = time.monotonic()
+        round_start = started
+        current = offset
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.out_dir / f"{self.args.sweep_id}-{trial.name}.log", "a") as log_file:
+            log_file.write(f"$ {' '.join(cmd)}\n")
+            proc = subprocess.Popen(
+                cmd, cwd=self.demo_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            )
+            for line in iter(proc.stdout.readline, ''):
+                log_file.write(line)
+                if m := _STARTED.search(line):
+                    trial.flwr_run_ids.append(m.group(1))
+                if m := _ROUND.search(line):
+                    current = offset + int(m.group(1))
+                    round_start = time.monotonic()
+                elif (m := _EVALUATE.search(line)) and current > offset:
+                    metric = json.loads(m.group(1)).get(self.args.metric)
+                    if metric is None:
+                        continue
+                    with self._lock:
+                        trial.scores[current] = float(metric)
+                        trial.round_wall_s[current] = round(time.monotonic() - round_start, 2)
+                        trial.rounds_done = current
+                    if early_stop and self._losing(trial, current):
+                        trial.state = "stopped"
+                        trial.message = f"below the median at round {current}"
+                        self._stop(proc, trial)
+                        break
+            proc.stdout.close()
+            rc = proc.wait()
+        trial.wall_s += round(time.monotonic() - started, 2)
+        if trial.state == "running":
+            if rc == 0 and trial.rounds_done >= rounds:
+                trial.state = "done"
+            else:
+                trial.state = "failed"
+                trial.message = f"flwr run exited with code {rc} after {trial.rounds_done} round(s)"
+        print(f"[{trial.name}] {trial.state} at round {trial.rounds_done}: "
+              f"{self.args.metric}={trial.score()} {trial.message}", flush=True)
+        return trial
+
+    def _losing(self, trial: Trial, rnd: int) -> bool:
+        """Median stopping rule: worse than the other trials' median at this round."""
+        if rnd <= self.args.grace_rounds:
+            return False
+        with self._lock:
+            peers = [t.scores[rnd] for t in self.trials if t is not trial and rnd in t.scores]
+        if len(peers) < 2:
+            return False
+        return self.better(statistics.median(peers), trial.scores[rnd])
+
+    def _stop(self, proc: subprocess.Popen, trial: Trial) -> None:
+        # Against a SuperLink the run outlives `flwr run --stream`; stop it there too
+        if trial.flwr_run_ids:
+            subprocess.run([self.flwr, "stop", trial.flwr_run_ids[-1], ".", self.args.federation],
+                           cwd=self.demo_dir, capture_output=True, timeout=60)
+        proc.terminate()
+
+    def run_all(self, trials: list[Trial], rounds: int, early_stop: bool) -> None:
+        with ThreadPoolExecutor(max_workers=self.args.parallel) as pool:
+            list(pool.map(lambda t: self.run_trial(t, rounds, early_stop), trials))
+
+    # -- search methods -----------------------------------------------------
+    def run(self) -> None:
+        if self.args.method != "halving":
+            self.run_all(self.trials, self.args.rounds, early_stop=self.args.early_stop)
+            return
+
+        alive, rounds = list(self.trials), min(self.args.min_rounds, self.args.rounds)
+        while True:
+            print(f"--- rung: {len(alive)} trial(s) to round {rounds} ---", flush=True)
+            self.run_all(alive, rounds, early_stop=False)
+            alive = [t for t in alive if t.state == "done" and t.score() is not None]
+            if rounds >= self.args.rounds or len(alive) <= 1:
+                return
+            alive.sort(key=lambda t: self.sign * t.score(), reverse=True)
+            keep = max(1, len(alive) // self.args.eta)
+            for t in alive[keep:]:
+                t.state, t.message = "pruned", f"not in the top {keep} at round {rounds}"
+            alive = alive[:keep]
+            rounds = min(rounds * self.args.eta, self.args.rounds)
+
+    # -- report -------------------------------------------------------------
+    def report(self) -> dict:
+        ranked = sorted(
+            (t for t in self.trials if t.score() is not None),
+            key=lambda t: self.sign * t.score(), reverse=True,
+        )
+        used = sum(t.rounds_done for t in self.trials)
+        full = len(self.trials) * self.args.rounds
+        return {
+            "sweep_id": self.args.sweep_id,
+            "demo": self.args.demo,
+            "federation": self.args.federation,
+            "method": self.args.method,
+            "metric": self.args.metric,
+            "mode": self.args.mode,
+            "fixed": self.args.fixed,
+            "best": asdict(ranked[0]) if ranked else None,
+            "rounds_trained": used,
+            "rounds_full_budget": full,
+            "wall_s": round(sum(t.wall_s for t in self.trials), 2),
+            "trials": [asdict(t) for t in self.trials],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--demo", default="pytorch", choices=("pytorch", "tensorflow", "sklearn", "llm"))
+    parser.add_argument("--federation", default="opennebula", help="federation in the demo's pyproject.toml")
+    parser.add_argument("--method", default="grid", choices=("grid", "random", "halving"))
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUES",
+                        help="swept parameter: a,b,c | lo:hi | lo:hi:log (repeatable)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="fixed run-config value for every trial (repeatable)")
+    parser.add_argument("--rounds", type=int, default=6, help="rounds per trial (halving: the maximum)")
+    parser.add_argument("--trials", type=int, default=9, help="random/halving: configurations sampled")
+    parser.add_argument("--min-rounds", type=int, default=1, help="halving: rounds in the first rung")
+    parser.add_argument("--eta", type=int, default=3, help="halving: keep the best 1/eta per rung")
+    parser.add_argument("--parallel", type=int, default=2, help="trials running at once")
+    parser.add_argument("--metric", default="accuracy", help="evaluate metric to rank trials by")
+    parser.add_argument("--mode", default="max", choices=("max", "min"))
+    parser.add_argument("--grace-rounds", type=int, default=1,
+                        help="grid/random: rounds before early stopping may stop a trial")
+    parser.add_argument("--no-early-stop", dest="early_stop", action="store_false")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--flwr", default="", help="flwr executable (default: demo/.venv, then PATH)")
+    parser.add_argument("--checkpoint-root", default="",
+                        help=f"trial checkpoints (default: <out-dir>/checkpoints for local-sim, "
+                             f"else {REMOTE_CHECKPOINT_ROOT} on the SuperLink)")
+    parser.add_argument("--out-dir", default="sweeps", help="trial logs and the JSON report")
+    args = parser.parse_args()
+
+    try:
+        params = [Param.parse(p) for p in args.param]
+        args.fixed = {}
+        for item in args.set:
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise ValueError(f"expected KEY=VALUE, got '{item}'")
+            args.fixed[RUN_CONFIG_KEYS.get(key, key)] = _value(value)
+        if not params:
+            raise ValueError("nothing to sweep: give at least one --param")
+        if "num-server-rounds" in {p.key for p in params}:
+            raise ValueError("set the number of rounds with --rounds, not --param")
+        configs = grid(params) if args.method == "grid" else sample(params, args.trials, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.eta < 2:
+        parser.error("--eta must be at least 2")
+
+    args.sweep_id = time.strftime("sweep-%Y%m%d-%H%M%S")
+    sweep = Sweep(args, [Trial(i, c) for i, c in enumerate(configs)])
+    print(f"{args.sweep_id}: {len(configs)} trial(s), {args.method}, {args.parallel} at a time, "
+          f"federation {args.federation}", flush=True)
+    sweep.run()
+
+    report = sweep.report()
+    path = sweep.out_dir / f"{args.sweep_id}.json"
+    path.write_text(json.dumps(report, indent=2))
+    print(f"\n{'trial':<10} {'state':<8} {'rounds':>6} {args.metric:>10}  config")
+    for t in sorted(sweep.trials, key=lambda t: (t.score() is None, -sweep.sign * (t.score() or 0))):
+        score = f"{t.score():.4f}" if t.score() is not None else "-"
+        print(f"{t.name:<10} {t.state:<8} {t.rounds_done:>6} {score:>10}  {json.dumps(t.config)}")
+    print(f"\nrounds trained: {report['rounds_trained']} of {report['rounds_full_budget']} "
+          f"for every trial to run --rounds; report: {path}")
+    if report["best"] is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
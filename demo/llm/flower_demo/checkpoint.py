@@ -0,0 +1,210 @@
+"""Global-model checkpoints on the SuperLink state volume, written off-thread.
+
+NumPy and the standard library only: this runs inside the ServerApp, and
+the SuperLink container has no ML framework (so no safetensors either;
+checkpoints are plain `.npz` files holding the aggregated arrays in order).
+"""
+
+import os
+import re
+import threading
+import zipfile
+from logging import INFO, WARNING
+from pathlib import Path
+
+import numpy as np
+from flwr.common import Parameters, ndarrays_to_parameters, parameters_to_ndarrays
+from flwr.common.logger import log
+from flwr.server.strategy import Strategy
+
+_FILE_RE = re.compile(r"^round-(\d+)\.npz$")
+_TAG_RE = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]*")
+
+
+def latest_run_dir(base: Path) -> Path | None:
+    """The run directory under `base` with the most recently written checkpoint."""
+    newest = None
+    try:
+        run_dirs = [d for d in base.iterdir() if d.is_dir()]
+    except OSError:
+        return None
+    for run_dir in run_dirs:
+        for path in run_dir.glob("round-*.npz"):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if _FILE_RE.match(path.name) and (newest is None or mtime > newest[0]):
+                newest = (mtime, run_dir)
+    return newest[1] if newest else None
+
+
+class Checkpointer:
+    """Save aggregated parameters every `every` rounds and restore the latest.
+
+    `save()` hands the serialized parameters to a writer thread and returns
+    at once; the thread deserializes, writes to a temporary file and renames
+    it into place, so a crash mid-write never leaves a truncated checkpoint.
+    Only the newest `keep` checkpoints are kept. The directory belongs to
+    one run, so pruning never touches another run's checkpoints.
+    """
+
+    def __init__(self, directory: str, every: int, keep: int = 3):
+        self.directory = Path(directory)
+        self.every = every
+        self.keep = keep
+        self._lock = threading.Lock()
+        self.enabled = every > 0 and self._prepare_dir()
+
+    @classmethod
+    def from_run_config(cls, cfg, run_id: int = 0) -> "Checkpointer":
+        """A Checkpointer in this run's own directory under `checkpoint-dir`.
+
+        The directory is `checkpoint-tag` when set, else `run-<run_id>`. With
+        `resume = true` and no tag, the run continues in the run directory
+        written to last. Without `resume`, a tagged directory is emptied first,
+        so an earlier run's checkpoints are neither kept nor restored later.
+        """
+        base = Path(str(cfg.get("checkpoint-dir", "/app/state/checkpoints")))
+        tag = str(cfg.get("checkpoint-tag", "")).strip()
+        if tag and not _TAG_RE.fullmatch(tag):
+            log(WARNING, "[CHECKPOINT] checkpoint-tag %r is not a plain name, ignoring it", tag)
+            tag = ""
+        resume = bool(cfg.get("resume", False))
+        directory = base / (tag or f"run-{run_id}")
+        if resume and not tag:
+            directory = latest_run_dir(base) or directory
+        checkpointer = cls(
+            directory=str(directory),
+            every=int(cfg.get("checkpoint-every", 0)),
+            keep=int(cfg.get("checkpoint-keep", 3)),
+        )
+        if checkpointer.enabled and not resume:
+            checkpointer.clear()
+        return checkpointer
+
+    def _prepare_dir(self) -> bool:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            log(WARNING, "[CHECKPOINT] disabled, cannot create %s: %s", self.directory, e)
+            return False
+        if not os.access(self.directory, os.W_OK):
+            log(WARNING, "[CHECKPOINT] disabled, %s is not writable", self.directory)
+            return False
+        return True
+
+    def _checkpoints(self) -> list[tuple[int, Path]]:
+        found = []
+        for path in self.directory.glob("round-*.npz"):
+            match = _FILE_RE.match(path.name)
+            if match:
+                found.append((int(match.group(1)), path))
+        return sorted(found)
+
+    def clear(self) -> None:
+        """Remove every checkpoint in the directory."""
+        with self._lock:
+            for _, path in self._checkpoints():
+                path.unlink(missing_ok=True)
+
+    def restore(self) -> tuple[int, Parameters | None]:
+        """Return (round, parameters) of the newest checkpoint, or (0, None).
+
+        Checkpoints hold the global weights alone. A FedAdam, FedYogi or
+        FedAvgM strategy built around them starts with zeroed moments or
+        momentum and counts its rounds from 1 again.
+        """
+        if not self.directory.is_dir():
+            return 0, None
+        for server_round, path in reversed(self._checkpoints()):
+            try:
+                with np.load(path) as data:
+                    arrays = [data[f"arr_{i}"] for i in range(len(data.files))]
+            except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile) as e:
+                log(WARNING, "[CHECKPOINT] skipping unreadable %s: %s", path.name, e)
+                continue
+            log(INFO, "[CHECKPOINT] resuming from round %d (%s): weights only, the server "
+                "optimizer state and the strategy's round count start afresh", server_round, path)
+            return server_round, ndarrays_to_parameters(arrays)
+        return 0, None
+
+    def due(self, server_round: int, last_round: int) -> bool:
+        """Whether to save `server_round`; both rounds count from the first run's start."""
+        return self.enabled and (server_round % self.every == 0 or server_round == last_round)
+
+    def save(self, server_round: int, parameters: Parameters) -> None:
+        """Write `parameters` as round `server_round` in the background.
+
+        The thread is non-daemon, so the ServerApp process waits for the
+        final checkpoint to reach disk before it exits.
+        """
+        threading.Thread(
+            target=self._write, args=(server_round, parameters),
+            name=f"checkpoint-{server_round}",
+        ).start()
+
+    def _write(self, server_round: int, parameters: Parameters) -> None:
+        path = self.directory / f"round-{server_round:05d}.npz"
+        tmp = path.with_suffix(".npz.tmp")
+        try:
+            arrays = parameters_to_ndarrays(parameters)
+            with open(tmp, "wb") as f:
+                np.savez(f, *arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except OSError as e:
+            log(WARNING, "[CHECKPOINT] round %d not saved: %s", server_round, e)
+            tmp.unlink(missing_ok=True)
+            return
+        log(INFO, "[CHECKPOINT] round %d saved to %s", server_round, path)
+        with self._lock:
+            for _, old in self._checkpoints()[:-self.keep]:
+                old.unlink(missing_ok=True)
+
+    def wrap(self, strategy: Strategy, num_rounds: int, round_offset: int = 0) -> Strategy:
+        """Return `strategy` with checkpointing, or unchanged when disabled."""
+        if not self.enabled:
+            return strategy
+        return CheckpointStrategy(strategy, self, num_rounds, round_offset)
+
+
+class CheckpointStrategy(Strategy):
+    """Delegate to `inner`, checkpointing the result of each due aggregate_fit.
+
+    `round_offset` is the round a resumed run started from, so checkpoint
+    numbering continues across restarts instead of starting over at 1.
+    """
+
+    def __init__(self, inner: Strategy, checkpointer: Checkpointer, num_rounds: int, round_offset: int = 0):
+        self.inner = inner
+        self.checkpointer = checkpointer
+        self.num_rounds = num_rounds
+        self.round_offset = round_offset
+
+    def __repr__(self) -> str:
+        return f"CheckpointStrategy({self.inner!r}, every={self.checkpointer.every})"
+
+    def initialize_parameters(self, client_manager):
+        return self.inner.initialize_parameters(client_manager)
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        return self.inner.configure_fit(server_round, parameters, client_manager)
+
+    def aggregate_fit(self, server_round, results, failures):
+        parameters, metrics = self.inner.aggregate_fit(server_round, results, failures)
+        # The round the file is named after, so `every` keeps its spacing across a resume
+        total_round = self.round_offset + server_round
+        if parameters is not None and self.checkpointer.due(total_round, self.round_offset + self.num_rounds):
+            self.checkpointer.save(total_round, parameters)
+        return parameters, metrics
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        return self.inner.configure_evaluate(server_round, parameters, client_manager)
+
+    def aggregate_evaluate(self, server_round, results, failures):
+        return self.inner.aggregate_evaluate(server_round, results, failures)
+
+    def evaluate(self, server_round, parameters):
+        return self.inner.evaluate(server_round, parameters)
@@ -7,7 +7,13 @@ from transformers import TrainingArguments
 from trl import SFTTrainer
 
 from flower_demo.dataset import formatting_prompts_func, get_tokenizer_and_collator, load_data
+from flower_demo.datasource import MIRROR_ROOT
+from flower_demo.heterolora import budget, budget_metrics, project
+from flower_demo.hierarchy import group_metrics
+from flower_demo.init_params import NUM_LAYERS
 from flower_demo.model import cosine_annealing, get_model, get_parameters, set_parameters
+from flower_demo.partitioning import cache_root, resolve_assignment
+from flower_demo.profiling import RoundProfiler
 
 DEVICE = torch.device("cpu")
 
@@ -15,18 +21,23 @@ DEVICE = torch.device("cpu")
 class FlowerClient(NumPyClient):
     """Flower client that fine-tunes a Qwen2-0.5B model with LoRA."""
 
-    def __init__(self, model, train_dataset, tokenizer, collator, run_config):
+    def __init__(self, model, train_dataset, tokenizer, collator, run_config, profiler, group_metrics=None,
+                 lora_budget=(16, 0)):
         self.model = model
         self.train_dataset = train_dataset
         self.tokenizer = tokenizer
         self.collator = collator
         self.run_config = run_config
+        self.profiler = profiler
+        self.group_metrics = group_metrics or {}
+        self.lora_budget = lora_budget  # (rank, first trained layer), see heterolora.py
 
     def get_parameters(self, config):
         return get_parameters(self.model)
 
     def fit(self, parameters, config):
-        set_parameters(self.model, parameters)
+        with self.profiler.phase("set_weights"):
+            set_parameters(self.model, project(parameters, *self.lora_budget))
 
         # Cosine-annealed learning rate
         current_round = config.get("current_round", 1)
@@ -34,7 +45,8 @@ class FlowerClient(NumPyClient):
         lr_max = float(self.run_config.get("learning-rate", 5e-5))
         lr = cosine_annealing(current_round, total_rounds, lr_max)
 
-        max_steps = int(self.run_config.get("max-steps", 10))
+        # local-steps: set per node by the server in adaptive-work mode
+        max_steps = int(config.get("local-steps") or self.run_config.get("max-steps", 10))
         seq_length = int(self.run_config.get("seq-length", 512))
         batch_size = int(self.run_config.get("batch-size", 4))
 
@@ -60,35 +72,56 @@ class FlowerClient(NumPyClient):
             max_seq_length=seq_length,
         )
 
-        result = trainer.train()
+        with self.profiler.phase("train"):
+            result = trainer.train()
         loss = result.training_loss
 
+        with self.profiler.phase("get_weights"):
+            weights = get_parameters(self.model)
+        self.profiler.record_payload(weights)
+
         return (
-            get_parameters(self.model),
+            weights,
             len(self.train_dataset),
-            {"train_loss": float(loss)},
+            {"train_loss": float(loss), "local_steps": result.global_step,
+             **self.profiler.metrics(), **self.group_metrics,
+             **budget_metrics(*self.lora_budget, self.run_config)},
         )
 
 
 def client_fn(context: Context):
     """Create a FlowerClient for this SuperNode's data partition."""
-    node_config = context.node_config
-    num_partitions = int(node_config.get("num-partitions", 2))
+    profiler = RoundProfiler()
 
-    if "partition-id" in node_config:
-        partition_id = int(node_config["partition-id"])
-    else:
-        partition_id = int(context.node_id) % num_partitions
+    # Shards of the training split this node owns: stable across scale events,
+    # from the appliance's manifest, else from the node config
+    assignment = resolve_assignment(context.node_config, context.run_config, context.node_id)
 
     run_config = context.run_config
     lora_rank = int(run_config.get("lora-rank", 16))
     lora_alpha = int(run_config.get("lora-alpha", 32))
+    synthetic = bool(run_config.get("synthetic-data", False))
+    synthetic_samples = int(run_config.get("synthetic-samples", 0))
+
+    # hetero-lora: a smaller rank and only the top layers on a small node,
+    # at the run's alpha / rank scaling
+    rank, first_layer = budget(context.node_config, run_config)
+    with profiler.phase("model_setup"):
+        model = get_model(
+            lora_r=rank, lora_alpha=lora_alpha * rank / lora_rank,
+            layers=list(range(first_layer, NUM_LAYERS)) if first_layer else None,
+        )
+    with profiler.phase("data_load"):
+        train_dataset = load_data(
+            assignment, cache_root(run_config), synthetic, synthetic_samples,
+            mirror=str(run_config.get("data-mirror", MIRROR_ROOT)),
+        )
+        tokenizer, collator = get_tokenizer_and_collator()
 
-    model = get_model(lora_r=lora_rank, lora_alpha=lora_alpha)
-    train_dataset = load_data(partition_id, num_partitions)
-    tokenizer, collator = get_tokenizer_and_collator()
-
-    return FlowerClient(model, train_dataset, tokenizer, collator, run_config).to_client()
+    return FlowerClient(
+        model, train_dataset, tokenizer, collator, run_config, profiler,
+        group_metrics=group_metrics(context), lora_budget=(rank, first_layer),
+    ).to_client()
 
 
 # Flower ClientApp entry point
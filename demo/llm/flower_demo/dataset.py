@@ -1,11 +1,29 @@
 """Alpaca-GPT4 dataset loading and tokenization for federated LLM training."""
 
-from flwr_datasets import FederatedDataset
-from flwr_datasets.partitioner import IidPartitioner
+import random
+from pathlib import Path
+
+from datasets import Dataset
 from transformers import AutoTokenizer
 from trl import DataCollatorForCompletionOnlyLM
 
+from flower_demo.datasource import MIRROR_ROOT, load_split
 from flower_demo.model import MODEL_NAME
+from flower_demo.partitioning import Assignment, load_assigned
+
+DATASET_NAME = "vicgalle/alpaca-gpt4"
+SPLITS = ("train",)
+# FederatedDataset's default shuffle before partitioning, kept so shards
+# are the same whether the split comes from the mirror or the Hub
+SHUFFLE_SEED = 42
+
+# Alpaca-GPT4 train split size, used to size the synthetic stand-in
+TRAIN_SIZE = 52_002
+
+_WORDS = (
+    "model data client server round update weight gradient node cluster "
+    "train federated private local global average network token layer"
+).split()
 
 ALPACA_TEMPLATE = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
 
@@ -45,10 +63,47 @@ def get_tokenizer_and_collator(model_name: str = MODEL_NAME):
     return tokenizer, collator
 
 
-def load_data(partition_id: int, num_partitions: int):
-    """Load an IID partition of the Alpaca-GPT4 dataset."""
-    fds = FederatedDataset(
-        dataset="vicgalle/alpaca-gpt4",
-        partitioners={"train": IidPartitioner(num_partitions=num_partitions)},
-    )
-    return fds.load_partition(partition_id, "train")
+def synthetic_alpaca(num_samples: int, seed: int) -> Dataset:
+    """Random instruction/input/output records with Alpaca-GPT4's schema.
+
+    Text lengths roughly follow the real dataset (short instructions, longer
+    responses) so tokenization and sequence packing cost about the same.
+    """
+    rng = random.Random(seed)
+
+    def text(min_words: int, max_words: int) -> str:
+        return " ".join(rng.choices(_WORDS, k=rng.randint(min_words, max_words)))
+
+    records = {"instruction": [], "input": [], "output": []}
+    for _ in range(num_samples):
+        records["instruction"].append(text(5, 20))
+        records["input"].append(text(0, 30) if rng.random() < 0.4 else "")
+        records["output"].append(text(30, 200))
+    return Dataset.from_dict(records)
+
+
+def load_data(
+    assignment: Assignment, cache_dir: Path, synthetic: bool = False, synthetic_samples: int = 0,
+    mirror: str = MIRROR_ROOT,
+):
+    """Load this node's shards of the Alpaca-GPT4 dataset.
+
+    Alpaca has no label column, so only the `iid` partitioner applies. The
+    split comes from the local mirror when staged (see datasource.py).
+    With `synthetic`, deterministic random records replace the download (the
+    base model and tokenizer still come from the Hub or its local cache).
+    """
+    if synthetic:
+        share = TRAIN_SIZE * len(assignment.shards) // assignment.spec.num_shards
+        return synthetic_alpaca(synthetic_samples or share, seed=min(assignment.shards, default=0))
+
+    partitioner = None
+
+    def shard(shard_id: int) -> Dataset:
+        nonlocal partitioner
+        if partitioner is None:
+            partitioner = assignment.spec.build(partition_by=None)
+            partitioner.dataset = load_split(DATASET_NAME, "train", mirror).shuffle(seed=SHUFFLE_SEED)
+        return partitioner.load_partition(shard_id)
+
+    return load_assigned(assignment, DATASET_NAME, shard, cache_dir)
@@ -0,0 +1,271 @@
+"""Heterogeneous LoRA: a rank and a layer slice per SuperNode, sized to the node.
+
+With `hetero-lora = true` every SuperNode trains a LoRA adapter sized to
+its VM instead of the run's `lora-rank` on all 24 layers. A node with
+fewer vCPUs or less memory than `hetero-lora-ref-vcpus` and
+`hetero-lora-ref-memory-mb` gets the fraction of the reference it has:
+rank rounded down to a power of two (at least MIN_RANK), and only the top
+layers (at least MIN_LAYERS). The backward pass stops at the lowest trained
+layer, so compute, activation memory and the update sent back all shrink
+with it. Node config `lora-rank` and `lora-layers` override the choice.
+Every node keeps the run's lora_alpha / lora_rank scaling, so factors mean
+the same on every node.
+
+The global adapter keeps the full rank and all layers. From its second
+round on, a node is sent only its slice: the first `rank` rows of each
+lora_A and columns of each lora_B, for its layers (in its first round it
+slices the global adapter itself). Its update comes back padded with the
+global values it did not train, and the slots it did train are scaled so
+that each one is averaged over only the nodes that trained it (HetLoRA,
+Cho et al., 2024, without the dilution of plain zero-padding). The result
+is ordinary full-size updates, so hierarchical aggregation and adaptive
+work apply unchanged.
+
+The scale assumes the strategy inside averages updates weighted by
+num_examples, as the FedAvg family does. Hierarchical aggregation keeps
+those weights (a group counts with its members' examples), and FedNova's
+per-node step factor multiplies a padded change slot by slot, so each slot
+gets the FedNova mean over its own trainers. Strategies that do not
+average by examples (FedMedian, Krum, ...) are rejected.
+
+`hetero-lora-merge = "svd"` also re-factorises every adapter after
+aggregation through an SVD of B·A, so that its rank components are ordered
+by singular value, as in FlexLoRA (Bai et al., 2024). Slicing then hands a
+weak node the best rank-r approximation of the global update rather than
+the first r of arbitrary components. The product B·A is unchanged, but the
+factors are not, so this is for stateless strategies like the demo's FedAvg.
+
+NumPy and the standard library only, like checkpoint.py.
+"""
+
+import math
+import os
+from logging import INFO, WARNING
+
+import numpy as np
+from flwr.common import FitIns, FitRes, ndarrays_to_parameters, parameters_to_ndarrays
+from flwr.common.logger import log
+from flwr.server.strategy import Bulyan, FedAvg, FedMedian, FedTrimmedAvg, Krum, QFedAvg, Strategy
+
+from flower_demo.init_params import NUM_LAYERS
+
+RANK_METRIC = "lora_rank"                 # fit metric: the node's LoRA rank
+FIRST_LAYER_METRIC = "lora_first_layer"   # fit metric: its lowest trained layer
+MIN_RANK = 4
+MIN_LAYERS = 6
+ARRAYS_PER_LAYER = 4  # q_proj lora_A, lora_B, v_proj lora_A, lora_B (init_params.py)
+MERGES = ("pad", "svd")
+# FedAvg subclasses that do not take the example-weighted mean _pad scales for
+UNWEIGHTED = (Bulyan, FedMedian, FedTrimmedAvg, Krum, QFedAvg)
+
+
+def enabled(cfg) -> bool:
+    return bool(cfg.get("hetero-lora", False))
+
+
+# ---------------------------------------------------------------------------
+# Client side: this node's budget
+# ---------------------------------------------------------------------------
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def node_resources() -> tuple[float, float]:
+    """(vCPUs, memory MB) this process may use, cgroup limits included."""
+    cpus = float(len(os.sched_getaffinity(0)))
+    quota = _read("/sys/fs/cgroup/cpu.max").split()
+    if len(quota) == 2 and quota[0] != "max":
+        cpus = min(cpus, int(quota[0]) / int(quota[1]))
+    memory_mb = 0.0
+    for line in _read("/proc/meminfo").splitlines():
+        if line.startswith("MemTotal:"):
+            memory_mb = int(line.split()[1]) / 1024
+    limit = _read("/sys/fs/cgroup/memory.max")
+    if limit.isdigit():
+        memory_mb = min(memory_mb or math.inf, int(limit) / 2**20)
+    return cpus, memory_mb
+
+
+def budget(node_config, run_config) -> tuple[int, int]:
+    """(rank, first trained layer) for this node; (lora-rank, 0) when the mode is off."""
+    full_rank = int(run_config.get("lora-rank", 16))
+    if not enabled(run_config):
+        return full_rank, 0
+    cpus, memory_mb = node_resources()
+    capacity = min(
+        1.0,
+        cpus / float(run_config.get("hetero-lora-ref-vcpus", 8)),
+        (memory_mb or math.inf) / float(run_config.get("hetero-lora-ref-memory-mb", 16384)),
+    )
+    rank = full_rank if capacity >= 1.0 else 2 ** int(math.log2(max(1.0, full_rank * capacity)))
+    layers = math.ceil(NUM_LAYERS * capacity)
+    rank = int(node_config.get("lora-rank", rank))
+    layers = int(node_config.get("lora-layers", layers))
+    rank = min(full_rank, max(MIN_RANK, rank))
+    layers = min(NUM_LAYERS, max(MIN_LAYERS, layers))
+    return rank, NUM_LAYERS - layers
+
+
+def budget_metrics(rank: int, first_layer: int, run_config) -> dict:
+    """Fit metrics a ClientApp adds to report its budget ({} when the mode is off)."""
+    return {RANK_METRIC: rank, FIRST_LAYER_METRIC: first_layer} if enabled(run_config) else {}
+
+
+# ---------------------------------------------------------------------------
+# Both sides: slicing and padding
+# ---------------------------------------------------------------------------
+def project(arrays: list[np.ndarray], rank: int, first_layer: int) -> list[np.ndarray]:
+    """The slice of a full adapter one node trains (a slice is returned as is)."""
+    if len(arrays) == ARRAYS_PER_LAYER * NUM_LAYERS:
+        arrays = arrays[ARRAYS_PER_LAYER * first_layer:]
+    # lora_A is (rank, in), lora_B (out, rank)
+    return [a[:rank] if i % 2 == 0 else a[:, :rank] for i, a in enumerate(arrays)]
+
+
+def _coverage(budgets: list[tuple[int, int]], weights: list[float], full_rank: int) -> np.ndarray:
+    """(layer, rank slot) -> total weight of the nodes that train it."""
+    cover = np.zeros((NUM_LAYERS, full_rank))
+    for (rank, first_layer), w in zip(budgets, weights):
+        cover[first_layer:, :rank] += w
+    return cover
+
+
+def expand(global_arrays: list[np.ndarray], arrays: list[np.ndarray], rank: int, first_layer: int,
+           scale: np.ndarray) -> list[np.ndarray]:
+    """A node's slice as a full adapter: global + scale * (its change), slot by slot.
+
+    `scale` is (layer, rank slot); slots the node did not train keep the
+    global values.
+    """
+    out = list(global_arrays)
+    for k, a in enumerate(arrays):
+        i = ARRAYS_PER_LAYER * first_layer + k
+        g = global_arrays[i]
+        s = scale[i // ARRAYS_PER_LAYER, :rank].astype(g.dtype)
+        full = g.copy()
+        if i % 2 == 0:
+            full[:rank] += s[:, None] * (a - g[:rank])
+        else:
+            full[:, :rank] += s[None, :] * (a - g[:, :rank])
+        out[i] = full
+    return out
+
+
+def svd_order(arrays: list[np.ndarray]) -> list[np.ndarray]:
+    """Re-factorise every (lora_A, lora_B) pair so its components are ordered by singular value.
+
+    B·A = (Q_B R_B)(Q_A R_A)^T; the SVD of the small R_B R_A^T gives the
+    product's. The new B = U·S, A = V^T with its rows at the old A's mean
+    norm, so A never collapses to zero while B is still zero.
+    """
+    out = []
+    for a, b in zip(arrays[0::2], arrays[1::2]):
+        q_b, r_b = np.linalg.qr(b.astype(np.float64))
+        q_a, r_a = np.linalg.qr(a.T.astype(np.float64))
+        u, s, vt = np.linalg.svd(r_b @ r_a.T)
+        norm = float(np.sqrt(np.mean(np.sum(a.astype(np.float64) ** 2, axis=1)))) or 1.0
+        out.append(((q_a @ vt.T).T * norm).astype(a.dtype))
+        out.append((q_b @ u * (s / norm)).astype(b.dtype))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Server side
+# ---------------------------------------------------------------------------
+class HeteroLoRAStrategy(Strategy):
+    """Delegate to `inner`, sending each node its adapter slice and padding its update back.
+
+    Wrap it around the strategy (and any HierarchicalStrategy or
+    AdaptiveWorkStrategy): those see full-size updates. The strategy at the
+    bottom of the `inner` chain must average by num_examples. Nodes are
+    told apart by their proxy's `cid`, as in adaptive.py.
+    """
+
+    def __init__(self, inner: Strategy, merge: str = "pad"):
+        base = inner
+        while hasattr(base, "inner"):
+            base = base.inner
+        if not isinstance(base, FedAvg) or isinstance(base, UNWEIGHTED):
+            raise ValueError(f"hetero-lora needs an example-weighted FedAvg-family strategy, not {base!r}")
+        if merge not in MERGES:
+            log(WARNING, "hetero-lora-merge %r unknown, using \"pad\"", merge)
+            merge = "pad"
+        self.inner = inner
+        self.merge = merge
+        self.budgets: dict[str, tuple[int, int]] = {}
+        self._global: list[np.ndarray] | None = None
+
+    def __repr__(self) -> str:
+        return f"HeteroLoRAStrategy({self.inner!r})"
+
+    def initialize_parameters(self, client_manager):
+        return self.inner.initialize_parameters(client_manager)
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        instructions = self.inner.configure_fit(server_round, parameters, client_manager)
+        self._global = parameters_to_ndarrays(parameters)
+        full_rank = self._global[0].shape[0]
+        slices = {}  # budget -> Parameters, shared by the nodes of a tier
+        out = []
+        for proxy, ins in instructions:
+            b = self.budgets.get(proxy.cid)
+            if b is not None and b != (full_rank, 0):
+                if b not in slices:
+                    slices[b] = ndarrays_to_parameters(project(self._global, *b))
+                # Strategies share one FitIns across clients; give this one its own
+                ins = FitIns(parameters=slices[b], config=ins.config)
+            out.append((proxy, ins))
+        return out
+
+    def _pad(self, server_round, results) -> list:
+        full_rank = self._global[0].shape[0]
+        budgets = []
+        for proxy, res in results:
+            b = (int(res.metrics.get(RANK_METRIC, full_rank)), int(res.metrics.get(FIRST_LAYER_METRIC, 0)))
+            self.budgets[proxy.cid] = b
+            budgets.append(b)
+        weights = [float(res.num_examples) for _, res in results]
+        if not sum(weights):
+            weights = [1.0] * len(results)
+        cover = _coverage(budgets, weights, full_rank)
+        # inner averages with weight w_i / sum(w) (through any group tier, see
+        # the module docstring); a slot trained by some nodes only should be
+        # averaged over them: scale their changes by sum(w) / cover
+        scale = sum(weights) / np.maximum(cover, 1e-12)
+        out = []
+        for (proxy, res), b in zip(results, budgets):
+            arrays = expand(self._global, parameters_to_ndarrays(res.parameters), *b, scale)
+            out.append((proxy, FitRes(
+                status=res.status, parameters=ndarrays_to_parameters(arrays),
+                num_examples=res.num_examples, metrics=res.metrics,
+            )))
+        sent = sum(sum(len(t) for t in res.parameters.tensors) for _, res in results)
+        full = sum(a.nbytes for a in self._global) * len(results)
+        tiers = {}
+        for rank, first_layer in budgets:
+            key = f"r{rank}/{NUM_LAYERS - first_layer}L"
+            tiers[key] = tiers.get(key, 0) + 1
+        log(INFO, "[HETERO-LORA] round %d: %d nodes %s, updates %.1f MB of %.1f MB full size",
+            server_round, len(results), dict(sorted(tiers.items())), sent / 1e6, full / 1e6)
+        return out
+
+    def aggregate_fit(self, server_round, results, failures):
+        if results and self._global is not None:
+            results = self._pad(server_round, results)
+        parameters, metrics = self.inner.aggregate_fit(server_round, results, failures)
+        if parameters is not None and self.merge == "svd":
+            parameters = ndarrays_to_parameters(svd_order(parameters_to_ndarrays(parameters)))
+        return parameters, metrics
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        return self.inner.configure_evaluate(server_round, parameters, client_manager)
+
+    def aggregate_evaluate(self, server_round, results, failures):
+        return self.inner.aggregate_evaluate(server_round, results, failures)
+
+    def evaluate(self, server_round, parameters):
+        return self.inner.evaluate(server_round, parameters)
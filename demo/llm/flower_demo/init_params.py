@@ -0,0 +1,35 @@
+"""Initial LoRA adapter weights built on the server, without PyTorch.
+
+NumPy only, so the ServerApp can hand Flower `initial_parameters` instead of
+asking a client for them: without them Flower picks one client before
+round 1, and that client loads the full 0.5B base model just to return
+freshly initialised adapters.
+"""
+
+import numpy as np
+
+SEED = 42
+
+# Qwen2-0.5B attention geometry (the LoRA targets are q_proj and v_proj)
+NUM_LAYERS = 24
+HIDDEN_SIZE = 896
+Q_PROJ_OUT = 896   # 14 heads × 64
+V_PROJ_OUT = 128   # 2 key/value heads × 64
+
+
+def initial_arrays(lora_r: int = 16, seed: int = SEED) -> list[np.ndarray]:
+    """Adapters in get_peft_model_state_dict() order and shapes.
+
+    Per layer: q_proj lora_A (r, hidden), lora_B (896, r), then v_proj
+    lora_A (r, hidden), lora_B (128, r). Same init as PEFT: A uniform in
+    ±1/sqrt(hidden) (kaiming_uniform with a=sqrt(5)), B zeros, so the
+    adapted model starts out identical to the base model.
+    """
+    rng = np.random.default_rng(seed)
+    bound = 1.0 / np.sqrt(HIDDEN_SIZE)
+    arrays = []
+    for _ in range(NUM_LAYERS):
+        for out_features in (Q_PROJ_OUT, V_PROJ_OUT):
+            arrays.append(rng.uniform(-bound, bound, size=(lora_r, HIDDEN_SIZE)).astype(np.float32))
+            arrays.append(np.zeros((out_features, lora_r), dtype=np.float32))
+    return arrays
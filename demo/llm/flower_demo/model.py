@@ -10,8 +10,8 @@ from transformers import AutoModelForCausalLM
 MODEL_NAME = "Qwen/Qwen2-0.5B-Instruct"
 
 
-def get_model(lora_r: int = 16, lora_alpha: int = 32):
-    """Load base model with LoRA adapters (CPU, float32)."""
+def get_model(lora_r: int = 16, lora_alpha: float = 32, layers: list[int] | None = None):
+    """Load base model with LoRA adapters (CPU, float32), on `layers` only if given."""
     base = AutoModelForCausalLM.from_pretrained(
         MODEL_NAME, torch_dtype=torch.float32, device_map="cpu",
     )
@@ -19,6 +19,7 @@ def get_model(lora_r: int = 16, lora_alpha: int = 32):
         r=lora_r,
         lora_alpha=lora_alpha,
         target_modules=["q_proj", "v_proj"],
+        layers_to_transform=layers,
         lora_dropout=0.05,
         bias="none",
         task_type="CAUSAL_LM",
@@ -0,0 +1,167 @@
+"""Per-round ClientApp profiling, reported through the fit/evaluate metrics.
+
+Standard library only: the ServerApp imports the aggregation functions from
+here, and the SuperLink container has no ML framework installed.
+"""
+
+import json
+import logging
+import resource
+import time
+from contextlib import contextmanager
+from logging import INFO
+
+from flwr.common.logger import FLOWER_LOGGER, log
+
+# Prefix for every profiling metric, so the server can tell them apart from
+# model metrics (accuracy, train_loss, ...) when aggregating.
+PREFIX = "prof_"
+
+
+def _current_rss_mb() -> float | None:
+    """Resident set size of this process right now (VmRSS), or None off Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)  # kB
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class _RunTag(logging.Filter):
+    """Prefixes every flwr log record with `[RUN <id>]`."""
+
+    def __init__(self, run_id: int):
+        super().__init__()
+        self.tag = f"[RUN {run_id}] "
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not str(record.msg).startswith(self.tag):
+            record.msg = self.tag + str(record.msg)
+        return True
+
+
+def tag_run_log(run_id: int) -> None:
+    """Tag this ServerApp's log lines with its run id from here on.
+
+    ServerApps of concurrent runs write to the same SuperLink log, and their
+    `[ROUND N]`, `aggregate_fit` and `[METRICS]` lines carry no run id of
+    their own; the dashboard files each line under the run in its tag.
+    """
+    for old in [f for f in FLOWER_LOGGER.filters if isinstance(f, _RunTag)]:
+        FLOWER_LOGGER.removeFilter(old)
+    FLOWER_LOGGER.addFilter(_RunTag(run_id))
+
+
+class RoundProfiler:
+    """Time the phases of one ClientApp call and sample process resources.
+
+    Create it at the top of client_fn so data loading is covered, wrap each
+    phase in `phase()`, and return `metrics()` from fit/evaluate.
+    """
+
+    def __init__(self):
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.timings: dict[str, float] = {}
+        self.array_bytes = 0
+
+    @contextmanager
+    def phase(self, name: str):
+        """Accumulate the wall time of the enclosed block under `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def record_payload(self, arrays: list) -> None:
+        """Record the in-memory size (`nbytes`) of the arrays sent back.
+
+        This is the arrays' data before Flower serializes them: each tensor
+        goes on the wire as .npy bytes, a little larger (its header).
+        """
+        self.array_bytes = int(sum(a.nbytes for a in arrays))
+
+    def metrics(self) -> dict:
+        """Flat, scalar-only metrics dict (Flower metrics must be scalars)."""
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.process_time() - self._cpu_start
+        out = {f"{PREFIX}{name}_s": round(secs, 4) for name, secs in self.timings.items()}
+        if self.array_bytes:
+            out[f"{PREFIX}payload_array_bytes"] = self.array_bytes
+        rss = _current_rss_mb()
+        if rss is not None:
+            out[f"{PREFIX}rss_mb"] = rss
+        # ru_maxrss is in KiB on Linux: the peak over the ClientApp process's
+        # whole life, so under a warm worker or in simulation it covers
+        # earlier tasks (and other nodes) too, not just this round
+        out[f"{PREFIX}process_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        # CPU seconds per wall second; exceeds 1.0 when training uses several cores
+        out[f"{PREFIX}cpu_util"] = round(cpu / wall, 3) if wall > 0 else 0.0
+        return out
+
+
+def _aggregate(results: list, stage: str) -> dict:
+    """Combine per-client metrics and log them as one `[METRICS]` line.
+
+    Profiling metrics get a mean and a max across clients (the max is the
+    straggler that sets the round time); model metrics get the usual
+    example-weighted average. The log line is what the dashboard parses.
+    """
+    keys = sorted({key for _, metrics in results for key in metrics})
+    out = {}
+    for key in keys:
+        values = [
+            (num_examples, float(metrics[key]))
+            for num_examples, metrics in results
+            if isinstance(metrics.get(key), (int, float))
+        ]
+        if not values:
+            continue
+        if key.startswith(PREFIX):
+            samples = [value for _, value in values]
+            out[f"{key}_mean"] = round(sum(samples) / len(samples), 4)
+            out[f"{key}_max"] = round(max(samples), 4)
+        else:
+            total = sum(num_examples for num_examples, _ in values)
+            if total > 0:
+                out[key] = sum(num_examples * value for num_examples, value in values) / total
+    if stage == "fit":
+        out.update(_idle(results))
+    log(INFO, "[METRICS] %s %s", stage, json.dumps(out, sort_keys=True))
+    return out
+
+
+def _idle(results: list) -> dict:
+    """How long clients sat waiting for the slowest one this round.
+
+    A client's busy time is the sum of its timed phases; its idle time is
+    the slowest client's busy time minus its own. `idle_frac` is the share
+    of all client time in the round spent idle.
+    """
+    busy = [
+        sum(float(v) for k, v in metrics.items() if k.startswith(PREFIX) and k.endswith("_s"))
+        for _, metrics in results
+    ]
+    if not busy or max(busy) <= 0:
+        return {}
+    slowest = max(busy)
+    idle = [slowest - b for b in busy]
+    return {
+        "idle_s_mean": round(sum(idle) / len(idle), 4),
+        "idle_s_max": round(max(idle), 4),
+        "idle_frac": round(sum(idle) / (slowest * len(idle)), 4),
+    }
+
+
+def aggregate_fit_metrics(results: list) -> dict:
+    """`fit_metrics_aggregation_fn` for the demo strategies."""
+    return _aggregate(results, "fit")
+
+
+def aggregate_evaluate_metrics(results: list) -> dict:
+    """`evaluate_metrics_aggregation_fn` for the demo strategies."""
+    return _aggregate(results, "evaluate")
@@ -4,27 +4,67 @@ IMPORTANT: This module must NOT import torch or any ML framework.
 The ServerApp runs on the SuperLink container which only has flwr installed.
 """
 
+from flwr.common import ndarrays_to_parameters
 from flwr.server import ServerApp, ServerAppComponents, ServerConfig
 from flwr.server.strategy import FedAvg
 
+from flower_demo.adaptive import AdaptiveWorkStrategy, enabled as adaptive_enabled
+from flower_demo.checkpoint import Checkpointer
+from flower_demo.flat import FlatFedAvg
+from flower_demo.heterolora import HeteroLoRAStrategy, enabled as hetero_lora_enabled
+from flower_demo.hierarchy import HierarchicalStrategy, enabled as hierarchical_enabled
+from flower_demo.init_params import initial_arrays
+from flower_demo.profiling import aggregate_fit_metrics, tag_run_log
+
 
 def server_fn(context):
     """Configure the strategy and server from run config."""
     cfg = context.run_config
+    tag_run_log(context.run_id)
     num_rounds = int(cfg.get("num-server-rounds", 3))
     min_fit = int(cfg.get("min-fit-clients", 2))
     min_available = int(cfg.get("min-available-clients", 2))
+    hierarchical = hierarchical_enabled(cfg)
+
+    # Resume from the newest checkpoint: run only the rounds still missing,
+    # keeping the round numbers the clients' LR schedule sees unchanged
+    checkpointer = Checkpointer.from_run_config(cfg, context.run_id)
+    total_rounds = num_rounds
+    resumed_round, initial_parameters = (0, None)
+    if cfg.get("resume", False):
+        resumed_round, initial_parameters = checkpointer.restore()
+        num_rounds = max(num_rounds - resumed_round, 0)
+
+    if initial_parameters is None and cfg.get("server-init", True):
+        # Built here, so no client has to cold-start before round 1
+        initial_parameters = ndarrays_to_parameters(initial_arrays(lora_r=int(cfg.get("lora-rank", 16))))
 
     def on_fit_config_fn(server_round: int):
-        return {"current_round": server_round, "total_rounds": num_rounds}
+        return {"current_round": resumed_round + server_round, "total_rounds": total_rounds}
 
-    strategy = FedAvg(
+    # FedAvg over one flat buffer per update: 96 LoRA tensors, one vectorised sum
+    strategy_cls = FlatFedAvg if cfg.get("flat-aggregation", False) else FedAvg
+    strategy = strategy_cls(
+        initial_parameters=initial_parameters,
         fraction_fit=1.0,
         fraction_evaluate=0.0,  # No eval for LLM — too slow on CPU
         min_fit_clients=min_fit,
         min_available_clients=min_available,
         on_fit_config_fn=on_fit_config_fn,
+        # Per-phase client timings and resources, logged once per round
+        # (per node, by the group tier when aggregation is hierarchical)
+        fit_metrics_aggregation_fn=None if hierarchical else aggregate_fit_metrics,
     )
+    if hierarchical:
+        # Per-group weighted FedAvg first; the strategy sees one update per group
+        strategy = HierarchicalStrategy(strategy, fit_metrics_aggregation_fn=aggregate_fit_metrics)
+    if adaptive_enabled(cfg):
+        # Outside the group tier: work and normalisation are per node
+        strategy = AdaptiveWorkStrategy(strategy, target_s=float(cfg.get("adaptive-target-s", 0.0)))
+    if hetero_lora_enabled(cfg):
+        # Outermost: everything inside sees full-rank, all-layer updates
+        strategy = HeteroLoRAStrategy(strategy, merge=str(cfg.get("hetero-lora-merge", "pad")))
+    strategy = checkpointer.wrap(strategy, num_rounds, round_offset=resumed_round)
     config = ServerConfig(num_rounds=num_rounds)
     return ServerAppComponents(strategy=strategy, config=config)
 
@@ -0,0 +1,149 @@
+"""Per-node local work sized to measured throughput, FedNova-normalised.
+
+With `adaptive-work = true` the ServerApp stops giving every SuperNode the
+same local work. Each node's first round runs the demo's default (its
+`local-epochs` or `max-steps`) and reports how many optimizer steps that
+was (`local_steps`) and how long training took (`prof_train_s`). From then
+on every node is sent `local-steps` in its fit config: as many steps as it
+can do, at its measured speed, in the time the median node needs for its
+default work (or in `adaptive-target-s` seconds), between a quarter and
+four times its default. Fast VMs train longer instead of waiting for slow
+ones.
+
+Unequal step counts would bias plain averaging towards the nodes that
+took more steps, so updates are normalised as in FedNova (Wang et al.,
+2020): each node's change to the global model is divided by its step count
+and scaled by the example-weighted mean step count before the strategy
+averages as usual. With equal step counts this changes nothing.
+
+The round's idle time (how long nodes waited for the slowest one) is in
+the `[METRICS] fit` line either way, see profiling.py.
+
+NumPy and the standard library only, like checkpoint.py.
+"""
+
+import statistics
+from logging import INFO
+
+from flwr.common import FitIns, FitRes
+from flwr.common.logger import log
+from flwr.server.strategy import Strategy
+
+from flower_demo.flat import Layout
+
+STEPS_KEY = "local-steps"      # fit config: optimizer steps to run this round
+STEPS_METRIC = "local_steps"   # fit metric: optimizer steps the node ran
+MIN_FACTOR, MAX_FACTOR = 0.25, 4.0
+SMOOTHING = 0.5  # weight of the newest throughput sample
+
+
+def enabled(cfg) -> bool:
+    return bool(cfg.get("adaptive-work", False))
+
+
+class AdaptiveWorkStrategy(Strategy):
+    """Delegate to `inner`, assigning local steps per node and normalising updates.
+
+    Nodes are told apart by their proxy's `cid` (the SuperNode's node id).
+    """
+
+    def __init__(self, inner: Strategy, target_s: float = 0.0):
+        self.inner = inner
+        self.target_s = target_s
+        self.throughput: dict[str, float] = {}    # steps per training second
+        self.default_steps: dict[str, int] = {}   # steps of the node's unassigned round
+        self._assigned: dict[str, int] = {}
+        self._global = None  # parameters sent out this round
+
+    def __repr__(self) -> str:
+        return f"AdaptiveWorkStrategy({self.inner!r})"
+
+    def initialize_parameters(self, client_manager):
+        return self.inner.initialize_parameters(client_manager)
+
+    # -- work assignment ----------------------------------------------------
+    def plan(self) -> dict[str, int]:
+        """Steps for every node with a measured throughput."""
+        known = [cid for cid in self.throughput if cid in self.default_steps]
+        if not known:
+            return {}
+        target = self.target_s or statistics.median(
+            self.default_steps[cid] / self.throughput[cid] for cid in known
+        )
+        plan = {}
+        for cid in known:
+            default = self.default_steps[cid]
+            low, high = max(1, round(default * MIN_FACTOR)), max(1, round(default * MAX_FACTOR))
+            plan[cid] = min(max(round(self.throughput[cid] * target), low), high)
+        return plan
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        instructions = self.inner.configure_fit(server_round, parameters, client_manager)
+        self._global = parameters
+        plan = self.plan()
+        self._assigned = {}
+        out = []
+        for proxy, ins in instructions:
+            steps = plan.get(proxy.cid)
+            if steps is not None:
+                # Strategies share one FitIns across clients; give this one its own
+                ins = FitIns(parameters=ins.parameters, config={**ins.config, STEPS_KEY: steps})
+                self._assigned[proxy.cid] = steps
+            out.append((proxy, ins))
+        return out
+
+    def _measure(self, results) -> None:
+        for proxy, res in results:
+            steps = res.metrics.get(STEPS_METRIC)
+            train_s = res.metrics.get("prof_train_s")
+            if not steps or not train_s:
+                continue
+            if proxy.cid not in self._assigned:
+                self.default_steps[proxy.cid] = int(steps)
+            sample = steps / train_s
+            previous = self.throughput.get(proxy.cid)
+            self.throughput[proxy.cid] = sample if previous is None else (
+                SMOOTHING * sample + (1 - SMOOTHING) * previous
+            )
+
+    # -- normalisation ------------------------------------------------------
+    def _normalise(self, results) -> list:
+        """Rescale each update to the mean step count (FedNova, plain SGD)."""
+        steps = [res.metrics.get(STEPS_METRIC) for _, res in results]
+        if self._global is None or not all(steps) or len(set(steps)) == 1:
+            return results
+        total = sum(res.num_examples for _, res in results)
+        mean_steps = sum(res.num_examples * s for (_, res), s in zip(results, steps)) / total if total \
+            else statistics.mean(steps)
+
+        layout = Layout.of_parameters(self._global)
+        base = layout.pack_parameters(self._global)
+        out = []
+        for (proxy, res), s in zip(results, steps):
+            update = layout.pack_parameters(res.parameters)
+            update -= base
+            update *= mean_steps / s
+            update += base
+            out.append((proxy, FitRes(
+                status=res.status, parameters=layout.to_parameters(update),
+                num_examples=res.num_examples, metrics=res.metrics,
+            )))
+        return out
+
+    def aggregate_fit(self, server_round, results, failures):
+        self._measure(results)
+        if results:
+            steps = sorted(int(res.metrics.get(STEPS_METRIC, 0)) for _, res in results)
+            log(INFO, "[ADAPTIVE] round %d: %d nodes, local steps %d..%d (median %d), next round %s",
+                server_round, len(results), steps[0], steps[-1], statistics.median(steps),
+                dict(sorted(self.plan().items())) or "defaults")
+        return self.inner.aggregate_fit(server_round, self._normalise(results), failures)
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        return self.inner.configure_evaluate(server_round, parameters, client_manager)
+
+    def aggregate_evaluate(self, server_round, results, failures):
+        return self.inner.aggregate_evaluate(server_round, results, failures)
+
+    def evaluate(self, server_round, parameters):
+        return self.inner.evaluate(server_round, parameters)
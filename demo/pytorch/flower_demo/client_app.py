@@ -3,11 +3,14 @@
 import torch
 from flwr.client import ClientApp, NumPyClient
 from flwr.common import Context
-from flwr_datasets import FederatedDataset
-from flwr_datasets.partitioner import IidPartitioner
 from torch.utils.data import DataLoader
 
-from flower_demo.model import SimpleCNN, apply_transforms, get_weights, set_weights, test, train
+from flower_demo.dataset import load_data
+from flower_demo.datasource import MIRROR_ROOT
+from flower_demo.hierarchy import group_metrics
+from flower_demo.model import SimpleCNN, apply_transforms, compile_model, get_weights, set_weights, test, train
+from flower_demo.partitioning import cache_root, resolve_assignment
+from flower_demo.profiling import RoundProfiler
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -15,59 +18,79 @@ DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 class FlowerClient(NumPyClient):
     """Flower client that trains a SimpleCNN on a CIFAR-10 partition."""
 
-    def __init__(self, net, trainloader, testloader, local_epochs):
+    def __init__(self, net, trainloader, testloader, local_epochs, profiler, group_metrics=None, fused=False):
         self.net = net
         self.trainloader = trainloader
         self.testloader = testloader
         self.local_epochs = local_epochs
+        self.profiler = profiler
+        self.group_metrics = group_metrics or {}
+        self.fused = fused
 
     def get_parameters(self, config):
         return get_weights(self.net)
 
     def fit(self, parameters, config):
-        set_weights(self.net, parameters)
-        train(self.net, self.trainloader, self.local_epochs, DEVICE)
-        return get_weights(self.net), len(self.trainloader.dataset), {}
+        with self.profiler.phase("set_weights"):
+            set_weights(self.net, parameters)
+        with self.profiler.phase("train"):
+            # local-steps: set per node by the server in adaptive-work mode
+            steps = train(self.net, self.trainloader, self.local_epochs, DEVICE, config.get("local-steps"),
+                          fused=self.fused)
+        with self.profiler.phase("get_weights"):
+            weights = get_weights(self.net)
+        self.profiler.record_payload(weights)
+        metrics = {"local_steps": steps, **self.profiler.metrics(), **self.group_metrics}
+        return weights, len(self.trainloader.dataset), metrics
 
     def evaluate(self, parameters, config):
-        set_weights(self.net, parameters)
-        loss, accuracy = test(self.net, self.testloader, DEVICE)
-        return loss, len(self.testloader.dataset), {"accuracy": accuracy}
+        with self.profiler.phase("set_weights"):
+            set_weights(self.net, parameters)
+        with self.profiler.phase("eval"):
+            loss, accuracy = test(self.net, self.testloader, DEVICE)
+        metrics = {"accuracy": accuracy, **self.profiler.metrics()}
+        return loss, len(self.testloader.dataset), metrics
 
 
 def client_fn(context: Context):
     """Create a FlowerClient for this SuperNode's data partition."""
-    # Read partition config — auto-assigned in OneFlow, fallback for manual deploy
-    node_config = context.node_config
-    num_partitions = int(node_config.get("num-partitions", 2))
+    profiler = RoundProfiler()
 
-    if "partition-id" in node_config:
-        partition_id = int(node_config["partition-id"])
-    else:
-        # Manual deployment fallback: deterministic partition from node ID
-        partition_id = int(context.node_id) % num_partitions
+    # Shards of the training split this node owns: stable across scale events,
+    # from the appliance's manifest, else from the node config
+    assignment = resolve_assignment(context.node_config, context.run_config, context.node_id)
 
     # Read run config
     run_config = context.run_config
     local_epochs = int(run_config.get("local-epochs", 1))
     batch_size = int(run_config.get("batch-size", 32))
+    synthetic = bool(run_config.get("synthetic-data", False))
+    synthetic_samples = int(run_config.get("synthetic-samples", 0))
 
     # Load CIFAR-10 partition
-    fds = FederatedDataset(
-        dataset="uoft-cs/cifar10",
-        partitioners={"train": IidPartitioner(num_partitions=num_partitions)},
-    )
-    train_partition = fds.load_partition(partition_id, "train")
-    test_partition = fds.load_split("test")
-
-    train_partition = train_partition.with_transform(apply_transforms)
-    test_partition = test_partition.with_transform(apply_transforms)
-
-    trainloader = DataLoader(train_partition, batch_size=batch_size, shuffle=True)
-    testloader = DataLoader(test_partition, batch_size=batch_size)
-
-    net = SimpleCNN().to(DEVICE)
-    return FlowerClient(net, trainloader, testloader, local_epochs).to_client()
+    with profiler.phase("data_load"):
+        train_partition, test_partition = load_data(
+            assignment, cache_root(run_config), synthetic, synthetic_samples,
+            mirror=str(run_config.get("data-mirror", MIRROR_ROOT)),
+        )
+
+        train_partition = train_partition.with_transform(apply_transforms)
+        test_partition = test_partition.with_transform(apply_transforms)
+
+        trainloader = DataLoader(train_partition, batch_size=batch_size, shuffle=True)
+        testloader = DataLoader(test_partition, batch_size=batch_size)
+
+    # compile: inductor-compiled train and eval steps, kernels cached on the
+    # SuperNode's cache volume; fused SGD with it
+    compiled = bool(run_config.get("compile", False))
+    with profiler.phase("model_setup"):
+        net = SimpleCNN().to(DEVICE)
+        if compiled:
+            net = compile_model(net, str(run_config.get("compile-cache-dir", "")))
+    return FlowerClient(
+        net, trainloader, testloader, local_epochs, profiler, group_metrics=group_metrics(context),
+        fused=compiled,
+    ).to_client()
 
 
 # Flower ClientApp entry point
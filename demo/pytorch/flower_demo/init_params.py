@@ -0,0 +1,33 @@
+"""Initial global weights built on the server, without PyTorch.
+
+NumPy only, so the ServerApp can hand Flower `initial_parameters` instead of
+asking a client for them: without them Flower picks one client before
+round 1 and waits for it to build the model just to call get_parameters.
+"""
+
+import numpy as np
+
+SEED = 42
+
+# SimpleCNN state_dict layout, in order: (weight shape, fan_in)
+LAYERS = [
+    ((32, 3, 5, 5), 3 * 5 * 5),        # conv1
+    ((64, 32, 5, 5), 32 * 5 * 5),      # conv2
+    ((512, 64 * 6 * 6), 64 * 6 * 6),   # fc1
+    ((10, 512), 512),                  # fc2
+]
+
+
+def initial_arrays(seed: int = SEED) -> list[np.ndarray]:
+    """Weights and biases matching SimpleCNN.state_dict() order and shapes.
+
+    Same distribution as PyTorch's default Conv2d/Linear init: weights and
+    biases uniform in ±1/sqrt(fan_in) (kaiming_uniform with a=sqrt(5)).
+    """
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for shape, fan_in in LAYERS:
+        bound = 1.0 / np.sqrt(fan_in)
+        arrays.append(rng.uniform(-bound, bound, size=shape).astype(np.float32))
+        arrays.append(rng.uniform(-bound, bound, size=shape[0]).astype(np.float32))
+    return arrays
@@ -1,10 +1,13 @@
 """SimpleCNN for CIFAR-10 and helper functions."""
 
+import os
 from collections import OrderedDict
+from logging import WARNING
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from flwr.common.logger import log
 from torch.utils.data import DataLoader
 
 
@@ -34,6 +37,47 @@ class SimpleCNN(nn.Module):
         return x
 
 
+def compile_model(net: nn.Module, cache_dir: str = "") -> nn.Module:
+    """`torch.compile` the model (inductor, CPU C++ kernels) for training and eval.
+
+    Compilation is lazy: the first training step and the first evaluation
+    batch each compile their graph (forward and backward, or inference).
+    With `cache_dir` the compiled graphs and kernels are kept there (FX
+    graph and AOTAutograd caches), so later processes (every task under
+    subprocess isolation, every SuperNode restart) load them instead of
+    compiling again. Without a working C++ compiler, or on any other
+    compile error, the model runs eagerly.
+    """
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            os.environ["TORCHINDUCTOR_CACHE_DIR"] = cache_dir
+        except OSError as e:
+            log(WARNING, "compile cache %s unusable (%s), compiled kernels are not kept", cache_dir, e)
+    import torch._dynamo
+    import torch._functorch.config
+    import torch._inductor.config
+
+    torch._inductor.config.fx_graph_cache = True
+    if hasattr(torch._functorch.config, "enable_autograd_cache"):  # torch >= 2.5
+        torch._functorch.config.enable_autograd_cache = True
+    torch._dynamo.config.suppress_errors = True
+    return torch.compile(net)
+
+
+def make_optimizer(net: nn.Module, lr: float = 0.01, momentum: float = 0.9,
+                   fused: bool = False) -> torch.optim.Optimizer:
+    """SGD with momentum; with `fused`, one kernel over all parameters
+    (foreach, a few batched ops, where the fused kernel is unavailable)."""
+    params = list(net.parameters())
+    if fused:
+        try:
+            return torch.optim.SGD(params, lr=lr, momentum=momentum, fused=True)
+        except (RuntimeError, TypeError):
+            return torch.optim.SGD(params, lr=lr, momentum=momentum, foreach=True)
+    return torch.optim.SGD(params, lr=lr, momentum=momentum)
+
+
 def get_weights(net: nn.Module) -> list[list[float]]:
     """Extract model parameters as a list of NumPy arrays."""
     return [val.cpu().numpy() for _, val in net.state_dict().items()]
@@ -56,21 +100,32 @@ def apply_transforms(batch: dict) -> dict:
 
 
 def train(
-    net: nn.Module, trainloader: DataLoader, epochs: int, device: torch.device
-) -> None:
-    """Train the model on local data."""
+    net: nn.Module, trainloader: DataLoader, epochs: int, device: torch.device,
+    steps: int | None = None, fused: bool = False,
+) -> int:
+    """Train the model on local data: `epochs` passes, or exactly `steps`
+    mini-batches when given (cycling through the loader). Returns the
+    number of optimizer steps taken."""
     net.to(device)
     net.train()
     criterion = nn.CrossEntropyLoss()
-    optimizer = torch.optim.SGD(net.parameters(), lr=0.01, momentum=0.9)
-    for _ in range(epochs):
+    optimizer = make_optimizer(net, fused=fused)
+    if len(trainloader) == 0:
+        return 0
+    done, epoch = 0, 0
+    while done < steps if steps else epoch < epochs:
         for batch in trainloader:
+            if steps and done >= steps:
+                break
             images = batch["img"].to(device)
             labels = batch["label"].to(device)
             optimizer.zero_grad()
             loss = criterion(net(images), labels)
             loss.backward()
             optimizer.step()
+            done += 1
+        epoch += 1
+    return done
 
 
 def test(
@@ -0,0 +1,218 @@
+"""Stable partition assignment: fixed shards, rendezvous hashing, a node manifest.
+
+The training split is cut into a fixed number of shards (`partition-shards`)
+by the partitioner chosen in the run config (`iid`, `dirichlet` or `shard`),
+independently of how many SuperNodes there are. Each shard goes to the node
+whose stable key hashes highest against it (rendezvous hashing), so a join
+or leave only moves shards to the new node or off the departed one. Loads
+are then capped at ceil(shards / nodes): a node over the cap hands its
+surplus to the next-best nodes with room. The cap can move a few shards
+between nodes that did not join or leave (about 1.4x the minimum on
+average, see bench/partition_bench.py); a node under the cap keeps every
+shard it wins by hashing.
+
+A node's key and the member list come from the manifest the SuperNode
+appliance keeps at /app/data/partition.json (node config
+`partition-manifest` overrides the path):
+
+    {"version": 1, "node_key": "123", "members": ["120", "123", "131"]}
+
+Without a manifest, the node config's `partition-id` / `num-partitions` are
+used as the key and member list. Prepared shards are cached on disk per
+partitioning, so a node only prepares the shards it did not have before.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from logging import INFO, WARNING
+from pathlib import Path
+
+from flwr.common.logger import log
+
+MANIFEST_PATH = "/app/data/partition.json"
+PARTITIONERS = ("iid", "dirichlet", "shard")
+
+
+@dataclass(frozen=True)
+class PartitionSpec:
+    """How the training split is cut into shards (the same on every node)."""
+
+    partitioner: str = "iid"
+    num_shards: int = 64
+    alpha: float = 0.5
+    seed: int = 42
+
+    @classmethod
+    def from_run_config(cls, cfg) -> "PartitionSpec":
+        spec = cls(
+            partitioner=str(cfg.get("partitioner", "iid")).lower(),
+            num_shards=int(cfg.get("partition-shards", 64)),
+            alpha=float(cfg.get("dirichlet-alpha", 0.5)),
+            seed=int(cfg.get("partition-seed", 42)),
+        )
+        if spec.partitioner not in PARTITIONERS:
+            raise ValueError(f"partitioner must be one of {PARTITIONERS}, got '{spec.partitioner}'")
+        return spec
+
+    def key(self, dataset: str) -> str:
+        """Short digest naming this partitioning of `dataset` (cache directory)."""
+        ident = f"{dataset}|{self.partitioner}|{self.num_shards}|{self.alpha}|{self.seed}"
+        return hashlib.sha256(ident.encode()).hexdigest()[:16]
+
+    def build(self, partition_by: str | None = "label"):
+        """The flwr-datasets partitioner producing `num_shards` shards."""
+        from flwr_datasets.partitioner import DirichletPartitioner, IidPartitioner, ShardPartitioner
+
+        if self.partitioner == "iid":
+            return IidPartitioner(num_partitions=self.num_shards)
+        if partition_by is None:
+            raise ValueError(f"partitioner '{self.partitioner}' needs a label column; this dataset has none")
+        if self.partitioner == "dirichlet":
+            return DirichletPartitioner(
+                num_partitions=self.num_shards, partition_by=partition_by,
+                alpha=self.alpha, seed=self.seed,
+            )
+        return ShardPartitioner(
+            num_partitions=self.num_shards, partition_by=partition_by,
+            num_shards_per_partition=2, seed=self.seed,
+        )
+
+
+@dataclass(frozen=True)
+class Assignment:
+    """The shards one node trains on, and where that came from."""
+
+    node_key: str
+    members: tuple[str, ...]
+    shards: tuple[int, ...]
+    spec: PartitionSpec
+    source: str  # "manifest" or "node-config"
+
+
+def _weight(member: str, shard: int) -> int:
+    digest = hashlib.blake2b(f"{member}/{shard}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def assign_shards(members, num_shards: int) -> dict[str, list[int]]:
+    """Map every member to its shards: rendezvous hashing, then a load cap.
+
+    Each shard first goes to its highest-weight member. A member holding
+    more than ceil(num_shards / len(members)) keeps its highest-weight
+    shards up to that cap, and each shard it sheds goes to the
+    highest-weight member that still has room. Only that overflow moves
+    beyond what plain rendezvous hashing would. Deterministic, so every
+    node computes the same map from the same member list.
+    """
+    members = sorted(set(members))
+    if not members:
+        return {}
+    capacity = -(-num_shards // len(members))
+    owned: dict[str, list[int]] = {m: [] for m in members}
+    for shard in range(num_shards):
+        owned[max(members, key=lambda m: _weight(m, shard))].append(shard)
+
+    overflow = []
+    for member, shards in owned.items():
+        if len(shards) > capacity:
+            shards.sort(key=lambda s, m=member: _weight(m, s), reverse=True)
+            overflow.extend(shards[capacity:])
+            del shards[capacity:]
+    for shard in sorted(overflow):
+        room = [m for m in members if len(owned[m]) < capacity]
+        owned[max(room, key=lambda m: _weight(m, shard))].append(shard)
+    return {m: sorted(shards) for m, shards in owned.items()}
+
+
+def read_manifest(path: str | os.PathLike) -> dict | None:
+    """The appliance's partition manifest, or None if absent or unreadable."""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        members = [str(m) for m in manifest["members"]]
+        node_key = str(manifest["node_key"])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log(WARNING, "[PARTITION] ignoring unreadable manifest %s: %s", path, e)
+        return None
+    if node_key not in members:
+        log(WARNING, "[PARTITION] ignoring manifest %s: node %s is not a member", path, node_key)
+        return None
+    return {"node_key": node_key, "members": members}
+
+
+def resolve_assignment(node_config, run_config, node_id: int = 0) -> Assignment:
+    """This node's shards, from the manifest or else the node config."""
+    spec = PartitionSpec.from_run_config(run_config)
+    manifest = read_manifest(node_config.get("partition-manifest", MANIFEST_PATH))
+    if manifest is not None:
+        node_key, members, source = manifest["node_key"], manifest["members"], "manifest"
+    else:
+        num_partitions = int(node_config.get("num-partitions", 2))
+        # Manual deployment fallback: deterministic partition from node ID
+        partition_id = int(node_config.get("partition-id", int(node_id) % num_partitions))
+        node_key, members, source = str(partition_id), [str(i) for i in range(num_partitions)], "node-config"
+
+    if spec.num_shards < len(members):
+        raise ValueError(
+            f"partition-shards={spec.num_shards} is less than the {len(members)} SuperNodes; raise it"
+        )
+    shards = tuple(assign_shards(members, spec.num_shards)[node_key])
+    log(INFO, "[PARTITION] node %s owns %d/%d %s shards (%s, %d members)",
+        node_key, len(shards), spec.num_shards, spec.partitioner, source, len(members))
+    return Assignment(node_key, tuple(sorted(members)), shards, spec, source)
+
+
+def cache_root(run_config) -> Path:
+    path = str(run_config.get("partition-cache-dir", ""))
+    return Path(path) if path else Path.home() / ".cache" / "flower_demo" / "partitions"
+
+
+def cached_dataset(path: Path, build):
+    """`datasets.load_from_disk(path)`, or `build()` saved there first.
+
+    Saved to a sibling temporary directory and renamed into place, so an
+    interrupted save never leaves a half-written shard behind.
+    """
+    from datasets import load_from_disk
+
+    if path.is_dir():
+        try:
+            return load_from_disk(str(path))
+        except (OSError, ValueError, FileNotFoundError):
+            shutil.rmtree(path, ignore_errors=True)
+    dataset = build()
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    try:
+        dataset.save_to_disk(str(tmp))
+        os.replace(tmp, path)
+    except OSError as e:
+        log(WARNING, "[PARTITION] not caching %s: %s", path.name, e)
+        shutil.rmtree(tmp, ignore_errors=True)
+        return dataset
+    return load_from_disk(str(path))
+
+
+def load_assigned(assignment: Assignment, dataset: str, load_shard, root: Path):
+    """Concatenate this node's shards, preparing only the ones not cached yet.
+
+    `load_shard(shard_id)` returns one shard as a `datasets.Dataset`; it is
+    only called on a cache miss.
+    """
+    from datasets import concatenate_datasets
+
+    directory = root / assignment.spec.key(dataset)
+    directory.mkdir(parents=True, exist_ok=True)
+    misses = [s for s in assignment.shards if not (directory / f"shard-{s:05d}").is_dir()]
+    if misses:
+        log(INFO, "[PARTITION] preparing %d new shard(s), %d cached",
+            len(misses), len(assignment.shards) - len(misses))
+    parts = [
+        cached_dataset(directory / f"shard-{s:05d}", lambda s=s: load_shard(s))
+        for s in assignment.shards
+    ]
+    return concatenate_datasets(parts)
@@ -3,64 +3,83 @@
 import numpy as np
 from flwr.client import ClientApp, NumPyClient
 from flwr.common import Context
-from flwr_datasets import FederatedDataset
-from flwr_datasets.partitioner import IidPartitioner
 
+from flower_demo.dataset import load_data
+from flower_demo.datasource import MIRROR_ROOT
+from flower_demo.hierarchy import group_metrics
 from flower_demo.model import create_model, get_weights, set_weights, init_model, test, train
+from flower_demo.partitioning import cache_root, resolve_assignment
+from flower_demo.profiling import RoundProfiler
 
 
 class FlowerClient(NumPyClient):
     """Flower client that trains an MLPClassifier on a CIFAR-10 partition."""
 
-    def __init__(self, model, x_train, y_train, x_test, y_test):
+    def __init__(self, model, x_train, y_train, x_test, y_test, profiler, group_metrics=None):
         self.model = model
         self.x_train = x_train
         self.y_train = y_train
         self.x_test = x_test
         self.y_test = y_test
+        self.profiler = profiler
+        self.group_metrics = group_metrics or {}
 
     def get_parameters(self, config):
         return get_weights(self.model)
 
     def fit(self, parameters, config):
-        set_weights(self.model, parameters)
-        train(self.model, self.x_train, self.y_train)
-        return get_weights(self.model), len(self.x_train), {}
+        with self.profiler.phase("set_weights"):
+            set_weights(self.model, parameters)
+        with self.profiler.phase("train"):
+            # local-steps: set per node by the server in adaptive-work mode
+            steps = train(self.model, self.x_train, self.y_train, config.get("local-steps"))
+        with self.profiler.phase("get_weights"):
+            weights = get_weights(self.model)
+        self.profiler.record_payload(weights)
+        metrics = {"local_steps": steps, **self.profiler.metrics(), **self.group_metrics}
+        return weights, len(self.x_train), metrics
 
     def evaluate(self, parameters, config):
-        set_weights(self.model, parameters)
-        loss, accuracy = test(self.model, self.x_test, self.y_test)
-        return loss, len(self.x_test), {"accuracy": accuracy}
+        with self.profiler.phase("set_weights"):
+            set_weights(self.model, parameters)
+        with self.profiler.phase("eval"):
+            loss, accuracy = test(self.model, self.x_test, self.y_test)
+        metrics = {"accuracy": accuracy, **self.profiler.metrics()}
+        return loss, len(self.x_test), metrics
 
 
 def client_fn(context: Context):
     """Create a FlowerClient for this SuperNode's data partition."""
-    node_config = context.node_config
-    num_partitions = int(node_config.get("num-partitions", 2))
+    profiler = RoundProfiler()
 
-    if "partition-id" in node_config:
-        partition_id = int(node_config["partition-id"])
-    else:
-        partition_id = int(context.node_id) % num_partitions
+    # Shards of the training split this node owns: stable across scale events,
+    # from the appliance's manifest, else from the node config
+    assignment = resolve_assignment(context.node_config, context.run_config, context.node_id)
+
+    run_config = context.run_config
+    synthetic = bool(run_config.get("synthetic-data", False))
+    synthetic_samples = int(run_config.get("synthetic-samples", 0))
 
     # Load CIFAR-10 partition as numpy arrays (flattened for sklearn)
-    fds = FederatedDataset(
-        dataset="uoft-cs/cifar10",
-        partitioners={"train": IidPartitioner(num_partitions=num_partitions)},
-    )
-    train_partition = fds.load_partition(partition_id, "train")
-    test_partition = fds.load_split("test")
-
-    # Flatten 32×32×3 images to 3072-dim vectors for MLP
-    x_train = np.array(train_partition["img"], dtype=np.float32).reshape(-1, 3072) / 255.0
-    y_train = np.array(train_partition["label"])
-    x_test = np.array(test_partition["img"], dtype=np.float32).reshape(-1, 3072) / 255.0
-    y_test = np.array(test_partition["label"])
-
-    model = create_model()
-    init_model(model, n_features=3072, n_classes=10)
-
-    return FlowerClient(model, x_train, y_train, x_test, y_test).to_client()
+    with profiler.phase("data_load"):
+        train_partition, test_partition = load_data(
+            assignment, cache_root(run_config), synthetic, synthetic_samples,
+            mirror=str(run_config.get("data-mirror", MIRROR_ROOT)),
+        )
+
+        # Flatten 32×32×3 images to 3072-dim vectors for MLP
+        x_train = np.array(train_partition["img"], dtype=np.float32).reshape(-1, 3072) / 255.0
+        y_train = np.array(train_partition["label"])
+        x_test = np.array(test_partition["img"], dtype=np.float32).reshape(-1, 3072) / 255.0
+        y_test = np.array(test_partition["label"])
+
+    with profiler.phase("model_setup"):
+        model = create_model()
+        init_model(model, n_features=3072, n_classes=10)
+
+    return FlowerClient(
+        model, x_train, y_train, x_test, y_test, profiler, group_metrics=group_metrics(context),
+    ).to_client()
 
 
 # Flower ClientApp entry point
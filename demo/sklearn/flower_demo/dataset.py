@@ -0,0 +1,68 @@
+"""CIFAR-10 loading: the Hugging Face dataset, or synthetic CIFAR-shaped data."""
+
+from pathlib import Path
+
+import numpy as np
+from datasets import ClassLabel, Dataset, Features, Image
+
+from flower_demo.datasource import MIRROR_ROOT, load_split
+from flower_demo.partitioning import Assignment, load_assigned
+
+DATASET_NAME = "uoft-cs/cifar10"
+SPLITS = ("train", "test")
+# FederatedDataset's default shuffle before partitioning, kept so shards
+# are the same whether the split comes from the mirror or the Hub
+SHUFFLE_SEED = 42
+
+# CIFAR-10 split sizes, used to size the synthetic stand-in
+TRAIN_SIZE = 50_000
+TEST_SIZE = 10_000
+
+
+def synthetic_cifar10(num_samples: int, seed: int) -> Dataset:
+    """Random 32×32×3 images with CIFAR-10's schema ("img", "label").
+
+    The images go through the same `Image` feature encoding as the real
+    dataset, so downstream decoding and transforms cost the same.
+    """
+    rng = np.random.default_rng(seed)
+    images = rng.integers(0, 256, size=(num_samples, 32, 32, 3), dtype=np.uint8)
+    labels = rng.integers(0, 10, size=num_samples)
+    features = Features({"img": Image(), "label": ClassLabel(num_classes=10)})
+    return Dataset.from_dict({"img": list(images), "label": labels.tolist()}, features=features)
+
+
+def load_data(
+    assignment: Assignment, cache_dir: Path, synthetic: bool = False, synthetic_samples: int = 0,
+    mirror: str = MIRROR_ROOT,
+) -> tuple[Dataset, Dataset]:
+    """Return this node's (train shards, test split).
+
+    Shards come from the on-disk cache when this node prepared them before
+    (see partitioning.py); the splits themselves from the local mirror when
+    staged, else the Hub (see datasource.py). With `synthetic`, deterministic random data
+    replaces the download: the node gets its shards' share of CIFAR-10's
+    samples (or `synthetic_samples` when set), so simulation benchmarks
+    need no network access.
+    """
+    if synthetic:
+        share = TRAIN_SIZE * len(assignment.shards) // assignment.spec.num_shards
+        num_test = max(1, synthetic_samples // 5) if synthetic_samples else TEST_SIZE
+        return (
+            synthetic_cifar10(synthetic_samples or share, seed=min(assignment.shards, default=0)),
+            synthetic_cifar10(num_test, seed=1_000),
+        )
+
+    partitioner = None
+
+    def shard(shard_id: int) -> Dataset:
+        # Only set up on a cache miss: a warm node never reads the full split
+        nonlocal partitioner
+        if partitioner is None:
+            partitioner = assignment.spec.build(partition_by="label")
+            partitioner.dataset = load_split(DATASET_NAME, "train", mirror).shuffle(seed=SHUFFLE_SEED)
+        return partitioner.load_partition(shard_id)
+
+    train = load_assigned(assignment, DATASET_NAME, shard, cache_dir)
+    test = load_split(DATASET_NAME, "test", mirror, cache_dir=cache_dir)
+    return train, test
@@ -0,0 +1,132 @@
+"""Simulated two-tier aggregation: per-group FedAvg, then the run's strategy.
+
+Off by default. With `hierarchical-aggregation = true` every SuperNode
+reports the group it belongs to (node config `aggregation-group`, set by the
+SuperNode appliance from ONEAPP_FL_AGGREGATION_GROUP, e.g. one per
+OpenNebula host or subnet). The ServerApp first averages the updates of
+each group, weighted by their example counts, then hands the configured
+strategy one update per group carrying the group's total example count.
+
+This simulates a grouped topology; it is not one. Flower has no relay
+role, so the group tier runs inside the ServerApp after every node's update
+has already crossed the SuperLink: fan-in, bandwidth and the work of
+deserializing and averaging N updates are the same as flat aggregation.
+What it shows is how a strategy behaves when it sees per-group updates
+(a server optimizer stepping on group means, say) before real
+intermediate aggregators exist.
+
+For FedAvg (and FedProx, FedAdam, whose first step is the same weighted
+mean) the result equals flat aggregation: a weighted mean of weighted
+means, each weighted by its total. Nodes without a group are pooled in one
+unnamed group; `aggregation-groups = N` assigns them `partition-id mod N`
+instead, which is how simulations are split.
+
+NumPy and the standard library only, like checkpoint.py.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import INFO
+
+from flwr.common import Code, FitRes, Status
+from flwr.common.logger import log
+from flwr.server.strategy import Strategy
+
+from flower_demo.flat import weighted_mean
+
+# Fit metric carrying a node's group (a string; the metrics aggregation
+# functions only combine numeric values, so it never reaches the log line)
+GROUP_KEY = "aggregation-group"
+
+
+def enabled(cfg) -> bool:
+    return bool(cfg.get("hierarchical-aggregation", False))
+
+
+def node_group(node_config, run_config) -> str:
+    """This node's aggregation group, or "" when it has none (or the mode is off)."""
+    if not enabled(run_config):
+        return ""
+    group = str(node_config.get(GROUP_KEY, ""))
+    if group:
+        return group
+    groups = int(run_config.get("aggregation-groups", 0))
+    if groups > 0 and "partition-id" in node_config:
+        return f"g{int(node_config['partition-id']) % groups}"
+    return ""
+
+
+def group_metrics(context) -> dict:
+    """Fit metrics a ClientApp adds to report its group ({} when it has none)."""
+    group = node_group(context.node_config, context.run_config)
+    return {GROUP_KEY: group} if group else {}
+
+
+def _group_mean(results: list) -> FitRes:
+    """One group's FitRes: the example-weighted mean of its updates.
+
+    Accumulated one update at a time in a flat buffer (flat.py), so a group
+    holds a single running sum rather than a copy of every member's arrays.
+    """
+    layout, mean = weighted_mean(results)
+    return FitRes(
+        status=Status(code=Code.OK, message=""),
+        parameters=layout.to_parameters(mean),
+        num_examples=sum(res.num_examples for _, res in results),
+        metrics={},
+    )
+
+
+class HierarchicalStrategy(Strategy):
+    """Delegate to `inner`, pre-aggregating fit results group by group.
+
+    `fit_metrics_aggregation_fn` runs on the per-node results (so the
+    `[METRICS] fit` line still describes the nodes, not the groups); give
+    `inner` none of its own. Evaluation is unchanged.
+    """
+
+    def __init__(self, inner: Strategy, fit_metrics_aggregation_fn=None):
+        self.inner = inner
+        self.fit_metrics_aggregation_fn = fit_metrics_aggregation_fn
+        self.max_workers = os.cpu_count() or 1
+
+    def __repr__(self) -> str:
+        return f"HierarchicalStrategy({self.inner!r})"
+
+    def initialize_parameters(self, client_manager):
+        return self.inner.initialize_parameters(client_manager)
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        return self.inner.configure_fit(server_round, parameters, client_manager)
+
+    def aggregate_fit(self, server_round, results, failures):
+        if not results:
+            return self.inner.aggregate_fit(server_round, results, failures)
+
+        start = time.perf_counter()
+        groups: dict[str, list] = {}
+        for proxy, res in results:
+            groups.setdefault(str(res.metrics.get(GROUP_KEY, "")), []).append((proxy, res))
+        with ThreadPoolExecutor(max_workers=min(len(groups), self.max_workers)) as pool:
+            means = list(pool.map(_group_mean, groups.values()))
+        # Any member's proxy stands for the group; the strategies only read the FitRes
+        group_results = [(members[0][0], mean) for members, mean in zip(groups.values(), means)]
+        log(INFO, "[HIER] round %d: %d updates in %d groups, pre-aggregated in %.3fs",
+            server_round, len(results), len(groups), time.perf_counter() - start)
+
+        parameters, metrics = self.inner.aggregate_fit(server_round, group_results, failures)
+        if self.fit_metrics_aggregation_fn is not None:
+            metrics = {**metrics, **self.fit_metrics_aggregation_fn(
+                [(res.num_examples, res.metrics) for _, res in results]
+            )}
+        return parameters, metrics
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        return self.inner.configure_evaluate(server_round, parameters, client_manager)
+
+    def aggregate_evaluate(self, server_round, results, failures):
+        return self.inner.aggregate_evaluate(server_round, results, failures)
+
+    def evaluate(self, server_round, parameters):
+        return self.inner.evaluate(server_round, parameters)
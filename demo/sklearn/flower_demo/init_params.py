@@ -0,0 +1,23 @@
+"""Initial global weights built on the server, without scikit-learn.
+
+NumPy only, so the ServerApp can hand Flower `initial_parameters` instead of
+asking a client for them: without them Flower picks one client before
+round 1 and waits for it to build the model just to call get_parameters.
+The clients' init_model() uses the same arrays, so both sides agree.
+"""
+
+import numpy as np
+
+SEED = 42
+HIDDEN = 512
+
+
+def initial_arrays(n_features: int = 3072, n_classes: int = 10, seed: int = SEED) -> list[np.ndarray]:
+    """Small random weights in get_weights() order: coefs, intercepts per layer."""
+    rng = np.random.default_rng(seed)
+    return [
+        rng.standard_normal((n_features, HIDDEN)).astype(np.float32) * 0.01,
+        np.zeros(HIDDEN, dtype=np.float32),
+        rng.standard_normal((HIDDEN, n_classes)).astype(np.float32) * 0.01,
+        np.zeros(n_classes, dtype=np.float32),
+    ]
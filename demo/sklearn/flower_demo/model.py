@@ -4,6 +4,8 @@ import numpy as np
 from sklearn.neural_network import MLPClassifier
 from sklearn.metrics import log_loss, accuracy_score
 
+from flower_demo.init_params import initial_arrays
+
 
 def create_model() -> MLPClassifier:
     """Create an MLPClassifier for CIFAR-10 (~1.6M parameters).
@@ -50,20 +52,22 @@ def init_model(model: MLPClassifier, n_features: int, n_classes: int) -> None:
     y_dummy = np.arange(n_classes)
     model.partial_fit(x_dummy, y_dummy, classes=y_dummy)
 
-    # Overwrite with small random weights (the dummy fit produces arbitrary ones)
-    model.coefs_ = [
-        rng.standard_normal((n_features, 512)).astype(np.float32) * 0.01,
-        rng.standard_normal((512, n_classes)).astype(np.float32) * 0.01,
-    ]
-    model.intercepts_ = [
-        np.zeros(512, dtype=np.float32),
-        np.zeros(n_classes, dtype=np.float32),
-    ]
+    # Overwrite with the server's initial weights (the dummy fit produces arbitrary ones)
+    set_weights(model, initial_arrays(n_features, n_classes))
 
 
-def train(model: MLPClassifier, x: np.ndarray, y: np.ndarray) -> None:
-    """Train the model on local data using partial_fit."""
+def train(model: MLPClassifier, x: np.ndarray, y: np.ndarray, steps: int | None = None) -> int:
+    """Train the model on local data using partial_fit: one pass, or exactly
+    `steps` mini-batches when given (cycling through the data). Returns the
+    number of optimizer steps taken."""
+    # MLPClassifier's batch_size="auto" means min(200, n_samples)
+    batch_size = model.batch_size if isinstance(model.batch_size, int) else 200
+    batch_size = min(batch_size, len(x))
+    if steps:
+        idx = np.arange(steps * batch_size) % len(x)
+        x, y = x[idx], y[idx]
     model.partial_fit(x, y, classes=np.arange(10))
+    return -(-len(x) // batch_size)
 
 
 def test(model: MLPClassifier, x: np.ndarray, y: np.ndarray) -> tuple[float, float]:
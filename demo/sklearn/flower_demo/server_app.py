@@ -4,40 +4,89 @@ IMPORTANT: This module must NOT import torch or any ML framework.
 The ServerApp runs on the SuperLink container which only has flwr installed.
 """
 
+from flwr.common import ndarrays_to_parameters
 from flwr.server import ServerApp, ServerAppComponents, ServerConfig
-from flwr.server.strategy import FedAvg, FedProx, FedAdam
+from flwr.server.strategy import FedAdam, FedAvg, FedAvgM, FedProx, FedYogi
+
+from flower_demo.adaptive import AdaptiveWorkStrategy, enabled as adaptive_enabled
+from flower_demo.checkpoint import Checkpointer
+from flower_demo.flat import FlatFedAdam, FlatFedAvg, FlatFedAvgM, FlatFedProx, FlatFedYogi
+from flower_demo.hierarchy import HierarchicalStrategy, enabled as hierarchical_enabled
+from flower_demo.init_params import initial_arrays
+from flower_demo.profiling import aggregate_evaluate_metrics, aggregate_fit_metrics, tag_run_log
 
 STRATEGY_MAP = {
     "FedAvg": FedAvg,
     "FedProx": FedProx,
     "FedAdam": FedAdam,
+    "FedYogi": FedYogi,
+    "FedAvgM": FedAvgM,
+}
+
+# The same strategies aggregating over one flat buffer per update (flat.py)
+FLAT_STRATEGY_MAP = {
+    "FedAvg": FlatFedAvg,
+    "FedProx": FlatFedProx,
+    "FedAdam": FlatFedAdam,
+    "FedYogi": FlatFedYogi,
+    "FedAvgM": FlatFedAvgM,
 }
 
 
 def server_fn(context):
     """Configure the strategy and server from run config."""
     cfg = context.run_config
+    tag_run_log(context.run_id)
     num_rounds = int(cfg.get("num-server-rounds", 3))
     strategy_name = cfg.get("strategy", "FedAvg")
     min_fit = int(cfg.get("min-fit-clients", 2))
     min_available = int(cfg.get("min-available-clients", 2))
+    hierarchical = hierarchical_enabled(cfg)
 
-    strategy_cls = STRATEGY_MAP.get(strategy_name, FedAvg)
+    strategy_map = FLAT_STRATEGY_MAP if cfg.get("flat-aggregation", False) else STRATEGY_MAP
+    strategy_cls = strategy_map.get(strategy_name, strategy_map["FedAvg"])
+
+    # Resume from the newest checkpoint: run only the rounds still missing
+    checkpointer = Checkpointer.from_run_config(cfg, context.run_id)
+    resumed_round, initial_parameters = (0, None)
+    if cfg.get("resume", False):
+        resumed_round, initial_parameters = checkpointer.restore()
+        num_rounds = max(num_rounds - resumed_round, 0)
+
+    if initial_parameters is None and cfg.get("server-init", True):
+        # Built here, so no client has to cold-start before round 1
+        initial_parameters = ndarrays_to_parameters(initial_arrays())
 
     kwargs = dict(
         fraction_fit=1.0,
         fraction_evaluate=1.0,
         min_fit_clients=min_fit,
         min_available_clients=min_available,
+        # Per-phase client timings and resources, logged once per round
+        # (per node, by the group tier when aggregation is hierarchical)
+        fit_metrics_aggregation_fn=None if hierarchical else aggregate_fit_metrics,
+        evaluate_metrics_aggregation_fn=aggregate_evaluate_metrics,
     )
 
+    if initial_parameters is not None:
+        kwargs["initial_parameters"] = initial_parameters
+
     if strategy_name == "FedProx":
         kwargs["proximal_mu"] = float(cfg.get("proximal-mu", 1.0))
-    elif strategy_name == "FedAdam":
+    elif strategy_name in ("FedAdam", "FedYogi"):
         kwargs["eta"] = float(cfg.get("server-lr", 0.01))
         kwargs["tau"] = float(cfg.get("tau", 0.1))
+    elif strategy_name == "FedAvgM":
+        kwargs["server_momentum"] = float(cfg.get("server-momentum", 0.9))
 
     strategy = strategy_cls(**kwargs)
+    if hierarchical:
+        # Per-group weighted FedAvg first; the strategy sees one update per group
+        strategy = HierarchicalStrategy(strategy, fit_metrics_aggregation_fn=aggregate_fit_metrics)
+    if adaptive_enabled(cfg):
+        # Outside the group tier: work and normalisation are per node
+        strategy = AdaptiveWorkStrategy(strategy, target_s=float(cfg.get("adaptive-target-s", 0.0)))
+    strategy = checkpointer.wrap(strategy, num_rounds, round_offset=resumed_round)
     config = ServerConfig(num_rounds=num_rounds)
     return ServerAppComponents(strategy=strategy, config=config)
 
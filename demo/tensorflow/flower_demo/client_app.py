@@ -3,16 +3,20 @@
 import numpy as np
 from flwr.client import ClientApp, NumPyClient
 from flwr.common import Context
-from flwr_datasets import FederatedDataset
-from flwr_datasets.partitioner import IidPartitioner
 
-from flower_demo.model import SimpleCNN, get_weights, set_weights, test, train
+from flower_demo.dataset import load_data
+from flower_demo.datasource import MIRROR_ROOT
+from flower_demo.hierarchy import group_metrics
+from flower_demo.model import get_model, get_weights, prepare_optimizer_state, set_weights, test, train
+from flower_demo.partitioning import cache_root, resolve_assignment
+from flower_demo.profiling import RoundProfiler
 
 
 class FlowerClient(NumPyClient):
     """Flower client that trains a Keras CNN on a CIFAR-10 partition."""
 
-    def __init__(self, model, x_train, y_train, x_test, y_test, local_epochs, batch_size):
+    def __init__(self, model, x_train, y_train, x_test, y_test, local_epochs, batch_size,
+                 profiler, owner, keep_optimizer_state=False, model_cached=False, group_metrics=None):
         self.model = model
         self.x_train = x_train
         self.y_train = y_train
@@ -20,55 +24,82 @@ class FlowerClient(NumPyClient):
         self.y_test = y_test
         self.local_epochs = local_epochs
         self.batch_size = batch_size
+        self.profiler = profiler
+        self.owner = owner  # (run id, node id) the optimizer state belongs to
+        self.keep_optimizer_state = keep_optimizer_state
+        self.model_cached = model_cached
+        self.group_metrics = group_metrics or {}
 
     def get_parameters(self, config):
         return get_weights(self.model)
 
     def fit(self, parameters, config):
-        set_weights(self.model, parameters)
-        train(self.model, self.x_train, self.y_train,
-              self.local_epochs, self.batch_size)
-        return get_weights(self.model), len(self.x_train), {}
+        with self.profiler.phase("set_weights"):
+            set_weights(self.model, parameters)
+            prepare_optimizer_state(self.model, self.owner, self.keep_optimizer_state)
+        with self.profiler.phase("train"):
+            # local-steps: set per node by the server in adaptive-work mode
+            steps = train(self.model, self.x_train, self.y_train,
+                          self.local_epochs, self.batch_size, config.get("local-steps"))
+        with self.profiler.phase("get_weights"):
+            weights = get_weights(self.model)
+        self.profiler.record_payload(weights)
+        # Warm (cached) vs cold (built + compiled) rounds: compare
+        # prof_model_setup_s between rounds with and without a cache hit
+        metrics = {"model_cache_hit": int(self.model_cached), "local_steps": steps,
+                   **self.profiler.metrics(), **self.group_metrics}
+        return weights, len(self.x_train), metrics
 
     def evaluate(self, parameters, config):
-        set_weights(self.model, parameters)
-        loss, accuracy = test(self.model, self.x_test, self.y_test)
-        return loss, len(self.x_test), {"accuracy": accuracy}
+        with self.profiler.phase("set_weights"):
+            set_weights(self.model, parameters)
+        with self.profiler.phase("eval"):
+            loss, accuracy = test(self.model, self.x_test, self.y_test)
+        metrics = {"accuracy": accuracy, **self.profiler.metrics()}
+        return loss, len(self.x_test), metrics
 
 
 def client_fn(context: Context):
     """Create a FlowerClient for this SuperNode's data partition."""
-    node_config = context.node_config
-    num_partitions = int(node_config.get("num-partitions", 2))
+    profiler = RoundProfiler()
 
-    if "partition-id" in node_config:
-        partition_id = int(node_config["partition-id"])
-    else:
-        partition_id = int(context.node_id) % num_partitions
+    # Shards of the training split this node owns: stable across scale events,
+    # from the appliance's manifest, else from the node config
+    assignment = resolve_assignment(context.node_config, context.run_config, context.node_id)
 
     run_config = context.run_config
     local_epochs = int(run_config.get("local-epochs", 1))
     batch_size = int(run_config.get("batch-size", 32))
+    keep_optimizer_state = bool(run_config.get("keep-optimizer-state", False))
+    synthetic = bool(run_config.get("synthetic-data", False))
+    synthetic_samples = int(run_config.get("synthetic-samples", 0))
 
     # Load CIFAR-10 partition as numpy arrays
-    fds = FederatedDataset(
-        dataset="uoft-cs/cifar10",
-        partitioners={"train": IidPartitioner(num_partitions=num_partitions)},
-    )
-    train_partition = fds.load_partition(partition_id, "train")
-    test_partition = fds.load_split("test")
-
-    train_partition.set_format("numpy")
-    test_partition.set_format("numpy")
-
-    x_train = train_partition["img"].astype(np.float32) / 255.0
-    y_train = train_partition["label"]
-    x_test = test_partition["img"].astype(np.float32) / 255.0
-    y_test = test_partition["label"]
-
-    model = SimpleCNN()
+    with profiler.phase("data_load"):
+        train_partition, test_partition = load_data(
+            assignment, cache_root(run_config), synthetic, synthetic_samples,
+            mirror=str(run_config.get("data-mirror", MIRROR_ROOT)),
+        )
+
+        train_partition.set_format("numpy")
+        test_partition.set_format("numpy")
+
+        x_train = train_partition["img"].astype(np.float32) / 255.0
+        y_train = train_partition["label"]
+        x_test = test_partition["img"].astype(np.float32) / 255.0
+        y_test = test_partition["label"]
+
+    # Reuse the process's compiled model; only the weights change per round
+    with profiler.phase("model_setup"):
+        model, cached = get_model()
+
     return FlowerClient(
         model, x_train, y_train, x_test, y_test, local_epochs, batch_size,
+        profiler,
+        owner=(context.run_id, context.node_id),
+        keep_optimizer_state=keep_optimizer_state,
+        model_cached=cached,
+        group_metrics=group_metrics(context),
     ).to_client()
 
 
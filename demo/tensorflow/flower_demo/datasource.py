@@ -0,0 +1,88 @@
+"""Dataset splits from a local mirror under /app/data, else the Hugging Face Hub.
+
+The SuperNode appliance mounts the host's /opt/flower/data read-only at
+/app/data, and that volume outlives the container (framework switches
+recreate it, losing any Hub download). A split staged there is read with
+`load_from_disk`, memory-mapped, with no network access:
+
+    <mirror>/<dataset with "/" replaced by "__">/<split>/     save_to_disk output
+    <mirror>/<dataset ...>/<split>.parquet  or  <split>/*.parquet
+
+Fill the mirror with this module (from the demo directory, on any machine
+with the demo installed; then copy the result to /opt/flower/data/mirror on
+each SuperNode), or on a SuperNode itself with
+/opt/flower/scripts/stage-dataset.sh:
+
+    python -m flower_demo.datasource --dest ./mirror
+"""
+
+import argparse
+from logging import INFO
+from pathlib import Path
+
+from flwr.common.logger import log
+
+from flower_demo.partitioning import cached_dataset
+
+MIRROR_ROOT = "/app/data/mirror"
+
+
+def mirror_dir(root: str | Path, dataset: str) -> Path:
+    return Path(root) / dataset.replace("/", "__")
+
+
+def _parquet_files(root: str | Path, dataset: str, split: str) -> list[Path]:
+    local = mirror_dir(root, dataset)
+    return sorted(local.glob(f"{split}.parquet")) + sorted((local / split).glob("*.parquet"))
+
+
+def load_split(dataset: str, split: str, root: str | Path = MIRROR_ROOT, cache_dir: Path | None = None):
+    """One split of `dataset`: from the mirror when staged, else from the Hub.
+
+    A Hub download is also saved under `cache_dir` when given, so the next
+    call in the same container skips the Hub's network round trips.
+    """
+    from datasets import Dataset, load_dataset, load_from_disk
+
+    arrow = mirror_dir(root, dataset) / split
+    if (arrow / "state.json").is_file():
+        log(INFO, "[DATA] %s/%s from mirror %s", dataset, split, arrow)
+        return load_from_disk(str(arrow))
+    parquet = _parquet_files(root, dataset, split)
+    if parquet:
+        log(INFO, "[DATA] %s/%s from %d Parquet file(s) in %s", dataset, split, len(parquet), arrow.parent)
+        return Dataset.from_parquet([str(p) for p in parquet])
+
+    log(INFO, "[DATA] %s/%s not in mirror %s, loading from the Hub", dataset, split, root)
+    if cache_dir is None:
+        return load_dataset(dataset, split=split)
+    return cached_dataset(cache_dir / f"{dataset.replace('/', '__')}-{split}",
+                          lambda: load_dataset(dataset, split=split))
+
+
+def stage(dataset: str, splits, dest: str | Path) -> list[Path]:
+    """Download `splits` of `dataset` from the Hub into the mirror at `dest`."""
+    from datasets import load_dataset
+
+    staged = []
+    for split in splits:
+        path = mirror_dir(dest, dataset) / split
+        load_dataset(dataset, split=split).save_to_disk(str(path))
+        staged.append(path)
+    return staged
+
+
+def main():
+    from flower_demo.dataset import DATASET_NAME, SPLITS
+
+    parser = argparse.ArgumentParser(description="Stage this demo's dataset into a local mirror.")
+    parser.add_argument("--dest", default=MIRROR_ROOT, help=f"mirror root (default: {MIRROR_ROOT})")
+    parser.add_argument("--dataset", default=DATASET_NAME)
+    parser.add_argument("--splits", nargs="+", default=list(SPLITS))
+    args = parser.parse_args()
+    for path in stage(args.dataset, args.splits, args.dest):
+        print(f"staged {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Server aggregation on one contiguous float32 buffer per update.
+
+Flower hands the strategies each update as a list of arrays (8 for the
+CNN, 4 for the MLP, 96 LoRA tensors for the LLM), and the stock FedAvg,
+FedAdam, FedYogi and FedAvgM loop over that list in Python for every
+client and every optimizer step. Here each update is copied once into a
+flat float32 buffer described by a `Layout` (shapes, dtypes, offsets);
+the weighted mean and the server optimizer steps are then a handful of
+whole-buffer NumPy operations, and the result is split back into arrays
+only when it is returned to Flower.
+
+The strategies below are drop-in subclasses of Flower's: configuration,
+client sampling and evaluation are theirs; only `aggregate_fit` and the
+server optimizer state (kept flat) are replaced. The update rules match
+Flower's.
+
+NumPy and the standard library only, like checkpoint.py.
+"""
+
+import io
+from abc import ABC, abstractmethod
+from math import prod
+
+import numpy as np
+from flwr.common import Parameters, ndarrays_to_parameters
+from flwr.server.strategy import FedAdam, FedAvg, FedAvgM, FedProx, FedYogi
+
+
+def _npy_header(data: bytes) -> tuple[tuple, bool, np.dtype, int]:
+    """(shape, fortran_order, dtype, data offset) of one serialized tensor (.npy bytes)."""
+    f = io.BytesIO(data)
+    version = np.lib.format.read_magic(f)
+    read = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, fortran_order, dtype = read(f)
+    return shape, fortran_order, dtype, f.tell()
+
+
+def _npy_view(data: bytes, header: tuple) -> np.ndarray:
+    """A serialized tensor as a flat C-order view of `data`, without a copy."""
+    shape, fortran_order, dtype, offset = header
+    array = np.frombuffer(data, dtype=dtype, count=prod(shape), offset=offset)
+    if fortran_order:
+        array = array.reshape(shape[::-1]).T
+    return array.reshape(-1)
+
+
+class Layout:
+    """Where each array of a parameter list lives in a flat buffer."""
+
+    def __init__(self, shapes: list[tuple], dtypes: list[np.dtype], headers: list[tuple] | None = None):
+        self.shapes = shapes
+        self.dtypes = dtypes
+        # .npy headers of the serialized tensors: every update of a model
+        # serializes the same way, so they are parsed once, not per client
+        self.headers = headers
+        self.offsets = [0]
+        for shape in shapes:
+            self.offsets.append(self.offsets[-1] + prod(shape))
+        self.size = self.offsets[-1]
+
+    @classmethod
+    def of(cls, arrays: list[np.ndarray]) -> "Layout":
+        return cls([a.shape for a in arrays], [a.dtype for a in arrays])
+
+    @classmethod
+    def of_parameters(cls, parameters: Parameters) -> "Layout":
+        headers = [_npy_header(data) for data in parameters.tensors]
+        return cls([h[0] for h in headers], [h[2] for h in headers], headers)
+
+    def pack(self, arrays: list[np.ndarray], out: np.ndarray | None = None) -> np.ndarray:
+        """Copy `arrays` into `out` (a new float32 buffer by default)."""
+        if out is None:
+            out = np.empty(self.size, dtype=np.float32)
+        if len(arrays) != len(self.shapes):
+            raise ValueError(f"expected {len(self.shapes)} arrays, got {len(arrays)}")
+        for a, start, end in zip(arrays, self.offsets, self.offsets[1:]):
+            out[start:end] = a.reshape(-1)
+        return out
+
+    def pack_parameters(self, parameters: Parameters, out: np.ndarray | None = None,
+                        scale: float = 1.0) -> np.ndarray:
+        """Deserialize `parameters` straight into a flat buffer, times `scale`."""
+        if out is None:
+            out = np.empty(self.size, dtype=np.float32)
+        if len(parameters.tensors) != len(self.shapes):
+            raise ValueError(f"expected {len(self.shapes)} arrays, got {len(parameters.tensors)}")
+        headers = self.headers or [None] * len(self.shapes)
+        for data, header, start, end in zip(parameters.tensors, headers, self.offsets, self.offsets[1:]):
+            # A tensor serialized unlike the first (other dtype or shape) gets its own header
+            if header is None or len(data) != header[3] + (end - start) * header[2].itemsize:
+                header = _npy_header(data)
+            np.multiply(_npy_view(data, header), scale, out=out[start:end], casting="same_kind")
+        return out
+
+    def unpack(self, buffer: np.ndarray) -> list[np.ndarray]:
+        """The arrays in their own shapes and dtypes (views where the dtype is float32)."""
+        return [
+            buffer[start:end].reshape(shape).astype(dtype, copy=False)
+            for shape, dtype, start, end in zip(self.shapes, self.dtypes, self.offsets, self.offsets[1:])
+        ]
+
+    def to_parameters(self, buffer: np.ndarray) -> Parameters:
+        return ndarrays_to_parameters(self.unpack(buffer))
+
+
+def weighted_mean(results: list) -> tuple[Layout, np.ndarray]:
+    """Example-weighted mean of fit results, as (layout, flat buffer).
+
+    One update is deserialized at a time into a scratch buffer and added,
+    scaled, to the running sum: two buffers in memory however many clients.
+    """
+    total = sum(res.num_examples for _, res in results)
+
+    def weight(res) -> float:
+        return res.num_examples / total if total else 1.0 / len(results)
+
+    layout = Layout.of_parameters(results[0][1].parameters)
+    acc = layout.pack_parameters(results[0][1].parameters, scale=weight(results[0][1]))
+    scratch = np.empty_like(acc)
+    for _, res in results[1:]:
+        layout.pack_parameters(res.parameters, out=scratch, scale=weight(res))
+        acc += scratch
+    return layout, acc
+
+
+class FlatAggregation:
+    """`aggregate_fit` for the FedAvg family over flat buffers.
+
+    Mixed in ahead of a Flower strategy class; subclasses with a server
+    optimizer override `server_step`.
+    """
+
+    def aggregate_fit(self, server_round, results, failures):
+        if not results:
+            return None, {}
+        if not self.accept_failures and failures:
+            return None, {}
+        layout, mean = weighted_mean(results)
+        weights = self.server_step(server_round, layout, mean)
+
+        metrics = {}
+        if self.fit_metrics_aggregation_fn:
+            metrics = self.fit_metrics_aggregation_fn([(res.num_examples, res.metrics) for _, res in results])
+        return layout.to_parameters(weights), metrics
+
+    def server_step(self, server_round: int, layout: Layout, mean: np.ndarray) -> np.ndarray:
+        """New global weights from this round's weighted mean."""
+        return mean
+
+    def _current(self, layout: Layout, initial: Parameters | list | None) -> np.ndarray:
+        # The global weights the clients trained from, packed from the
+        # strategy's initial weights on first use and kept flat after that
+        if getattr(self, "_weights", None) is None:
+            if not initial:
+                raise ValueError(f"{type(self).__name__} needs initial_parameters (run config server-init = true)")
+            if isinstance(initial, Parameters):
+                self._weights = layout.pack_parameters(initial)
+            else:
+                self._weights = layout.pack(initial)
+        return self._weights
+
+
+class FlatFedAvg(FlatAggregation, FedAvg):
+    """FedAvg with flat-buffer aggregation."""
+
+
+class FlatFedProx(FlatAggregation, FedProx):
+    """FedProx (FedAvg aggregation, proximal term on the clients) with flat-buffer aggregation."""
+
+
+class FlatFedAvgM(FlatAggregation, FedAvgM):
+    """FedAvgM: server momentum on the pseudo-gradient, over flat buffers."""
+
+    def server_step(self, server_round, layout, mean):
+        if self.server_momentum <= 0.0 and self.server_learning_rate == 1.0:
+            return mean
+        # FedAvgM keeps its initial_parameters (FedAvg hands them out and drops them)
+        current = self._current(layout, self.initial_parameters)
+        pseudo_gradient = current - mean
+        if self.server_momentum > 0.0:
+            if getattr(self, "_momentum", None) is None:
+                self._momentum = pseudo_gradient
+            else:
+                self._momentum *= self.server_momentum
+                self._momentum += pseudo_gradient
+            pseudo_gradient = self._momentum
+        self._weights = current - self.server_learning_rate * pseudo_gradient
+        return self._weights
+
+
+class _FlatFedOpt(FlatAggregation, ABC):
+    """Shared FedOpt step: delta, first moment, adaptive update (Flower's rule).
+
+    Subclasses supply the second-moment rule, updating `v` in place.
+    """
+
+    bias_correction = False
+
+    @abstractmethod
+    def _second_moment(self, v: np.ndarray, delta_sq: np.ndarray) -> None:
+        """Fold the squared delta into the second moment `v`, in place."""
+
+    def server_step(self, server_round, layout, mean):
+        # FedOpt keeps the initial weights as current_weights; only the flat copy is updated
+        current = self._current(layout, self.current_weights)
+        delta = mean - current
+        if getattr(self, "_m", None) is None:
+            self._m = np.zeros_like(delta)
+            self._v = np.zeros_like(delta)
+        self._m *= self.beta_1
+        self._m += (1 - self.beta_1) * delta
+        delta *= delta
+        self._second_moment(self._v, delta)
+        eta_norm = self.eta
+        if self.bias_correction:
+            # Bias-corrected step size, as in Flower's FedAdam
+            eta_norm *= (np.sqrt(1 - np.power(self.beta_2, server_round + 1.0))
+                         / (1 - np.power(self.beta_1, server_round + 1.0)))
+        update = np.sqrt(self._v)
+        update += self.tau
+        np.divide(self._m, update, out=update)
+        update *= eta_norm
+        current += update
+        return current
+
+
+class FlatFedAdam(_FlatFedOpt, FedAdam):
+    """FedAdam with flat-buffer aggregation and optimizer state."""
+
+    bias_correction = True
+
+    def _second_moment(self, v, delta_sq):
+        v *= self.beta_2
+        v += (1 - self.beta_2) * delta_sq
+
+
+class FlatFedYogi(_FlatFedOpt, FedYogi):
+    """FedYogi with flat-buffer aggregation and optimizer state."""
+
+    def _second_moment(self, v, delta_sq):
+        v -= (1.0 - self.beta_2) * delta_sq * np.sign(v - delta_sq)
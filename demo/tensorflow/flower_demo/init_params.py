@@ -0,0 +1,34 @@
+"""Initial global weights built on the server, without TensorFlow.
+
+NumPy only, so the ServerApp can hand Flower `initial_parameters` instead of
+asking a client for them: without them Flower picks one client before
+round 1 and waits for it to build and compile the model just to call
+get_parameters.
+"""
+
+import numpy as np
+
+SEED = 42
+
+# SimpleCNN get_weights() layout, in order: (kernel shape, fan_in, fan_out)
+LAYERS = [
+    ((5, 5, 3, 32), 5 * 5 * 3, 5 * 5 * 32),      # conv 1
+    ((5, 5, 32, 64), 5 * 5 * 32, 5 * 5 * 64),    # conv 2
+    ((8 * 8 * 64, 512), 8 * 8 * 64, 512),        # dense 1
+    ((512, 10), 512, 10),                        # dense 2
+]
+
+
+def initial_arrays(seed: int = SEED) -> list[np.ndarray]:
+    """Kernels and biases matching SimpleCNN().get_weights() order and shapes.
+
+    Same distribution as the Keras defaults: Glorot-uniform kernels
+    (±sqrt(6 / (fan_in + fan_out))) and zero biases.
+    """
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for shape, fan_in, fan_out in LAYERS:
+        limit = np.sqrt(6.0 / (fan_in + fan_out))
+        arrays.append(rng.uniform(-limit, limit, size=shape).astype(np.float32))
+        arrays.append(np.zeros(shape[-1], dtype=np.float32))
+    return arrays
@@ -4,6 +4,18 @@ import numpy as np
 import tensorflow as tf
 from tensorflow import keras
 
+# This process's compiled model. Building and compiling the Sequential model
+# re-traces the graph and recreates the optimizer, a fixed cost of several
+# seconds on CPU VMs, so each process builds it once and later rounds only
+# load new weights. It lives as long as the ClientApp process: every round in
+# simulation, or under the warm worker (ONEAPP_FL_ISOLATION=process). With the
+# default subprocess isolation each task is a new process and builds it again.
+_model: keras.Model | None = None
+# (run id, node id) of the last fit on _model. One process can train for
+# several nodes in turn (simulation runs many virtual nodes per process),
+# and optimizer state is only carried over within the same node and run.
+_optimizer_owner: tuple[int, int] | None = None
+
 
 def SimpleCNN() -> keras.Model:
     """Lightweight CNN for CIFAR-10 (~2.16M parameters).
@@ -31,6 +43,40 @@ def SimpleCNN() -> keras.Model:
     return model
 
 
+def get_model() -> tuple[keras.Model, bool]:
+    """Return this process's compiled SimpleCNN and whether it was cached."""
+    global _model
+    if _model is not None:
+        return _model, True
+    _model = SimpleCNN()
+    return _model, False
+
+
+def reset_optimizer_state(model: keras.Model) -> None:
+    """Zero the optimizer's slots and step counter, keeping the compiled graph.
+
+    Used when optimizer state should not carry over between rounds on a
+    cached model. The learning rate is a variable too and is left untouched.
+    """
+    for var in model.optimizer.variables:
+        if "learning_rate" in var.name:
+            continue
+        var.assign(keras.ops.zeros(var.shape, dtype=var.dtype))
+
+
+def prepare_optimizer_state(model: keras.Model, owner: tuple[int, int], keep: bool) -> None:
+    """Reset the optimizer state before `owner`'s fit, unless it may be kept.
+
+    State is kept only when `keep` is set and the previous fit on this
+    model was `owner`'s (same run, same node); another node's moments are
+    never carried into this one's round.
+    """
+    global _optimizer_owner
+    if not (keep and _optimizer_owner == owner):
+        reset_optimizer_state(model)
+    _optimizer_owner = owner
+
+
 def get_weights(model: keras.Model) -> list[np.ndarray]:
     """Extract model parameters as a list of NumPy arrays."""
     return model.get_weights()
@@ -42,9 +88,16 @@ def set_weights(model: keras.Model, params: list[np.ndarray]) -> None:
 
 
 def train(model: keras.Model, x: np.ndarray, y: np.ndarray,
-          epochs: int, batch_size: int) -> None:
-    """Train the model on local data."""
+          epochs: int, batch_size: int, steps: int | None = None) -> int:
+    """Train the model on local data: `epochs` passes, or exactly `steps`
+    mini-batches when given (cycling through the data). Returns the number
+    of optimizer steps taken."""
+    if steps:
+        idx = np.arange(steps * batch_size) % len(x)
+        model.fit(x[idx], y[idx], epochs=1, batch_size=batch_size, verbose=0)
+        return steps
     model.fit(x, y, epochs=epochs, batch_size=batch_size, verbose=0)
+    return epochs * -(-len(x) // batch_size)
 
 
 def test(model: keras.Model, x: np.ndarray, y: np.ndarray) -> tuple[float, float]: